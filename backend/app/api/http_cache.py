@@ -0,0 +1,113 @@
+"""Условные GET-запросы: ETag, If-None-Match, Last-Modified.
+
+Обработчик вычисляет ETag по дешевым метаданным (id версий, хэши
+содержимого, время изменения) и возвращает 304 до загрузки и сериализации
+тела ответа.
+"""
+from __future__ import annotations
+
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+
+from fastapi import Request, Response
+
+
+def make_etag(*parts) -> str:
+    """Сильный ETag по набору значений"""
+    digest = hashlib.blake2b(digest_size=16)
+    for part in parts:
+        digest.update(str(part).encode("utf-8"))
+        digest.update(b"\x1f")
+    return f'"{digest.hexdigest()}"'
+
+
+def _as_utc(value: datetime) -> datetime:
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+def http_date(value: datetime) -> str:
+    return format_datetime(_as_utc(value).replace(microsecond=0), usegmt=True)
+
+
+def etag_matches(header: str | None, etag: str) -> bool:
+    """Слабое сравнение для If-None-Match (RFC 9110): W/ игнорируется, поддерживается *"""
+    if not header:
+        return False
+    bare = etag.removeprefix("W/")
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == bare:
+            return True
+    return False
+
+
+def _not_modified_since(header: str | None, last_modified: datetime | None) -> bool:
+    if not header or last_modified is None:
+        return False
+    try:
+        since = parsedate_to_datetime(header)
+    except (TypeError, ValueError):
+        return False
+    if since is None:
+        return False
+    return _as_utc(last_modified).replace(microsecond=0) <= _as_utc(since)
+
+
+def cache_headers(
+    etag: str,
+    last_modified: datetime | None = None,
+    cache_control: str = "private, no-cache",
+    vary: str | None = None,
+) -> dict[str, str]:
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    if last_modified is not None:
+        headers["Last-Modified"] = http_date(last_modified)
+    if vary:
+        headers["Vary"] = vary
+    return headers
+
+
+def conditional_response(
+    request: Request,
+    response: Response,
+    etag: str,
+    last_modified: datetime | None = None,
+    cache_control: str = "private, no-cache",
+    vary: str | None = None,
+) -> Response | None:
+    """Вернуть 304, если клиент уже имеет актуальную копию; иначе проставить
+    заголовки валидации в response и вернуть None"""
+    headers = cache_headers(etag, last_modified, cache_control, vary)
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        fresh = etag_matches(if_none_match, etag)
+    else:
+        fresh = _not_modified_since(request.headers.get("if-modified-since"), last_modified)
+    if fresh:
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return None
+
+
+def versions_conditional(request: Request, response: Response, stamps) -> Response | None:
+    """conditional_response для ответа, собранного из версий (строки с id, plan_hash, updated_at).
+
+    ETag зависит от пути, параметров и заголовков Accept* запроса и от
+    состояния всех версий; Last-Modified — время последнего изменения версии.
+    """
+    if not stamps:
+        return None
+    etag = make_etag(
+        request.url.path,
+        request.url.query,
+        # Разные представления (JSON/MessagePack, сжатие) — разные сильные ETag
+        request.headers.get("accept", ""),
+        request.headers.get("accept-encoding", ""),
+        *(f"{row.id}:{row.plan_hash}:{row.updated_at.isoformat()}" for row in stamps),
+    )
+    return conditional_response(
+        request, response, etag, max(row.updated_at for row in stamps), vary="Accept, Accept-Encoding"
+    )
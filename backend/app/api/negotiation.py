@@ -0,0 +1,99 @@
+"""Согласование формата ответов с планами.
+
+``Accept: application/msgpack`` — тело в MessagePack вместо JSON;
+``Accept-Encoding: br``/``gzip`` — сжатие (brotli, если установлен);
+параметр ``layout=columnar`` — колоночная раскладка стен (см. plan_codec).
+Без этих заголовков и параметра ответ формируется FastAPI как раньше.
+"""
+from __future__ import annotations
+
+import gzip
+import json
+
+import msgpack
+from fastapi import Request, Response
+from pydantic import BaseModel
+
+from app.services import plan_codec
+
+try:
+    import brotli
+except ImportError:  # brotli необязателен, остается gzip
+    brotli = None
+
+MSGPACK_MEDIA_TYPES = ("application/msgpack", "application/x-msgpack", "application/vnd.msgpack")
+MIN_COMPRESS_SIZE = 1024
+VARY = "Accept, Accept-Encoding"
+
+
+def _accepted(header: str | None) -> dict[str, float]:
+    """Значения заголовка Accept*/q-веса в нижнем регистре"""
+    result: dict[str, float] = {}
+    for part in (header or "").split(","):
+        name, *params = [p.strip() for p in part.split(";")]
+        if not name:
+            continue
+        quality = 1.0
+        for param in params:
+            key, _, value = param.partition("=")
+            if key.strip() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        result[name.lower()] = quality
+    return result
+
+
+def wants_msgpack(request: Request) -> bool:
+    accepted = _accepted(request.headers.get("accept"))
+    msgpack_q = max((accepted.get(t, 0.0) for t in MSGPACK_MEDIA_TYPES), default=0.0)
+    json_q = max(accepted.get("application/json", 0.0), accepted.get("*/*", 0.0) * 0.99)
+    return msgpack_q > 0 and msgpack_q >= json_q
+
+
+def choose_content_encoding(request: Request) -> str | None:
+    accepted = _accepted(request.headers.get("accept-encoding"))
+    if brotli is not None and accepted.get("br", 0.0) > 0:
+        return "br"
+    if accepted.get("gzip", 0.0) > 0:
+        return "gzip"
+    return None
+
+
+def _apply_layout(data: dict, binary: bool) -> dict:
+    """Колоночная раскладка для plan в ответе и во вложенных original/modified"""
+    result = dict(data)
+    for key, value in data.items():
+        if key == "plan" and isinstance(value, dict):
+            result[key] = plan_codec.to_columnar(value, binary=binary)
+        elif isinstance(value, dict) and isinstance(value.get("plan"), dict):
+            result[key] = {**value, "plan": plan_codec.to_columnar(value["plan"], binary=binary)}
+    return result
+
+
+def render(request: Request, response: Response, payload: BaseModel, layout: str | None = None):
+    """Вернуть payload в согласованном формате; заголовки из response сохраняются"""
+    response.headers["Vary"] = VARY
+    use_msgpack = wants_msgpack(request)
+    encoding = choose_content_encoding(request)
+    columnar = layout == plan_codec.COLUMNAR
+    if not (use_msgpack or encoding or columnar):
+        return payload
+
+    data = payload.model_dump(mode="json", by_alias=True)
+    if columnar:
+        data = _apply_layout(data, binary=use_msgpack)
+    if use_msgpack:
+        body = msgpack.packb(data, use_bin_type=True)
+        media_type = "application/msgpack"
+    else:
+        body = json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        media_type = "application/json"
+
+    headers = dict(response.headers)
+    headers.pop("content-length", None)
+    if encoding and len(body) >= MIN_COMPRESS_SIZE:
+        body = brotli.compress(body, quality=5) if encoding == "br" else gzip.compress(body, compresslevel=6)
+        headers["Content-Encoding"] = encoding
+    return Response(content=body, media_type=media_type, headers=headers, status_code=response.status_code or 200)
@@ -0,0 +1,57 @@
+"""Кэш готовых JSON-ответов для редко меняющихся справочников.
+
+Тело ответа сериализуется один раз на версию данных (счетчики записей в
+directory_service/texture_service) и отдается байтами с сильным ETag, без
+обращения к БД и повторной проверки Pydantic-моделей. Записи в других
+процессах видны не позже чем через response_cache_ttl_seconds.
+"""
+from __future__ import annotations
+
+import hashlib
+import threading
+import time
+from collections.abc import Callable
+from dataclasses import dataclass
+from typing import Any
+
+from fastapi import Request, Response
+
+from app.api import http_cache
+from app.core.config import settings
+
+
+@dataclass(frozen=True)
+class CachedBody:
+    body: bytes
+    etag: str
+
+
+def json_body(body: bytes) -> CachedBody:
+    return CachedBody(body, f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"')
+
+
+_cache: dict[str, tuple[Any, Any, float]] = {}
+_lock = threading.Lock()
+
+
+def get_or_build(key: str, version: Any, build: Callable[[], Any]) -> Any:
+    """Значение для версии данных version; build() вызывается только при смене версии или по TTL"""
+    entry = _cache.get(key)
+    if entry is not None and entry[0] == version and time.monotonic() - entry[2] < settings.response_cache_ttl_seconds:
+        return entry[1]
+    value = build()
+    with _lock:
+        _cache[key] = (version, value, time.monotonic())
+    return value
+
+
+def respond(request: Request, cached: CachedBody, cache_control: str = "private, no-cache") -> Response:
+    """200 с готовым телом или 304, если у клиента та же версия"""
+    headers = {"ETag": cached.etag, "Cache-Control": cache_control}
+    if http_cache.etag_matches(request.headers.get("if-none-match"), cached.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=cached.body, media_type="application/json", headers=headers)
+
+
+def public_cache_control() -> str:
+    return f"public, max-age={settings.directory_cache_max_age_seconds}"
@@ -13,6 +13,7 @@ from app.schemas.ai_rule import (
     AIRulePreviewRequest,
     AIRulePreviewResponse,
     AIRuleBatchActionRequest,
+    AIRuleTagFacet,
 )
 from app.services import ai_rule_service
 
@@ -43,6 +44,19 @@ def list_rules(
     return [AIRuleRead.model_validate(rule) for rule in rules]
 
 
+@router.get("/ai/rules/tags", response_model=list[AIRuleTagFacet], summary="Теги правил AI с количеством")
+def list_rule_tags(
+    riskType: RiskType | None = Query(default=None, alias="riskType", description="Фильтр по типу риска"),
+    isEnabled: bool | None = Query(default=None, alias="isEnabled", description="Фильтр по статусу (включено/выключено)"),
+    search: str | None = Query(default=None, description="Поиск по названию или описанию"),
+    db: Session = Depends(get_db_session),
+    admin=Depends(get_current_admin),
+) -> list[AIRuleTagFacet]:
+    """Число правил по каждому тегу с теми же фильтрами, что у списка правил"""
+    facets = ai_rule_service.tag_facets(db, risk_type=riskType, is_enabled=isEnabled, search=search)
+    return [AIRuleTagFacet(tag=tag, count=count) for tag, count in facets]
+
+
 @router.get("/ai/rules/{rule_id}", response_model=AIRuleRead, summary="Детали правила")
 def get_rule(
     rule_id: uuid.UUID,
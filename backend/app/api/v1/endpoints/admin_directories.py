@@ -1,6 +1,8 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Query, Request
+from pydantic import TypeAdapter
 from sqlalchemy.orm import Session
 
+from app.api import response_cache
 from app.api.deps import get_current_admin, get_db_session
 from app.schemas.directory import (
     DepartmentCreate,
@@ -13,17 +15,30 @@ from app.schemas.directory import (
     HouseTypeRead,
     HouseTypeUpdate,
 )
-from app.services import directory_service
+from app.services import directory_service, job_service
+from app.services.job_handlers import REPRICE_ORDERS
 
 router = APIRouter(prefix="/admin", tags=["Admin"])
 
+_departments_adapter = TypeAdapter(list[DepartmentRead])
+
+_REPRICE_QUERY = Query(default=False, description="После изменения коэффициента пересчитать цены открытых заказов в фоне")
+
+
+def _enqueue_reprice(db: Session, admin, payload: dict) -> None:
+    job_service.enqueue(db, REPRICE_ORDERS, payload=payload, created_by_id=admin.id)
+
 
 @router.get("/departments", response_model=list[DepartmentRead])
 def list_departments(
-    db: Session = Depends(get_db_session), admin=Depends(get_current_admin)
+    request: Request, db: Session = Depends(get_db_session), admin=Depends(get_current_admin)
 ):
-    departments = directory_service.list_departments(db)
-    return [DepartmentRead.model_validate(d) for d in departments]
+    def build() -> response_cache.CachedBody:
+        departments = [DepartmentRead.model_validate(d) for d in directory_service.list_departments(db)]
+        return response_cache.json_body(_departments_adapter.dump_json(departments, by_alias=True))
+
+    cached = response_cache.get_or_build("departments", directory_service.directory_version("departments"), build)
+    return response_cache.respond(request, cached)
 
 
 @router.post("/departments", response_model=DepartmentRead)
@@ -61,10 +76,13 @@ def create_district(
 def update_district(
     code: str,
     data: DistrictUpdate,
+    reprice: bool = _REPRICE_QUERY,
     db: Session = Depends(get_db_session),
     admin=Depends(get_current_admin),
 ):
     district = directory_service.upsert_district(db, data, code=code)
+    if reprice and data.price_coef is not None:
+        _enqueue_reprice(db, admin, {"districtCodes": [district.code]})
     return DistrictRead.model_validate(district)
 
 
@@ -82,8 +100,11 @@ def create_house_type(
 def update_house_type(
     code: str,
     data: HouseTypeUpdate,
+    reprice: bool = _REPRICE_QUERY,
     db: Session = Depends(get_db_session),
     admin=Depends(get_current_admin),
 ):
     house_type = directory_service.upsert_house_type(db, data, code=code)
+    if reprice and data.price_coef is not None:
+        _enqueue_reprice(db, admin, {"houseTypeCodes": [house_type.code]})
     return HouseTypeRead.model_validate(house_type)
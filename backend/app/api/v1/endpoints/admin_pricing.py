@@ -0,0 +1,76 @@
+"""API endpoints для версий тарифа калькулятора стоимости"""
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.orm import Session
+
+from app.api.deps import get_current_admin, get_db_session
+from app.schemas.job import JobRead
+from app.schemas.pricing import RepriceRequest, TariffCreate, TariffRead
+from app.services import job_service, tariff_service
+from app.services.job_handlers import REPRICE_ORDERS
+from app.services.pricing_rules import PricingRulesError
+
+router = APIRouter(prefix="/admin", tags=["Admin"])
+
+
+@router.get("/pricing/tariffs", response_model=list[TariffRead], summary="Версии тарифа")
+def list_tariffs(
+    db: Session = Depends(get_db_session),
+    admin=Depends(get_current_admin),
+) -> list[TariffRead]:
+    """Все версии тарифа, новые первыми"""
+    return [TariffRead.model_validate(t) for t in tariff_service.list_tariffs(db)]
+
+
+@router.get("/pricing/tariffs/{version}", response_model=TariffRead, summary="Версия тарифа")
+def get_tariff(
+    version: int,
+    db: Session = Depends(get_db_session),
+    admin=Depends(get_current_admin),
+) -> TariffRead:
+    tariff = tariff_service.get_tariff(db, version)
+    if not tariff:
+        raise HTTPException(status_code=404, detail="Tariff not found")
+    return TariffRead.model_validate(tariff)
+
+
+@router.post("/pricing/tariffs", response_model=TariffRead, status_code=201, summary="Создать версию тарифа")
+def create_tariff(
+    data: TariffCreate,
+    db: Session = Depends(get_db_session),
+    admin=Depends(get_current_admin),
+) -> TariffRead:
+    """Создать новую версию тарифа; правила проверяются до сохранения"""
+    try:
+        tariff = tariff_service.create_tariff(db, data, created_by_id=admin.id)
+    except PricingRulesError as exc:
+        raise HTTPException(status_code=422, detail=str(exc))
+    return TariffRead.model_validate(tariff)
+
+
+@router.post("/pricing/tariffs/{version}/activate", response_model=TariffRead, summary="Сделать версию тарифа действующей")
+def activate_tariff(
+    version: int,
+    db: Session = Depends(get_db_session),
+    admin=Depends(get_current_admin),
+) -> TariffRead:
+    tariff = tariff_service.get_tariff(db, version)
+    if not tariff:
+        raise HTTPException(status_code=404, detail="Tariff not found")
+    return TariffRead.model_validate(tariff_service.activate_tariff(db, tariff))
+
+
+@router.post("/pricing/reprice", response_model=JobRead, status_code=202, summary="Пересчитать цены открытых заказов")
+def reprice_orders(
+    data: RepriceRequest,
+    db: Session = Depends(get_db_session),
+    admin=Depends(get_current_admin),
+) -> JobRead:
+    """Фоновый пересчет estimated_price по текущим коэффициентам и тарифу.
+
+    Ход выполнения — в progress задачи (GET /jobs/{id}), в пробном режиме
+    результат содержит изменения цен без записи.
+    """
+    job = job_service.enqueue(
+        db, REPRICE_ORDERS, payload=data.model_dump(mode="json", by_alias=True), created_by_id=admin.id
+    )
+    return JobRead.model_validate(job)
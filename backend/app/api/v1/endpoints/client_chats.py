@@ -10,6 +10,7 @@ from app.models.order import Order, ExecutorAssignment
 from app.schemas.chat import ClientChatThread, CreateChatRequest
 from app.schemas.orders import ChatMessageCreate, ChatMessagePairResponse, OrderChatMessage
 from app.services import chat_service
+from app.services.job_handlers import enqueue_chat_ai_reply
 
 router = APIRouter(tags=["Client"])
 
@@ -84,8 +85,8 @@ def list_messages(
     return [OrderChatMessage.model_validate(m) for m in messages]
 
 
-@router.post("/chats/{chat_id}/messages", response_model=ChatMessagePairResponse)
-async def post_message(
+@router.post("/chats/{chat_id}/messages", response_model=ChatMessagePairResponse, status_code=202)
+def post_message(
     chat_id: uuid.UUID,
     payload: ChatMessageCreate,
     db: Session = Depends(get_db_session),
@@ -96,8 +97,8 @@ async def post_message(
         raise HTTPException(status_code=404, detail="Chat not found")
     _check_chat_access(db, chat, current_user)
     user_msg = chat_service.add_message(db, chat, sender=current_user, sender_type=_sender_type(current_user), text=payload.message)
-    ai_msg = await chat_service.delegate_to_ai(db, chat, payload)
-    return ChatMessagePairResponse(userMessage=user_msg, aiMessage=ai_msg)
+    job = enqueue_chat_ai_reply(db, chat, current_user, payload.message)
+    return ChatMessagePairResponse(userMessage=user_msg, aiJobId=job.id)
 
 
 def _ensure_order_access(order: Order, user, db: Session):
@@ -129,8 +130,8 @@ def order_chat_messages(
     return [OrderChatMessage.model_validate(m) for m in messages]
 
 
-@router.post("/orders/{order_id}/chat", response_model=ChatMessagePairResponse)
-async def post_order_chat_message(
+@router.post("/orders/{order_id}/chat", response_model=ChatMessagePairResponse, status_code=202)
+def post_order_chat_message(
     order_id: uuid.UUID,
     payload: ChatMessageCreate,
     db: Session = Depends(get_db_session),
@@ -144,5 +145,5 @@ async def post_order_chat_message(
     user_msg = chat_service.add_message(
         db, chat, sender=current_user, sender_type=_sender_type(current_user), text=payload.message
     )
-    ai_msg = await chat_service.delegate_to_ai(db, chat, payload)
-    return ChatMessagePairResponse(userMessage=user_msg, aiMessage=ai_msg)
+    job = enqueue_chat_ai_reply(db, chat, current_user, payload.message)
+    return ChatMessagePairResponse(userMessage=user_msg, aiJobId=job.id)
@@ -1,14 +1,12 @@
-import math
 import uuid
-from copy import deepcopy
-from datetime import datetime
 from pathlib import Path
 
-from fastapi import APIRouter, Depends, File, HTTPException, UploadFile
+from fastapi import APIRouter, Depends, File, HTTPException, Query, Request, Response, UploadFile
 from fastapi.responses import FileResponse
 from pydantic import BaseModel
 from sqlalchemy.orm import Session
 
+from app.api import http_cache, negotiation
 from app.api.deps import get_current_user, get_db_session
 from app.schemas.orders import (
     CreateOrderRequest,
@@ -17,23 +15,28 @@ from app.schemas.orders import (
     OrderFile,
     OrderPlanVersion,
     OrderStatusHistoryItem,
+    PlanRevisionInfo,
+    PlanRevisionRead,
+    PatchPlanRequest,
+    PatchPlanResponse,
     SavePlanChangesRequest,
     ParsePlanResultRequest,
     AiAnalysis,
-    AiRisk,
     RecognizePlanRequest,
 )
+from app.schemas.job import JobRead
 from app.schemas.plan_responses import (
     Plan2DResponse,
     PlanBeforeAfterResponse,
     PlanDiffResponse,
     PlanExportResponse,
+    PlanQueryResponse,
 )
 from app.models.order import OrderFile as OrderFileModel
 from app.core.config import settings
-from app.services import order_service, plan_recognition_service, ai_rule_service
-from app.services.gemini_client import generate_json
-from app.services.plan_description import summarize_plan
+from app.services import ai_analysis_service, job_service, order_service, plan_diff, plan_history, plan_lod, plan_mesh, plan_spatial
+from app.services.job_handlers import AI_ANALYSIS, PLAN_RECOGNITION
+from app.services.plan_transform import apply_split_to_plan_version as _apply_split_to_plan_version, split_wall_segments
 
 class HTTPValidationError(BaseModel):
     detail: list[dict] | None = None
@@ -46,255 +49,6 @@ def _ensure_ownership(order, user_id: uuid.UUID):
         raise HTTPException(status_code=403, detail="Not your order")
 
 
-def _split_wall_segments(plan: dict) -> dict:
-    """Split walls with openings into separate wall elements without openings."""
-    if not plan:
-        return plan
-    meta = plan.get("meta", {}) or {}
-    scale = meta.get("scale") or {}
-    px_per_meter = scale.get("px_per_meter") or scale.get("pxPerMeter") or 1
-    try:
-        px_per_meter = float(px_per_meter)
-        if px_per_meter <= 0:
-            px_per_meter = 1
-    except Exception:
-        px_per_meter = 1
-
-    elements = []
-    for elem in plan.get("elements", []):
-        if elem.get("type") != "wall":
-            elements.append(elem)
-            continue
-        geom = elem.get("geometry") or {}
-        openings = geom.get("openings") or []
-        points = geom.get("points") or []
-        if geom.get("kind") != "segment" or len(points) != 4 or not openings:
-            elements.append(elem)
-            continue
-
-        x1, y1, x2, y2 = points
-        dx = x2 - x1
-        dy = y2 - y1
-        length_px = math.hypot(dx, dy)
-        if length_px == 0:
-            elements.append(elem)
-            continue
-        length_m = length_px / px_per_meter if px_per_meter else length_px
-
-        def point_at(offset_m: float) -> tuple[float, float]:
-            offset_px = offset_m * px_per_meter
-            ratio = offset_px / length_px
-            return x1 + dx * ratio, y1 + dy * ratio
-
-        openings_sorted = sorted(openings, key=lambda o: o.get("from_m", 0))
-        segments: list[tuple[float, float]] = []
-        cursor = 0.0
-        for op in openings_sorted:
-            start = max(0.0, float(op.get("from_m", 0)))
-            end = max(start, float(op.get("to_m", start)))
-            start = min(start, length_m)
-            end = min(end, length_m)
-            if start > cursor:
-                segments.append((cursor, start))
-            cursor = max(cursor, end)
-        if cursor < length_m:
-            segments.append((cursor, length_m))
-
-        if not segments:
-            elements.append(elem)
-            continue
-
-        for idx, (seg_start, seg_end) in enumerate(segments):
-            if seg_end - seg_start <= 0:
-                continue
-            sx, sy = point_at(seg_start)
-            ex, ey = point_at(seg_end)
-            new_elem = deepcopy(elem)
-            new_elem["id"] = f"{elem.get('id')}_seg{idx+1}"
-            new_elem_geom = deepcopy(geom)
-            new_elem_geom["points"] = [sx, sy, ex, ey]
-            new_elem_geom["openings"] = None
-            new_elem["geometry"] = new_elem_geom
-            elements.append(new_elem)
-
-    plan_copy = deepcopy(plan)
-    plan_copy["elements"] = elements
-    return plan_copy
-
-
-def _apply_split_to_plan_version(plan_version):
-    if not plan_version or not getattr(plan_version, "plan", None):
-        return plan_version
-    plan_version.plan = _split_wall_segments(plan_version.plan)
-    return plan_version
-
-
-def _format_rules_text(rules: list) -> str:
-    if not rules:
-        return "Правила для анализа не заданы."
-    lines = []
-    for rule in rules[:5]:
-        title = getattr(rule, "name", None) or "Правило"
-        description = getattr(rule, "description", None) or getattr(rule, "trigger_condition", "") or ""
-        risk_type = getattr(rule, "risk_type", None)
-        severity = getattr(rule, "severity", None)
-        parts = [f"- {title}: {description}"]
-        extra = []
-        if risk_type:
-            extra.append(f"тип риска {getattr(risk_type, 'value', risk_type)}")
-        if severity:
-            extra.append(f"серьезность {severity}")
-        if extra:
-            parts.append(f"({', '.join(extra)})")
-        lines.append(" ".join(parts).strip())
-    return "\n".join(lines)
-
-
-def _severity_from_label(label: str | None) -> int | None:
-    if not label:
-        return None
-    mapping = {"low": 1, "medium": 2, "high": 4, "critical": 5}
-    return mapping.get(label.lower())
-
-
-def _map_ai_risk(risk_dict: dict) -> AiRisk:
-    severity = risk_dict.get("severity")
-    if severity is None:
-        severity = _severity_from_label(risk_dict.get("severity_str"))
-    risk_type = risk_dict.get("type") or "TECHNICAL"
-    description = risk_dict.get("description") or "Risk details are not available"
-    return AiRisk(
-        type=risk_type,
-        description=description,
-        severity=severity,
-        zone=risk_dict.get("zone"),
-    )
-
-
-def _derive_decision_status(risks: list[AiRisk]) -> str:
-    if any(r.severity and r.severity >= 4 for r in risks):
-        return "FORBIDDEN"
-    if any(r.severity and r.severity >= 3 for r in risks):
-        return "NEEDS_APPROVAL"
-    if risks:
-        return "ALLOWED_WITH_WARNINGS"
-    return "ALLOWED"
-
-
-def _collect_order_context(order) -> dict:
-    status_value = order.status.value if hasattr(order.status, "value") else str(order.status)
-    context = {
-        "order_id": str(order.id),
-        "order_title": order.title,
-        "order_status": status_value,
-    }
-    if order.district_code:
-        context["district_code"] = order.district_code
-    if order.house_type_code:
-        context["house_type_code"] = order.house_type_code
-    if order.address:
-        context["address"] = order.address
-    if getattr(order, "area", None):
-        context["area"] = order.area
-    return context
-
-
-def _get_latest_plan_data(db: Session, order_id: uuid.UUID) -> dict | None:
-    versions = order_service.get_plan_versions(db, order_id)
-    if not versions:
-        return None
-    latest = versions[-1]
-    latest = _apply_split_to_plan_version(latest)
-    return latest.plan
-
-
-async def _build_ai_analysis(db: Session, order, persist: bool = False) -> AiAnalysis:
-    plan_data = _get_latest_plan_data(db, order.id)
-    if not plan_data:
-        summary = order.ai_decision_summary or "Plan data not available for analysis"
-        decision_status = order.ai_decision_status or "UNKNOWN"
-        analysis = AiAnalysis(
-            id=uuid.uuid4(),
-            orderId=order.id,
-            decisionStatus=decision_status,
-            summary=summary,
-            risks=None,
-            legalWarnings=None,
-            financialWarnings=None,
-            rawResponse=None,
-        )
-        if persist:
-            order.ai_decision_status = decision_status
-            order.ai_decision_summary = summary
-            db.add(order)
-            db.commit()
-            db.refresh(order)
-        return analysis
-
-    rules = ai_rule_service.list_rules(db, is_enabled=True)
-    rules_text = _format_rules_text(rules)
-    order_context = _collect_order_context(order)
-    plan_description = summarize_plan(plan_data)
-
-    system_prompt = (
-        "Ты эксперт по перепланировкам и БТИ. "
-        "Анализируй план квартиры, оценивай риски и формируй структурированный вывод."
-    )
-    prompt = (
-        f"Данные заказа:\n"
-        f"ID: {order_context.get('order_id')}\n"
-        f"Статус: {order_context.get('order_status')}\n"
-        f"Тип дома: {order_context.get('house_type_code', 'не указан')}\n"
-        f"Округ: {order_context.get('district_code', 'не указан')}\n"
-        f"Адрес: {order_context.get('address', 'не указан')}\n\n"
-        f"Описание плана:\n{plan_description}\n\n"
-        f"Правила и ограничения:\n{rules_text}\n\n"
-        "Сформируй краткое резюме и список рисков по категориям "
-        "(TECHNICAL, LEGAL, FINANCIAL, OPERATIONAL). "
-        "Ответ верни строго в JSON с полями: summary (str), risks (list of objects: "
-        "type, description, severity(1-5), zone(optional))."
-    )
-
-    result = await generate_json(
-        system=system_prompt,
-        prompt=prompt,
-        temperature=settings.analysis_temperature,
-    )
-
-    risks_dicts = result.get("risks") if isinstance(result, dict) else []
-    summary = result.get("summary") if isinstance(result, dict) else None
-
-    ai_risks = [_map_ai_risk(r) for r in risks_dicts] if risks_dicts else []
-    decision_status = result.get("decisionStatus") if isinstance(result, dict) else None
-    derived_status = _derive_decision_status(ai_risks)
-    if derived_status:
-        decision_status = derived_status
-    if not decision_status:
-        decision_status = order.ai_decision_status or "UNKNOWN"
-    if not summary:
-        summary = "Анализ плана не дал результатов."
-
-    analysis = AiAnalysis(
-        id=uuid.uuid4(),
-        orderId=order.id,
-        decisionStatus=decision_status,
-        summary=summary,
-        risks=ai_risks or None,
-        legalWarnings=None,
-        financialWarnings=None,
-        rawResponse=result if isinstance(result, dict) else None,
-    )
-
-    if persist:
-        order.ai_decision_status = decision_status
-        order.ai_decision_summary = summary
-        db.add(order)
-        db.commit()
-        db.refresh(order)
-
-    return analysis
-
-
 @router.get("/orders", response_model=list[Order])
 def list_client_orders(
     db: Session = Depends(get_db_session), current_user=Depends(get_current_user)
@@ -383,10 +137,20 @@ def get_files(
     return [OrderFile.model_validate(f) for f in files]
 
 
+_SPLIT_DESCRIPTION = (
+    "false — стены без разрезки по проемам, с id как в сохраненном плане, и revisionId: "
+    "по этим id и ревизии редактор сохраняет изменения через PATCH /plan"
+)
+
+
 @router.get("/orders/{order_id}/plan", response_model=OrderPlanVersion)
 def get_plan_versions(
     order_id: uuid.UUID,
+    request: Request,
+    response: Response,
     version: str | None = None,
+    layout: str | None = Query(default=None, description="columnar — координаты стен одним массивом float32"),
+    split: bool = Query(default=True, description=_SPLIT_DESCRIPTION),
     db: Session = Depends(get_db_session),
     current_user=Depends(get_current_user),
 ) -> OrderPlanVersion:
@@ -394,22 +158,37 @@ def get_plan_versions(
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
     _ensure_ownership(order, current_user.id)
+    not_modified = http_cache.versions_conditional(
+        request, response, order_service.get_plan_version_stamps(db, order_id)
+    )
+    if not_modified is not None:
+        return not_modified
+
     versions = order_service.get_plan_versions(db, order_id)
+    match = None
     if version:
         match = next((v for v in versions if v.version_type.lower() == version.lower()), None)
-        if match:
-            match = _apply_split_to_plan_version(match)
-            return OrderPlanVersion.model_validate(match)
-    if not versions:
-        raise HTTPException(status_code=404, detail="Plan not found")
-    latest = _apply_split_to_plan_version(versions[-1])
-    return OrderPlanVersion.model_validate(latest)
+    if match is None:
+        if not versions:
+            raise HTTPException(status_code=404, detail="Plan not found")
+        match = versions[-1]
+    if split:
+        result = OrderPlanVersion.model_validate(_apply_split_to_plan_version(match))
+    else:
+        result = OrderPlanVersion.model_validate(match)
+        result.revision_id = plan_history.latest_revision_id(db, order_id)
+    return negotiation.render(request, response, result, layout)
 
 
 @router.get("/orders/{order_id}/plan/2d", response_model=Plan2DResponse, summary="Получить 2D план с полной геометрией")
 def get_plan_2d(
     order_id: uuid.UUID,
+    request: Request,
+    response: Response,
     version: str | None = None,
+    layout: str | None = Query(default=None, description="columnar — координаты стен одним массивом float32"),
+    lod: int = Query(default=0, ge=0, le=plan_lod.MAX_LEVEL, description="Уровень детализации: 0 — полный план, 1–2 — упрощенный для обзора"),
+    split: bool = Query(default=True, description=_SPLIT_DESCRIPTION),
     db: Session = Depends(get_db_session),
     current_user=Depends(get_current_user),
 ) -> Plan2DResponse:
@@ -419,6 +198,12 @@ def get_plan_2d(
         raise HTTPException(status_code=404, detail="Order not found")
     _ensure_ownership(order, current_user.id)
     
+    not_modified = http_cache.versions_conditional(
+        request, response, order_service.get_plan_version_stamps(db, order_id)
+    )
+    if not_modified is not None:
+        return not_modified
+
     versions = order_service.get_plan_versions(db, order_id)
     if not versions:
         raise HTTPException(status_code=404, detail="Plan not found")
@@ -442,22 +227,37 @@ def get_plan_2d(
         if creator:
             created_by_name = creator.full_name
     
-    plan_version = _apply_split_to_plan_version(plan_version)
+    revision_id = None
+    if lod:
+        # Упрощенный уровень строится по целым стенам и затем режется по проемам
+        plan = plan_lod.get_level(plan_version.plan, lod, plan_version.stored_plan_hash)
+        if split:
+            plan = split_wall_segments(plan)
+    elif split:
+        plan = _apply_split_to_plan_version(plan_version).plan
+    else:
+        plan = plan_version.plan
+        revision_id = plan_history.latest_revision_id(db, order_id)
 
-    return Plan2DResponse(
+    result = Plan2DResponse(
         orderId=order_id,
         versionType=plan_version.version_type,
         versionId=plan_version.id,
-        plan=plan_version.plan,
+        plan=plan,
         comment=plan_version.comment,
         createdAt=plan_version.created_at,
         createdBy=created_by_name,
+        revisionId=revision_id,
     )
+    return negotiation.render(request, response, result, layout)
 
 
 @router.get("/orders/{order_id}/plan/before-after", response_model=PlanBeforeAfterResponse, summary="Получить план в режиме до/после")
 def get_plan_before_after(
     order_id: uuid.UUID,
+    request: Request,
+    response: Response,
+    layout: str | None = Query(default=None, description="columnar — координаты стен одним массивом float32"),
     db: Session = Depends(get_db_session),
     current_user=Depends(get_current_user),
 ) -> PlanBeforeAfterResponse:
@@ -467,6 +267,12 @@ def get_plan_before_after(
         raise HTTPException(status_code=404, detail="Order not found")
     _ensure_ownership(order, current_user.id)
     
+    not_modified = http_cache.versions_conditional(
+        request, response, order_service.get_plan_version_stamps(db, order_id)
+    )
+    if not_modified is not None:
+        return not_modified
+
     versions = order_service.get_plan_versions(db, order_id)
     if not versions:
         raise HTTPException(status_code=404, detail="Plan not found")
@@ -510,14 +316,17 @@ def get_plan_before_after(
                 createdBy=created_by_name,
             )
     
-    return PlanBeforeAfterResponse(original=original, modified=modified)
+    return negotiation.render(request, response, PlanBeforeAfterResponse(original=original, modified=modified), layout)
 
 
 @router.get("/orders/{order_id}/plan/diff", response_model=PlanDiffResponse, summary="Получить разницу между версиями плана")
 def get_plan_diff(
     order_id: uuid.UUID,
+    request: Request,
+    response: Response,
     original_version: str | None = None,
     modified_version: str | None = None,
+    layout: str | None = Query(default=None, description="columnar — координаты стен одним массивом float32"),
     db: Session = Depends(get_db_session),
     current_user=Depends(get_current_user),
 ) -> PlanDiffResponse:
@@ -527,6 +336,12 @@ def get_plan_diff(
         raise HTTPException(status_code=404, detail="Order not found")
     _ensure_ownership(order, current_user.id)
     
+    not_modified = http_cache.versions_conditional(
+        request, response, order_service.get_plan_version_stamps(db, order_id)
+    )
+    if not_modified is not None:
+        return not_modified
+
     versions = order_service.get_plan_versions(db, order_id)
     if not versions:
         raise HTTPException(status_code=404, detail="Plan not found")
@@ -547,6 +362,11 @@ def get_plan_diff(
         if not modified_plan and versions:
             modified_plan = versions[-1]  # Последняя версия
     
+    # Изменения считаются по исходным планам, до разрезания стен по проемам
+    changes = {}
+    if original_plan and modified_plan:
+        changes = plan_diff.diff_versions(original_plan, modified_plan)
+    
     original_response = None
     modified_response = None
     
@@ -586,58 +406,24 @@ def get_plan_diff(
             createdBy=created_by_name,
         )
     
-    # Вычисляем изменения
-    changes = {}
-    if original_plan and modified_plan:
-        changes = _calculate_plan_diff(original_plan.plan, modified_plan.plan)
+    if changes:
+        changes = plan_diff.expand_split_ids(changes, original_plan.plan, modified_plan.plan)
     
-    return PlanDiffResponse(
+    result = PlanDiffResponse(
         original=original_response,
         modified=modified_response,
         changes=changes,
     )
-
-
-def _calculate_plan_diff(original_plan: dict, modified_plan: dict) -> dict:
-    """Вычислить разницу между двумя планами для подсветки изменений"""
-    deleted = []
-    added = []
-    modified = []
-    
-    original_elements = {elem.get("id"): elem for elem in original_plan.get("elements", [])}
-    modified_elements = {elem.get("id"): elem for elem in modified_plan.get("elements", [])}
-    
-    # Находим удаленные элементы
-    for elem_id, elem in original_elements.items():
-        if elem_id not in modified_elements:
-            deleted.append(elem_id)
-    
-    # Находим добавленные элементы
-    for elem_id, elem in modified_elements.items():
-        if elem_id not in original_elements:
-            added.append(elem_id)
-    
-    # Находим измененные элементы (изменилась геометрия или свойства)
-    for elem_id in original_elements.keys() & modified_elements.keys():
-        orig_elem = original_elements[elem_id]
-        mod_elem = modified_elements[elem_id]
-        # Сравниваем геометрию и основные свойства
-        if orig_elem.get("geometry") != mod_elem.get("geometry") or \
-           orig_elem.get("role") != mod_elem.get("role") or \
-           orig_elem.get("zoneType") != mod_elem.get("zoneType"):
-            modified.append(elem_id)
-    
-    return {
-        "deleted": deleted,  # Красный
-        "added": added,     # Зеленый
-        "modified": modified,  # Желтый
-    }
+    return negotiation.render(request, response, result, layout)
 
 
 @router.get("/orders/{order_id}/plan/export", response_model=PlanExportResponse, summary="Экспорт плана в JSON")
 def export_plan(
     order_id: uuid.UUID,
+    request: Request,
+    response: Response,
     version: str | None = None,
+    layout: str | None = Query(default=None, description="columnar — координаты стен одним массивом float32"),
     db: Session = Depends(get_db_session),
     current_user=Depends(get_current_user),
 ) -> PlanExportResponse:
@@ -679,12 +465,101 @@ def export_plan(
             metadata["createdByEmail"] = creator.email
     
     from datetime import datetime
-    return PlanExportResponse(
+    result = PlanExportResponse(
         orderId=order_id,
         exportedAt=datetime.utcnow(),
         plan=plan_version.plan,
         metadata=metadata,
     )
+    return negotiation.render(request, response, result, layout)
+
+
+@router.get(
+    "/orders/{order_id}/plan/3d.glb",
+    response_class=Response,
+    responses={200: {"content": {"model/gltf-binary": {}}}},
+    summary="3D-сцена плана в формате glTF (.glb)",
+)
+def get_plan_glb(
+    order_id: uuid.UUID,
+    request: Request,
+    response: Response,
+    version: str | None = None,
+    db: Session = Depends(get_db_session),
+    current_user=Depends(get_current_user),
+) -> Response:
+    """Стены с проемами, полы зон и объекты в одном .glb; кэшируется по хэшу содержимого плана"""
+    order = order_service.get_order(db, order_id)
+    if not order:
+        raise HTTPException(status_code=404, detail="Order not found")
+    _ensure_ownership(order, current_user.id)
+
+    stamps = order_service.get_plan_version_stamps(db, order_id)
+    if version:
+        stamp = next((s for s in stamps if s.version_type.upper() == version.upper()), None)
+    else:
+        stamp = stamps[-1] if stamps else None
+    if stamp is None:
+        raise HTTPException(status_code=404, detail="Plan not found")
+    if stamp.plan_hash:
+        not_modified = http_cache.conditional_response(
+            request, response, f'"{plan_mesh.mesh_key(stamp.plan_hash)}"', stamp.updated_at
+        )
+        if not_modified is not None:
+            return not_modified
+
+    plan_version = order_service.get_plan_version(db, stamp.id)
+    key, data = plan_mesh.get_glb(plan_version.plan or {}, plan_version.stored_plan_hash)
+    return Response(
+        content=data,
+        media_type="model/gltf-binary",
+        headers=http_cache.cache_headers(f'"{key}"', stamp.updated_at),
+    )
+
+@router.get("/orders/{order_id}/plan/query", response_model=PlanQueryResponse, summary="Элементы плана в прямоугольнике")
+def get_plan_query(
+    order_id: uuid.UUID,
+    request: Request,
+    response: Response,
+    bbox: str = Query(description="Прямоугольник в px: x1,y1,x2,y2"),
+    version: str | None = None,
+    types: str | None = Query(default=None, description="Типы элементов через запятую, например wall,zone"),
+    db: Session = Depends(get_db_session),
+    current_user=Depends(get_current_user),
+) -> PlanQueryResponse:
+    """Элементы, габариты которых пересекают bbox; поиск по пространственному индексу версии плана"""
+    order = order_service.get_order(db, order_id)
+    if not order:
+        raise HTTPException(status_code=404, detail="Order not found")
+    _ensure_ownership(order, current_user.id)
+
+    try:
+        box = plan_spatial.parse_bbox(bbox)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+
+    stamps = order_service.get_plan_version_stamps(db, order_id)
+    if version:
+        stamp = next((s for s in stamps if s.version_type.upper() == version.upper()), None)
+    else:
+        stamp = stamps[-1] if stamps else None
+    if stamp is None:
+        raise HTTPException(status_code=404, detail="Plan not found")
+    not_modified = http_cache.versions_conditional(request, response, [stamp])
+    if not_modified is not None:
+        return not_modified
+
+    plan_version = order_service.get_plan_version(db, stamp.id)
+    index = plan_spatial.get_index(plan_version.plan or {}, plan_version.stored_plan_hash, split=True)
+    elements = index.query(box, {t.strip() for t in types.split(",") if t.strip()} if types else None)
+    return PlanQueryResponse(
+        orderId=order_id,
+        versionType=plan_version.version_type,
+        versionId=plan_version.id,
+        bbox=list(box),
+        total=len(elements),
+        elements=elements,
+    )
 
 
 @router.post("/orders/{order_id}/plan/parse-result", response_model=OrderPlanVersion, summary="Принять результат парсинга плана от нейронки")
@@ -711,33 +586,49 @@ def parse_plan_result(
     if file_obj.order_id != order_id:
         raise HTTPException(status_code=400, detail="File does not belong to this order")
     
-    # Формируем комментарий с информацией о парсинге
-    comment_parts = ["Результат автоматического парсинга плана"]
-    if payload.confidence is not None:
-        comment_parts.append(f"Уверенность: {payload.confidence:.0%}")
-    if payload.errors:
-        comment_parts.append(f"Предупреждения: {', '.join(payload.errors)}")
-    if payload.processing_time_ms is not None:
-        comment_parts.append(f"Время обработки: {payload.processing_time_ms}мс")
-    
-    comment = " | ".join(comment_parts)
-    
-    # Создаем версию плана ORIGINAL
-    from app.schemas.orders import SavePlanChangesRequest
-    plan_request = SavePlanChangesRequest(
-        versionType="ORIGINAL",
-        plan=payload.plan,
-        comment=comment,
-    )
-    
-    # Создаем версию плана (created_by может быть None, если это автоматический парсинг)
-    version = order_service.add_plan_version(db, order, plan_request, created_by=current_user)
+    # Создаем версию плана ORIGINAL (комментарий с уверенностью и временем обработки)
+    version = order_service.save_parse_result(db, order, payload, created_by=current_user)
     
     version = _apply_split_to_plan_version(version)
     version = _apply_split_to_plan_version(version)
     return OrderPlanVersion.model_validate(version)
 
 
+@router.get("/orders/{order_id}/plan/history", response_model=list[PlanRevisionInfo], summary="История изменений плана")
+def get_plan_history(
+    order_id: uuid.UUID,
+    db: Session = Depends(get_db_session),
+    current_user=Depends(get_current_user),
+) -> list[PlanRevisionInfo]:
+    """Все ревизии плана заказа по порядку (без тел планов)"""
+    order = order_service.get_order(db, order_id)
+    if not order:
+        raise HTTPException(status_code=404, detail="Order not found")
+    _ensure_ownership(order, current_user.id)
+    revisions = plan_history.list_revisions(db, order_id)
+    return [PlanRevisionInfo.model_validate(r) for r in revisions]
+
+
+@router.get("/orders/{order_id}/plan/versions/{version_id}", response_model=PlanRevisionRead, summary="План на момент ревизии")
+def get_plan_revision(
+    order_id: uuid.UUID,
+    version_id: uuid.UUID,
+    db: Session = Depends(get_db_session),
+    current_user=Depends(get_current_user),
+) -> PlanRevisionRead:
+    """Восстановить план любой ревизии (id ревизии из истории или id версии плана)"""
+    order = order_service.get_order(db, order_id)
+    if not order:
+        raise HTTPException(status_code=404, detail="Order not found")
+    _ensure_ownership(order, current_user.id)
+    revision = plan_history.resolve_revision(db, order_id, version_id)
+    if not revision:
+        raise HTTPException(status_code=404, detail="Plan version not found")
+    plan = plan_history.materialize(db, revision)
+    info = PlanRevisionInfo.model_validate(revision)
+    return PlanRevisionRead(**info.model_dump(), plan=plan)
+
+
 @router.post("/orders/{order_id}/plan/changes", response_model=OrderPlanVersion)
 def add_plan_change(
     order_id: uuid.UUID,
@@ -754,6 +645,31 @@ def add_plan_change(
     return OrderPlanVersion.model_validate(version)
 
 
+@router.patch("/orders/{order_id}/plan", response_model=PatchPlanResponse, summary="Инкрементальное сохранение плана")
+def patch_plan(
+    order_id: uuid.UUID,
+    payload: PatchPlanRequest,
+    db: Session = Depends(get_db_session),
+    current_user=Depends(get_current_user),
+) -> PatchPlanResponse:
+    """JSON Patch и/или операции над элементами относительно baseRevisionId; 409, если база устарела"""
+    order = order_service.get_order(db, order_id)
+    if not order:
+        raise HTTPException(status_code=404, detail="Order not found")
+    _ensure_ownership(order, current_user.id)
+
+    version, revision = order_service.patch_plan_version(db, order, payload, created_by=current_user)
+    return PatchPlanResponse(
+        orderId=order_id,
+        versionId=version.id,
+        versionType=version.version_type,
+        revisionId=revision.id,
+        baseRevisionId=payload.base_revision_id,
+        planHash=version.plan_hash,
+        elementCount=len((version.plan or {}).get("elements") or []),
+    )
+
+
 @router.get("/orders/{order_id}/status-history", response_model=list[OrderStatusHistoryItem])
 def get_status_history(
     order_id: uuid.UUID,
@@ -797,19 +713,26 @@ def get_status_history(
 
 
 
-@router.post("/orders/{order_id}/ai/analyze", response_model=AiAnalysis)
-async def trigger_ai_analyze(
+@router.post(
+    "/orders/{order_id}/ai/analyze",
+    response_model=JobRead,
+    status_code=202,
+    summary="Поставить AI-анализ плана в очередь",
+)
+def trigger_ai_analyze(
     order_id: uuid.UUID,
     db: Session = Depends(get_db_session),
     current_user=Depends(get_current_user),
-):
+) -> JobRead:
     order = order_service.get_order(db, order_id)
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
     _ensure_ownership(order, current_user.id)
 
-    analysis = await _build_ai_analysis(db, order, persist=True)
-    return analysis
+    job = job_service.get_active_job(db, AI_ANALYSIS, order.id) or job_service.enqueue(
+        db, AI_ANALYSIS, order_id=order.id, created_by_id=current_user.id
+    )
+    return JobRead.model_validate(job)
 
 
 @router.get("/orders/{order_id}/files/{file_id}")
@@ -839,22 +762,26 @@ def download_file(
 
 
 @router.get("/orders/{order_id}/ai/analysis", response_model=AiAnalysis)
-async def get_ai_analysis(
+def get_ai_analysis(
     order_id: uuid.UUID,
     db: Session = Depends(get_db_session),
     current_user=Depends(get_current_user),
 ):
+    """Последний результат AI-анализа (запускается через POST .../ai/analyze)"""
     order = order_service.get_order(db, order_id)
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
     _ensure_ownership(order, current_user.id)
-    analysis = await _build_ai_analysis(db, order, persist=False)
-    return analysis
+    job = job_service.get_latest_succeeded_job(db, AI_ANALYSIS, order.id)
+    if job and job.result:
+        return AiAnalysis.model_validate(job.result)
+    return ai_analysis_service.build_stored_analysis(order)
 
 
 @router.post(
     "/orders/{order_id}/plan/recognize",
-    response_model=OrderPlanVersion,
+    response_model=JobRead,
+    status_code=202,
     summary="Распознать план по загруженному файлу",
 )
 def recognize_plan(
@@ -862,7 +789,8 @@ def recognize_plan(
     payload: RecognizePlanRequest,
     db: Session = Depends(get_db_session),
     current_user=Depends(get_current_user),
-):
+) -> JobRead:
+    """Ставит распознавание в очередь; версия плана появится после выполнения задачи"""
     order = order_service.get_order(db, order_id)
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
@@ -872,15 +800,11 @@ def recognize_plan(
     if not file or file.order_id != order_id:
         raise HTTPException(status_code=404, detail="File not found for this order")
 
-    plan = plan_recognition_service.get_plan_by_filename(file.filename)
-    if not plan:
-        raise HTTPException(status_code=422, detail="No plan template found for this filename")
-
-    existing_versions = order_service.get_plan_versions(db, order_id)
-    has_original = any(v.version_type.upper() == "ORIGINAL" for v in existing_versions)
-    version_type = "MODIFIED" if has_original else "ORIGINAL"
-    comment = f"Распознан план по изображению {file.filename}"
-
-    plan_request = SavePlanChangesRequest(versionType=version_type, plan=plan, comment=comment)
-    version = order_service.add_plan_version(db, order, plan_request, created_by=current_user)
-    return OrderPlanVersion.model_validate(version)
+    job = job_service.enqueue(
+        db,
+        PLAN_RECOGNITION,
+        payload={"fileId": str(file.id)},
+        order_id=order.id,
+        created_by_id=current_user.id,
+    )
+    return JobRead.model_validate(job)
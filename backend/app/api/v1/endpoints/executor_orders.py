@@ -1,8 +1,9 @@
 import uuid
 
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
 from sqlalchemy.orm import Session
 
+from app.api import http_cache, negotiation
 from app.api.deps import get_current_user, get_db_session
 from app.models.order import OrderStatus
 from app.schemas.orders import (
@@ -17,16 +18,22 @@ from app.schemas.orders import (
     ExecutorApprovePlanRequest,
     ExecutorEditPlanRequest,
     ExecutorRejectPlanRequest,
+    PatchPlanRequest,
+    PatchPlanResponse,
     SavePlanChangesRequest,
     OrderPlanVersion,
+    PlanRevisionInfo,
+    PlanRevisionRead,
 )
 from app.schemas.plan_responses import (
     Plan2DResponse,
     PlanBeforeAfterResponse,
     PlanDiffResponse,
     PlanExportResponse,
+    PlanQueryResponse,
+    SimilarPlanItem,
 )
-from app.services import order_service
+from app.services import order_service, plan_diff, plan_history, plan_lod, plan_mesh, plan_similarity_service, plan_spatial
 
 router = APIRouter(prefix="/executor", tags=["Executor"])
 
@@ -305,7 +312,10 @@ def update_visit(
 @router.get("/orders/{order_id}/plan", response_model=OrderPlanVersion)
 def get_order_plan(
     order_id: uuid.UUID,
+    request: Request,
+    response: Response,
     version: str | None = Query(default=None, description="ORIGINAL, MODIFIED, EXECUTOR_EDITED, FINAL"),
+    layout: str | None = Query(default=None, description="columnar — координаты стен одним массивом float32"),
     db: Session = Depends(get_db_session),
     current_user=Depends(get_current_user),
 ) -> OrderPlanVersion:
@@ -315,23 +325,36 @@ def get_order_plan(
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
     
+    not_modified = http_cache.versions_conditional(
+        request, response, order_service.get_plan_version_stamps(db, order_id)
+    )
+    if not_modified is not None:
+        return not_modified
+
     versions = order_service.get_plan_versions(db, order_id)
     if version:
         match = next((v for v in versions if v.version_type.upper() == version.upper()), None)
-        if match:
-            return OrderPlanVersion.model_validate(match)
-        raise HTTPException(status_code=404, detail=f"Plan version {version} not found")
-    
-    # По умолчанию возвращаем последнюю версию
-    if not versions:
+        if not match:
+            raise HTTPException(status_code=404, detail=f"Plan version {version} not found")
+    elif versions:
+        # По умолчанию возвращаем последнюю версию
+        match = versions[-1]
+    else:
         raise HTTPException(status_code=404, detail="Plan not found")
-    return OrderPlanVersion.model_validate(versions[-1])
+    # План исполнителю отдается без разрезки по проемам: id подходят для PATCH /plan
+    result = OrderPlanVersion.model_validate(match)
+    result.revision_id = plan_history.latest_revision_id(db, order_id)
+    return negotiation.render(request, response, result, layout)
 
 
 @router.get("/orders/{order_id}/plan/2d", response_model=Plan2DResponse, summary="Получить 2D план с полной геометрией (исполнитель)")
 def get_plan_2d_executor(
     order_id: uuid.UUID,
+    request: Request,
+    response: Response,
     version: str | None = None,
+    layout: str | None = Query(default=None, description="columnar — координаты стен одним массивом float32"),
+    lod: int = Query(default=0, ge=0, le=plan_lod.MAX_LEVEL, description="Уровень детализации: 0 — полный план, 1–2 — упрощенный для обзора"),
     db: Session = Depends(get_db_session),
     current_user=Depends(get_current_user),
 ) -> Plan2DResponse:
@@ -341,6 +364,12 @@ def get_plan_2d_executor(
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
     
+    not_modified = http_cache.versions_conditional(
+        request, response, order_service.get_plan_version_stamps(db, order_id)
+    )
+    if not_modified is not None:
+        return not_modified
+
     versions = order_service.get_plan_versions(db, order_id)
     if not versions:
         raise HTTPException(status_code=404, detail="Plan not found")
@@ -364,20 +393,32 @@ def get_plan_2d_executor(
         if creator:
             created_by_name = creator.full_name
     
-    return Plan2DResponse(
+    plan = plan_version.plan
+    revision_id = None
+    if lod:
+        plan = plan_lod.get_level(plan, lod, plan_version.stored_plan_hash)
+    else:
+        revision_id = plan_history.latest_revision_id(db, order_id)
+
+    result = Plan2DResponse(
         orderId=order_id,
         versionType=plan_version.version_type,
         versionId=plan_version.id,
-        plan=plan_version.plan,
+        plan=plan,
         comment=plan_version.comment,
         createdAt=plan_version.created_at,
         createdBy=created_by_name,
+        revisionId=revision_id,
     )
+    return negotiation.render(request, response, result, layout)
 
 
 @router.get("/orders/{order_id}/plan/before-after", response_model=PlanBeforeAfterResponse, summary="Получить план в режиме до/после (исполнитель)")
 def get_plan_before_after_executor(
     order_id: uuid.UUID,
+    request: Request,
+    response: Response,
+    layout: str | None = Query(default=None, description="columnar — координаты стен одним массивом float32"),
     db: Session = Depends(get_db_session),
     current_user=Depends(get_current_user),
 ) -> PlanBeforeAfterResponse:
@@ -387,6 +428,12 @@ def get_plan_before_after_executor(
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
     
+    not_modified = http_cache.versions_conditional(
+        request, response, order_service.get_plan_version_stamps(db, order_id)
+    )
+    if not_modified is not None:
+        return not_modified
+
     versions = order_service.get_plan_versions(db, order_id)
     if not versions:
         raise HTTPException(status_code=404, detail="Plan not found")
@@ -428,14 +475,17 @@ def get_plan_before_after_executor(
                 createdBy=created_by_name,
             )
     
-    return PlanBeforeAfterResponse(original=original, modified=modified)
+    return negotiation.render(request, response, PlanBeforeAfterResponse(original=original, modified=modified), layout)
 
 
 @router.get("/orders/{order_id}/plan/diff", response_model=PlanDiffResponse, summary="Получить разницу между версиями плана (исполнитель)")
 def get_plan_diff_executor(
     order_id: uuid.UUID,
+    request: Request,
+    response: Response,
     original_version: str | None = None,
     modified_version: str | None = None,
+    layout: str | None = Query(default=None, description="columnar — координаты стен одним массивом float32"),
     db: Session = Depends(get_db_session),
     current_user=Depends(get_current_user),
 ) -> PlanDiffResponse:
@@ -445,6 +495,12 @@ def get_plan_diff_executor(
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
     
+    not_modified = http_cache.versions_conditional(
+        request, response, order_service.get_plan_version_stamps(db, order_id)
+    )
+    if not_modified is not None:
+        return not_modified
+
     versions = order_service.get_plan_versions(db, order_id)
     if not versions:
         raise HTTPException(status_code=404, detail="Plan not found")
@@ -505,55 +561,23 @@ def get_plan_diff_executor(
     # Вычисляем изменения
     changes = {}
     if original_plan and modified_plan:
-        changes = _calculate_plan_diff_executor(original_plan.plan, modified_plan.plan)
+        changes = plan_diff.diff_versions(original_plan, modified_plan)
     
-    return PlanDiffResponse(
+    result = PlanDiffResponse(
         original=original_response,
         modified=modified_response,
         changes=changes,
     )
-
-
-def _calculate_plan_diff_executor(original_plan: dict, modified_plan: dict) -> dict:
-    """Вычислить разницу между двумя планами для подсветки изменений (исполнитель)"""
-    deleted = []
-    added = []
-    modified = []
-    
-    original_elements = {elem.get("id"): elem for elem in original_plan.get("elements", [])}
-    modified_elements = {elem.get("id"): elem for elem in modified_plan.get("elements", [])}
-    
-    # Находим удаленные элементы
-    for elem_id, elem in original_elements.items():
-        if elem_id not in modified_elements:
-            deleted.append(elem_id)
-    
-    # Находим добавленные элементы
-    for elem_id, elem in modified_elements.items():
-        if elem_id not in original_elements:
-            added.append(elem_id)
-    
-    # Находим измененные элементы (изменилась геометрия или свойства)
-    for elem_id in original_elements.keys() & modified_elements.keys():
-        orig_elem = original_elements[elem_id]
-        mod_elem = modified_elements[elem_id]
-        # Сравниваем геометрию и основные свойства
-        if orig_elem.get("geometry") != mod_elem.get("geometry") or \
-           orig_elem.get("role") != mod_elem.get("role") or \
-           orig_elem.get("zoneType") != mod_elem.get("zoneType"):
-            modified.append(elem_id)
-    
-    return {
-        "deleted": deleted,  # Красный
-        "added": added,     # Зеленый
-        "modified": modified,  # Желтый
-    }
+    return negotiation.render(request, response, result, layout)
 
 
 @router.get("/orders/{order_id}/plan/export", response_model=PlanExportResponse, summary="Экспорт плана в JSON (исполнитель)")
 def export_plan_executor(
     order_id: uuid.UUID,
+    request: Request,
+    response: Response,
     version: str | None = None,
+    layout: str | None = Query(default=None, description="columnar — координаты стен одним массивом float32"),
     db: Session = Depends(get_db_session),
     current_user=Depends(get_current_user),
 ) -> PlanExportResponse:
@@ -594,12 +618,101 @@ def export_plan_executor(
             metadata["createdByEmail"] = creator.email
     
     from datetime import datetime
-    return PlanExportResponse(
+    result = PlanExportResponse(
         orderId=order_id,
         exportedAt=datetime.utcnow(),
         plan=plan_version.plan,
         metadata=metadata,
     )
+    return negotiation.render(request, response, result, layout)
+
+
+@router.get(
+    "/orders/{order_id}/plan/3d.glb",
+    response_class=Response,
+    responses={200: {"content": {"model/gltf-binary": {}}}},
+    summary="3D-сцена плана в формате glTF (.glb) (исполнитель)",
+)
+def get_plan_glb_executor(
+    order_id: uuid.UUID,
+    request: Request,
+    response: Response,
+    version: str | None = None,
+    db: Session = Depends(get_db_session),
+    current_user=Depends(get_current_user),
+) -> Response:
+    """Стены с проемами, полы зон и объекты в одном .glb; кэшируется по хэшу содержимого плана"""
+    _ensure_executor(current_user)
+    order = order_service.get_order(db, order_id)
+    if not order:
+        raise HTTPException(status_code=404, detail="Order not found")
+
+    stamps = order_service.get_plan_version_stamps(db, order_id)
+    if version:
+        stamp = next((s for s in stamps if s.version_type.upper() == version.upper()), None)
+    else:
+        stamp = stamps[-1] if stamps else None
+    if stamp is None:
+        raise HTTPException(status_code=404, detail="Plan not found")
+    if stamp.plan_hash:
+        not_modified = http_cache.conditional_response(
+            request, response, f'"{plan_mesh.mesh_key(stamp.plan_hash)}"', stamp.updated_at
+        )
+        if not_modified is not None:
+            return not_modified
+
+    plan_version = order_service.get_plan_version(db, stamp.id)
+    key, data = plan_mesh.get_glb(plan_version.plan or {}, plan_version.stored_plan_hash)
+    return Response(
+        content=data,
+        media_type="model/gltf-binary",
+        headers=http_cache.cache_headers(f'"{key}"', stamp.updated_at),
+    )
+
+@router.get("/orders/{order_id}/plan/query", response_model=PlanQueryResponse, summary="Элементы плана в прямоугольнике (исполнитель)")
+def get_plan_query_executor(
+    order_id: uuid.UUID,
+    request: Request,
+    response: Response,
+    bbox: str = Query(description="Прямоугольник в px: x1,y1,x2,y2"),
+    version: str | None = None,
+    types: str | None = Query(default=None, description="Типы элементов через запятую, например wall,zone"),
+    db: Session = Depends(get_db_session),
+    current_user=Depends(get_current_user),
+) -> PlanQueryResponse:
+    """Элементы, габариты которых пересекают bbox; поиск по пространственному индексу версии плана"""
+    _ensure_executor(current_user)
+    order = order_service.get_order(db, order_id)
+    if not order:
+        raise HTTPException(status_code=404, detail="Order not found")
+
+    try:
+        box = plan_spatial.parse_bbox(bbox)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+
+    stamps = order_service.get_plan_version_stamps(db, order_id)
+    if version:
+        stamp = next((s for s in stamps if s.version_type.upper() == version.upper()), None)
+    else:
+        stamp = stamps[-1] if stamps else None
+    if stamp is None:
+        raise HTTPException(status_code=404, detail="Plan not found")
+    not_modified = http_cache.versions_conditional(request, response, [stamp])
+    if not_modified is not None:
+        return not_modified
+
+    plan_version = order_service.get_plan_version(db, stamp.id)
+    index = plan_spatial.get_index(plan_version.plan or {}, plan_version.stored_plan_hash, split=True)
+    elements = index.query(box, {t.strip() for t in types.split(",") if t.strip()} if types else None)
+    return PlanQueryResponse(
+        orderId=order_id,
+        versionType=plan_version.version_type,
+        versionId=plan_version.id,
+        bbox=list(box),
+        total=len(elements),
+        elements=elements,
+    )
 
 
 @router.get("/orders/{order_id}/plan/versions", response_model=list[OrderPlanVersion])
@@ -618,6 +731,76 @@ def get_all_plan_versions(
     return [OrderPlanVersion.model_validate(v) for v in versions]
 
 
+@router.get("/orders/{order_id}/plan/history", response_model=list[PlanRevisionInfo], summary="История изменений плана (исполнитель)")
+def get_plan_history_executor(
+    order_id: uuid.UUID,
+    db: Session = Depends(get_db_session),
+    current_user=Depends(get_current_user),
+) -> list[PlanRevisionInfo]:
+    """Все ревизии плана заказа по порядку (без тел планов)"""
+    _ensure_executor(current_user)
+    order = order_service.get_order(db, order_id)
+    if not order:
+        raise HTTPException(status_code=404, detail="Order not found")
+    revisions = plan_history.list_revisions(db, order_id)
+    return [PlanRevisionInfo.model_validate(r) for r in revisions]
+
+
+@router.get("/orders/{order_id}/plan/versions/{version_id}", response_model=PlanRevisionRead, summary="План на момент ревизии (исполнитель)")
+def get_plan_revision_executor(
+    order_id: uuid.UUID,
+    version_id: uuid.UUID,
+    db: Session = Depends(get_db_session),
+    current_user=Depends(get_current_user),
+) -> PlanRevisionRead:
+    """Восстановить план любой ревизии (id ревизии из истории или id версии плана)"""
+    _ensure_executor(current_user)
+    order = order_service.get_order(db, order_id)
+    if not order:
+        raise HTTPException(status_code=404, detail="Order not found")
+    revision = plan_history.resolve_revision(db, order_id, version_id)
+    if not revision:
+        raise HTTPException(status_code=404, detail="Plan version not found")
+    plan = plan_history.materialize(db, revision)
+    info = PlanRevisionInfo.model_validate(revision)
+    return PlanRevisionRead(**info.model_dump(), plan=plan)
+
+
+@router.get("/orders/{order_id}/plan/similar", response_model=list[SimilarPlanItem], summary="Похожие планы из библиотеки и других заказов")
+def get_similar_plans(
+    order_id: uuid.UUID,
+    version: str | None = None,
+    k: int = Query(default=5, ge=1, le=50),
+    db: Session = Depends(get_db_session),
+    current_user=Depends(get_current_user),
+) -> list[SimilarPlanItem]:
+    """Найти ближайшие по структуре планы, чтобы переиспользовать готовую работу"""
+    _ensure_executor(current_user)
+    order = order_service.get_order(db, order_id)
+    if not order:
+        raise HTTPException(status_code=404, detail="Order not found")
+
+    versions = order_service.get_plan_versions(db, order_id)
+    if version:
+        plan_version = next((v for v in versions if v.version_type.upper() == version.upper()), None)
+    else:
+        plan_version = versions[-1] if versions else None
+    if not plan_version:
+        raise HTTPException(status_code=404, detail="Plan not found")
+
+    matches = plan_similarity_service.find_similar(db, plan_version.plan, k=k, exclude_order_id=order_id)
+    return [
+        SimilarPlanItem(
+            source=m.source,
+            score=round(m.score, 4),
+            template_id=m.template_id,
+            order_id=m.order_id,
+            version_id=m.version_id,
+        )
+        for m in matches
+    ]
+
+
 @router.post("/orders/{order_id}/plan/approve", response_model=ExecutorOrderDetails)
 def approve_plan(
     order_id: uuid.UUID,
@@ -649,7 +832,7 @@ def edit_plan(
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
     
-    plan_data = payload.plan.model_dump() if hasattr(payload.plan, 'model_dump') else payload.plan
+    plan_data = payload.plan.to_data()
     order_service.executor_edit_plan(db, order, current_user, plan_data, payload.comment)
     db.refresh(order)
     return get_order(order_id, db, current_user)
@@ -688,3 +871,28 @@ def save_plan_changes(
     
     version = order_service.add_plan_version(db, order, payload, created_by=current_user)
     return OrderPlanVersion.model_validate(version)
+
+
+@router.patch("/orders/{order_id}/plan", response_model=PatchPlanResponse, summary="Инкрементальное сохранение плана (исполнитель)")
+def patch_plan_executor(
+    order_id: uuid.UUID,
+    payload: PatchPlanRequest,
+    db: Session = Depends(get_db_session),
+    current_user=Depends(get_current_user),
+) -> PatchPlanResponse:
+    """JSON Patch и/или операции над элементами относительно baseRevisionId; 409, если база устарела"""
+    _ensure_executor(current_user)
+    order = order_service.get_order(db, order_id)
+    if not order:
+        raise HTTPException(status_code=404, detail="Order not found")
+
+    version, revision = order_service.patch_plan_version(db, order, payload, created_by=current_user)
+    return PatchPlanResponse(
+        orderId=order_id,
+        versionId=version.id,
+        versionType=version.version_type,
+        revisionId=revision.id,
+        baseRevisionId=payload.base_revision_id,
+        planHash=version.plan_hash,
+        elementCount=len((version.plan or {}).get("elements") or []),
+    )
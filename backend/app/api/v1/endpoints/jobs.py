@@ -0,0 +1,26 @@
+import uuid
+
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.orm import Session
+
+from app.api.deps import get_current_user, get_db_session
+from app.schemas.job import JobRead
+from app.services import job_service, order_service
+
+router = APIRouter(prefix="/jobs", tags=["Jobs"])
+
+
+@router.get("/{job_id}", response_model=JobRead, summary="Статус фоновой задачи")
+def get_job(
+    job_id: uuid.UUID,
+    db: Session = Depends(get_db_session),
+    current_user=Depends(get_current_user),
+) -> JobRead:
+    job = job_service.get_job(db, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if not (current_user.is_admin or current_user.is_superadmin or job.created_by_id == current_user.id):
+        order = order_service.get_order(db, job.order_id) if job.order_id else None
+        if not order or order.client_id != current_user.id:
+            raise HTTPException(status_code=403, detail="Forbidden")
+    return JobRead.model_validate(job)
@@ -1,9 +1,15 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 
 from app.api.deps import get_db_session
-from app.schemas.pricing import PriceCalculatorInput, PriceEstimateResponse
-from app.services.price_calculator import calculate_price
+from app.core.config import settings
+from app.schemas.pricing import (
+    PriceCalculatorInput,
+    PriceEstimateBatchRequest,
+    PriceEstimateBatchResponse,
+    PriceEstimateResponse,
+)
+from app.services.price_calculator import calculate_price, get_snapshot, price_with
 
 router = APIRouter(tags=["Public"])
 
@@ -17,3 +23,18 @@ def calc_estimate(payload: PriceCalculatorInput, db: Session = Depends(get_db_se
         calculator_input=payload.calculator_input or {},
     )
     return PriceEstimateResponse(estimatedPrice=estimated, breakdown=breakdown)
+
+
+@router.post("/calc/estimate/batch", response_model=PriceEstimateBatchResponse)
+def calc_estimate_batch(payload: PriceEstimateBatchRequest, db: Session = Depends(get_db_session)):
+    """Расчет стоимости для списка входов калькулятора (например, всех квартир дома) одним запросом"""
+    if len(payload.items) > settings.price_batch_max_items:
+        raise HTTPException(status_code=413, detail=f"Too many items, max {settings.price_batch_max_items}")
+    snapshot = get_snapshot(db)
+    items = []
+    for item in payload.items:
+        estimated, breakdown = price_with(
+            snapshot, item.district_code, item.house_type_code, item.calculator_input or {}
+        )
+        items.append(PriceEstimateResponse(estimatedPrice=estimated, breakdown=breakdown))
+    return PriceEstimateBatchResponse(items=items, coefficientsVersion=snapshot.version[0])
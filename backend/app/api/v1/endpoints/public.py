@@ -1,6 +1,8 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
+from pydantic import TypeAdapter
 from sqlalchemy.orm import Session
 
+from app.api import response_cache
 from app.api.deps import get_db_session
 from app.schemas.directory import (
     DistrictRead,
@@ -10,29 +12,50 @@ from app.services import directory_service
 
 router = APIRouter(tags=["Public"])
 
+_districts_adapter = TypeAdapter(list[DistrictRead])
+_house_types_adapter = TypeAdapter(list[HouseTypeRead])
+
+
+def _cached_directory(db: Session, name: str, load, schema, adapter) -> dict[str | None, response_cache.CachedBody]:
+    """Готовые тела ответов справочника: None — весь список, code — один элемент"""
+    def build() -> dict[str | None, response_cache.CachedBody]:
+        items = [schema.model_validate(item) for item in load(db)]
+        bodies = {item.code: response_cache.json_body(item.model_dump_json(by_alias=True).encode()) for item in items}
+        bodies[None] = response_cache.json_body(adapter.dump_json(items, by_alias=True))
+        return bodies
+
+    return response_cache.get_or_build(name, directory_service.directory_version(name), build)
+
+
+def _districts(db: Session) -> dict[str | None, response_cache.CachedBody]:
+    return _cached_directory(db, "districts", directory_service.list_districts, DistrictRead, _districts_adapter)
+
+
+def _house_types(db: Session) -> dict[str | None, response_cache.CachedBody]:
+    return _cached_directory(db, "house_types", directory_service.list_house_types, HouseTypeRead, _house_types_adapter)
+
+
 @router.get("/districts", response_model=list[DistrictRead])
-def list_districts(db: Session = Depends(get_db_session)):
-    districts = directory_service.list_districts(db)
-    return [DistrictRead.model_validate(d) for d in districts]
+def list_districts(request: Request, db: Session = Depends(get_db_session)):
+    return response_cache.respond(request, _districts(db)[None], response_cache.public_cache_control())
 
 
 @router.get("/districts/{code}", response_model=DistrictRead)
-def get_district(code: str, db: Session = Depends(get_db_session)):
-    district = directory_service.get_district(db, code)
+def get_district(code: str, request: Request, db: Session = Depends(get_db_session)):
+    district = _districts(db).get(code)
     if not district:
         raise HTTPException(status_code=404, detail="District not found")
-    return DistrictRead.model_validate(district)
+    return response_cache.respond(request, district, response_cache.public_cache_control())
 
 
 @router.get("/house-types", response_model=list[HouseTypeRead])
-def list_house_types(db: Session = Depends(get_db_session)):
-    house_types = directory_service.list_house_types(db)
-    return [HouseTypeRead.model_validate(h) for h in house_types]
+def list_house_types(request: Request, db: Session = Depends(get_db_session)):
+    return response_cache.respond(request, _house_types(db)[None], response_cache.public_cache_control())
 
 
 @router.get("/house-types/{code}", response_model=HouseTypeRead)
-def get_house_type(code: str, db: Session = Depends(get_db_session)):
-    house_type = directory_service.get_house_type(db, code)
+def get_house_type(code: str, request: Request, db: Session = Depends(get_db_session)):
+    house_type = _house_types(db).get(code)
     if not house_type:
         raise HTTPException(status_code=404, detail="House type not found")
-    return HouseTypeRead.model_validate(house_type)
+    return response_cache.respond(request, house_type, response_cache.public_cache_control())
@@ -1,9 +1,11 @@
 import uuid
 
-from fastapi import APIRouter, Depends, File, HTTPException, UploadFile, status
+from fastapi import APIRouter, Depends, File, HTTPException, Request, Response, UploadFile, status
 from fastapi.params import Form
+from pydantic import TypeAdapter
 from sqlalchemy.orm import Session
 
+from app.api import response_cache
 from app.core.config import settings
 from app.db.session import get_db
 from app.schemas.texture import Texture as TextureSchema
@@ -13,27 +15,10 @@ from app.services import texture_service
 router = APIRouter(prefix="/textures", tags=["textures"])
 
 
-@router.get("", response_model=list[TextureSchema], summary="Список доступных текстур")
-def list_textures(db: Session = Depends(get_db)) -> list[TextureSchema]:
-    textures = texture_service.list_textures(db)
-    return [
-        TextureSchema.model_validate(
-            {
-                "id": t.id,
-                "handle": t.handle,
-                "description": t.description,
-                "url": f"{settings.static_url}/textures/{t.filename}",
-            }
-        )
-        for t in textures
-    ]
+_textures_adapter = TypeAdapter(list[TextureSchema])
 
 
-@router.get("/{texture_id}", response_model=TextureSchema, summary="Получить текстуру по id")
-def get_texture(texture_id: uuid.UUID, db: Session = Depends(get_db)) -> TextureSchema:
-    texture = texture_service.get_texture(db, texture_id)
-    if not texture:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Texture not found")
+def _to_schema(texture) -> TextureSchema:
     return TextureSchema.model_validate(
         {
             "id": texture.id,
@@ -44,6 +29,30 @@ def get_texture(texture_id: uuid.UUID, db: Session = Depends(get_db)) -> Texture
     )
 
 
+def _cached_textures(db: Session) -> dict[str | None, response_cache.CachedBody]:
+    """Готовые тела ответов: None — весь список, str(id) — одна текстура"""
+    def build() -> dict[str | None, response_cache.CachedBody]:
+        items = [_to_schema(t) for t in texture_service.list_textures(db)]
+        bodies = {str(item.id): response_cache.json_body(item.model_dump_json(by_alias=True).encode()) for item in items}
+        bodies[None] = response_cache.json_body(_textures_adapter.dump_json(items, by_alias=True))
+        return bodies
+
+    return response_cache.get_or_build("textures", texture_service.textures_version(), build)
+
+
+@router.get("", response_model=list[TextureSchema], summary="Список доступных текстур")
+def list_textures(request: Request, db: Session = Depends(get_db)) -> Response:
+    return response_cache.respond(request, _cached_textures(db)[None], response_cache.public_cache_control())
+
+
+@router.get("/{texture_id}", response_model=TextureSchema, summary="Получить текстуру по id")
+def get_texture(texture_id: uuid.UUID, request: Request, db: Session = Depends(get_db)) -> Response:
+    texture = _cached_textures(db).get(str(texture_id))
+    if not texture:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Texture not found")
+    return response_cache.respond(request, texture, response_cache.public_cache_control())
+
+
 @router.post(
     "",
     response_model=TextureSchema,
@@ -61,11 +70,4 @@ def create_texture(
         raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Handle already exists")
 
     texture = texture_service.create_texture(db, handle=handle, upload=file, description=description)
-    return TextureSchema.model_validate(
-        {
-            "id": texture.id,
-            "handle": texture.handle,
-            "description": texture.description,
-            "url": f"{settings.static_url}/textures/{texture.filename}",
-        }
-    )
+    return _to_schema(texture)
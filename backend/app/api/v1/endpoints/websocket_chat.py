@@ -1,4 +1,5 @@
 """WebSocket endpoints для чатов"""
+import asyncio
 import json
 import uuid
 from typing import Optional
@@ -7,12 +8,45 @@ from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Query, HTTPExcept
 from sqlalchemy.orm import Session
 
 from app.api.deps import _get_user_from_token
-from app.services import chat_service
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.models.job import JobStatus
+from app.models.order import OrderChatMessage as OrderChatMessageModel
+from app.services import chat_service, job_service
+from app.services.job_handlers import enqueue_chat_ai_reply
 from app.services.websocket_manager import manager
-from app.schemas.orders import OrderChatMessage, ChatMessageCreate
+from app.schemas.orders import OrderChatMessage
 
 router = APIRouter(tags=["WebSocket"])
 
+# Задачи, ждущие ответов ассистента (ссылки держим, чтобы задачи не собрал GC)
+_reply_tasks: set[asyncio.Task] = set()
+
+
+async def _push_ai_reply(job_id: uuid.UUID, chat_id: uuid.UUID) -> None:
+    """Дождаться задачи CHAT_AI_REPLY (ее выполняет воркер) и разослать ответ в чат"""
+    while manager.get_chat_connections_count(chat_id):
+        await asyncio.sleep(settings.job_poll_interval_seconds)
+        with SessionLocal() as db:
+            job = job_service.get_job(db, job_id)
+            if job is None:
+                return
+            if job.status == JobStatus.FAILED:
+                await manager.broadcast_to_chat(
+                    {"type": "error", "message": f"AI reply failed: {job.error}", "jobId": str(job_id)}, chat_id
+                )
+                return
+            if job.status != JobStatus.SUCCEEDED:
+                continue
+            message_id = (job.result or {}).get("messageId")
+            ai_msg = db.get(OrderChatMessageModel, uuid.UUID(message_id)) if message_id else None
+            if ai_msg:
+                await manager.broadcast_to_chat({
+                    "type": "new_message",
+                    "message": OrderChatMessage.model_validate(ai_msg).model_dump(mode="json"),
+                }, chat_id)
+            return
+
 
 async def authenticate_websocket(
     websocket: WebSocket,
@@ -49,11 +83,11 @@ async def websocket_chat_endpoint(
     Формат сообщений от сервера:
     - history: {"type": "history", "messages": [...]}
     - new_message: {"type": "new_message", "message": {...}}
-    - message_sent: {"type": "message_sent", "messageId": "uuid"}
+    - message_sent: {"type": "message_sent", "messageId": "uuid", "aiJobId": "uuid" | null}
+      (ответ ассистента готовит воркер, он придет как new_message)
     - error: {"type": "error", "message": "..."}
     """
     # Получаем сессию БД
-    from app.db.session import SessionLocal
     db = SessionLocal()
     
     try:
@@ -116,23 +150,20 @@ async def websocket_chat_endpoint(
                     }
                     await manager.broadcast_to_chat(message_data, chat_id, exclude=websocket)
                     
+                    # Если нужно, делегируем AI: ответ готовит воркер, в чат его отправит _push_ai_reply
+                    ai_job = None
+                    if data.get("delegate_to_ai", False):
+                        ai_job = enqueue_chat_ai_reply(db, chat, user, message_text)
+                        task = asyncio.create_task(_push_ai_reply(ai_job.id, chat_id))
+                        _reply_tasks.add(task)
+                        task.add_done_callback(_reply_tasks.discard)
+
                     # Отправляем подтверждение отправителю
                     await websocket.send_json({
                         "type": "message_sent",
-                        "messageId": str(user_msg.id)
+                        "messageId": str(user_msg.id),
+                        "aiJobId": str(ai_job.id) if ai_job else None,
                     })
-                    
-                    # Если нужно, делегируем AI (асинхронно)
-                    if data.get("delegate_to_ai", False):
-                        ai_msg = await chat_service.delegate_to_ai(
-                            db, chat, ChatMessageCreate(message=message_text)
-                        )
-                        if ai_msg:
-                            ai_message_data = {
-                                "type": "new_message",
-                                "message": OrderChatMessage.model_validate(ai_msg).model_dump(mode="json")
-                            }
-                            await manager.broadcast_to_chat(ai_message_data, chat_id)
                 
                 elif data.get("type") == "ping":
                     await websocket.send_json({"type": "pong"})
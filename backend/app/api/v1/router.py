@@ -5,12 +5,14 @@ from app.api.v1.endpoints import (
     admin_directories,
     admin_error_logs,
     admin_orders,
+    admin_pricing,
     admin_users,
     auth,
     client_chats,
     client_orders,
     executor_calendar,
     executor_orders,
+    jobs,
     pricing,
     textures,
     public,
@@ -28,7 +30,9 @@ api_router.include_router(admin_users.router)
 api_router.include_router(admin_orders.router)
 api_router.include_router(admin_directories.router)
 api_router.include_router(admin_ai_rules.router)
+api_router.include_router(admin_pricing.router)
 api_router.include_router(admin_error_logs.router)
 api_router.include_router(websocket_chat.router)
 api_router.include_router(pricing.router)
 api_router.include_router(textures.router)
+api_router.include_router(jobs.router)
@@ -24,8 +24,56 @@ class Settings(BaseSettings):
     rag_top_k: int = Field(default=5, description="Количество релевантных чанков для RAG")
     chat_temperature: float = Field(default=0.7, description="Температура для генерации чата")
     chat_max_history: int = Field(default=10, description="Максимальное количество сообщений в истории")
+    chat_prompt_max_tokens: int = Field(default=6000, description="Бюджет промпта чата в токенах (приблизительная оценка)")
+    chat_message_max_tokens: int = Field(default=800, description="Сколько токенов сообщения попадает в промпт чата, остальное обрезается")
+    chat_summary_max_tokens: int = Field(default=500, description="Размер сводки ранней истории чата в токенах")
+    chat_summary_batch: int = Field(default=6, description="Сколько сообщений вне окна истории копится перед сверткой в сводку")
     analysis_temperature: float = Field(default=0.3, description="Температура для анализа")
     analysis_top_k: int = Field(default=10, description="Количество релевантных чанков для анализа")
+    rag_documents_dir: str = Field(default="regulations", description="Каталог нормативных документов для RAG (*.txt, *.md)")
+    rag_index_dir: str = Field(default="rag_index", description="Каталог векторного индекса RAG")
+    rag_embedding_batch_size: int = Field(default=64, description="Сколько чанков эмбеддить за один вызов модели")
+    rag_ivf_min_chunks: int = Field(default=20000, description="С какого числа чанков индекс делится на списки (IVF) вместо полного просмотра")
+    rag_nprobe: int = Field(default=12, description="Сколько ближайших списков IVF просматривать при поиске")
+    rag_embedding_cache_dir: str = Field(default="rag_cache", description="Каталог кэша эмбеддингов чанков RAG (по модели и хэшу текста)")
+    rag_workers: int = Field(default=0, description="Процессов для эмбеддинга при сборке индекса RAG (0 — по числу ядер)")
+    rag_compact_ratio: float = Field(default=0.05, description="Доля дельты и удаленных чанков от основы индекса RAG, после которой индекс уплотняется")
+
+    # Фоновые задачи (app.worker)
+    job_max_attempts: int = Field(default=5, description="Максимум попыток выполнения задачи")
+    job_retry_base_seconds: float = Field(default=5.0, description="Базовая задержка перед повтором")
+    job_retry_max_seconds: float = Field(default=600.0, description="Максимальная задержка перед повтором")
+    job_lease_seconds: int = Field(default=900, description="Через сколько секунд зависшая задача возвращается в очередь")
+    job_heartbeat_seconds: float = Field(default=60.0, description="Как часто воркер продлевает аренду выполняемой задачи")
+    job_poll_interval_seconds: float = Field(default=1.0, description="Пауза воркера при пустой очереди")
+    worker_concurrency: int = Field(default=4, description="Сколько задач воркер выполняет одновременно")
+
+    # Распознавание планов по изображению
+    recognition_workers: int = Field(default=2, description="Число процессов распознавания")
+    recognition_timeout_seconds: float = Field(default=60.0, description="Таймаут распознавания одного изображения")
+    recognition_default_px_per_meter: float = Field(default=100.0, description="Масштаб, если его не удалось определить")
+    plan_templates_dir: Optional[str] = Field(default=None, description="Каталог с дополнительными шаблонами планов (*.json)")
+    plan_templates_reload_seconds: float = Field(default=2.0, description="Как часто проверять изменения каталога шаблонов")
+    plan_snapshot_interval: int = Field(default=20, description="Каждая N-я ревизия истории плана хранится полным снимком")
+    plan_snapshot_patch_ratio: float = Field(default=0.5, description="Если патч больше этой доли плана, пишется снимок")
+    plan_blob_gc_grace_seconds: int = Field(default=86400, description="Сколько блоб плана должен пробыть без ссылок, прежде чем сборщик мусора его удалит")
+    plan_history_cache_size: int = Field(default=128, description="Сколько восстановленных ревизий держать в памяти")
+    plan_diff_tolerance_px: float = Field(default=0.5, description="Допуск сравнения координат в diff планов")
+    plan_diff_match_radius_px: float = Field(default=25.0, description="Радиус сопоставления элементов без общего id")
+    plan_diff_cache_size: int = Field(default=256, description="Сколько результатов diff хранить в памяти")
+    plan_similarity_refresh_seconds: float = Field(default=60.0, description="Как часто дополнять индекс похожих планов новыми версиями")
+    plan_mesh_cache_size: int = Field(default=32, description="Сколько собранных 3D-сцен (.glb) хранить в памяти")
+    plan_spatial_cache_size: int = Field(default=64, description="Сколько пространственных индексов планов хранить в памяти")
+    plan_lod_cache_size: int = Field(default=64, description="Сколько наборов упрощенных уровней (LOD) планов хранить в памяти")
+    price_coefficients_refresh_seconds: float = Field(default=60.0, description="Как часто перечитывать коэффициенты районов и типов домов из БД")
+    price_batch_max_items: int = Field(default=1000, description="Максимум расчетов в одном запросе /calc/estimate/batch")
+    reprice_chunk_size: int = Field(default=500, description="Сколько заказов пересчитывать и записывать за одну транзакцию")
+    reprice_diff_limit: int = Field(default=200, description="Сколько изменений цен показывать в результате пробного пересчета")
+    response_cache_ttl_seconds: float = Field(default=30.0, description="Сколько секунд кэшированный ответ справочника живет без проверки (записи из других процессов)")
+    directory_cache_max_age_seconds: int = Field(default=60, description="max-age в Cache-Control публичных справочников")
+    ai_ruleset_refresh_seconds: float = Field(default=30.0, description="Как часто перечитывать включенные правила AI из БД (изменения из других процессов)")
+    analysis_local_short_circuit: bool = Field(default=True, description="Не вызывать LLM, если локальная проверка правил уже запрещает перепланировку")
+    analysis_cache_size: int = Field(default=256, description="Сколько ответов AI-анализа (план + контекст + набор правил) хранить в памяти")
 
     model_config = {
         "env_file": "_env",  # Используем _env вместо .env для безопасности
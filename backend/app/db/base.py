@@ -6,14 +6,18 @@ from app.models.order import (
     OrderStatusHistory,
     OrderFile,
     OrderPlanVersion,
+    PlanBlob,
+    PlanRevision,
     OrderChatMessage,
     ExecutorAssignment,
     ExecutorCalendarEvent,
 )
 from app.models.chat import ChatThread
-from app.models.ai_rule import AIRule, RiskType
+from app.models.ai_rule import AIRule, AIRuleTag, RiskType
 from app.models.error_log import ErrorLog, ErrorType, ErrorSeverity, ErrorStatus
 from app.models.texture import Texture
+from app.models.job import Job, JobStatus
+from app.models.pricing import PricingTariff
 
 __all__ = [
     "Base",
@@ -27,15 +31,21 @@ __all__ = [
     "OrderStatusHistory",
     "OrderFile",
     "OrderPlanVersion",
+    "PlanBlob",
+    "PlanRevision",
     "OrderChatMessage",
     "ExecutorAssignment",
     "ExecutorCalendarEvent",
     "ChatThread",
     "AIRule",
+    "AIRuleTag",
     "RiskType",
     "ErrorLog",
     "ErrorType",
     "ErrorSeverity",
     "ErrorStatus",
     "Texture",
+    "Job",
+    "JobStatus",
+    "PricingTariff",
 ]
@@ -15,7 +15,14 @@ from app.schemas.directory import (
 )
 from app.schemas.orders import CreateOrderRequest, SavePlanChangesRequest
 from app.schemas.user import ExecutorCreateRequest, UserCreate
-from app.services import directory_service, order_service, user_service
+from app.services import (
+    directory_service,
+    order_service,
+    plan_blob_service,
+    plan_history,
+    tariff_service,
+    user_service,
+)
 from app.models.order import OrderPlanVersion
 from app.models.texture import Texture
 
@@ -129,6 +136,8 @@ def init_directories(db: Session):
     for ht in house_types:
         directory_service.upsert_house_type(db, ht)
 
+    tariff_service.ensure_default_tariff(db)
+
 
 def init_users(db: Session):
     client_email = "client@example.com"
@@ -492,6 +501,8 @@ def init_data():
         init_directories(db)
         init_users(db)
         init_orders(db)
+        plan_blob_service.migrate_legacy_plans(db)
+        plan_history.seed_history(db)
         init_demo_plan3d(db)
     finally:
         db.close()
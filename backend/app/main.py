@@ -81,13 +81,110 @@ try:
                     if 'created_by_id' not in plan_columns:
                         print("🔄 Migrating: Adding created_by_id to order_plan_versions table...")
                         cursor.execute("ALTER TABLE order_plan_versions ADD COLUMN created_by_id TEXT")
+
+                    # Миграция: order_plan_versions.plan_hash (тела планов переносятся в plan_blobs)
+                    if 'plan_hash' not in plan_columns:
+                        print("🔄 Migrating: Adding plan_hash to order_plan_versions table...")
+                        cursor.execute("ALTER TABLE order_plan_versions ADD COLUMN plan_hash VARCHAR(64)")
+                        cursor.execute("CREATE INDEX IF NOT EXISTS ix_order_plan_versions_plan_hash ON order_plan_versions (plan_hash)")
+
+                    # Миграция: order_plan_versions.updated_at (время изменения для ETag/Last-Modified)
+                    if 'updated_at' not in plan_columns:
+                        print("🔄 Migrating: Adding updated_at to order_plan_versions table...")
+                        cursor.execute("ALTER TABLE order_plan_versions ADD COLUMN updated_at DATETIME")
+                        cursor.execute("UPDATE order_plan_versions SET updated_at = created_at")
+
+                    # Индекс для выборки версий заказа (ETag планов без загрузки тел)
+                    cursor.execute("CREATE INDEX IF NOT EXISTS ix_order_plan_versions_order_id ON order_plan_versions (order_id)")
                 
+                # Миграция: plan_blobs.orphaned_at (отметка сборщика мусора блобов)
+                cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='plan_blobs'")
+                if cursor.fetchone():
+                    cursor.execute("PRAGMA table_info(plan_blobs)")
+                    if 'orphaned_at' not in [row[1] for row in cursor.fetchall()]:
+                        print("🔄 Migrating: Adding orphaned_at to plan_blobs table...")
+                        cursor.execute("ALTER TABLE plan_blobs ADD COLUMN orphaned_at DATETIME")
+
+                # Миграция: уникальный seq ревизии в истории заказа
+                cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='plan_revisions'")
+                if cursor.fetchone():
+                    cursor.execute(
+                        "SELECT 1 FROM sqlite_master WHERE type='index' AND name='uq_plan_revisions_order_id_seq'"
+                    )
+                    if not cursor.fetchone():
+                        print("🔄 Migrating: Adding unique (order_id, seq) to plan_revisions table...")
+                        # Повторы seq от параллельных записей перенумеровываются по порядку создания
+                        cursor.execute(
+                            "UPDATE plan_revisions SET seq = ("
+                            "SELECT numbered.rn FROM (SELECT id, ROW_NUMBER() OVER "
+                            "(PARTITION BY order_id ORDER BY seq, created_at) AS rn FROM plan_revisions) AS numbered "
+                            "WHERE numbered.id = plan_revisions.id) "
+                            "WHERE order_id IN (SELECT order_id FROM plan_revisions GROUP BY order_id, seq HAVING COUNT(*) > 1)"
+                        )
+                        cursor.execute(
+                            "CREATE UNIQUE INDEX uq_plan_revisions_order_id_seq ON plan_revisions (order_id, seq)"
+                        )
+
+                # Проверяем существование таблицы jobs
+                cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='jobs'")
+                if cursor.fetchone():
+                    # Миграция: jobs.progress
+                    cursor.execute("PRAGMA table_info(jobs)")
+                    job_columns = [row[1] for row in cursor.fetchall()]
+                    if 'progress' not in job_columns:
+                        print("🔄 Migrating: Adding progress to jobs table...")
+                        cursor.execute("ALTER TABLE jobs ADD COLUMN progress JSON")
+
+                # Миграция: chat_threads.history_summary, chat_threads.summary_until (сводка истории чата)
+                cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='chat_threads'")
+                if cursor.fetchone():
+                    cursor.execute("PRAGMA table_info(chat_threads)")
+                    chat_columns = [row[1] for row in cursor.fetchall()]
+                    if 'history_summary' not in chat_columns:
+                        print("🔄 Migrating: Adding history_summary to chat_threads table...")
+                        cursor.execute("ALTER TABLE chat_threads ADD COLUMN history_summary TEXT")
+                    if 'summary_until' not in chat_columns:
+                        print("🔄 Migrating: Adding summary_until to chat_threads table...")
+                        cursor.execute("ALTER TABLE chat_threads ADD COLUMN summary_until DATETIME")
+
+                # Индекс для выборки последних сообщений чата (LIMIT по времени)
+                cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='order_chat_messages'")
+                if cursor.fetchone():
+                    cursor.execute(
+                        "CREATE INDEX IF NOT EXISTS ix_order_chat_messages_chat_id_created_at "
+                        "ON order_chat_messages (chat_id, created_at)"
+                    )
+
+                # Миграция: ai_rule_tags (теги правил из JSON-колонки ai_rules.tags в отдельную таблицу)
+                cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='ai_rules'")
+                has_rules = cursor.fetchone()
+                cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='ai_rule_tags'")
+                if has_rules and not cursor.fetchone():
+                    print("🔄 Migrating: Creating ai_rule_tags from ai_rules.tags...")
+                    cursor.execute(
+                        "CREATE TABLE ai_rule_tags ("
+                        "rule_id VARCHAR NOT NULL REFERENCES ai_rules (id) ON DELETE CASCADE, "
+                        "tag VARCHAR(100) NOT NULL, "
+                        "PRIMARY KEY (rule_id, tag))"
+                    )
+                    cursor.execute("CREATE INDEX ix_ai_rule_tags_tag_rule_id ON ai_rule_tags (tag, rule_id)")
+                    cursor.execute(
+                        "INSERT OR IGNORE INTO ai_rule_tags (rule_id, tag) "
+                        "SELECT ai_rules.id, trim(tags.value) FROM ai_rules, json_each(ai_rules.tags) AS tags "
+                        "WHERE json_valid(ai_rules.tags) AND json_type(ai_rules.tags) = 'array' "
+                        "AND tags.type = 'text' AND trim(tags.value) != ''"
+                    )
+
                 # Проверяем существование таблицы orders
                 cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='orders'")
                 if cursor.fetchone():
                     # Миграция: orders.service_code
                     cursor.execute("PRAGMA table_info(orders)")
                     order_columns = [row[1] for row in cursor.fetchall()]
+                    # Миграция: orders.tariff_version (версия тарифа, по которому рассчитана цена)
+                    if 'tariff_version' not in order_columns:
+                        print("🔄 Migrating: Adding tariff_version to orders table...")
+                        cursor.execute("ALTER TABLE orders ADD COLUMN tariff_version INTEGER")
                     if 'service_code' not in order_columns:
                         print("🔄 Migrating: Adding service_code to orders table...")
                         # SQLite не поддерживает добавление NOT NULL колонки без дефолта к существующей таблице
@@ -2,7 +2,7 @@ import enum
 import uuid
 from datetime import datetime
 
-from sqlalchemy import Boolean, DateTime, Enum, ForeignKey, Integer, JSON, String, Text
+from sqlalchemy import Boolean, DateTime, Enum, ForeignKey, Index, Integer, JSON, String, Text
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.db.base_class import Base
@@ -38,3 +38,27 @@ class AIRule(Base):
         DateTime(timezone=True), default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False
     )
 
+    tag_links: Mapped[list["AIRuleTag"]] = relationship(
+        "AIRuleTag", back_populates="rule", cascade="all, delete-orphan"
+    )
+
+    def set_tags(self, tags: list[str] | None) -> None:
+        """Записать теги в JSON-колонку и в таблицу ai_rule_tags (без повторов и пустых)"""
+        unique = list(dict.fromkeys(tag.strip() for tag in tags or () if tag and tag.strip()))
+        existing = {link.tag: link for link in self.tag_links}
+        self.tags = unique
+        self.tag_links = [existing.get(tag) or AIRuleTag(tag=tag) for tag in unique]
+
+
+class AIRuleTag(Base):
+    """Тег правила AI: нормализованная копия AIRule.tags для индексированного отбора и подсчета"""
+    __tablename__ = "ai_rule_tags"
+    __table_args__ = (Index("ix_ai_rule_tags_tag_rule_id", "tag", "rule_id"),)
+
+    rule_id: Mapped[uuid.UUID] = mapped_column(
+        GUID(), ForeignKey("ai_rules.id", ondelete="CASCADE"), primary_key=True
+    )
+    tag: Mapped[str] = mapped_column(String(100), primary_key=True)
+
+    rule: Mapped[AIRule] = relationship("AIRule", back_populates="tag_links")
+
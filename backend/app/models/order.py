@@ -1,4 +1,6 @@
 import enum
+import hashlib
+import json
 import uuid
 from datetime import datetime
 
@@ -8,11 +10,15 @@ from sqlalchemy import (
     Enum,
     Float,
     ForeignKey,
+    Index,
+    Integer,
     JSON,
     String,
     Text,
+    UniqueConstraint,
 )
-from sqlalchemy.orm import Mapped, mapped_column, relationship
+from sqlalchemy import event
+from sqlalchemy.orm import Mapped, Session, attributes, make_transient_to_detached, mapped_column, relationship
 
 from app.db.base_class import Base
 from app.db.types import GUID
@@ -65,6 +71,7 @@ class Order(Base):
     )
     calculator_input: Mapped[dict | None] = mapped_column(JSON, default=dict)
     estimated_price: Mapped[float | None] = mapped_column(Float)
+    tariff_version: Mapped[int | None] = mapped_column(Integer, ForeignKey("pricing_tariffs.version"))  # Тариф, по которому рассчитана estimated_price
     total_price: Mapped[float | None] = mapped_column(Float)
     ai_decision_status: Mapped[str | None] = mapped_column(String(100))
     ai_decision_summary: Mapped[str | None] = mapped_column(Text)
@@ -133,25 +140,178 @@ class OrderFile(Base):
     uploaded_by: Mapped["User"] = relationship("User")
 
 
+def canonical_plan_json(plan: dict) -> str:
+    """Каноническая JSON-форма плана: сортированные ключи, без пробелов"""
+    return json.dumps(plan, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str)
+
+
+def plan_content_hash(plan: dict) -> str:
+    return hashlib.sha256(canonical_plan_json(plan).encode("utf-8")).hexdigest()
+
+
+class PlanBlob(Base):
+    """Тело плана, хранимое один раз на уникальное содержимое (ключ — sha256 канонического JSON)"""
+    __tablename__ = "plan_blobs"
+
+    hash: Mapped[str] = mapped_column(String(64), primary_key=True)
+    body: Mapped[dict] = mapped_column(JSON, nullable=False)
+    size_bytes: Mapped[int] = mapped_column(Integer, default=0)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), default=datetime.utcnow
+    )
+    # Когда сборщик мусора застал блоб без ссылок; сбрасывается при повторном использовании
+    orphaned_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True))
+
+
+def _blob_upsert(session: Session, blob: PlanBlob) -> bool:
+    """Записать блоб, если его еще нет; если есть — снять отметку сборщика мусора.
+
+    INSERT ... ON CONFLICT не падает, когда тот же план параллельно сохраняет
+    другой запрос. В PostgreSQL ветка DO UPDATE блокирует существующую строку
+    до конца транзакции, поэтому сборщик не удалит ее до появления ссылки.
+    Для других СУБД возвращает False: блоб добавляется обычным INSERT.
+    """
+    dialect = session.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        return False
+    stmt = insert(PlanBlob).values(
+        hash=blob.hash, body=blob.body, size_bytes=blob.size_bytes, created_at=datetime.utcnow()
+    )
+    session.execute(
+        stmt.on_conflict_do_update(
+            index_elements=[PlanBlob.hash],
+            set_={"orphaned_at": None},
+            where=PlanBlob.orphaned_at.is_not(None),
+        )
+    )
+    return True
+
+
 class OrderPlanVersion(Base):
     __tablename__ = "order_plan_versions"
 
     id: Mapped[uuid.UUID] = mapped_column(GUID(), primary_key=True, default=uuid.uuid4)
-    order_id: Mapped[uuid.UUID] = mapped_column(GUID(), ForeignKey("orders.id"), nullable=False)
+    order_id: Mapped[uuid.UUID] = mapped_column(GUID(), ForeignKey("orders.id"), nullable=False, index=True)
     version_type: Mapped[str] = mapped_column(String(20))  # ORIGINAL / MODIFIED / EXECUTOR_EDITED
-    plan: Mapped[dict] = mapped_column(JSON)
+    plan_hash: Mapped[str | None] = mapped_column(String(64), ForeignKey("plan_blobs.hash"), index=True)
+    # Старая колонка с телом плана: заполнена только у строк до переноса в plan_blobs
+    legacy_plan: Mapped[dict | None] = mapped_column("plan", JSON)
     is_applied: Mapped[bool] = mapped_column(Boolean, default=False)
     comment: Mapped[str | None] = mapped_column(Text)  # Комментарий исполнителя при редактировании
     created_by_id: Mapped[uuid.UUID | None] = mapped_column(GUID(), ForeignKey("users.id"))  # Кто создал версию
     created_at: Mapped[datetime] = mapped_column(
         DateTime(timezone=True), default=datetime.utcnow
     )
+    # Время последнего сохранения (ETag/Last-Modified); порядок версий — по created_at
+    updated_at: Mapped[datetime | None] = mapped_column(
+        DateTime(timezone=True), default=datetime.utcnow, onupdate=datetime.utcnow
+    )
 
     order: Mapped[Order] = relationship("Order", back_populates="plan_versions")
+    blob: Mapped[PlanBlob | None] = relationship("PlanBlob", lazy="joined")
+
+    @property
+    def plan(self) -> dict | None:
+        pending = self.__dict__.get("_pending_plan")
+        if pending is not None:
+            return pending
+        if self.blob is not None:
+            return self.blob.body
+        return self.legacy_plan
+
+    @plan.setter
+    def plan(self, value: dict | None) -> None:
+        # Блоб ищется/создается при flush (см. _store_pending_plans)
+        self.__dict__["_pending_plan"] = value
+        attributes.flag_dirty(self)
+
+    @property
+    def stored_plan_hash(self) -> str | None:
+        """Хэш сохраненного содержимого; None, если план изменен и еще не записан"""
+        if "_pending_plan" in self.__dict__:
+            return None
+        return self.plan_hash
+
+
+def _attached(session: Session, blob: PlanBlob) -> PlanBlob:
+    make_transient_to_detached(blob)
+    session.add(blob)
+    return blob
+
+
+@event.listens_for(Session, "before_flush")
+def _store_pending_plans(session: Session, flush_context, instances) -> None:
+    """Перенести измененные планы версий в plan_blobs (один блоб на уникальное содержимое)"""
+    versions = [
+        obj for obj in (*session.new, *session.dirty)
+        if isinstance(obj, OrderPlanVersion) and "_pending_plan" in obj.__dict__
+    ]
+    if not versions:
+        return
+    pending_blobs = {obj.hash: obj for obj in session.new if isinstance(obj, PlanBlob)}
+    with session.no_autoflush:
+        for version in versions:
+            plan = version.__dict__.pop("_pending_plan")
+            if plan is None:
+                version.blob = None
+                version.legacy_plan = None
+                continue
+            body = canonical_plan_json(plan)
+            digest = hashlib.sha256(body.encode("utf-8")).hexdigest()
+            blob = pending_blobs.get(digest)
+            if blob is None:
+                blob = PlanBlob(hash=digest, body=plan, size_bytes=len(body.encode("utf-8")))
+                if _blob_upsert(session, blob):
+                    # Строка уже в БД: объект подключается без повторного INSERT и SELECT тела
+                    blob = session.identity_map.get(session.identity_key(PlanBlob, digest)) or _attached(session, blob)
+                else:
+                    blob = session.get(PlanBlob, digest) or blob
+                    session.add(blob)
+                pending_blobs[digest] = blob
+            version.blob = blob
+            version.plan_hash = digest
+            # Явный None пишет JSON null: колонка plan в старых БД объявлена NOT NULL
+            version.legacy_plan = None
+
+
+class PlanRevision(Base):
+    """Запись неизменяемой истории плана заказа.
+
+    Хранит либо полный снимок плана (snapshot), либо JSON Patch относительно
+    родительской ревизии. Текущее состояние каждого типа версии по-прежнему
+    лежит в order_plan_versions.
+    """
+    __tablename__ = "plan_revisions"
+    # Две ревизии с одним seq — параллельная запись в историю: вторая отклоняется
+    __table_args__ = (UniqueConstraint("order_id", "seq", name="uq_plan_revisions_order_id_seq"),)
+
+    id: Mapped[uuid.UUID] = mapped_column(GUID(), primary_key=True, default=uuid.uuid4)
+    order_id: Mapped[uuid.UUID] = mapped_column(GUID(), ForeignKey("orders.id"), nullable=False, index=True)
+    version_id: Mapped[uuid.UUID | None] = mapped_column(GUID(), ForeignKey("order_plan_versions.id"), index=True)
+    version_type: Mapped[str] = mapped_column(String(20))
+    seq: Mapped[int] = mapped_column(Integer, nullable=False)  # Порядковый номер в истории заказа
+    parent_id: Mapped[uuid.UUID | None] = mapped_column(GUID(), ForeignKey("plan_revisions.id"))
+    snapshot: Mapped[dict | None] = mapped_column(JSON)
+    patch: Mapped[list | None] = mapped_column(JSON)
+    size_bytes: Mapped[int] = mapped_column(Integer, default=0)  # Размер snapshot/patch в JSON
+    comment: Mapped[str | None] = mapped_column(Text)
+    created_by_id: Mapped[uuid.UUID | None] = mapped_column(GUID(), ForeignKey("users.id"))
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), default=datetime.utcnow
+    )
+
+    @property
+    def is_snapshot(self) -> bool:
+        return self.snapshot is not None
 
 
 class OrderChatMessage(Base):
     __tablename__ = "order_chat_messages"
+    __table_args__ = (Index("ix_order_chat_messages_chat_id_created_at", "chat_id", "created_at"),)
 
     id: Mapped[uuid.UUID] = mapped_column(GUID(), primary_key=True, default=uuid.uuid4)
     chat_id: Mapped[uuid.UUID] = mapped_column(GUID(), ForeignKey("chat_threads.id"), nullable=False)
@@ -0,0 +1,22 @@
+import uuid
+from datetime import datetime
+
+from sqlalchemy import Boolean, DateTime, ForeignKey, Integer, JSON, Text
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.db.base_class import Base
+from app.db.types import GUID
+
+
+class PricingTariff(Base):
+    """Версия тарифа калькулятора стоимости: правила расчета как данные"""
+    __tablename__ = "pricing_tariffs"
+
+    version: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    rules: Mapped[dict] = mapped_column(JSON, nullable=False, comment="lineItems и multipliers, см. pricing_rules")
+    comment: Mapped[str | None] = mapped_column(Text)
+    is_active: Mapped[bool] = mapped_column(Boolean, default=False, server_default="0", nullable=False, index=True)
+    created_by_id: Mapped[uuid.UUID | None] = mapped_column(GUID(), ForeignKey("users.id"))
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), default=datetime.utcnow, nullable=False
+    )
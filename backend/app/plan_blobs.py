@@ -0,0 +1,35 @@
+"""Обслуживание хранилища тел планов.
+
+Запуск из каталога backend:
+
+* ``python -m app.plan_blobs gc [--grace SECONDS]`` — пометить блобы без
+  ссылок и удалить помеченные прошлым запуском не меньше grace секунд назад
+  (по умолчанию plan_blob_gc_grace_seconds). Запускается по расписанию, например
+  из cron раз в сутки.
+"""
+from __future__ import annotations
+
+import argparse
+
+from app.db import base  # noqa: F401  регистрирует модели
+from app.db.session import SessionLocal
+from app.services import plan_blob_service
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Обслуживание хранилища тел планов")
+    commands = parser.add_subparsers(dest="command", required=True)
+    gc = commands.add_parser("gc", help="Удалить блобы, на которые не ссылается ни одна версия плана")
+    gc.add_argument("--grace", type=int, default=None, help="Сколько секунд блоб должен пробыть помеченным")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        result = plan_blob_service.collect_garbage(db, args.grace)
+    finally:
+        db.close()
+    print(f"marked {result['marked']}, unmarked {result['unmarked']}, deleted {result['deleted']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""Индекс нормативных документов для RAG.
+
+Запуск из каталога backend:
+
+* ``python -m app.rag build [--workers N]`` — собрать индекс по rag_documents_dir
+  заново; эмбеддинги, которых нет в кэше, считаются в N процессах (по
+  умолчанию rag_workers, 0 — по числу ядер);
+* ``python -m app.rag update [--workers N] [--compact]`` — проиндексировать только
+  новые и измененные документы; если дельта разрослась, уплотнение ставится в
+  очередь фоновых задач (rag_compact) или выполняется сразу с ``--compact``;
+* ``python -m app.rag compact`` — уплотнить индекс сейчас;
+* ``python -m app.rag query "текст"`` — показать найденные чанки.
+"""
+from __future__ import annotations
+
+import argparse
+import logging
+import time
+
+from app.core.config import settings
+from app.services import rag_service
+
+
+def _enqueue_compaction() -> None:
+    from app.db.session import SessionLocal
+    from app.services import job_service
+    from app.services.job_handlers import RAG_COMPACT
+
+    db = SessionLocal()
+    try:
+        job = job_service.get_active_job(db, RAG_COMPACT, None) or job_service.enqueue(db, RAG_COMPACT)
+        print(f"compaction queued: job {job.id}")
+    finally:
+        db.close()
+
+
+def _report(started: float) -> None:
+    index = rag_service.get_index()
+    meta = index.meta
+    print(
+        f"{index.path}: {len(index)} chunks ({meta['deltaChunks']} in delta, {meta['deletedChunks']} deleted), "
+        f"{meta['lists']} lists, {meta['embeddedChunks']} embedded, {time.perf_counter() - started:.1f} s"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Индекс нормативных документов для RAG")
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("build", help="Собрать индекс заново")
+    build.add_argument("--workers", type=int, default=None, help="Процессов для эмбеддинга (0 — по числу ядер)")
+    update = commands.add_parser("update", help="Проиндексировать новые и измененные документы")
+    update.add_argument("--workers", type=int, default=None, help="Процессов для эмбеддинга (0 — по числу ядер)")
+    update.add_argument("--compact", action="store_true", help="Уплотнить индекс сразу, а не фоновой задачей")
+    commands.add_parser("compact", help="Слить дельту индекса в основу")
+    query = commands.add_parser("query", help="Найти чанки по запросу")
+    query.add_argument("text")
+    query.add_argument("-k", type=int, default=settings.rag_top_k)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    started = time.perf_counter()
+    if args.command == "build":
+        rag_service.rebuild_index(args.workers)
+        _report(started)
+    elif args.command == "update":
+        if rag_service.update_index(args.workers) is None:
+            print("no changes")
+            return
+        _report(started)
+        if rag_service.needs_compaction():
+            if args.compact:
+                rag_service.compact_index()
+                _report(started)
+            else:
+                _enqueue_compaction()
+    elif args.command == "compact":
+        if rag_service.compact_index() is None:
+            print("nothing to compact")
+            return
+        _report(started)
+    else:
+        for chunk in rag_service.retrieve(args.text, args.k):
+            print(f"{chunk.score:.3f} [{chunk.document} #{chunk.seq}] {chunk.text[:200]!r}")
+
+
+if __name__ == "__main__":
+    main()
@@ -53,6 +53,12 @@ class AIRuleRead(AIRuleBase):
     model_config = ConfigDict(from_attributes=True, populate_by_name=True)
 
 
+class AIRuleTagFacet(BaseModel):
+    """Тег и число правил с ним"""
+    tag: str
+    count: int
+
+
 class AIRulePreviewRequest(BaseModel):
     """Запрос на предпросмотр ответа AI на основе правила"""
     test_scenario: dict = Field(alias="testScenario", description="Тестовый сценарий для проверки правила")
@@ -0,0 +1,28 @@
+"""Схемы для фоновых задач"""
+from __future__ import annotations
+
+import uuid
+from datetime import datetime
+
+from pydantic import BaseModel, ConfigDict, Field
+
+from app.models.job import JobStatus
+
+
+class JobRead(BaseModel):
+    """Состояние фоновой задачи"""
+    id: uuid.UUID
+    kind: str
+    status: JobStatus
+    attempts: int
+    max_attempts: int = Field(alias="maxAttempts")
+    order_id: uuid.UUID | None = Field(default=None, alias="orderId")
+    result: dict | None = None
+    progress: dict | None = None
+    error: str | None = None
+    run_after: datetime | None = Field(default=None, alias="runAfter")
+    created_at: datetime = Field(alias="createdAt")
+    updated_at: datetime | None = Field(default=None, alias="updatedAt")
+    finished_at: datetime | None = Field(default=None, alias="finishedAt")
+
+    model_config = ConfigDict(from_attributes=True, populate_by_name=True)
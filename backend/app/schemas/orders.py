@@ -2,7 +2,7 @@ from __future__ import annotations
 
 import uuid
 from datetime import datetime
-from typing import Any
+from typing import Any, Literal
 
 from pydantic import BaseModel, ConfigDict, Field
 
@@ -40,6 +40,9 @@ class ChatMessageCreate(BaseModel):
 class ChatMessagePairResponse(BaseModel):
     user_message: OrderChatMessage | None = Field(default=None, alias="userMessage")
     ai_message: OrderChatMessage | None = Field(default=None, alias="aiMessage")
+    ai_job_id: uuid.UUID | None = Field(
+        default=None, alias="aiJobId", description="Фоновая задача, которая добавит ответ ассистента"
+    )
 
     model_config = ConfigDict(populate_by_name=True)
 
@@ -52,10 +55,35 @@ class OrderPlanVersion(BaseModel):
     comment: str | None = None
     created_by_id: uuid.UUID | None = Field(default=None, alias="createdById")
     created_at: datetime = Field(alias="createdAt")
+    revision_id: uuid.UUID | None = Field(
+        default=None, alias="revisionId", description="Последняя ревизия истории, если план отдан без разрезки стен по проемам"
+    )
 
     model_config = ConfigDict(from_attributes=True, populate_by_name=True, extra="forbid")
 
 
+class PlanRevisionInfo(BaseModel):
+    """Ревизия из истории плана (без тела плана)"""
+    id: uuid.UUID
+    order_id: uuid.UUID = Field(alias="orderId")
+    version_id: uuid.UUID | None = Field(default=None, alias="versionId")
+    version_type: str = Field(alias="versionType")
+    seq: int
+    parent_id: uuid.UUID | None = Field(default=None, alias="parentId")
+    is_snapshot: bool = Field(alias="isSnapshot")
+    size_bytes: int = Field(default=0, alias="sizeBytes")
+    comment: str | None = None
+    created_by_id: uuid.UUID | None = Field(default=None, alias="createdById")
+    created_at: datetime = Field(alias="createdAt")
+
+    model_config = ConfigDict(from_attributes=True, populate_by_name=True)
+
+
+class PlanRevisionRead(PlanRevisionInfo):
+    """Ревизия плана с восстановленным планом"""
+    plan: Plan
+
+
 class SavePlanChangesRequest(BaseModel):
     version_type: str = Field(alias="versionType")
     plan: Plan
@@ -64,6 +92,44 @@ class SavePlanChangesRequest(BaseModel):
     model_config = ConfigDict(populate_by_name=True, extra="forbid")
 
 
+class PlanElementOp(BaseModel):
+    """Операция над элементом плана по id"""
+    op: Literal["add", "update", "delete"]
+    id: str
+    element: dict | None = Field(default=None, description="Новый элемент (add)")
+    fields: dict | None = Field(
+        default=None, description="JSON Merge Patch к элементу (update): вложенные объекты сливаются, null удаляет поле"
+    )
+
+    model_config = ConfigDict(populate_by_name=True, extra="forbid")
+
+
+class PatchPlanRequest(BaseModel):
+    """Изменения плана относительно базовой ревизии истории"""
+    base_revision_id: uuid.UUID = Field(
+        alias="baseRevisionId", description="Последняя ревизия истории, известная клиенту; иначе 409"
+    )
+    version_type: str = Field(alias="versionType", description="Тип версии, в которую сохраняется результат")
+    patch: list[dict] | None = Field(default=None, description="JSON Patch (RFC 6902): add, remove, replace")
+    elements: list[PlanElementOp] | None = Field(default=None, description="Операции над элементами по id")
+    comment: str | None = None
+
+    model_config = ConfigDict(populate_by_name=True, extra="forbid")
+
+
+class PatchPlanResponse(BaseModel):
+    """Результат инкрементального сохранения (без тела плана)"""
+    order_id: uuid.UUID = Field(alias="orderId")
+    version_id: uuid.UUID = Field(alias="versionId")
+    version_type: str = Field(alias="versionType")
+    revision_id: uuid.UUID = Field(alias="revisionId", description="Базовая ревизия для следующего изменения")
+    base_revision_id: uuid.UUID = Field(alias="baseRevisionId")
+    plan_hash: str | None = Field(default=None, alias="planHash")
+    element_count: int = Field(alias="elementCount")
+
+    model_config = ConfigDict(populate_by_name=True)
+
+
 class ParsePlanResultRequest(BaseModel):
     """Запрос на сохранение результата парсинга плана от нейронки"""
     file_id: uuid.UUID = Field(alias="fileId", description="ID загруженного файла, который обрабатывался")
@@ -154,6 +220,7 @@ class Order(BaseModel):
     complexity: str | None = None
     calculator_input: dict | None = Field(default=None, alias="calculatorInput")
     estimated_price: float | None = Field(default=None, alias="estimatedPrice")
+    tariff_version: int | None = Field(default=None, alias="tariffVersion")
     total_price: float | None = Field(default=None, alias="totalPrice")
     current_department_code: str | None = Field(default=None, alias="currentDepartmentCode")
     ai_decision_status: str | None = Field(default=None, alias="aiDecisionStatus")
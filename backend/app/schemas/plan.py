@@ -1,8 +1,8 @@
 from __future__ import annotations
 
-from typing import Literal
+from typing import Annotated, Literal
 
-from pydantic import BaseModel, ConfigDict, Field
+from pydantic import BaseModel, ConfigDict, Field, TypeAdapter
 
 
 class PlanScale(BaseModel):
@@ -157,7 +157,11 @@ class PlanObject3D(BaseModel):
     model_config = ConfigDict(populate_by_name=True, extra="forbid")
 
 
-PlanElement = WallElement | ZoneElement | DoorElement | WindowElement | LabelElement
+# Тег type выбирает модель сразу, без перебора всех вариантов объединения
+PlanElement = Annotated[
+    WallElement | ZoneElement | DoorElement | WindowElement | LabelElement,
+    Field(discriminator="type"),
+]
 
 
 class Plan(BaseModel):
@@ -166,3 +170,24 @@ class Plan(BaseModel):
     objects3d: list[PlanObject3D] | None = Field(default=None, alias="objects3d")
 
     model_config = ConfigDict(populate_by_name=True, extra="forbid")
+
+    def to_data(self) -> dict:
+        """Каноническая форма плана для хранения и хэша: model_dump() со значениями по умолчанию.
+
+        Одна форма для любого пути (dict запроса, готовая модель, шаблон),
+        иначе один и тот же план получал бы разные plan_hash.
+        """
+        return self.model_dump()
+
+
+_element_adapter: TypeAdapter = TypeAdapter(PlanElement)
+
+
+def validated_plan_data(data: dict) -> dict:
+    """Проверить план и вернуть его каноническую форму"""
+    return Plan.model_validate(data).to_data()
+
+
+def validated_element_data(data: dict) -> dict:
+    """Проверить один элемент плана и вернуть его в той же форме, что и в Plan.to_data()"""
+    return _element_adapter.dump_python(_element_adapter.validate_python(data))
@@ -6,7 +6,7 @@ from datetime import datetime
 
 from pydantic import BaseModel, ConfigDict, Field
 
-from app.schemas.plan import Plan
+from app.schemas.plan import Plan, PlanElement
 
 
 class Plan2DResponse(BaseModel):
@@ -18,6 +18,9 @@ class Plan2DResponse(BaseModel):
     comment: str | None = None
     createdAt: datetime | None = Field(default=None, alias="createdAt")
     createdBy: str | None = Field(default=None, alias="createdBy", description="Имя создателя версии")
+    revision_id: uuid.UUID | None = Field(
+        default=None, alias="revisionId", description="Последняя ревизия истории, если план отдан без разрезки стен по проемам"
+    )
 
     model_config = ConfigDict(populate_by_name=True)
 
@@ -54,3 +57,25 @@ class PlanExportResponse(BaseModel):
 
     model_config = ConfigDict(populate_by_name=True)
 
+
+class PlanQueryResponse(BaseModel):
+    """Элементы плана, попавшие в прямоугольник запроса"""
+    orderId: uuid.UUID = Field(alias="orderId")
+    versionType: str = Field(alias="versionType")
+    versionId: uuid.UUID = Field(alias="versionId")
+    bbox: list[float] = Field(description="Прямоугольник запроса в px: min x, min y, max x, max y")
+    total: int = Field(description="Сколько элементов пересекает прямоугольник")
+    elements: list[PlanElement]
+
+    model_config = ConfigDict(populate_by_name=True)
+
+
+class SimilarPlanItem(BaseModel):
+    """Похожий план из библиотеки шаблонов или истории заказов"""
+    source: str = Field(description="template — шаблон библиотеки, order — план другого заказа")
+    score: float = Field(description="Косинусная близость признаков (0..1)")
+    template_id: str | None = Field(default=None, alias="templateId")
+    order_id: uuid.UUID | None = Field(default=None, alias="orderId")
+    version_id: uuid.UUID | None = Field(default=None, alias="versionId")
+
+    model_config = ConfigDict(populate_by_name=True)
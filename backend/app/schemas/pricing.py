@@ -1,3 +1,6 @@
+import uuid
+from datetime import datetime
+
 from pydantic import BaseModel, ConfigDict, Field
 
 
@@ -35,6 +38,7 @@ class PriceBreakdown(BaseModel):
     base_component: float = Field(alias="baseComponent")
     works_component: float = Field(alias="worksComponent")
     features_coef: float = Field(alias="featuresCoef")
+    tariff_version: int | None = Field(default=None, alias="tariffVersion")
     raw: dict | None = None
 
     model_config = ConfigDict(populate_by_name=True)
@@ -45,3 +49,43 @@ class PriceEstimateResponse(BaseModel):
     breakdown: PriceBreakdown
 
     model_config = ConfigDict(populate_by_name=True)
+
+
+class PriceEstimateBatchRequest(BaseModel):
+    items: list[PriceCalculatorInput] = Field(min_length=1)
+
+    model_config = ConfigDict(populate_by_name=True)
+
+
+class PriceEstimateBatchResponse(BaseModel):
+    items: list[PriceEstimateResponse]
+    coefficients_version: int = Field(alias="coefficientsVersion")
+
+    model_config = ConfigDict(populate_by_name=True)
+
+
+class TariffCreate(BaseModel):
+    rules: dict = Field(description="Правила тарифа: lineItems и multipliers")
+    comment: str | None = None
+    activate: bool = Field(default=True, description="Сразу сделать версию действующей")
+
+    model_config = ConfigDict(populate_by_name=True)
+
+
+class TariffRead(BaseModel):
+    version: int
+    rules: dict
+    comment: str | None = None
+    is_active: bool = Field(alias="isActive")
+    created_by_id: uuid.UUID | None = Field(default=None, alias="createdById")
+    created_at: datetime = Field(alias="createdAt")
+
+    model_config = ConfigDict(from_attributes=True, populate_by_name=True)
+
+
+class RepriceRequest(BaseModel):
+    district_codes: list[str] | None = Field(default=None, alias="districtCodes", description="Только заказы этих районов")
+    house_type_codes: list[str] | None = Field(default=None, alias="houseTypeCodes", description="Только заказы этих типов домов")
+    dry_run: bool = Field(default=False, alias="dryRun", description="Ничего не записывать, вернуть изменения цен")
+
+    model_config = ConfigDict(populate_by_name=True)
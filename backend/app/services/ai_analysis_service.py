@@ -0,0 +1,276 @@
+"""AI-анализ плана заказа (Gemini + правила из ai_rule_service).
+
+Правила с условием на языке условий (rule_expressions) проверяются локально
+по плану; LLM получает найденные риски и только текстовые правила.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import threading
+import uuid
+from collections import OrderedDict
+
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.order import plan_content_hash
+from app.schemas.orders import AiAnalysis, AiRisk
+from app.services import ai_rule_service, order_service, plan_spatial, rag_service
+from app.services.gemini_client import generate_json
+from app.services.plan_description import summarize_plan
+from app.services.plan_transform import split_wall_segments
+from app.services.rule_expressions import PlanContext
+
+logger = logging.getLogger(__name__)
+
+
+def _severity_from_label(label: str | None) -> int | None:
+    if not label:
+        return None
+    mapping = {"low": 1, "medium": 2, "high": 4, "critical": 5}
+    return mapping.get(label.lower())
+
+
+def _map_ai_risk(risk_dict: dict) -> AiRisk:
+    severity = risk_dict.get("severity")
+    if severity is None:
+        severity = _severity_from_label(risk_dict.get("severity_str"))
+    risk_type = risk_dict.get("type") or "TECHNICAL"
+    description = risk_dict.get("description") or "Risk details are not available"
+    return AiRisk(
+        type=risk_type,
+        description=description,
+        severity=severity,
+        zone=risk_dict.get("zone"),
+    )
+
+
+def _derive_decision_status(risks: list[AiRisk]) -> str:
+    if any(r.severity and r.severity >= 4 for r in risks):
+        return "FORBIDDEN"
+    if any(r.severity and r.severity >= 3 for r in risks):
+        return "NEEDS_APPROVAL"
+    if risks:
+        return "ALLOWED_WITH_WARNINGS"
+    return "ALLOWED"
+
+
+def _collect_order_context(order) -> dict:
+    status_value = order.status.value if hasattr(order.status, "value") else str(order.status)
+    context = {
+        "order_id": str(order.id),
+        "order_title": order.title,
+        "order_status": status_value,
+    }
+    if order.district_code:
+        context["district_code"] = order.district_code
+    if order.house_type_code:
+        context["house_type_code"] = order.house_type_code
+    if order.address:
+        context["address"] = order.address
+    if getattr(order, "area", None):
+        context["area"] = order.area
+    return context
+
+
+def _get_latest_plan_data(db: Session, order_id: uuid.UUID) -> tuple[dict | None, str | None]:
+    """План последней версии (без разрезания стен) и хэш его сохраненного содержимого"""
+    versions = order_service.get_plan_versions(db, order_id)
+    if not versions:
+        return None, None
+    latest = versions[-1]
+    return latest.plan, latest.stored_plan_hash
+
+
+# Ответы LLM по ключу (план, контекст заказа, набор правил): повторный анализ
+# без изменений не обращается к модели
+_cache: OrderedDict[str, dict] = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def analysis_cache_key(plan_hash: str, order_context: dict, rules_hash: str, corpus_version: str = "") -> str:
+    context = json.dumps(order_context, sort_keys=True, ensure_ascii=False, default=str)
+    context_hash = hashlib.blake2b(context.encode("utf-8"), digest_size=8).hexdigest()
+    return f"{plan_hash}:{context_hash}:{rules_hash}:{corpus_version}"
+
+
+def _cached_result(key: str) -> dict | None:
+    with _cache_lock:
+        result = _cache.get(key)
+        if result is not None:
+            _cache.move_to_end(key)
+        return result
+
+
+def _store_result(key: str, result: dict) -> None:
+    with _cache_lock:
+        _cache[key] = result
+        _cache.move_to_end(key)
+        while len(_cache) > settings.analysis_cache_size:
+            _cache.popitem(last=False)
+
+
+def evaluate_local_rules(ruleset: ai_rule_service.RuleSet, plan: dict, plan_hash: str | None = None) -> list[AiRisk]:
+    """Риски по правилам, условие которых проверяется локально (без LLM)"""
+    rules = ruleset.local_rules
+    if not rules:
+        return []
+    # План уже разрезан по проемам: ключ совпадает с индексом get_index(..., split=True)
+    index = plan_spatial.get_index(plan, f"{plan_hash}-split" if plan_hash else None)
+    context = PlanContext(index)
+    risks = []
+    for rule in rules:
+        try:
+            triggered, element_ids = rule.condition.matches(context)
+        except Exception:
+            # Ошибка одного правила не должна ронять анализ: правило считается несработавшим
+            logger.exception("AI rule %s failed on the plan, treating it as not triggered", rule.id)
+            continue
+        if not triggered:
+            continue
+        description = rule.description
+        if len(element_ids) > 1:
+            description = f"{description} Элементы: {', '.join(element_ids)}."
+        risks.append(AiRisk(
+            type=rule.risk_type,
+            description=description,
+            severity=rule.severity,
+            zone=rule.risk_zone or (element_ids[0] if element_ids else None),
+        ))
+    return risks
+
+
+def _local_summary(risks: list[AiRisk]) -> str:
+    if not risks:
+        return "Нарушений правил не найдено."
+    return f"Проверка правил: найдено рисков — {len(risks)}. " + " ".join(r.description for r in risks[:3])
+
+
+def build_stored_analysis(order) -> AiAnalysis:
+    """Анализ из сохраненных в заказе полей, без обращения к LLM"""
+    return AiAnalysis(
+        id=uuid.uuid4(),
+        orderId=order.id,
+        decisionStatus=order.ai_decision_status or "UNKNOWN",
+        summary=order.ai_decision_summary or "Plan data not available for analysis",
+        risks=None,
+        legalWarnings=None,
+        financialWarnings=None,
+        rawResponse=None,
+    )
+
+
+async def _request_analysis(
+    plan_data: dict, stored_plan: dict, order_context: dict, rules_text: str, local_risks: list[AiRisk]
+) -> dict:
+    plan_description = summarize_plan(plan_data, stored_plan)
+    found_text = ""
+    if local_risks:
+        found = "\n".join(f"- {r.type}: {r.description} (серьезность {r.severity})" for r in local_risks)
+        found_text = f"Уже выявлено автоматической проверкой правил (не повторяй эти риски):\n{found}\n\n"
+    regulations = await rag_service.regulations_context(
+        f"{plan_description}\n{rules_text}\nТип дома: {order_context.get('house_type_code', '')}",
+        settings.analysis_top_k,
+    )
+    regulations_text = f"Выдержки из нормативных документов:\n{regulations}\n\n" if regulations else ""
+
+    system_prompt = (
+        "Ты эксперт по перепланировкам и БТИ. "
+        "Анализируй план квартиры, оценивай риски и формируй структурированный вывод."
+    )
+    prompt = (
+        f"Данные заказа:\n"
+        f"ID: {order_context.get('order_id')}\n"
+        f"Статус: {order_context.get('order_status')}\n"
+        f"Тип дома: {order_context.get('house_type_code', 'не указан')}\n"
+        f"Округ: {order_context.get('district_code', 'не указан')}\n"
+        f"Адрес: {order_context.get('address', 'не указан')}\n\n"
+        f"Описание плана:\n{plan_description}\n\n"
+        f"Правила и ограничения:\n{rules_text}\n\n"
+        f"{found_text}"
+        f"{regulations_text}"
+        "Сформируй краткое резюме и список рисков по категориям "
+        "(TECHNICAL, LEGAL, FINANCIAL, OPERATIONAL). "
+        "Ответ верни строго в JSON с полями: summary (str), risks (list of objects: "
+        "type, description, severity(1-5), zone(optional))."
+    )
+
+    return await generate_json(
+        system=system_prompt,
+        prompt=prompt,
+        temperature=settings.analysis_temperature,
+    )
+
+
+def _finish_analysis(
+    db: Session, order, result: dict | None, persist: bool, local_risks: list[AiRisk] | None = None
+) -> AiAnalysis:
+    """result — ответ LLM (None, если модель не вызывалась)"""
+    risks_dicts = result.get("risks") if isinstance(result, dict) else []
+    summary = result.get("summary") if isinstance(result, dict) else None
+
+    ai_risks = list(local_risks or []) + ([_map_ai_risk(r) for r in risks_dicts] if risks_dicts else [])
+    decision_status = result.get("decisionStatus") if isinstance(result, dict) else None
+    derived_status = _derive_decision_status(ai_risks)
+    if derived_status:
+        decision_status = derived_status
+    if not decision_status:
+        decision_status = order.ai_decision_status or "UNKNOWN"
+    if not summary:
+        summary = _local_summary(local_risks) if result is None else "Анализ плана не дал результатов."
+
+    analysis = AiAnalysis(
+        id=uuid.uuid4(),
+        orderId=order.id,
+        decisionStatus=decision_status,
+        summary=summary,
+        risks=ai_risks or None,
+        legalWarnings=None,
+        financialWarnings=None,
+        rawResponse=result if isinstance(result, dict) else None,
+    )
+
+    if persist:
+        order.ai_decision_status = decision_status
+        order.ai_decision_summary = summary
+        db.add(order)
+        db.commit()
+        db.refresh(order)
+
+    return analysis
+
+
+async def build_ai_analysis(db: Session, order, persist: bool = False) -> AiAnalysis:
+    stored_plan, plan_hash = _get_latest_plan_data(db, order.id)
+    if not stored_plan:
+        analysis = build_stored_analysis(order)
+        if persist:
+            order.ai_decision_status = analysis.decision_status
+            order.ai_decision_summary = analysis.summary
+            db.add(order)
+            db.commit()
+            db.refresh(order)
+        return analysis
+
+    # Разрезанный план не присваивается версии: иначе он записался бы в БД при commit
+    # и версия потеряла бы хэш сохраненного содержимого
+    plan_data = split_wall_segments(stored_plan)
+    ruleset = ai_rule_service.get_ruleset(db)
+    local_risks = evaluate_local_rules(ruleset, plan_data, plan_hash)
+    if settings.analysis_local_short_circuit and _derive_decision_status(local_risks) == "FORBIDDEN":
+        # Решение уже определено локально найденным нарушением: LLM не нужна
+        return _finish_analysis(db, order, None, persist, local_risks)
+
+    order_context = _collect_order_context(order)
+    cache_key = analysis_cache_key(
+        plan_hash or plan_content_hash(plan_data), order_context, ruleset.hash, rag_service.corpus_version()
+    )
+    result = _cached_result(cache_key)
+    if result is None:
+        result = await _request_analysis(plan_data, stored_plan, order_context, ruleset.prompt_text, local_risks)
+        # Пустой ответ (ошибка разбора JSON) не кэшируем, чтобы следующий запуск повторил запрос
+        if isinstance(result, dict) and result:
+            _store_result(cache_key, result)
+    return _finish_analysis(db, order, result, persist, local_risks)
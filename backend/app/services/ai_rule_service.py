@@ -1,41 +1,166 @@
 """Сервис для работы с правилами AI"""
 from __future__ import annotations
 
+import hashlib
+import json
+import logging
+import threading
+import time
 import uuid
+from dataclasses import dataclass
 from sqlalchemy.orm import Session
-from sqlalchemy import select, and_, or_
+from sqlalchemy import func, select, and_, or_
 
-from app.models.ai_rule import AIRule, RiskType
+from app.core.config import settings
+from app.models.ai_rule import AIRule, AIRuleTag, RiskType
 from app.schemas.ai_rule import AIRuleCreate, AIRuleUpdate
-from fastapi import HTTPException
+from app.services import plan_spatial
+from app.services.rule_expressions import Condition, PlanContext, RuleExpressionError, compile_condition, uses_language
+from fastapi import HTTPException, status
 
+logger = logging.getLogger(__name__)
 
-def list_rules(
-    db: Session,
+# Сколько правил попадает в текст промпта анализа
+PROMPT_RULES_LIMIT = 5
+
+
+@dataclass(frozen=True)
+class CompiledRule:
+    """Включенное правило в виде, не зависящем от сессии БД"""
+    id: str
+    name: str
+    trigger_condition: str
+    risk_type: str
+    description: str
+    severity: int
+    risk_zone: str | None
+    priority: int
+    tags: tuple[str, ...]
+    # Разобранное условие; None — условие задано текстом и проверяется LLM
+    condition: Condition | None = None
+
+
+@dataclass(frozen=True)
+class RuleSet:
+    """Включенные правила по убыванию приоритета, хэш их содержимого и готовый текст
+    для промпта (только правила, которые нельзя проверить локально)"""
+    version: int
+    hash: str
+    rules: tuple[CompiledRule, ...]
+    prompt_text: str
+    loaded_at: float
+
+    @property
+    def local_rules(self) -> tuple[CompiledRule, ...]:
+        return tuple(rule for rule in self.rules if rule.condition is not None)
+
+    @property
+    def residual_rules(self) -> tuple[CompiledRule, ...]:
+        return tuple(rule for rule in self.rules if rule.condition is None)
+
+
+_version = 0
+_ruleset: RuleSet | None = None
+_ruleset_lock = threading.Lock()
+
+
+def rules_version() -> int:
+    return _version
+
+
+def _bump_version() -> None:
+    global _version
+    _version += 1
+
+
+def _try_compile(text: str | None) -> Condition | None:
+    try:
+        return compile_condition(text)
+    except RuleExpressionError:
+        return None
+
+
+def _compile_rule(rule: AIRule) -> CompiledRule:
+    return CompiledRule(
+        id=str(rule.id),
+        name=rule.name or "",
+        trigger_condition=rule.trigger_condition or "",
+        risk_type=getattr(rule.risk_type, "value", rule.risk_type) or "",
+        description=rule.description or "",
+        severity=rule.severity or 1,
+        risk_zone=rule.risk_zone,
+        priority=rule.priority or 0,
+        tags=tuple(rule.tags or ()),
+        condition=_try_compile(rule.trigger_condition),
+    )
+
+
+def _format_prompt_text(rules: tuple[CompiledRule, ...]) -> str:
+    if not rules:
+        return "Правила для анализа не заданы."
+    lines = []
+    for rule in rules[:PROMPT_RULES_LIMIT]:
+        title = rule.name or "Правило"
+        description = rule.description or rule.trigger_condition
+        parts = [f"- {title}: {description}"]
+        extra = []
+        if rule.risk_type:
+            extra.append(f"тип риска {rule.risk_type}")
+        if rule.severity:
+            extra.append(f"серьезность {rule.severity}")
+        if extra:
+            parts.append(f"({', '.join(extra)})")
+        lines.append(" ".join(parts).strip())
+    return "\n".join(lines)
+
+
+def _ruleset_hash(rules: tuple[CompiledRule, ...]) -> str:
+    payload = json.dumps(
+        [[r.id, r.name, r.trigger_condition, r.risk_type, r.description, r.severity, r.risk_zone, r.priority, r.tags]
+         for r in rules],
+        ensure_ascii=False, separators=(",", ":"),
+    )
+    return hashlib.blake2b(payload.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def _load_ruleset(db: Session, version: int) -> RuleSet:
+    rules = tuple(_compile_rule(rule) for rule in list_rules(db, is_enabled=True))
+    residual = tuple(rule for rule in rules if rule.condition is None)
+    return RuleSet(version, _ruleset_hash(rules), rules, _format_prompt_text(residual), time.monotonic())
+
+
+def _is_fresh(ruleset: RuleSet | None, version: int) -> bool:
+    return (
+        ruleset is not None
+        and ruleset.version == version
+        and time.monotonic() - ruleset.loaded_at < settings.ai_ruleset_refresh_seconds
+    )
+
+
+def get_ruleset(db: Session) -> RuleSet:
+    """Включенные правила для анализа; перечитываются после изменений правил в этом
+    процессе и не реже ai_ruleset_refresh_seconds (изменения из других процессов)"""
+    global _ruleset
+    version = _version
+    ruleset = _ruleset
+    if _is_fresh(ruleset, version):
+        return ruleset
+    with _ruleset_lock:
+        if not _is_fresh(_ruleset, version):
+            _ruleset = _load_ruleset(db, version)
+        return _ruleset
+
+
+def _filter_conditions(
     risk_type: RiskType | None = None,
     is_enabled: bool | None = None,
-    tags: list[str] | None = None,
     search: str | None = None,
-) -> list[AIRule]:
-    """Получить список правил с фильтрами"""
-    query = select(AIRule)
-    
+) -> list:
     conditions = []
-    
     if risk_type:
         conditions.append(AIRule.risk_type == risk_type)
-    
     if is_enabled is not None:
         conditions.append(AIRule.is_enabled == is_enabled)
-    
-    if tags:
-        # Фильтр по тегам: правило должно содержать хотя бы один из указанных тегов
-        tag_conditions = []
-        for tag in tags:
-            tag_conditions.append(AIRule.tags.contains([tag]))
-        if tag_conditions:
-            conditions.append(or_(*tag_conditions))
-    
     if search:
         search_pattern = f"%{search}%"
         conditions.append(
@@ -44,6 +169,25 @@ def list_rules(
                 AIRule.description.ilike(search_pattern),
             )
         )
+    return conditions
+
+
+def list_rules(
+    db: Session,
+    risk_type: RiskType | None = None,
+    is_enabled: bool | None = None,
+    tags: list[str] | None = None,
+    search: str | None = None,
+) -> list[AIRule]:
+    """Получить список правил с фильтрами"""
+    query = select(AIRule)
+    
+    conditions = _filter_conditions(risk_type, is_enabled, search)
+    
+    if tags:
+        # Фильтр по тегам: правило должно содержать хотя бы один из указанных тегов
+        # (по индексу ai_rule_tags (tag, rule_id), без разбора JSON-колонки)
+        conditions.append(AIRule.id.in_(select(AIRuleTag.rule_id).where(AIRuleTag.tag.in_(tags))))
     
     if conditions:
         query = query.where(and_(*conditions))
@@ -53,13 +197,42 @@ def list_rules(
     return list(db.scalars(query).all())
 
 
+def tag_facets(
+    db: Session,
+    risk_type: RiskType | None = None,
+    is_enabled: bool | None = None,
+    search: str | None = None,
+) -> list[tuple[str, int]]:
+    """Число правил по каждому тегу (с теми же фильтрами, что у списка), частые первыми"""
+    count = func.count(AIRuleTag.rule_id)
+    query = select(AIRuleTag.tag, count).group_by(AIRuleTag.tag).order_by(count.desc(), AIRuleTag.tag)
+    conditions = _filter_conditions(risk_type, is_enabled, search)
+    if conditions:
+        query = query.join(AIRule, AIRule.id == AIRuleTag.rule_id).where(and_(*conditions))
+    return [(tag, total) for tag, total in db.execute(query)]
+
+
 def get_rule(db: Session, rule_id: uuid.UUID) -> AIRule | None:
     """Получить правило по ID"""
     return db.get(AIRule, rule_id)
 
 
+def validate_trigger_condition(text: str | None) -> None:
+    """Выражение языка условий должно разбираться; свободный текст остается описанием для LLM"""
+    if not uses_language(text):
+        return
+    try:
+        compile_condition(text)
+    except RuleExpressionError as exc:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"Invalid trigger condition: {exc}",
+        ) from exc
+
+
 def create_rule(db: Session, data: AIRuleCreate) -> AIRule:
     """Создать новое правило"""
+    validate_trigger_condition(data.trigger_condition)
     rule = AIRule(
         name=data.name,
         trigger_condition=data.trigger_condition,
@@ -69,10 +242,11 @@ def create_rule(db: Session, data: AIRuleCreate) -> AIRule:
         risk_zone=data.risk_zone,
         is_enabled=data.is_enabled,
         priority=data.priority,
-        tags=data.tags or [],
     )
+    rule.set_tags(data.tags)
     db.add(rule)
     db.commit()
+    _bump_version()
     db.refresh(rule)
     return rule
 
@@ -82,6 +256,7 @@ def update_rule(db: Session, rule: AIRule, data: AIRuleUpdate) -> AIRule:
     if data.name is not None:
         rule.name = data.name
     if data.trigger_condition is not None:
+        validate_trigger_condition(data.trigger_condition)
         rule.trigger_condition = data.trigger_condition
     if data.risk_type is not None:
         rule.risk_type = data.risk_type
@@ -96,10 +271,11 @@ def update_rule(db: Session, rule: AIRule, data: AIRuleUpdate) -> AIRule:
     if data.priority is not None:
         rule.priority = data.priority
     if data.tags is not None:
-        rule.tags = data.tags
+        rule.set_tags(data.tags)
     
     db.add(rule)
     db.commit()
+    _bump_version()
     db.refresh(rule)
     return rule
 
@@ -108,6 +284,7 @@ def delete_rule(db: Session, rule: AIRule) -> None:
     """Удалить правило"""
     db.delete(rule)
     db.commit()
+    _bump_version()
 
 
 def batch_update_rules(
@@ -128,41 +305,61 @@ def batch_update_rules(
             rule.is_enabled = False
             updated_count += 1
         elif action == "add_tags" and tags:
-            existing_tags = rule.tags or []
-            for tag in tags:
-                if tag not in existing_tags:
-                    existing_tags.append(tag)
-            rule.tags = existing_tags
+            rule.set_tags([*(rule.tags or []), *tags])
             updated_count += 1
         elif action == "remove_tags" and tags:
-            existing_tags = rule.tags or []
-            rule.tags = [t for t in existing_tags if t not in tags]
+            rule.set_tags([t for t in rule.tags or [] if t not in tags])
             updated_count += 1
     
     if updated_count > 0:
         db.commit()
+        _bump_version()
     
     return updated_count
 
 
 def preview_rule_response(rule: AIRule, test_scenario: dict) -> dict:
-    """Предпросмотр ответа AI на основе правила (заглушка)"""
-    # В реальной реализации здесь должна быть логика проверки условия правила
-    # и формирования ответа AI. Пока возвращаем заглушку.
-    would_trigger = True  # Упрощенная логика
-    
+    """Предпросмотр срабатывания правила.
+
+    Условие на языке условий проверяется по плану из test_scenario["plan"];
+    текстовое условие проверяет только LLM, поэтому для него срабатывание
+    предполагается.
+    """
+    risk = {
+        "type": rule.risk_type.value,
+        "description": rule.description,
+        "severity": rule.severity,
+        "zone": rule.risk_zone,
+    }
     preview = {
         "ruleId": str(rule.id),
         "ruleName": rule.name,
-        "risk": {
-            "type": rule.risk_type.value,
-            "description": rule.description,
-            "severity": rule.severity,
-            "zone": rule.risk_zone,
-        },
-        "wouldTrigger": would_trigger,
+        "risk": risk,
+        "wouldTrigger": True,
+        "evaluation": "llm",
         "testScenario": test_scenario,
     }
-    
-    return preview
+    try:
+        condition = compile_condition(rule.trigger_condition)
+    except RuleExpressionError as exc:
+        preview["expressionError"] = str(exc)
+        return preview
 
+    preview["evaluation"] = "local"
+    plan = test_scenario.get("plan") if isinstance(test_scenario, dict) else None
+    if not isinstance(plan, dict):
+        preview["wouldTrigger"] = False
+        preview["expressionError"] = "testScenario.plan is required to evaluate the condition"
+        return preview
+    try:
+        triggered, element_ids = condition.matches(PlanContext(plan_spatial.PlanSpatialIndex(plan)))
+    except Exception as exc:
+        logger.exception("AI rule %s failed on the preview plan", rule.id)
+        preview["wouldTrigger"] = False
+        preview["expressionError"] = f"evaluation failed: {exc}"
+        return preview
+    preview["wouldTrigger"] = triggered
+    preview["matchedElements"] = element_ids
+    if element_ids and not rule.risk_zone:
+        risk["zone"] = element_ids[0]
+    return preview
@@ -0,0 +1,107 @@
+"""Промпт чата с ограничением по токенам.
+
+Токены оцениваются без токенизатора модели (estimate_tokens): оценка
+намеренно с запасом, чтобы промпт не выходил за бюджет и на русском тексте.
+Разделы промпта обрезаются по своим лимитам, а история добавляется от новых
+сообщений к старым, пока хватает бюджета.
+"""
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass
+
+# Слово или отдельный знак: токенизаторы моделей режут так же, но длинные слова — на части
+_TOKEN = re.compile(r"\w+|[^\w\s]", re.UNICODE)
+_ASCII_CHARS_PER_TOKEN = 4
+_OTHER_CHARS_PER_TOKEN = 3
+# Токен не короче символа: дальше этого префикса текст лимита точно не уместится
+_MAX_CHARS_PER_TOKEN = 6
+ELLIPSIS = " …"
+
+
+def _word_tokens(word: str) -> int:
+    per_token = _ASCII_CHARS_PER_TOKEN if word.isascii() else _OTHER_CHARS_PER_TOKEN
+    return -(-len(word) // per_token)
+
+
+def estimate_tokens(text: str) -> int:
+    """Приблизительное число токенов текста"""
+    return sum(_word_tokens(match.group()) for match in _TOKEN.finditer(text or ""))
+
+
+def truncate_tokens(text: str, max_tokens: int) -> str:
+    """Начало текста не длиннее max_tokens (с многоточием, если текст обрезан)"""
+    text = text or ""
+    if max_tokens <= 0:
+        return ""
+    total = 0
+    for match in _TOKEN.finditer(text, 0, max_tokens * _MAX_CHARS_PER_TOKEN + 1):
+        total += _word_tokens(match.group())
+        if total > max_tokens:
+            return text[:match.start()].rstrip() + ELLIPSIS
+    if len(text) > max_tokens * _MAX_CHARS_PER_TOKEN:
+        return text[:max_tokens * _MAX_CHARS_PER_TOKEN].rstrip() + ELLIPSIS
+    return text
+
+
+def tail_tokens(text: str, max_tokens: int) -> str:
+    """Конец текста не длиннее max_tokens, по целым строкам (для свертки сводки)"""
+    lines = (text or "").splitlines()
+    kept: list[str] = []
+    total = 0
+    for line in reversed(lines):
+        total += estimate_tokens(line) + 1
+        if total > max_tokens:
+            break
+        kept.append(line)
+    return "\n".join(reversed(kept))
+
+
+@dataclass(frozen=True)
+class HistoryMessage:
+    role: str
+    text: str
+
+
+def format_message(message: HistoryMessage, max_tokens: int) -> str:
+    return f"{message.role}: {truncate_tokens(message.text, max_tokens)}"
+
+
+@dataclass(frozen=True)
+class Section:
+    title: str
+    text: str
+    max_tokens: int
+
+
+def build_prompt(
+    sections: list[Section],
+    summary: str | None,
+    history: list[HistoryMessage],
+    message: str,
+    instruction: str,
+    budget: int,
+    message_max_tokens: int,
+) -> str:
+    """Собрать промпт в пределах budget токенов.
+
+    Разделы контекста, сводка и новое сообщение обрезаются по своим лимитам;
+    остаток бюджета заполняется историей от последних сообщений к ранним.
+    """
+    head = [f"{section.title}:\n{truncate_tokens(section.text, section.max_tokens)}" for section in sections if section.text]
+    if summary:
+        head.append(f"Краткое содержание ранней переписки:\n{summary}")
+    tail = [f"Новое сообщение пользователя:\n{truncate_tokens(message, message_max_tokens)}", instruction]
+    used = sum(estimate_tokens(part) for part in (*head, *tail))
+
+    lines: list[str] = []
+    remaining = budget - used - estimate_tokens("История чата:")
+    for item in reversed(history):
+        line = format_message(item, message_max_tokens)
+        cost = estimate_tokens(line)
+        if cost > remaining:
+            break
+        lines.append(line)
+        remaining -= cost
+    history_text = "\n".join(reversed(lines)) if lines else "История пуста."
+    return "\n\n".join([*head, "История чата:\n" + history_text, *tail])
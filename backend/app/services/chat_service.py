@@ -12,8 +12,12 @@ from app.models.order import ExecutorAssignment, Order, OrderChatMessage
 from app.models.user import User
 from app.schemas.chat import CreateChatRequest
 from app.schemas.orders import ChatMessageCreate
+from app.services.chat_prompt import HistoryMessage, Section, build_prompt, format_message, tail_tokens, truncate_tokens
 from app.services.gemini_client import generate_text
 from app.services.plan_description import summarize_plan
+from app.services.rag_service import regulations_context
+
+logger = logging.getLogger(__name__)
 
 
 def get_chat(db: Session, chat_id: uuid.UUID) -> ChatThread | None:
@@ -94,11 +98,62 @@ def add_message(
     return msg
 
 
+def recent_messages(db: Session, chat: ChatThread, limit: int) -> list[OrderChatMessage]:
+    """Последние limit сообщений чата, еще не свернутых в сводку, по времени"""
+    query = select(OrderChatMessage).where(OrderChatMessage.chat_id == chat.id)
+    if chat.summary_until is not None:
+        query = query.where(OrderChatMessage.created_at > chat.summary_until)
+    messages = list(db.scalars(query.order_by(OrderChatMessage.created_at.desc()).limit(limit)))
+    messages.reverse()
+    return messages
+
+
+def _history_message(msg: OrderChatMessage) -> HistoryMessage:
+    role = "Клиент" if msg.sender_type in ["CLIENT", "EXECUTOR"] else "Ассистент"
+    return HistoryMessage(role, msg.message_text or "")
+
+
+# Сколько токенов сообщения попадает в сводку, если модель недоступна
+_FALLBACK_SUMMARY_LINE_TOKENS = 60
+
+
+async def fold_history(db: Session, chat: ChatThread, messages: list[OrderChatMessage]) -> None:
+    """Добавить сообщения к сводке чата (сводку пишет модель, при ошибке — начала сообщений)"""
+    limit = settings.chat_summary_max_tokens
+    history = [_history_message(msg) for msg in messages]
+    lines = "\n".join(format_message(item, settings.chat_message_max_tokens) for item in history)
+    summary = ""
+    try:
+        summary = await generate_text(
+            system="Ты ведешь краткое содержание переписки клиента с помощником инженера БТИ.",
+            prompt=(
+                f"Текущее краткое содержание:\n{chat.history_summary or 'нет'}\n\n"
+                f"Новые сообщения:\n{lines}\n\n"
+                f"Обнови краткое содержание с учетом новых сообщений: факты, решения и открытые вопросы, "
+                f"не длиннее {max(limit // 3, 20)} слов. Ответь только текстом содержания."
+            ),
+            temperature=0.2,
+        )
+    except Exception as exc:
+        logger.error("AI chat summary error: %s", exc)
+    summary = truncate_tokens(summary.strip(), limit)
+    if not summary:
+        brief = "\n".join(format_message(item, _FALLBACK_SUMMARY_LINE_TOKENS) for item in history)
+        summary = tail_tokens("\n".join(filter(None, [chat.history_summary, brief])), limit)
+    chat.history_summary = summary
+    chat.summary_until = messages[-1].created_at
+    db.add(chat)
+    db.commit()
+
+
 async def delegate_to_ai(db: Session, chat: ChatThread, user_message: ChatMessageCreate) -> OrderChatMessage | None:
-    """Delegate a chat message to Gemini using a minimal prompt."""
-    from app.services import order_service
+    """Delegate a chat message to Gemini with a token-bounded prompt.
 
-    logger = logging.getLogger(__name__)
+    Берутся только последние сообщения (LIMIT); вышедшие из окна
+    chat_max_history копятся и порциями по chat_summary_batch сворачиваются в
+    сводку чата, так что размер промпта и работа с БД на ответ ограничены.
+    """
+    from app.services import order_service
 
     order_context_lines: list[str] = []
     plan_summary = None
@@ -116,18 +171,20 @@ async def delegate_to_ai(db: Session, chat: ChatThread, user_message: ChatMessag
             if order.house_type_code:
                 order_context_lines.append(f"Тип дома: {order.house_type_code}")
 
-            versions = order_service.get_plan_versions(db, order.id)
-            if versions:
-                plan_summary = summarize_plan(versions[-1].plan)
-
-    history = list_chat_messages(db, chat)
-    history_limit = settings.chat_max_history or 10
-    last_messages = history[-history_limit:] if history_limit > 0 else []
-    history_lines = []
-    for msg in last_messages:
-        role = "Клиент" if msg.sender_type in ["CLIENT", "EXECUTOR"] else "Ассистент"
-        history_lines.append(f"{role}: {msg.message_text}")
-    history_text = "\n".join(history_lines) if history_lines else "История пуста."
+            latest = order_service.get_latest_plan_version(db, order.id)
+            if latest:
+                plan_summary = summarize_plan(latest.plan)
+
+    window = settings.chat_max_history or 10
+    batch = max(settings.chat_summary_batch, 1)
+    messages = recent_messages(db, chat, window + batch + 1) if window > 0 else []
+    # Новое сообщение уже сохранено вызывающим кодом и идет в промпт отдельно
+    if messages and messages[-1].sender_type != "AI" and messages[-1].message_text == user_message.message:
+        messages.pop()
+    pending = messages[:max(len(messages) - window, 0)]
+    if len(pending) >= batch:
+        await fold_history(db, chat, pending)
+        messages = messages[len(pending):]
 
     system_prompt = (
         "Ты помощник инженера БТИ. "
@@ -135,15 +192,22 @@ async def delegate_to_ai(db: Session, chat: ChatThread, user_message: ChatMessag
         "Если данных не хватает, уточняй вопросы."
     )
 
-    prompt_parts = []
-    if order_context_lines:
-        prompt_parts.append("Контекст заказа:\n" + "\n".join(order_context_lines))
-    if plan_summary:
-        prompt_parts.append("Описание плана:\n" + plan_summary)
-    prompt_parts.append("История чата:\n" + history_text)
-    prompt_parts.append(f"Новое сообщение пользователя:\n{user_message.message}")
-    prompt_parts.append("Сформулируй ответ ассистента.")
-    prompt = "\n\n".join(prompt_parts)
+    regulations = await regulations_context(user_message.message)
+
+    budget = settings.chat_prompt_max_tokens
+    prompt = build_prompt(
+        sections=[
+            Section("Контекст заказа", "\n".join(order_context_lines), budget // 10),
+            Section("Описание плана", plan_summary or "", budget // 6),
+            Section("Выдержки из нормативных документов", regulations, budget // 4),
+        ],
+        summary=chat.history_summary if window > 0 else None,
+        history=[_history_message(msg) for msg in messages],
+        message=user_message.message,
+        instruction="Сформулируй ответ ассистента.",
+        budget=budget,
+        message_max_tokens=settings.chat_message_max_tokens,
+    )
 
     fallback_text = "Сервис помощника временно недоступен. Попробуйте позже."
     ai_text = fallback_text
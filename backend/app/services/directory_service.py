@@ -11,6 +11,23 @@ from app.schemas.directory import (
     HouseTypeUpdate,
 )
 
+# Номера версий справочников: меняются при каждой записи в этом процессе.
+# По ним калькулятор цены и кэш ответов API понимают, что данные устарели
+_versions = {"departments": 0, "districts": 0, "house_types": 0}
+
+
+def directory_version(name: str) -> int:
+    return _versions[name]
+
+
+def coefficients_version() -> int:
+    """Версия коэффициентов районов и типов домов"""
+    return _versions["districts"] + _versions["house_types"]
+
+
+def _bump_version(name: str) -> None:
+    _versions[name] += 1
+
 
 def upsert_department(db: Session, data: DepartmentCreate | DepartmentUpdate, code: str | None = None) -> Department:
     dept_code = code or getattr(data, "code", None)
@@ -24,6 +41,7 @@ def upsert_department(db: Session, data: DepartmentCreate | DepartmentUpdate, co
             department.description = data.description
     db.add(department)
     db.commit()
+    _bump_version("departments")
     db.refresh(department)
     return department
 
@@ -43,6 +61,7 @@ def upsert_district(db: Session, data: DistrictCreate | DistrictUpdate, code: st
         district.price_coef = data.price_coef
     db.add(district)
     db.commit()
+    _bump_version("districts")
     db.refresh(district)
     return district
 
@@ -69,6 +88,7 @@ def upsert_house_type(db: Session, data: HouseTypeCreate | HouseTypeUpdate, code
         house_type.price_coef = data.price_coef
     db.add(house_type)
     db.commit()
+    _bump_version("house_types")
     db.refresh(house_type)
     return house_type
 
@@ -0,0 +1,130 @@
+"""Обработчики фоновых задач. Импортируется воркером для регистрации."""
+from __future__ import annotations
+
+import uuid
+from pathlib import Path
+
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+
+from app.models.job import Job
+from app.models.order import Order, OrderFile
+from app.models.user import User
+from app.schemas.orders import ChatMessageCreate, ParsePlanResultRequest
+from app.services import (
+    ai_analysis_service,
+    chat_service,
+    job_service,
+    order_service,
+    plan_recognition_service,
+    rag_service,
+    repricing_service,
+)
+from app.services.job_service import PermanentJobError, register_handler
+
+AI_ANALYSIS = "ai_analysis"
+CHAT_AI_REPLY = "chat_ai_reply"
+PLAN_RECOGNITION = "plan_recognition"
+REPRICE_ORDERS = "reprice_orders"
+RAG_COMPACT = "rag_compact"
+
+
+def _get_order(db: Session, job: Job) -> Order:
+    order = db.get(Order, job.order_id) if job.order_id else None
+    if not order:
+        raise PermanentJobError("Order not found")
+    return order
+
+
+@register_handler(AI_ANALYSIS)
+async def handle_ai_analysis(db: Session, job: Job) -> dict:
+    order = _get_order(db, job)
+    analysis = await ai_analysis_service.build_ai_analysis(db, order, persist=True)
+    return analysis.model_dump(mode="json", by_alias=True)
+
+
+@register_handler(CHAT_AI_REPLY)
+async def handle_chat_ai_reply(db: Session, job: Job) -> dict:
+    payload = job.payload or {}
+    chat = chat_service.get_chat(db, uuid.UUID(payload["chatId"]))
+    if not chat:
+        raise PermanentJobError("Chat not found")
+    message = ChatMessageCreate(message=payload.get("message") or "")
+    ai_msg = await chat_service.delegate_to_ai(db, chat, message)
+    return {"chatId": str(chat.id), "messageId": str(ai_msg.id) if ai_msg else None}
+
+
+def enqueue_chat_ai_reply(db: Session, chat, user: User, text: str) -> Job:
+    """Поставить в очередь ответ ассистента на сообщение чата (REST и WebSocket)"""
+    return job_service.enqueue(
+        db,
+        CHAT_AI_REPLY,
+        payload={"chatId": str(chat.id), "message": text},
+        order_id=chat.order_id,
+        created_by_id=user.id,
+    )
+
+
+@register_handler(PLAN_RECOGNITION)
+async def handle_plan_recognition(db: Session, job: Job) -> dict:
+    order = _get_order(db, job)
+    payload = job.payload or {}
+    file = db.get(OrderFile, uuid.UUID(payload["fileId"]))
+    if not file or file.order_id != order.id:
+        raise PermanentJobError("File not found for this order")
+
+    existing_versions = order_service.get_plan_versions(db, order.id)
+    has_original = any(v.version_type.upper() == "ORIGINAL" for v in existing_versions)
+    version_type = "MODIFIED" if has_original else "ORIGINAL"
+
+    # Демонстрационные файлы сопоставляются с готовыми шаблонами, остальные распознаются по изображению
+    template = plan_recognition_service.get_template_by_filename(file.filename)
+    if template:
+        result = ParsePlanResultRequest(fileId=file.id, plan=template.plan, confidence=1.0, processingTimeMs=0)
+    else:
+        image_path = Path(settings.static_root) / "orders" / str(order.id) / file.filename
+        if not image_path.is_file():
+            raise PermanentJobError("Uploaded file is missing on disk")
+        try:
+            recognized = await plan_recognition_service.recognize_image(image_path)
+        except plan_recognition_service.RecognitionTimeoutError as exc:
+            raise PermanentJobError(str(exc)) from exc
+        except OSError as exc:
+            # Pillow не смог прочитать файл: это не изображение
+            raise PermanentJobError(f"Cannot read image: {exc}") from exc
+        result = ParsePlanResultRequest(
+            fileId=file.id,
+            plan=recognized.plan,
+            confidence=recognized.confidence,
+            errors=recognized.errors,
+            processingTimeMs=recognized.processing_time_ms,
+        )
+
+    created_by = db.get(User, job.created_by_id) if job.created_by_id else None
+    version = order_service.save_parse_result(db, order, result, created_by=created_by, version_type=version_type)
+    return {
+        "versionId": str(version.id),
+        "versionType": version.version_type,
+        "confidence": result.confidence,
+        "processingTimeMs": result.processing_time_ms,
+        "errors": result.errors,
+    }
+
+
+@register_handler(REPRICE_ORDERS)
+def handle_reprice_orders(db: Session, job: Job) -> dict:
+    payload = job.payload or {}
+    return repricing_service.reprice_orders(
+        db,
+        district_codes=payload.get("districtCodes"),
+        house_type_codes=payload.get("houseTypeCodes"),
+        dry_run=bool(payload.get("dryRun")),
+        on_progress=lambda progress: job_service.report_progress(db, job, progress),
+    )
+
+
+@register_handler(RAG_COMPACT)
+def handle_rag_compact(db: Session, job: Job) -> dict:
+    path = rag_service.compact_index()
+    return {"build": path.name if path else None}
@@ -0,0 +1,266 @@
+"""Очередь фоновых задач в БД.
+
+Задачи хранятся в таблице ``jobs``. Воркер (``python -m app.worker``) забирает их
+по одной: на PostgreSQL через ``SELECT ... FOR UPDATE SKIP LOCKED``, на SQLite —
+внутри ``BEGIN IMMEDIATE``, который берет блокировку записи на время захвата.
+Пока задача выполняется, воркер продлевает ее аренду (``locked_at``); задача с
+истекшей арендой возвращается в очередь, а если попытки кончились — проваливается.
+Итог записывает только воркер, который все еще держит аренду. Упавшие задачи
+перезапускаются с экспоненциальной задержкой.
+"""
+from __future__ import annotations
+
+import asyncio
+import inspect
+import logging
+import random
+import uuid
+from collections.abc import Awaitable, Callable
+from datetime import datetime, timedelta
+from typing import Any
+
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.job import Job, JobStatus
+
+logger = logging.getLogger(__name__)
+
+JobHandler = Callable[[Session, Job], dict | None | Awaitable[dict | None]]
+
+_HANDLERS: dict[str, JobHandler] = {}
+
+
+class PermanentJobError(Exception):
+    """Ошибка, повтор которой не имеет смысла: задача сразу помечается FAILED"""
+
+
+def register_handler(kind: str) -> Callable[[JobHandler], JobHandler]:
+    """Декоратор регистрации обработчика задач заданного типа"""
+    def decorator(func: JobHandler) -> JobHandler:
+        _HANDLERS[kind] = func
+        return func
+    return decorator
+
+
+def get_handler(kind: str) -> JobHandler | None:
+    return _HANDLERS.get(kind)
+
+
+def enqueue(
+    db: Session,
+    kind: str,
+    payload: dict[str, Any] | None = None,
+    order_id: uuid.UUID | None = None,
+    created_by_id: uuid.UUID | None = None,
+    max_attempts: int | None = None,
+) -> Job:
+    """Поставить задачу в очередь"""
+    job = Job(
+        kind=kind,
+        status=JobStatus.QUEUED,
+        payload=payload or {},
+        order_id=order_id,
+        created_by_id=created_by_id,
+        max_attempts=max_attempts or settings.job_max_attempts,
+        run_after=datetime.utcnow(),
+    )
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    return job
+
+
+def get_job(db: Session, job_id: uuid.UUID) -> Job | None:
+    return db.get(Job, job_id)
+
+
+def get_active_job(db: Session, kind: str, order_id: uuid.UUID | None) -> Job | None:
+    """Незавершенная задача данного типа по заказу (чтобы не ставить дубликат)"""
+    return db.scalar(
+        select(Job)
+        .where(
+            Job.kind == kind,
+            Job.order_id == order_id,
+            Job.status.in_([JobStatus.QUEUED, JobStatus.RUNNING]),
+        )
+        .order_by(Job.created_at.desc())
+        .limit(1)
+    )
+
+
+def get_latest_succeeded_job(db: Session, kind: str, order_id: uuid.UUID) -> Job | None:
+    return db.scalar(
+        select(Job)
+        .where(
+            Job.kind == kind,
+            Job.order_id == order_id,
+            Job.status == JobStatus.SUCCEEDED,
+        )
+        .order_by(Job.finished_at.desc())
+        .limit(1)
+    )
+
+
+def _claimable_query(now: datetime, kinds: list[str] | None):
+    query = (
+        select(Job)
+        .where(Job.status == JobStatus.QUEUED, Job.run_after <= now)
+        .order_by(Job.run_after, Job.created_at)
+        .limit(1)
+    )
+    if kinds:
+        query = query.where(Job.kind.in_(kinds))
+    return query
+
+
+def claim_next(db: Session, worker_id: str, kinds: list[str] | None = None) -> Job | None:
+    """Атомарно захватить следующую готовую к запуску задачу"""
+    now = datetime.utcnow()
+    dialect = db.get_bind().dialect.name
+
+    if dialect == "sqlite":
+        # Завершаем возможную открытую транзакцию, чтобы BEGIN IMMEDIATE был первым
+        db.commit()
+        db.connection().exec_driver_sql("BEGIN IMMEDIATE")
+        job = db.scalar(_claimable_query(now, kinds))
+    else:
+        job = db.scalar(_claimable_query(now, kinds).with_for_update(skip_locked=True))
+
+    if job is None:
+        db.rollback()
+        return None
+
+    job.status = JobStatus.RUNNING
+    job.attempts = (job.attempts or 0) + 1
+    job.locked_by = worker_id
+    job.locked_at = now
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    return job
+
+
+def report_progress(db: Session, job: Job, progress: dict) -> None:
+    """Сохранить ход выполнения длинной задачи"""
+    job.progress = progress
+    db.add(job)
+    db.commit()
+
+
+def renew_lease(db: Session, job_id: uuid.UUID, owner: str) -> bool:
+    """Продлить аренду задачи; False, если задачу уже забрали у этого воркера"""
+    result = db.execute(
+        update(Job)
+        .where(Job.id == job_id, Job.status == JobStatus.RUNNING, Job.locked_by == owner)
+        .values(locked_at=datetime.utcnow())
+    )
+    db.commit()
+    return bool(result.rowcount)
+
+
+def retry_delay(attempts: int) -> timedelta:
+    """Экспоненциальная задержка перед повтором с небольшим джиттером"""
+    base = settings.job_retry_base_seconds * (2 ** max(attempts - 1, 0))
+    delay = min(base, settings.job_retry_max_seconds)
+    return timedelta(seconds=delay * (1 + random.random() * 0.1))
+
+
+def _release(db: Session, job: Job, owner: str, **values) -> Job:
+    """Записать итог задачи, только если ее аренда все еще у воркера owner"""
+    result = db.execute(
+        update(Job)
+        .where(Job.id == job.id, Job.status == JobStatus.RUNNING, Job.locked_by == owner)
+        .values(locked_by=None, locked_at=None, **values)
+    )
+    db.commit()
+    if not result.rowcount:
+        logger.warning("Job %s (%s): lease of worker %s was lost, result discarded", job.id, job.kind, owner)
+    db.refresh(job)
+    return job
+
+
+def complete_job(db: Session, job: Job, result: dict | None, owner: str) -> Job:
+    return _release(
+        db, job, owner, status=JobStatus.SUCCEEDED, result=result, error=None, finished_at=datetime.utcnow()
+    )
+
+
+def fail_job(db: Session, job: Job, error: str, owner: str, permanent: bool = False) -> Job:
+    """Зафиксировать ошибку: повторить позже или окончательно провалить задачу"""
+    if not permanent and job.attempts < job.max_attempts:
+        return _release(
+            db, job, owner, status=JobStatus.QUEUED, error=error,
+            run_after=datetime.utcnow() + retry_delay(job.attempts),
+        )
+    return _release(db, job, owner, status=JobStatus.FAILED, error=error, finished_at=datetime.utcnow())
+
+
+def requeue_stale_jobs(db: Session) -> int:
+    """Вернуть в очередь задачи, чей воркер пропал (перезапуск, падение процесса).
+
+    Задача, у которой кончились попытки, не перезапускается, а проваливается.
+    """
+    now = datetime.utcnow()
+    stale = (Job.status == JobStatus.RUNNING, Job.locked_at < now - timedelta(seconds=settings.job_lease_seconds))
+    failed = db.execute(
+        update(Job)
+        .where(*stale, Job.attempts >= Job.max_attempts)
+        .values(
+            status=JobStatus.FAILED, locked_by=None, locked_at=None, finished_at=now,
+            error="Worker lease expired, no attempts left",
+        )
+    ).rowcount
+    requeued = db.execute(
+        update(Job)
+        .where(*stale)
+        .values(status=JobStatus.QUEUED, locked_by=None, locked_at=None, run_after=now)
+    ).rowcount
+    db.commit()
+    if failed:
+        logger.warning("Failed %s job(s) whose lease expired on the last attempt", failed)
+    return (failed or 0) + (requeued or 0)
+
+
+def _renew_in_session(bind, job_id: uuid.UUID, owner: str) -> bool:
+    # Отдельная сессия: основную занимает обработчик задачи
+    with Session(bind=bind) as db:
+        return renew_lease(db, job_id, owner)
+
+
+async def _keep_lease(bind, job_id: uuid.UUID, owner: str) -> None:
+    """Продлевать аренду, пока задача выполняется"""
+    while True:
+        await asyncio.sleep(settings.job_heartbeat_seconds)
+        if not await asyncio.to_thread(_renew_in_session, bind, job_id, owner):
+            logger.warning("Job %s: lease of worker %s was taken over", job_id, owner)
+            return
+
+
+async def run_job(db: Session, job: Job) -> Job:
+    """Выполнить захваченную задачу ее обработчиком.
+
+    Синхронные обработчики выполняются в потоке, чтобы не блокировать цикл
+    событий воркера (и продление аренды).
+    """
+    owner = job.locked_by
+    handler = get_handler(job.kind)
+    if handler is None:
+        return fail_job(db, job, f"No handler registered for job kind '{job.kind}'", owner, permanent=True)
+    lease = asyncio.create_task(_keep_lease(db.get_bind(), job.id, owner))
+    try:
+        if inspect.iscoroutinefunction(handler):
+            result = await handler(db, job)
+        else:
+            result = await asyncio.to_thread(handler, db, job)
+    except PermanentJobError as exc:
+        db.rollback()
+        return fail_job(db, job, str(exc), owner, permanent=True)
+    except Exception as exc:
+        logger.exception("Job %s (%s) failed on attempt %s", job.id, job.kind, job.attempts)
+        db.rollback()
+        return fail_job(db, job, f"{type(exc).__name__}: {exc}", owner)
+    finally:
+        lease.cancel()
+    return complete_job(db, job, result, owner)
@@ -0,0 +1,172 @@
+"""Минимальная реализация JSON Patch (RFC 6902): операции add, remove, replace.
+
+Используется для хранения истории планов дельтами. Списки элементов с полем
+``id`` сравниваются по последовательности id (difflib), поэтому вставка или
+удаление одной стены дает одну операцию, а не сдвиг всего хвоста списка.
+"""
+from __future__ import annotations
+
+import copy
+import difflib
+from typing import Any
+
+
+class JsonPatchError(ValueError):
+    """Патч не применим к документу"""
+
+
+def _escape(token: str | int) -> str:
+    return str(token).replace("~", "~0").replace("/", "~1")
+
+
+def _unescape(token: str) -> str:
+    return token.replace("~1", "/").replace("~0", "~")
+
+
+def _keyed(items: list) -> list | None:
+    """Последовательность id, если все элементы списка — объекты с id"""
+    ids = []
+    for item in items:
+        if not isinstance(item, dict) or "id" not in item:
+            return None
+        ids.append(item["id"])
+    return ids
+
+
+def _diff(src: Any, dst: Any, path: str, ops: list[dict]) -> None:
+    if type(src) is not type(dst):
+        ops.append({"op": "replace", "path": path, "value": copy.deepcopy(dst)})
+        return
+    if isinstance(src, dict):
+        for key in src:
+            if key not in dst:
+                ops.append({"op": "remove", "path": f"{path}/{_escape(key)}"})
+        for key, value in dst.items():
+            child = f"{path}/{_escape(key)}"
+            if key not in src:
+                ops.append({"op": "add", "path": child, "value": copy.deepcopy(value)})
+            elif src[key] != value:
+                _diff(src[key], value, child, ops)
+        return
+    if isinstance(src, list):
+        _diff_list(src, dst, path, ops)
+        return
+    if src != dst:
+        ops.append({"op": "replace", "path": path, "value": copy.deepcopy(dst)})
+
+
+def _diff_list(src: list, dst: list, path: str, ops: list[dict]) -> None:
+    src_ids, dst_ids = _keyed(src), _keyed(dst)
+    if src_ids is None or dst_ids is None:
+        # Списки без id (координаты и т.п.): поэлементно, хвост добавляется/удаляется
+        if len(src) != len(dst) and (len(src) < 8 or len(dst) < 8):
+            ops.append({"op": "replace", "path": path, "value": copy.deepcopy(dst)})
+            return
+        common = min(len(src), len(dst))
+        for idx in range(len(src) - 1, common - 1, -1):
+            ops.append({"op": "remove", "path": f"{path}/{idx}"})
+        for idx in range(common):
+            if src[idx] != dst[idx]:
+                _diff(src[idx], dst[idx], f"{path}/{idx}", ops)
+        for idx in range(common, len(dst)):
+            ops.append({"op": "add", "path": f"{path}/{idx}", "value": copy.deepcopy(dst[idx])})
+        return
+
+    matcher = difflib.SequenceMatcher(a=src_ids, b=dst_ids, autojunk=False)
+    # С конца списка: индексы в начале остаются верными при применении по порядку
+    for tag, i1, i2, j1, j2 in reversed(matcher.get_opcodes()):
+        if tag == "equal":
+            for k in range(i2 - i1 - 1, -1, -1):
+                if src[i1 + k] != dst[j1 + k]:
+                    _diff(src[i1 + k], dst[j1 + k], f"{path}/{i1 + k}", ops)
+            continue
+        for idx in range(i2 - 1, i1 - 1, -1):
+            ops.append({"op": "remove", "path": f"{path}/{idx}"})
+        for offset, idx in enumerate(range(j1, j2)):
+            ops.append({"op": "add", "path": f"{path}/{i1 + offset}", "value": copy.deepcopy(dst[idx])})
+
+
+def make_patch(src: Any, dst: Any) -> list[dict]:
+    """Построить патч, переводящий src в dst"""
+    ops: list[dict] = []
+    _diff(src, dst, "", ops)
+    return ops
+
+
+def _resolve(doc: Any, tokens: list[str]) -> Any:
+    target = doc
+    for token in tokens:
+        if isinstance(target, list):
+            try:
+                target = target[int(token)]
+            except (ValueError, IndexError) as exc:
+                raise JsonPatchError(f"Invalid list index '{token}'") from exc
+        elif isinstance(target, dict):
+            if token not in target:
+                raise JsonPatchError(f"Path segment '{token}' not found")
+            target = target[token]
+        else:
+            raise JsonPatchError(f"Cannot traverse into '{token}'")
+    return target
+
+
+def apply_patch(doc: Any, ops: list[dict], in_place: bool = False) -> Any:
+    """Применить патч; по умолчанию к копии документа"""
+    result = doc if in_place else copy.deepcopy(doc)
+    for op in ops:
+        kind = op.get("op")
+        path = op.get("path")
+        if not isinstance(path, str) or (path and not path.startswith("/")):
+            raise JsonPatchError(f"Invalid path '{path}'")
+        if path == "":
+            if kind in ("add", "replace"):
+                result = copy.deepcopy(op["value"])
+                continue
+            raise JsonPatchError(f"Operation '{kind}' is not allowed on the document root")
+        tokens = [_unescape(t) for t in path[1:].split("/")]
+        parent = _resolve(result, tokens[:-1])
+        key = tokens[-1]
+        if kind not in ("add", "remove", "replace"):
+            raise JsonPatchError(f"Unsupported operation '{kind}'")
+        if kind != "remove" and "value" not in op:
+            raise JsonPatchError(f"Operation '{kind}' requires a value")
+        if isinstance(parent, list):
+            if key == "-" and kind == "add":
+                parent.append(copy.deepcopy(op["value"]))
+                continue
+            try:
+                index = int(key)
+            except ValueError as exc:
+                raise JsonPatchError(f"Invalid list index '{key}'") from exc
+            limit = len(parent) if kind == "add" else len(parent) - 1
+            if index < 0 or index > limit:
+                raise JsonPatchError(f"List index {index} out of range")
+            if kind == "add":
+                parent.insert(index, copy.deepcopy(op["value"]))
+            elif kind == "remove":
+                del parent[index]
+            else:
+                parent[index] = copy.deepcopy(op["value"])
+        elif isinstance(parent, dict):
+            if kind != "add" and key not in parent:
+                raise JsonPatchError(f"Path '{path}' not found")
+            if kind == "remove":
+                del parent[key]
+            else:
+                parent[key] = copy.deepcopy(op["value"])
+        else:
+            raise JsonPatchError(f"Cannot apply '{kind}' at '{path}'")
+    return result
+
+
+def merge_patch(target: Any, patch: Any) -> Any:
+    """JSON Merge Patch (RFC 7386): объекты сливаются рекурсивно, None удаляет ключ"""
+    if not isinstance(patch, dict):
+        return copy.deepcopy(patch)
+    result = dict(target) if isinstance(target, dict) else {}
+    for key, value in patch.items():
+        if value is None:
+            result.pop(key, None)
+        else:
+            result[key] = merge_patch(result.get(key), value)
+    return result
@@ -1,8 +1,12 @@
+from contextlib import contextmanager
+from datetime import datetime
 from pathlib import Path
 import uuid
 
 from fastapi import HTTPException, UploadFile, status
+from pydantic import ValidationError
 from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 
 from app.core.config import settings
@@ -15,10 +19,17 @@ from app.models.order import (
     OrderPlanVersion,
     OrderStatus,
     OrderStatusHistory,
+    PlanRevision,
 )
 from app.models.user import User, ClientProfile
-from app.schemas.orders import CreateOrderRequest, UpdateOrderRequest, SavePlanChangesRequest
-from app.services import user_service
+from app.schemas.orders import (
+    CreateOrderRequest,
+    ParsePlanResultRequest,
+    PatchPlanRequest,
+    SavePlanChangesRequest,
+    UpdateOrderRequest,
+)
+from app.services import plan_history, plan_patch, plan_similarity_service, user_service
 from app.services.price_calculator import calculate_order_price
 from app.services.user_service import ensure_client_profile
 
@@ -45,8 +56,7 @@ def create_order(db: Session, client: User, data: CreateOrderRequest) -> Order:
     # Явно устанавливаем service_code, если он не был установлен
     if not hasattr(order, 'service_code') or order.service_code is None:
         order.service_code = service_code_value
-    estimated, _ = calculate_order_price(db, order, calculator_data)
-    order.estimated_price = estimated
+    order.estimated_price, order.tariff_version = calculate_order_price(db, order, calculator_data)
     db.add(order)
     db.flush()
     history = OrderStatusHistory(
@@ -108,7 +118,7 @@ def update_order_by_client(db: Session, order: Order, data: UpdateOrderRequest)
             setattr(order, field, value)
     if data.calculator_input is not None:
         order.calculator_input = data.calculator_input
-    order.estimated_price, _ = calculate_order_price(db, order, order.calculator_input or {})
+    order.estimated_price, order.tariff_version = calculate_order_price(db, order, order.calculator_input or {})
     db.add(order)
     db.commit()
     db.refresh(order)
@@ -393,39 +403,146 @@ def get_order_files(db: Session, order_id: uuid.UUID) -> list[OrderFile]:
     return list(db.scalars(select(OrderFile).where(OrderFile.order_id == order_id)))
 
 
+def _upsert_plan_version(
+    db: Session,
+    order: Order,
+    version_type: str,
+    plan_data: dict,
+    comment: str | None,
+    created_by: User | None,
+    is_applied: bool = True,
+) -> OrderPlanVersion:
+    """Обновить текущую версию данного типа и дописать ревизию в историю плана.
+
+    В order_plan_versions хранится только актуальное состояние каждого типа
+    версии, вся история — дельтами в plan_revisions (см. plan_history).
+    """
+    with _history_write(db, order.id):
+        plan_history.ensure_history(db, order.id)
+        existing = db.scalar(
+            select(OrderPlanVersion)
+            .where(
+                OrderPlanVersion.order_id == order.id,
+                OrderPlanVersion.version_type == version_type,
+            )
+            .order_by(OrderPlanVersion.created_at.desc())
+            .limit(1)
+        )
+        if existing:
+            existing.plan = plan_data
+            existing.is_applied = is_applied
+            existing.updated_at = datetime.utcnow()
+            if comment:
+                existing.comment = comment
+            if created_by:
+                existing.created_by_id = created_by.id
+            plan = existing
+        else:
+            plan = OrderPlanVersion(
+                order_id=order.id,
+                version_type=version_type,
+                plan=plan_data,
+                is_applied=is_applied,
+                comment=comment,
+                created_by_id=created_by.id if created_by else None,
+            )
+        db.add(plan)
+        db.flush()
+        plan_history.record_version(db, plan)
+    return plan
+
+
 def add_plan_version(
     db: Session, order: Order, payload: SavePlanChangesRequest, created_by: User | None = None
 ) -> OrderPlanVersion:
-    existing = db.scalar(
-        select(OrderPlanVersion).where(
-            OrderPlanVersion.order_id == order.id,
-            OrderPlanVersion.version_type == payload.version_type,
-        )
+    plan = _upsert_plan_version(
+        db, order, payload.version_type, payload.plan.to_data(), payload.comment, created_by
     )
-    plan_data = payload.plan.model_dump()
-    if existing:
-        existing.plan = plan_data
-        if payload.comment:
-            existing.comment = payload.comment
-        if created_by:
-            existing.created_by_id = created_by.id
-        db.add(existing)
-        plan = existing
-    else:
-        plan = OrderPlanVersion(
-            order_id=order.id,
-            version_type=payload.version_type,
-            plan=plan_data,
-            is_applied=True,
-            comment=payload.comment,
-            created_by_id=created_by.id if created_by else None,
-        )
-        db.add(plan)
     db.commit()
     db.refresh(plan)
+    plan_similarity_service.index_plan_version(plan)
     return plan
 
 
+def _stale_base(current: PlanRevision | None) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_409_CONFLICT,
+        detail={
+            "message": "Plan has changed since the base revision",
+            "currentRevisionId": str(current.id) if current else None,
+        },
+    )
+
+
+@contextmanager
+def _history_write(db: Session, order_id: uuid.UUID):
+    """Запись в историю плана: если параллельный запрос уже занял тот же seq — 409"""
+    try:
+        yield
+    except IntegrityError as exc:
+        db.rollback()
+        raise _stale_base(plan_history.get_latest_revision(db, order_id)) from exc
+
+
+def patch_plan_version(
+    db: Session, order: Order, payload: PatchPlanRequest, created_by: User | None = None
+) -> tuple[OrderPlanVersion, PlanRevision]:
+    """Применить изменения к плану базовой ревизии и сохранить как версию payload.version_type.
+
+    Базовая ревизия должна быть последней в истории заказа (оптимистичная
+    блокировка), иначе 409 с id текущей ревизии.
+    """
+    with _history_write(db, order.id):
+        plan_history.ensure_history(db, order.id)
+    base = plan_history.get_latest_revision(db, order.id)
+    if base is None or base.id != payload.base_revision_id:
+        raise _stale_base(base)
+    try:
+        plan_data = plan_patch.apply(plan_history.materialize(db, base), payload.patch, payload.elements)
+    except plan_patch.PlanPatchError as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc)) from exc
+    except ValidationError as exc:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=exc.errors(include_url=False, include_context=False),
+        ) from exc
+
+    plan = _upsert_plan_version(db, order, payload.version_type, plan_data, payload.comment, created_by)
+    revision = plan_history.get_latest_revision(db, order.id)
+    if revision.id != base.id and revision.parent_id != base.id:
+        # Между проверкой и записью историю успел дополнить другой запрос
+        db.rollback()
+        raise _stale_base(plan_history.get_latest_revision(db, order.id))
+    db.commit()
+    db.refresh(plan)
+    plan_similarity_service.index_plan_version(plan)
+    return plan, revision
+
+
+def save_parse_result(
+    db: Session,
+    order: Order,
+    payload: ParsePlanResultRequest,
+    created_by: User | None = None,
+    version_type: str = "ORIGINAL",
+) -> OrderPlanVersion:
+    """Сохранить результат распознавания плана как версию с комментарием о качестве"""
+    comment_parts = ["Результат автоматического парсинга плана"]
+    if payload.confidence is not None:
+        comment_parts.append(f"Уверенность: {payload.confidence:.0%}")
+    if payload.errors:
+        comment_parts.append(f"Предупреждения: {', '.join(payload.errors)}")
+    if payload.processing_time_ms is not None:
+        comment_parts.append(f"Время обработки: {payload.processing_time_ms}мс")
+
+    plan_request = SavePlanChangesRequest(
+        versionType=version_type,
+        plan=payload.plan,
+        comment=" | ".join(comment_parts),
+    )
+    return add_plan_version(db, order, plan_request, created_by=created_by)
+
+
 def executor_approve_plan(
     db: Session, order: Order, executor: User, comment: str | None = None
 ) -> OrderPlanVersion | None:
@@ -439,16 +556,11 @@ def executor_approve_plan(
     
     final_plan = None
     if current_plan:
-        # Создаем финальную версию
-        final_plan = OrderPlanVersion(
-            order_id=order.id,
-            version_type="FINAL",
-            plan=current_plan.plan,
-            is_applied=True,
-            comment=comment or "План одобрен исполнителем",
-            created_by_id=executor.id,
+        # Финальная версия — текущий план; в истории это ревизия без изменений плана
+        final_plan = _upsert_plan_version(
+            db, order, "FINAL", current_plan.plan,
+            comment or "План одобрен исполнителем", executor,
         )
-        db.add(final_plan)
     
     add_status_history(db, order, OrderStatus.READY_FOR_APPROVAL, executor, comment)
     db.commit()
@@ -462,15 +574,10 @@ def executor_edit_plan(
     db: Session, order: Order, executor: User, plan_data: dict, comment: str
 ) -> OrderPlanVersion:
     """Отредактировать план - создает новую версию EXECUTOR_EDITED и отправляет клиенту на утверждение"""
-    edited_plan = OrderPlanVersion(
-        order_id=order.id,
-        version_type="EXECUTOR_EDITED",
-        plan=plan_data,
-        is_applied=False,  # Не применена, ждет утверждения клиентом
-        comment=comment,
-        created_by_id=executor.id,
+    # Не применена, ждет утверждения клиентом
+    edited_plan = _upsert_plan_version(
+        db, order, "EXECUTOR_EDITED", plan_data, comment, executor, is_applied=False
     )
-    db.add(edited_plan)
     add_status_history(
         db, order, OrderStatus.AWAITING_CLIENT_APPROVAL, executor,
         f"План отредактирован исполнителем. {comment}"
@@ -504,6 +611,35 @@ def get_plan_versions(db: Session, order_id: uuid.UUID) -> list[OrderPlanVersion
     )
 
 
+def get_latest_plan_version(db: Session, order_id: uuid.UUID) -> OrderPlanVersion | None:
+    return db.scalar(
+        select(OrderPlanVersion)
+        .where(OrderPlanVersion.order_id == order_id)
+        .order_by(OrderPlanVersion.created_at.desc())
+        .limit(1)
+    )
+
+
+def get_plan_version(db: Session, version_id: uuid.UUID) -> OrderPlanVersion | None:
+    return db.get(OrderPlanVersion, version_id)
+
+
+def get_plan_version_stamps(db: Session, order_id: uuid.UUID) -> list:
+    """id, тип, хэш содержимого и время изменения версий без загрузки тел планов"""
+    return list(
+        db.execute(
+            select(
+                OrderPlanVersion.id,
+                OrderPlanVersion.version_type,
+                OrderPlanVersion.plan_hash,
+                OrderPlanVersion.updated_at,
+            )
+            .where(OrderPlanVersion.order_id == order_id)
+            .order_by(OrderPlanVersion.created_at)
+        )
+    )
+
+
 def get_status_history(db: Session, order_id: uuid.UUID) -> list[OrderStatusHistory]:
     """Получить историю статусов заказа с безопасной обработкой ошибок"""
     try:
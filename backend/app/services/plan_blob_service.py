@@ -0,0 +1,66 @@
+"""Хранилище тел планов с дедупликацией по содержимому.
+
+Версии плана ссылаются на ``plan_blobs`` по sha256 канонического JSON
+(``OrderPlanVersion.plan_hash``), поэтому одинаковые планы — копия MODIFIED
+в FINAL, повторное распознавание того же шаблона — хранятся один раз.
+Запись блобов выполняется при flush (см. ``app.models.order``); блобы без
+ссылок удаляет collect_garbage (``python -m app.plan_blobs gc``), а не
+запросы, которые меняют планы.
+"""
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, select, update
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.order import OrderPlanVersion, PlanBlob
+
+
+def get_blob(db: Session, plan_hash: str) -> PlanBlob | None:
+    return db.get(PlanBlob, plan_hash)
+
+
+def migrate_legacy_plans(db: Session, batch_size: int = 500) -> int:
+    """Перенести планы из старой колонки order_plan_versions.plan в plan_blobs"""
+    ids = list(db.scalars(select(OrderPlanVersion.id).where(OrderPlanVersion.plan_hash.is_(None))))
+    moved = 0
+    for start in range(0, len(ids), batch_size):
+        versions = db.scalars(
+            select(OrderPlanVersion).where(OrderPlanVersion.id.in_(ids[start: start + batch_size]))
+        ).all()
+        for version in versions:
+            if version.legacy_plan:
+                version.plan = version.legacy_plan
+                moved += 1
+        db.commit()
+    return moved
+
+
+def collect_garbage(db: Session, grace_seconds: int | None = None) -> dict:
+    """Пометить и удалить блобы без ссылок (mark-and-sweep, запускается отдельно от запросов).
+
+    Блоб удаляется, только если без ссылок его застал предыдущий запуск не
+    меньше grace_seconds назад и ссылок нет до сих пор. Запись плана снимает
+    отметку (см. ``app.models.order``), поэтому блоб, который снова стал
+    нужен, пока шла транзакция сохранения, не удаляется.
+    """
+    grace = settings.plan_blob_gc_grace_seconds if grace_seconds is None else grace_seconds
+    now = datetime.utcnow()
+    referenced = select(OrderPlanVersion.id).where(OrderPlanVersion.plan_hash == PlanBlob.hash).exists()
+    bulk = {"synchronize_session": False}
+    unmarked = db.execute(
+        update(PlanBlob).where(PlanBlob.orphaned_at.is_not(None), referenced).values(orphaned_at=None),
+        execution_options=bulk,
+    ).rowcount
+    deleted = db.execute(
+        delete(PlanBlob).where(PlanBlob.orphaned_at <= now - timedelta(seconds=grace), ~referenced),
+        execution_options=bulk,
+    ).rowcount
+    marked = db.execute(
+        update(PlanBlob).where(PlanBlob.orphaned_at.is_(None), ~referenced).values(orphaned_at=now),
+        execution_options=bulk,
+    ).rowcount
+    db.commit()
+    return {"marked": marked, "unmarked": unmarked, "deleted": deleted}
@@ -0,0 +1,113 @@
+"""Компактные представления плана для передачи клиенту.
+
+Колоночная раскладка (``layout=columnar``): координаты всех стен-отрезков
+собираются в один массив float32 ``[x1, y1, x2, y2, ...]`` (little-endian),
+толщины — во второй (NaN, если не задана); в элементах стен вместо
+``points`` и ``thickness`` остается индекс ``geometry.wall``. Вершины
+полигонов (зоны) — в общий массив float32 со смещениями uint32 (начало
+i-го полигона в числах, n+1 значений), в элементе — ``geometry.polygon``.
+Ключи со значением None опускаются. В MessagePack массивы передаются как bin,
+в JSON — строками base64. Точность координат — float32.
+"""
+from __future__ import annotations
+
+import base64
+import math
+
+import numpy as np
+
+COLUMNAR = "columnar"
+
+
+def _drop_none(value):
+    if isinstance(value, dict):
+        return {k: _drop_none(v) for k, v in value.items() if v is not None}
+    if isinstance(value, list):
+        return [_drop_none(v) for v in value]
+    return value
+
+
+def _is_segment(elem: dict) -> bool:
+    geometry = elem.get("geometry") or {}
+    return geometry.get("kind") == "segment" and len(geometry.get("points") or ()) == 4
+
+
+def _pack(values, dtype: str, binary: bool):
+    blob = np.asarray(values, dtype=dtype).reshape(-1).tobytes()
+    return blob if binary else base64.b64encode(blob).decode("ascii")
+
+
+def _unpack(blob, dtype: str) -> np.ndarray:
+    if isinstance(blob, str):
+        blob = base64.b64decode(blob)
+    return np.frombuffer(blob or b"", dtype=dtype)
+
+
+def to_columnar(plan: dict, binary: bool = True) -> dict:
+    """Перевести план (dict в JSON-форме) в колоночную раскладку"""
+    points: list[list[float]] = []
+    thickness: list[float] = []
+    polygon_points: list[float] = []
+    polygon_offsets: list[int] = [0]
+    elements = []
+    for elem in plan.get("elements") or []:
+        geometry = elem.get("geometry") or {}
+        if geometry.get("kind") == "polygon" and geometry.get("points"):
+            elem = dict(elem)
+            elem["geometry"] = {k: v for k, v in geometry.items() if k != "points"}
+            elem["geometry"]["polygon"] = len(polygon_offsets) - 1
+            polygon_points.extend(geometry["points"])
+            polygon_offsets.append(len(polygon_points))
+        elif _is_segment(elem):
+            geometry = {k: v for k, v in elem["geometry"].items() if k != "points"}
+            geometry["wall"] = len(points)
+            points.append(elem["geometry"]["points"])
+            thickness.append(math.nan if elem.get("thickness") is None else elem["thickness"])
+            elem = {k: v for k, v in elem.items() if k != "thickness"}
+            elem["geometry"] = geometry
+        elements.append(_drop_none(elem))
+
+    result = _drop_none({k: v for k, v in plan.items() if k != "elements"})
+    result["layout"] = COLUMNAR
+    result["walls"] = {
+        "count": len(points),
+        "points": _pack(points, "<f4", binary),
+        "thickness": _pack(thickness, "<f4", binary),
+    }
+    result["polygons"] = {
+        "count": len(polygon_offsets) - 1,
+        "offsets": _pack(polygon_offsets, "<u4", binary),
+        "points": _pack(polygon_points, "<f4", binary),
+    }
+    result["elements"] = elements
+    return result
+
+
+def from_columnar(data: dict) -> dict:
+    """Обратное преобразование (ключи со значением None не восстанавливаются)"""
+    walls = data.get("walls") or {}
+    points = _unpack(walls.get("points"), "<f4").astype(np.float64).reshape(-1, 4).tolist()
+    thickness = _unpack(walls.get("thickness"), "<f4").astype(np.float64).tolist()
+    polygons = data.get("polygons") or {}
+    offsets = _unpack(polygons.get("offsets"), "<u4").tolist()
+    polygon_points = _unpack(polygons.get("points"), "<f4").astype(np.float64).tolist()
+
+    elements = []
+    for elem in data.get("elements") or []:
+        geometry = elem.get("geometry") or {}
+        if "wall" in geometry:
+            index = geometry["wall"]
+            elem = dict(elem)
+            elem["geometry"] = {k: v for k, v in geometry.items() if k != "wall"}
+            elem["geometry"]["points"] = points[index]
+            if not math.isnan(thickness[index]):
+                elem["thickness"] = thickness[index]
+        elif "polygon" in geometry:
+            index = geometry["polygon"]
+            elem = dict(elem)
+            elem["geometry"] = {k: v for k, v in geometry.items() if k != "polygon"}
+            elem["geometry"]["points"] = polygon_points[offsets[index]: offsets[index + 1]]
+        elements.append(elem)
+    plan = {k: v for k, v in data.items() if k not in ("layout", "walls", "polygons", "elements")}
+    plan["elements"] = elements
+    return plan
@@ -3,9 +3,21 @@ from __future__ import annotations
 from collections import Counter
 from typing import Any
 
+import numpy as np
 
-def summarize_plan(plan: dict[str, Any] | None) -> str:
-    """Build a short human-readable description of the plan for LLM prompts."""
+from app.services import plan_geometry, plan_spatial
+
+
+def _format_length(value_px: float, px_per_meter: float | None) -> str:
+    return f"{value_px / px_per_meter:.2f} м" if px_per_meter else f"{value_px:.0f} px"
+
+
+def summarize_plan(plan: dict[str, Any] | None, stored_plan: dict[str, Any] | None = None) -> str:
+    """Build a short human-readable description of the plan for LLM prompts.
+
+    stored_plan is the same plan before split_wall_segments: objects3d refer to
+    the original wall ids, so object links are checked against it.
+    """
     if not plan:
         return "План отсутствует."
 
@@ -46,6 +58,26 @@ def summarize_plan(plan: dict[str, Any] | None) -> str:
     if zones_counter:
         zone_parts = ", ".join(f"{z}: {c}" for z, c in zones_counter.items())
         lines.append(f"Зоны: {zone_parts}")
+    arrays = plan_geometry.load(plan, elements)
+    scale = plan_geometry.px_per_meter(plan, default=0.0) or None
+    if len(arrays.wall_rows):
+        is_wall = np.array([elements[row].get("type") == "wall" for row in arrays.wall_rows], dtype=bool)
+        total = float(plan_geometry.wall_lengths(arrays)[is_wall].sum())
+        if total:
+            lines.append(f"Суммарная длина стен: {_format_length(total, scale)}")
+    if len(arrays.polygon_rows):
+        is_zone = np.array([elements[row].get("type") == "zone" for row in arrays.polygon_rows], dtype=bool)
+        total = float(plan_geometry.polygon_areas(arrays)[is_zone].sum())
+        if total:
+            area = f"{total / (scale * scale):.1f} м²" if scale else f"{total:.0f} {unit}²"
+            lines.append(f"Суммарная площадь зон: {area}")
+    bbox = plan_geometry.plan_bbox(arrays)
+    if bbox:
+        width_px, height_px = bbox[2] - bbox[0], bbox[3] - bbox[1]
+        lines.append(f"Габариты элементов: {_format_length(width_px, scale)} x {_format_length(height_px, scale)}")
+    link_issues = plan_spatial.check_object_links(stored_plan or plan)
+    if link_issues:
+        lines.append(f"Несоответствия привязок объектов ({len(link_issues)}): " + "; ".join(link_issues[:5]))
     if role_counter:
         role_parts = ", ".join(f"{r}: {c}" for r, c in role_counter.items())
         lines.append(f"Статусы элементов: {role_parts}")
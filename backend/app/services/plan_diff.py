@@ -0,0 +1,394 @@
+"""Структурное сравнение двух версий плана.
+
+Элементы сопоставляются по id, а оставшиеся без пары — по близости положения
+(план, распознанный заново, приходит с другими id). Для каждой пары
+формируется список типизированных изменений: перемещение концов стены,
+толщина, добавленные/удаленные проемы, стиль, роль и т.д. Координаты
+сравниваются с допуском, чтобы ошибки округления не считались изменениями.
+
+Ключи ``deleted``/``added``/``modified`` сохраняют прежний формат ответа
+``/plan/diff`` (списки id для подсветки), подробности — в ``elements``.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import marshal
+import math
+import threading
+from collections import OrderedDict
+from typing import Any
+
+import numpy as np
+
+from app.core.config import settings
+from app.services import plan_geometry, plan_spatial
+from app.services.plan_transform import split_wall_segments
+
+_SCALAR_FIELDS = ("role", "zoneType", "loadBearing", "text")
+
+
+def _differs(a: Any, b: Any, tol: float) -> bool:
+    """Рекурсивное сравнение с допуском для чисел"""
+    if isinstance(a, bool) or isinstance(b, bool):
+        return a != b
+    if isinstance(a, (int, float)) and isinstance(b, (int, float)):
+        return abs(a - b) > tol
+    if isinstance(a, dict) and isinstance(b, dict):
+        return a.keys() != b.keys() or any(_differs(a[k], b[k], tol) for k in a)
+    if isinstance(a, (list, tuple)) and isinstance(b, (list, tuple)):
+        return len(a) != len(b) or any(_differs(x, y, tol) for x, y in zip(a, b))
+    return a != b
+
+
+def _changed_keys(a: dict | None, b: dict | None, tol: float) -> list[str]:
+    a, b = a or {}, b or {}
+    return sorted(k for k in a.keys() | b.keys() if _differs(a.get(k), b.get(k), tol))
+
+
+# --- изменения внутри элемента ----------------------------------------------
+
+
+def _endpoints_change(a: list, b: list, tol: float) -> dict | None:
+    if len(a) != 4 or len(b) != 4:
+        return None if a == b else {"field": "points", "from": a, "to": b}
+    direct = (math.hypot(b[0] - a[0], b[1] - a[1]), math.hypot(b[2] - a[2], b[3] - a[3]))
+    reverse = (math.hypot(b[2] - a[0], b[3] - a[1]), math.hypot(b[0] - a[2], b[1] - a[3]))
+    # Стена, нарисованная в обратном направлении, — та же стена
+    if max(reverse) <= tol < max(direct):
+        return None
+    if max(direct) <= tol:
+        return None
+    return {
+        "field": "endpoints",
+        "from": a,
+        "to": b,
+        "startMoved": round(direct[0], 3),
+        "endMoved": round(direct[1], 3),
+    }
+
+
+def _opening_key(opening: dict) -> str:
+    return opening.get("id") or f"{opening.get('type')}@{opening.get('from_m')}"
+
+
+def _openings_change(a: list | None, b: list | None, tol_m: float) -> dict | None:
+    a_map = {_opening_key(o): o for o in a or []}
+    b_map = {_opening_key(o): o for o in b or []}
+    removed = [k for k in a_map if k not in b_map]
+    added = [k for k in b_map if k not in a_map]
+    # Проемы без id сопоставляются по положению на стене
+    for key in list(added):
+        opening = b_map[key]
+        match = next(
+            (
+                r for r in removed
+                if a_map[r].get("type") == opening.get("type")
+                and abs((a_map[r].get("from_m") or 0) - (opening.get("from_m") or 0)) <= tol_m
+                and abs((a_map[r].get("to_m") or 0) - (opening.get("to_m") or 0)) <= tol_m
+            ),
+            None,
+        )
+        if match is not None:
+            removed.remove(match)
+            added.remove(key)
+            b_map[match] = b_map.pop(key)
+    modified = [
+        {"id": k, "fields": fields}
+        for k in a_map.keys() & b_map.keys()
+        if (fields := _changed_keys(a_map[k], b_map[k], tol_m))
+    ]
+    if not (added or removed or modified):
+        return None
+    return {"field": "openings", "added": added, "removed": removed, "modified": sorted(modified, key=lambda m: m["id"])}
+
+
+def _polygon_change(a: list, b: list, tol: float) -> dict | None:
+    if len(a) == len(b) and not _differs(a, b, tol):
+        return None
+    change: dict[str, Any] = {"field": "points", "from": a, "to": b}
+    if len(a) == len(b) and len(a) >= 2:
+        dx, dy = b[0] - a[0], b[1] - a[1]
+        shifted = [v + (dx if i % 2 == 0 else dy) for i, v in enumerate(a)]
+        if not _differs(shifted, b, tol):
+            change["kind"] = "moved"
+            change["offset"] = [round(dx, 3), round(dy, 3)]
+            return change
+    change["kind"] = "reshaped"
+    return change
+
+
+def element_changes(a: dict, b: dict, tol: float, tol_m: float) -> list[dict]:
+    """Список изменений элемента a -> b"""
+    changes: list[dict] = []
+    if a.get("type") != b.get("type"):
+        changes.append({"field": "type", "from": a.get("type"), "to": b.get("type")})
+
+    geom_a, geom_b = a.get("geometry") or {}, b.get("geometry") or {}
+    kind = geom_b.get("kind")
+    if geom_a.get("kind") != kind:
+        changes.append({"field": "geometry", "from": geom_a, "to": geom_b})
+    elif kind == "segment":
+        if (change := _endpoints_change(geom_a.get("points") or [], geom_b.get("points") or [], tol)):
+            changes.append(change)
+        if (change := _openings_change(geom_a.get("openings"), geom_b.get("openings"), tol_m)):
+            changes.append(change)
+    elif kind == "polygon":
+        if (change := _polygon_change(geom_a.get("points") or [], geom_b.get("points") or [], tol)):
+            changes.append(change)
+    elif kind == "point":
+        a_xy = (geom_a.get("x") or 0, geom_a.get("y") or 0)
+        b_xy = (geom_b.get("x") or 0, geom_b.get("y") or 0)
+        if math.hypot(b_xy[0] - a_xy[0], b_xy[1] - a_xy[1]) > tol:
+            changes.append({"field": "position", "from": list(a_xy), "to": list(b_xy)})
+
+    if _differs(a.get("thickness"), b.get("thickness"), tol):
+        changes.append({"field": "thickness", "from": a.get("thickness"), "to": b.get("thickness")})
+    for field in _SCALAR_FIELDS:
+        if a.get(field) != b.get(field):
+            changes.append({"field": field, "from": a.get(field), "to": b.get(field)})
+    if (fields := _changed_keys(a.get("style"), b.get("style"), 0)):
+        changes.append({"field": "style", "keys": fields, "from": a.get("style"), "to": b.get("style")})
+    return changes
+
+
+# --- сопоставление без id ---------------------------------------------------
+
+
+def _anchor(elem: dict) -> tuple[float, float] | None:
+    geom = elem.get("geometry") or {}
+    points = geom.get("points")
+    if geom.get("kind") == "point":
+        return float(geom.get("x") or 0), float(geom.get("y") or 0)
+    if points and len(points) >= 2:
+        xs, ys = points[0::2], points[1::2]
+        return sum(xs) / len(xs), sum(ys) / len(ys)
+    return None
+
+
+def _anchors(arrays: plan_geometry.PlanArrays) -> np.ndarray:
+    result = plan_geometry.anchors(arrays)
+    for row in np.nonzero(np.isnan(result[:, 0]))[0]:
+        anchor = _anchor(arrays.elements[row])
+        if anchor is not None:
+            result[row] = anchor
+    return result
+
+
+def _segments(arrays: plan_geometry.PlanArrays) -> np.ndarray:
+    """Концы стен по строкам элементов (N, 4); NaN — не отрезок"""
+    result = np.full((len(arrays), 4), np.nan)
+    result[arrays.wall_rows] = arrays.walls
+    return result
+
+
+def _match_by_position(deleted: list[dict], added: list[dict], radius: float) -> list[tuple[dict, dict]]:
+    """Жадно сопоставить удаленные и добавленные элементы одного типа в радиусе radius.
+
+    Кандидаты берутся из пространственного индекса якорных точек удаленных
+    элементов, расстояния для всех пар считаются пакетно: для стен — по концам
+    (в любом направлении), иначе по якорным точкам.
+    """
+    if not deleted or not added or radius <= 0:
+        return []
+    arrays_a, arrays_b = plan_geometry.load(None, deleted), plan_geometry.load(None, added)
+    anchors_a, anchors_b = _anchors(arrays_a), _anchors(arrays_b)
+    grid = plan_spatial.GridIndex(np.column_stack((anchors_a, anchors_a)), cell=radius)
+    ib, ia = grid.near_points(anchors_b, radius)
+    same_type = np.array(
+        [deleted[a].get("type") == added[b].get("type") for a, b in zip(ia.tolist(), ib.tolist())], dtype=bool
+    )
+    if not same_type.any():
+        return []
+    ia, ib = ia[same_type], ib[same_type]
+
+    delta = anchors_b[ib] - anchors_a[ia]
+    distance = np.hypot(delta[:, 0], delta[:, 1])
+    seg_a, seg_b = _segments(arrays_a)[ia], _segments(arrays_b)[ib]
+    both = ~np.isnan(seg_a[:, 0]) & ~np.isnan(seg_b[:, 0])
+    if both.any():
+        direct, reverse = plan_geometry.endpoint_moves(seg_a[both], seg_b[both])
+        distance[both] = np.minimum(direct.max(axis=1), reverse.max(axis=1))
+    keep = distance <= radius
+    ia, ib, distance = ia[keep], ib[keep], distance[keep]
+
+    pairs: list[tuple[dict, dict]] = []
+    used_a: set[int] = set()
+    used_b: set[int] = set()
+    for k in np.lexsort((ib, ia, distance)).tolist():
+        a_idx, b_idx = int(ia[k]), int(ib[k])
+        if a_idx in used_a or b_idx in used_b:
+            continue
+        used_a.add(a_idx)
+        used_b.add(b_idx)
+        pairs.append((deleted[a_idx], added[b_idx]))
+    return pairs
+
+
+# --- сравнение планов -------------------------------------------------------
+
+
+def _split_base_ids(elements: list[dict]) -> set[str]:
+    bases = set()
+    for elem in elements:
+        base, sep, suffix = str(elem.get("id") or "").rpartition("_seg")
+        if sep and suffix.isdigit():
+            bases.add(base)
+    return bases
+
+
+def _align_split_walls(plan: dict, other_elements: list[dict]) -> list[dict]:
+    """Если в другой версии стена X уже разрезана по проемам (X_seg1, ...), а здесь
+    хранится целиком, разрезать ее так же, чтобы сравнивать одинаковые элементы"""
+    elements = plan.get("elements") or []
+    other_ids = {e.get("id") for e in other_elements}
+    bases = _split_base_ids(other_elements) - other_ids
+    targets = [e for e in elements if e.get("type") == "wall" and e.get("id") in bases]
+    if not targets:
+        return elements
+    split = split_wall_segments({"meta": plan.get("meta"), "elements": targets})["elements"]
+    split_by_base: dict[str, list[dict]] = {}
+    for elem in split:
+        base = str(elem.get("id")).rpartition("_seg")[0] or elem.get("id")
+        split_by_base.setdefault(base, []).append(elem)
+    result: list[dict] = []
+    for elem in elements:
+        result.extend(split_by_base.get(elem.get("id"), [elem]) if elem.get("id") in bases else [elem])
+    return result
+
+
+def _diff_objects3d(a: list | None, b: list | None, tol: float) -> dict:
+    a_map = {o.get("id"): o for o in a or []}
+    b_map = {o.get("id"): o for o in b or []}
+    modified = []
+    for obj_id in a_map.keys() & b_map.keys():
+        fields = _changed_keys(a_map[obj_id], b_map[obj_id], tol)
+        if fields:
+            modified.append({"id": obj_id, "fields": fields})
+    return {
+        "deleted": [k for k in a_map if k not in b_map],
+        "added": [k for k in b_map if k not in a_map],
+        "modified": sorted(modified, key=lambda m: str(m["id"])),
+    }
+
+
+def diff_plans(
+    original: dict,
+    modified: dict,
+    tolerance_px: float | None = None,
+    match_radius_px: float | None = None,
+) -> dict:
+    """Сравнить два плана (dict в формате Plan)"""
+    tol = settings.plan_diff_tolerance_px if tolerance_px is None else tolerance_px
+    radius = settings.plan_diff_match_radius_px if match_radius_px is None else match_radius_px
+    tol_m = tol / plan_geometry.px_per_meter(modified or original or {})
+
+    original, modified = original or {}, modified or {}
+    a_list = _align_split_walls(original, modified.get("elements") or [])
+    b_list = _align_split_walls(modified, original.get("elements") or [])
+    a_elems = {e.get("id"): e for e in a_list}
+    b_elems = {e.get("id"): e for e in b_list}
+    deleted = [e for k, e in a_elems.items() if k not in b_elems]
+    added = [e for k, e in b_elems.items() if k not in a_elems]
+
+    pairs = [(a_elems[k], b_elems[k]) for k in a_elems if k in b_elems]
+    matched = _match_by_position(deleted, added, radius)
+    if matched:
+        matched_a = {id(a) for a, _b in matched}
+        matched_b = {id(b) for _a, b in matched}
+        deleted = [e for e in deleted if id(e) not in matched_a]
+        added = [e for e in added if id(e) not in matched_b]
+
+    details: list[dict] = []
+    for a, b, rematched in [(a, b, False) for a, b in pairs] + [(a, b, True) for a, b in matched]:
+        if not rematched and a == b:
+            continue
+        changes = element_changes(a, b, tol, tol_m)
+        if not changes and not rematched:
+            continue
+        entry = {"id": b.get("id"), "type": b.get("type"), "changes": changes}
+        if rematched:
+            entry["originalId"] = a.get("id")
+        details.append(entry)
+
+    return {
+        "deleted": [e.get("id") for e in deleted],  # Красный
+        "added": [e.get("id") for e in added],  # Зеленый
+        "modified": [d["id"] for d in details if d["changes"]],  # Желтый
+        "elements": details,
+        "objects3d": _diff_objects3d(original.get("objects3d"), modified.get("objects3d"), tol_m),
+        "meta": _changed_keys(original.get("meta"), modified.get("meta"), 1e-9),
+    }
+
+
+def expand_split_ids(changes: dict, *split_plans: dict | None) -> dict:
+    """Добавить в списки подсветки id сегментов стен, разрезанных по проемам (wall_seg1, ...)"""
+    segments: dict[str, set[str]] = {}
+    for split_plan in split_plans:
+        for elem in (split_plan or {}).get("elements", []):
+            elem_id = str(elem.get("id") or "")
+            base, sep, suffix = elem_id.rpartition("_seg")
+            if sep and suffix.isdigit():
+                segments.setdefault(base, set()).add(elem_id)
+    if not segments:
+        return changes
+    result = dict(changes)
+    for key in ("deleted", "added", "modified"):
+        ids = list(changes.get(key) or [])
+        result[key] = ids + [seg for elem_id in ids for seg in sorted(segments.get(elem_id, ()))]
+    return result
+
+
+# --- кэш по паре версий -----------------------------------------------------
+
+_cache: OrderedDict[tuple, dict] = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def _version_fingerprint(plan: dict | None) -> str:
+    """Быстрый отпечаток содержимого версии для проверки кэша.
+
+    marshal на порядок быстрее json.dumps; другой порядок ключей дает лишь промах кэша.
+    """
+    try:
+        data = marshal.dumps(plan)
+    except ValueError:
+        data = json.dumps(plan, sort_keys=True, default=str).encode()
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def _content_key(version) -> str:
+    """Хэш содержимого версии: plan_hash из plan_blobs, для незаписанного плана — отпечаток"""
+    return getattr(version, "stored_plan_hash", None) or _version_fingerprint(version.plan)
+
+
+def empty_diff() -> dict:
+    return {
+        "deleted": [],
+        "added": [],
+        "modified": [],
+        "elements": [],
+        "objects3d": {"deleted": [], "added": [], "modified": []},
+        "meta": [],
+    }
+
+
+def diff_versions(original_version, modified_version) -> dict:
+    """Diff двух OrderPlanVersion. Одинаковое содержимое определяется сравнением
+    хэшей без обхода планов; результат кэшируется по паре хэшей содержимого"""
+    original_key = _content_key(original_version)
+    modified_key = _content_key(modified_version)
+    if original_key == modified_key:
+        return empty_diff()
+    key = (original_key, modified_key)
+    with _cache_lock:
+        cached = _cache.get(key)
+        if cached is not None:
+            _cache.move_to_end(key)
+            return cached
+    result = diff_plans(original_version.plan or {}, modified_version.plan or {})
+    with _cache_lock:
+        _cache[key] = result
+        while len(_cache) > settings.plan_diff_cache_size:
+            _cache.popitem(last=False)
+    return result
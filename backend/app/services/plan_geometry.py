@@ -0,0 +1,240 @@
+"""Векторизованная геометрия плана на NumPy.
+
+План один раз раскладывается в массивы: матрица отрезков стен (W, 4),
+общий буфер вершин полигонов со смещениями, точки, таблица проемов. Над ними
+пакетно считаются длины стен, площади зон (формула шнурования), центры,
+габариты элементов и разрезание стен по проемам.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+
+import numpy as np
+
+
+def px_per_meter(plan: dict | None, default: float = 1.0) -> float:
+    scale = ((plan or {}).get("meta") or {}).get("scale") or {}
+    value = scale.get("px_per_meter") or scale.get("pxPerMeter") or default
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return default
+    return value if value > 0 else default
+
+
+@dataclass
+class PlanArrays:
+    elements: list[dict]
+    px_per_meter: float
+    wall_rows: np.ndarray  # (W,) индекс элемента для каждой стены-отрезка
+    walls: np.ndarray  # (W, 4) x1, y1, x2, y2
+    polygon_rows: np.ndarray  # (P,) индекс элемента для каждого полигона
+    polygon_offsets: np.ndarray  # (P + 1,) начало полигона в vertices
+    vertices: np.ndarray  # (V, 2)
+    point_rows: np.ndarray  # (K,)
+    points: np.ndarray  # (K, 2)
+    opening_walls: np.ndarray  # (O,) номер стены (строка walls)
+    opening_from: np.ndarray  # (O,) м
+    opening_to: np.ndarray  # (O,) м
+
+    def __len__(self) -> int:
+        return len(self.elements)
+
+
+def load(plan: dict | None, elements: list[dict] | None = None) -> PlanArrays:
+    """Разложить элементы плана в массивы (один проход по элементам)"""
+    plan = plan or {}
+    elements = list(plan.get("elements") or []) if elements is None else elements
+    wall_rows, walls = [], []
+    polygon_rows, offsets, coords = [], [0], []
+    point_rows, points = [], []
+    opening_walls, opening_from, opening_to = [], [], []
+    for row, elem in enumerate(elements):
+        geometry = elem.get("geometry") or {}
+        kind = geometry.get("kind")
+        pts = geometry.get("points")
+        if kind == "segment" and pts is not None and len(pts) == 4:
+            for opening in geometry.get("openings") or ():
+                start = float(opening.get("from_m", 0) or 0)
+                opening_walls.append(len(walls))
+                opening_from.append(start)
+                opening_to.append(float(opening.get("to_m", start) if opening.get("to_m") is not None else start))
+            wall_rows.append(row)
+            walls.append(pts)
+        elif kind == "polygon" and pts and len(pts) >= 6:
+            polygon_rows.append(row)
+            coords.extend(pts[: len(pts) // 2 * 2])
+            offsets.append(len(coords) // 2)
+        elif kind == "point":
+            point_rows.append(row)
+            points.append((geometry.get("x") or 0, geometry.get("y") or 0))
+    return PlanArrays(
+        elements=elements,
+        px_per_meter=px_per_meter(plan),
+        wall_rows=np.asarray(wall_rows, dtype=np.int64),
+        walls=np.asarray(walls, dtype=np.float64).reshape(-1, 4),
+        polygon_rows=np.asarray(polygon_rows, dtype=np.int64),
+        polygon_offsets=np.asarray(offsets, dtype=np.int64),
+        vertices=np.asarray(coords, dtype=np.float64).reshape(-1, 2),
+        point_rows=np.asarray(point_rows, dtype=np.int64),
+        points=np.asarray(points, dtype=np.float64).reshape(-1, 2),
+        opening_walls=np.asarray(opening_walls, dtype=np.int64),
+        opening_from=np.asarray(opening_from, dtype=np.float64),
+        opening_to=np.asarray(opening_to, dtype=np.float64),
+    )
+
+
+def wall_lengths(arrays: PlanArrays) -> np.ndarray:
+    """Длины стен в px"""
+    w = arrays.walls
+    return np.hypot(w[:, 2] - w[:, 0], w[:, 3] - w[:, 1])
+
+
+def _next_vertex(offsets: np.ndarray, count: int) -> np.ndarray:
+    """Индекс следующей вершины с замыканием внутри каждого полигона"""
+    nxt = np.arange(1, count + 1)
+    if len(offsets) > 1:
+        nxt[offsets[1:] - 1] = offsets[:-1]
+    return nxt
+
+
+def polygon_areas(arrays: PlanArrays) -> np.ndarray:
+    """Площади полигонов в px² (формула шнурования)"""
+    offsets, v = arrays.polygon_offsets, arrays.vertices
+    if len(offsets) < 2:
+        return np.zeros(0)
+    nxt = _next_vertex(offsets, len(v))
+    cross = v[:, 0] * v[nxt, 1] - v[nxt, 0] * v[:, 1]
+    return np.abs(np.add.reduceat(cross, offsets[:-1])) / 2
+
+
+def polygon_centers(arrays: PlanArrays) -> np.ndarray:
+    """Средняя точка вершин каждого полигона, (P, 2)"""
+    offsets, v = arrays.polygon_offsets, arrays.vertices
+    if len(offsets) < 2:
+        return np.zeros((0, 2))
+    counts = np.diff(offsets)[:, None]
+    return np.add.reduceat(v, offsets[:-1], axis=0) / counts
+
+
+def anchors(arrays: PlanArrays) -> np.ndarray:
+    """Опорная точка каждого элемента (N, 2): середина стены, центр полигона, точка; NaN — нет геометрии"""
+    result = np.full((len(arrays), 2), np.nan)
+    w = arrays.walls
+    result[arrays.wall_rows] = np.column_stack(((w[:, 0] + w[:, 2]) / 2, (w[:, 1] + w[:, 3]) / 2))
+    result[arrays.polygon_rows] = polygon_centers(arrays)
+    result[arrays.point_rows] = arrays.points
+    return result
+
+
+def element_bboxes(arrays: PlanArrays) -> np.ndarray:
+    """Габариты элементов (N, 4): min x, min y, max x, max y; NaN — нет геометрии"""
+    result = np.full((len(arrays), 4), np.nan)
+    w = arrays.walls
+    result[arrays.wall_rows] = np.column_stack((
+        np.minimum(w[:, 0], w[:, 2]), np.minimum(w[:, 1], w[:, 3]),
+        np.maximum(w[:, 0], w[:, 2]), np.maximum(w[:, 1], w[:, 3]),
+    ))
+    offsets, v = arrays.polygon_offsets, arrays.vertices
+    if len(offsets) > 1:
+        starts = offsets[:-1]
+        result[arrays.polygon_rows] = np.column_stack((
+            np.minimum.reduceat(v[:, 0], starts), np.minimum.reduceat(v[:, 1], starts),
+            np.maximum.reduceat(v[:, 0], starts), np.maximum.reduceat(v[:, 1], starts),
+        ))
+    result[arrays.point_rows] = np.column_stack((arrays.points, arrays.points))
+    return result
+
+
+def plan_bbox(arrays: PlanArrays) -> tuple[float, float, float, float] | None:
+    boxes = element_bboxes(arrays)
+    if not len(boxes) or np.isnan(boxes[:, 0]).all():
+        return None
+    return (
+        float(np.nanmin(boxes[:, 0])), float(np.nanmin(boxes[:, 1])),
+        float(np.nanmax(boxes[:, 2])), float(np.nanmax(boxes[:, 3])),
+    )
+
+
+@dataclass
+class WallSplit:
+    """Сплошные куски стен между проемами"""
+    walls: np.ndarray  # (S,) строка walls, к которой относится кусок
+    seq: np.ndarray  # (S,) номер куска внутри стены, с 1
+    points: np.ndarray  # (S, 4) концы куска в px
+
+
+def split_walls(arrays: PlanArrays) -> WallSplit:
+    """Разрезать стены с проемами на сплошные куски.
+
+    Проемы стены сортируются по from_m, курсор — накопленный максимум to_m;
+    кусок [курсор, from) добавляется, если он непустой, и в конце [курсор, длина).
+    Стены без проемов и нулевой длины в результат не попадают.
+    """
+    empty = WallSplit(np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64), np.zeros((0, 4)))
+    if not len(arrays.opening_walls):
+        return empty
+    lengths_px = wall_lengths(arrays)
+    length_m = lengths_px / arrays.px_per_meter
+
+    order = np.lexsort((arrays.opening_from, arrays.opening_walls))
+    wall = arrays.opening_walls[order]
+    keep = lengths_px[wall] > 0
+    order, wall = order[keep], wall[keep]
+    if not len(wall):
+        return empty
+    limit = length_m[wall]
+    start = np.minimum(np.maximum(arrays.opening_from[order], 0.0), limit)
+    end = np.minimum(np.maximum(arrays.opening_to[order], start), limit)
+
+    # Накопленный максимум end внутри каждой стены: по целым рангам со сдвигом группы,
+    # чтобы не смешивать стены и не терять точность на сложении с плавающей точкой
+    first = np.ones(len(wall), dtype=bool)
+    first[1:] = wall[1:] != wall[:-1]
+    by_end = np.argsort(end, kind="stable")
+    rank = np.empty(len(end), dtype=np.int64)
+    rank[by_end] = np.arange(len(end))
+    shift = (np.cumsum(first) - 1) * len(end)
+    cursor_after = end[by_end][np.maximum.accumulate(rank + shift) - shift]
+    cursor_before = np.where(first, 0.0, np.roll(cursor_after, 1))
+
+    inner = start > cursor_before
+    last = np.ones(len(wall), dtype=bool)
+    last[:-1] = wall[1:] != wall[:-1]
+    tail = last & (cursor_after < limit)
+
+    seg_wall = np.concatenate((wall[inner], wall[tail]))
+    seg_start = np.concatenate((cursor_before[inner], cursor_after[tail]))
+    seg_end = np.concatenate((start[inner], limit[tail]))
+    # Порядок: по стене, внутри — по положению (хвост всегда последний)
+    position = np.concatenate((np.nonzero(inner)[0] * 2, np.nonzero(tail)[0] * 2 + 1))
+    order = np.lexsort((position, seg_wall))
+    seg_wall, seg_start, seg_end = seg_wall[order], seg_start[order], seg_end[order]
+
+    seg_first = np.ones(len(seg_wall), dtype=bool)
+    seg_first[1:] = seg_wall[1:] != seg_wall[:-1]
+    group_start = np.maximum.accumulate(np.where(seg_first, np.arange(len(seg_wall)), 0))
+    seq = np.arange(len(seg_wall)) - group_start + 1
+
+    w = arrays.walls[seg_wall]
+    ratio_start = seg_start * arrays.px_per_meter / lengths_px[seg_wall]
+    ratio_end = seg_end * arrays.px_per_meter / lengths_px[seg_wall]
+    dx, dy = w[:, 2] - w[:, 0], w[:, 3] - w[:, 1]
+    points = np.column_stack((
+        w[:, 0] + dx * ratio_start, w[:, 1] + dy * ratio_start,
+        w[:, 0] + dx * ratio_end, w[:, 1] + dy * ratio_end,
+    ))
+    return WallSplit(walls=seg_wall, seq=seq, points=points)
+
+
+def endpoint_moves(a: np.ndarray, b: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Смещения концов для пар отрезков (N, 4): прямое (N, 2) и для обратного направления (N, 2)"""
+    direct = np.column_stack((
+        np.hypot(b[:, 0] - a[:, 0], b[:, 1] - a[:, 1]),
+        np.hypot(b[:, 2] - a[:, 2], b[:, 3] - a[:, 3]),
+    ))
+    reverse = np.column_stack((
+        np.hypot(b[:, 2] - a[:, 0], b[:, 3] - a[:, 1]),
+        np.hypot(b[:, 0] - a[:, 2], b[:, 1] - a[:, 3]),
+    ))
+    return direct, reverse
@@ -0,0 +1,221 @@
+"""Неизменяемая история плана заказа.
+
+Каждое сохранение плана добавляет ревизию в ``plan_revisions``: JSON Patch
+относительно предыдущей ревизии заказа либо, каждые
+``plan_snapshot_interval`` ревизий (или когда патч почти не меньше плана),
+полный снимок. Восстановление ревизии — ближайший снимок плюс патчи;
+результаты кэшируются в памяти по id ревизии.
+
+История заказов, сохраненных до ее появления, создается при старте
+(seed_history) и на пути записи; чтение историю не создает.
+"""
+from __future__ import annotations
+
+import copy
+import json
+import threading
+import uuid
+from collections import OrderedDict
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.order import OrderPlanVersion, PlanRevision
+from app.services.json_patch import apply_patch, make_patch
+
+_cache: OrderedDict[uuid.UUID, dict] = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def _json_size(value) -> int:
+    return len(json.dumps(value, separators=(",", ":"), ensure_ascii=False, default=str))
+
+
+def _cache_get(revision_id: uuid.UUID) -> dict | None:
+    with _cache_lock:
+        plan = _cache.get(revision_id)
+        if plan is not None:
+            _cache.move_to_end(revision_id)
+        return plan
+
+
+def _cache_put(revision_id: uuid.UUID, plan: dict) -> None:
+    with _cache_lock:
+        _cache[revision_id] = plan
+        _cache.move_to_end(revision_id)
+        while len(_cache) > settings.plan_history_cache_size:
+            _cache.popitem(last=False)
+
+
+def get_latest_revision(db: Session, order_id: uuid.UUID) -> PlanRevision | None:
+    return db.scalar(
+        select(PlanRevision)
+        .where(PlanRevision.order_id == order_id)
+        .order_by(PlanRevision.seq.desc())
+        .limit(1)
+    )
+
+
+def latest_revision_id(db: Session, order_id: uuid.UUID) -> uuid.UUID | None:
+    """id последней ревизии — baseRevisionId для PATCH /plan"""
+    revision = get_latest_revision(db, order_id)
+    return revision.id if revision else None
+
+
+def get_revision(db: Session, revision_id: uuid.UUID) -> PlanRevision | None:
+    return db.get(PlanRevision, revision_id)
+
+
+def list_revisions(db: Session, order_id: uuid.UUID) -> list[PlanRevision]:
+    return list(
+        db.scalars(
+            select(PlanRevision)
+            .where(PlanRevision.order_id == order_id)
+            .order_by(PlanRevision.seq)
+        )
+    )
+
+
+def materialize(db: Session, revision: PlanRevision) -> dict:
+    """Восстановить план на момент ревизии (возвращается копия)"""
+    cached = _cache_get(revision.id)
+    if cached is not None:
+        return copy.deepcopy(cached)
+
+    # Одним запросом берем ревизии от ближайшего снимка до целевой
+    snapshot_seq = db.scalar(
+        select(func.max(PlanRevision.seq)).where(
+            PlanRevision.order_id == revision.order_id,
+            PlanRevision.seq <= revision.seq,
+            PlanRevision.snapshot.is_not(None),
+        )
+    )
+    rows = db.scalars(
+        select(PlanRevision).where(
+            PlanRevision.order_id == revision.order_id,
+            PlanRevision.seq >= (snapshot_seq or 0),
+            PlanRevision.seq <= revision.seq,
+        )
+    ).all()
+    by_id = {row.id: row for row in rows}
+
+    chain: list[PlanRevision] = []
+    current: PlanRevision | None = revision
+    base: dict | None = None
+    while current is not None:
+        cached = _cache_get(current.id) if current is not revision else None
+        if cached is not None:
+            base = copy.deepcopy(cached)
+            break
+        if current.snapshot is not None:
+            base = copy.deepcopy(current.snapshot)
+            break
+        chain.append(current)
+        current = by_id.get(current.parent_id) or (db.get(PlanRevision, current.parent_id) if current.parent_id else None)
+    if base is None:
+        raise ValueError(f"Plan revision {revision.id} has no snapshot in its history")
+
+    for rev in reversed(chain):
+        base = apply_patch(base, rev.patch or [], in_place=True)
+    _cache_put(revision.id, base)
+    return copy.deepcopy(base)
+
+
+def _add_revision(
+    db: Session,
+    order_id: uuid.UUID,
+    version_id: uuid.UUID | None,
+    version_type: str,
+    plan: dict,
+    comment: str | None,
+    created_by_id: uuid.UUID | None,
+    parent: PlanRevision | None,
+) -> PlanRevision:
+    seq = (parent.seq + 1) if parent else 1
+    revision = PlanRevision(
+        id=uuid.uuid4(),
+        order_id=order_id,
+        version_id=version_id,
+        version_type=version_type,
+        seq=seq,
+        parent_id=parent.id if parent else None,
+        comment=comment,
+        created_by_id=created_by_id,
+    )
+    plan_size = _json_size(plan)
+    patch = None
+    if parent is not None and seq % max(settings.plan_snapshot_interval, 1) != 0:
+        patch = make_patch(materialize(db, parent), plan)
+        patch_size = _json_size(patch)
+        if patch_size >= plan_size * settings.plan_snapshot_patch_ratio:
+            patch = None
+    if patch is None:
+        revision.snapshot = copy.deepcopy(plan)
+        revision.size_bytes = plan_size
+    else:
+        revision.patch = patch
+        revision.size_bytes = patch_size
+    db.add(revision)
+    db.flush()
+    _cache_put(revision.id, copy.deepcopy(plan))
+    return revision
+
+
+def ensure_history(db: Session, order_id: uuid.UUID) -> None:
+    """Создать историю из текущих версий заказа, сохраненных до ее появления"""
+    if get_latest_revision(db, order_id) is not None:
+        return
+    versions = db.scalars(
+        select(OrderPlanVersion)
+        .where(OrderPlanVersion.order_id == order_id)
+        .order_by(OrderPlanVersion.created_at)
+    ).all()
+    parent = None
+    for version in versions:
+        if version.plan:
+            parent = _add_revision(
+                db, order_id, version.id, version.version_type, version.plan,
+                version.comment, version.created_by_id, parent,
+            )
+
+
+def seed_history(db: Session) -> int:
+    """Создать историю всех заказов, у которых есть версии плана, но нет ревизий (при старте)"""
+    has_revisions = select(PlanRevision.id).where(PlanRevision.order_id == OrderPlanVersion.order_id).exists()
+    order_ids = list(db.scalars(select(OrderPlanVersion.order_id).where(~has_revisions).distinct()))
+    for order_id in order_ids:
+        ensure_history(db, order_id)
+        db.commit()
+    return len(order_ids)
+
+
+def record_version(db: Session, version: OrderPlanVersion) -> PlanRevision:
+    """Добавить в историю текущее состояние версии (вызывается после flush версии)"""
+    ensure_history(db, version.order_id)
+    parent = get_latest_revision(db, version.order_id)
+    if parent is not None and parent.version_id == version.id and materialize(db, parent) == version.plan:
+        return parent
+    return _add_revision(
+        db,
+        version.order_id,
+        version.id,
+        version.version_type,
+        version.plan,
+        version.comment,
+        version.created_by_id,
+        parent,
+    )
+
+
+def resolve_revision(db: Session, order_id: uuid.UUID, revision_or_version_id: uuid.UUID) -> PlanRevision | None:
+    """Ревизия по ее id или последняя ревизия версии order_plan_versions с этим id"""
+    revision = db.get(PlanRevision, revision_or_version_id)
+    if revision is not None:
+        return revision if revision.order_id == order_id else None
+    return db.scalar(
+        select(PlanRevision)
+        .where(PlanRevision.order_id == order_id, PlanRevision.version_id == revision_or_version_id)
+        .order_by(PlanRevision.seq.desc())
+        .limit(1)
+    )
@@ -0,0 +1,576 @@
+"""Распознавание плана по растровому изображению (только CPU, NumPy).
+
+Конвейер:
+1. перевод в оттенки серого и бинаризация порогом Оцу;
+2. поиск осевых стен: морфологическое открытие горизонтальным/вертикальным
+   элементом (отбор длинных серий пикселей) и склейка серий в полосы;
+3. поиск наклонных стен преобразованием Хафа по оставшимся пикселям;
+4. поиск проемов: разрывы между соосными стенами одной толщины
+   (тонкие линии внутри разрыва — окно, пустой разрыв — дверь);
+5. выделение помещений: связные области свободного пространства внутри
+   замкнутого контура стен и их обход по границе в многоугольник.
+
+Модуль не зависит от настроек приложения и БД, чтобы его можно было
+запускать в отдельном процессе (см. plan_recognition_service).
+"""
+from __future__ import annotations
+
+import math
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from pathlib import Path
+
+import numpy as np
+
+DOOR_WIDTH_M = 0.9
+
+
+@dataclass
+class RecognitionParams:
+    default_px_per_meter: float = 100.0
+    min_wall_thickness_px: int = 3
+    max_wall_thickness_ratio: float = 0.08
+    min_wall_length_ratio: float = 0.02
+    min_opening_m: float = 0.5
+    max_opening_m: float = 2.6
+    min_room_area_m2: float = 1.0
+    load_bearing_thickness_ratio: float = 1.25
+    grid_max_side: int = 320
+    hough_max_lines: int = 20
+
+
+@dataclass
+class DetectedWall:
+    x1: float
+    y1: float
+    x2: float
+    y2: float
+    thickness: float
+    orientation: str  # "h", "v" или "d"
+    openings: list[tuple[float, float, str]] = field(default_factory=list)
+
+    @property
+    def length(self) -> float:
+        return math.hypot(self.x2 - self.x1, self.y2 - self.y1)
+
+
+@dataclass
+class RecognitionResult:
+    plan: dict
+    confidence: float
+    errors: list[str]
+    processing_time_ms: int
+
+
+# --- загрузка и бинаризация -------------------------------------------------
+
+
+def load_grayscale(path: str | Path) -> np.ndarray:
+    from PIL import Image
+
+    with Image.open(path) as img:
+        return np.asarray(img.convert("L"), dtype=np.uint8)
+
+
+def otsu_threshold(gray: np.ndarray) -> int:
+    hist = np.bincount(gray.ravel(), minlength=256).astype(np.float64)
+    total = hist.sum()
+    if total == 0:
+        return 128
+    levels = np.arange(256, dtype=np.float64)
+    weight_bg = np.cumsum(hist)
+    weight_fg = total - weight_bg
+    cum_mean = np.cumsum(hist * levels)
+    mean_total = cum_mean[-1]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mean_bg = cum_mean / weight_bg
+        mean_fg = (mean_total - cum_mean) / weight_fg
+        between = weight_bg * weight_fg * (mean_bg - mean_fg) ** 2
+    between = np.nan_to_num(between)
+    return int(np.argmax(between))
+
+
+def binarize(gray: np.ndarray) -> np.ndarray:
+    """Маска «чернил» (True — линия/стена)"""
+    return gray <= otsu_threshold(gray)
+
+
+def majority_filter(mask: np.ndarray) -> np.ndarray:
+    """Мажоритарный фильтр 3x3: убирает шум и однопиксельные линии, сохраняя стены"""
+    padded = np.pad(mask.astype(np.uint8), 1)
+    h, w = mask.shape
+    total = sum(padded[dy: dy + h, dx: dx + w] for dy in range(3) for dx in range(3))
+    return total >= 5
+
+
+# --- осевые стены -----------------------------------------------------------
+
+
+def _row_runs(mask: np.ndarray, min_len: int) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Серии True по строкам длиной >= min_len: (строка, начало, конец не включительно)"""
+    h, w = mask.shape
+    padded = np.zeros((h, w + 2), dtype=np.int8)
+    padded[:, 1:-1] = mask
+    diff = np.diff(padded, axis=1)
+    start_rows, starts = np.nonzero(diff == 1)
+    _end_rows, ends = np.nonzero(diff == -1)
+    keep = (ends - starts) >= min_len
+    return start_rows[keep], starts[keep], ends[keep]
+
+
+def _group_bands(rows: np.ndarray, starts: np.ndarray, ends: np.ndarray) -> list[dict]:
+    """Склеить серии соседних строк с перекрытием в полосы (кандидаты в стены)"""
+    bands: list[dict] = []
+    active: list[dict] = []
+    for r, s, e in zip(rows.tolist(), starts.tolist(), ends.tolist()):
+        active = [b for b in active if b["last"] >= r - 1]
+        match = None
+        for band in active:
+            if band["last"] != r - 1:
+                continue
+            overlap = min(e, band["end"]) - max(s, band["start"])
+            if overlap >= 0.5 * min(e - s, band["end"] - band["start"]):
+                match = band
+                break
+        if match is None:
+            match = {"first": r, "last": r, "start": s, "end": e, "starts": [], "ends": []}
+            bands.append(match)
+            active.append(match)
+        match["last"] = r
+        match["start"], match["end"] = s, e
+        match["starts"].append(s)
+        match["ends"].append(e)
+    return bands
+
+
+def _axis_walls(mask: np.ndarray, min_len: int, min_thick: int, max_thick: int, orientation: str) -> list[DetectedWall]:
+    source = mask if orientation == "h" else mask.T
+    rows, starts, ends = _row_runs(source, min_len)
+    walls: list[DetectedWall] = []
+    for band in _group_bands(rows, starts, ends):
+        thickness = band["last"] - band["first"] + 1
+        if thickness < min_thick or thickness > max_thick:
+            continue
+        a = float(np.median(band["starts"]))
+        b = float(np.median(band["ends"]))
+        if b - a < min_len:
+            continue
+        center = (band["first"] + band["last"] + 1) / 2
+        if orientation == "h":
+            walls.append(DetectedWall(a, center, b, center, float(thickness), "h"))
+        else:
+            walls.append(DetectedWall(center, a, center, b, float(thickness), "v"))
+    return walls
+
+
+# --- наклонные стены (Хаф) --------------------------------------------------
+
+
+def _rasterize_walls(shape: tuple[int, int], walls: list[DetectedWall], scale: float = 1.0, pad: float = 0.0) -> np.ndarray:
+    h, w = shape
+    out = np.zeros((h, w), dtype=bool)
+    if not walls:
+        return out
+    ys, xs = np.mgrid[0:h, 0:w]
+    px = (xs + 0.5) / scale
+    py = (ys + 0.5) / scale
+    for wall in walls:
+        half = wall.thickness / 2 + pad
+        if wall.orientation in ("h", "v"):
+            x0, x1 = sorted((wall.x1, wall.x2))
+            y0, y1 = sorted((wall.y1, wall.y2))
+            if wall.orientation == "h":
+                y0, y1 = wall.y1 - half, wall.y1 + half
+                x0, x1 = x0 - pad, x1 + pad
+            else:
+                x0, x1 = wall.x1 - half, wall.x1 + half
+                y0, y1 = y0 - pad, y1 + pad
+            r0, r1 = max(int(math.floor(y0 * scale)), 0), min(int(math.ceil(y1 * scale)), h)
+            c0, c1 = max(int(math.floor(x0 * scale)), 0), min(int(math.ceil(x1 * scale)), w)
+            out[r0:r1, c0:c1] = True
+            continue
+        dx, dy = wall.x2 - wall.x1, wall.y2 - wall.y1
+        length = math.hypot(dx, dy) or 1.0
+        ux, uy = dx / length, dy / length
+        t = (px - wall.x1) * ux + (py - wall.y1) * uy
+        d = np.abs((px - wall.x1) * uy - (py - wall.y1) * ux)
+        out |= (t >= -pad) & (t <= length + pad) & (d <= half)
+    return out
+
+
+def _hough_walls(mask: np.ndarray, params: RecognitionParams, min_len: int, min_thick: int) -> list[DetectedWall]:
+    ys, xs = np.nonzero(mask)
+    if len(xs) < min_len * min_thick:
+        return []
+    if len(xs) > 20000:
+        idx = np.random.default_rng(0).choice(len(xs), 20000, replace=False)
+        ys, xs = ys[idx], xs[idx]
+    xs = xs.astype(np.float64) + 0.5
+    ys = ys.astype(np.float64) + 0.5
+    thetas = np.deg2rad(np.arange(0, 180, 1.0))
+    cos_t, sin_t = np.cos(thetas), np.sin(thetas)
+    diag = int(math.ceil(math.hypot(*mask.shape)))
+    theta_idx = np.arange(len(thetas))
+    # Голоса с учетом прореживания: порог по длине масштабируется долей точек
+    vote_scale = len(xs) / max(int(mask.sum()), 1)
+
+    walls: list[DetectedWall] = []
+    remaining = np.ones(len(xs), dtype=bool)
+    for _ in range(params.hough_max_lines):
+        px, py = xs[remaining], ys[remaining]
+        if len(px) < min_len * vote_scale:
+            break
+        rhos = np.rint(px[:, None] * cos_t + py[:, None] * sin_t).astype(np.int64) + diag
+        acc = np.zeros((2 * diag + 1, len(thetas)), dtype=np.int32)
+        np.add.at(acc, (rhos, np.broadcast_to(theta_idx, rhos.shape)), 1)
+        r_idx, t_idx = np.unravel_index(int(np.argmax(acc)), acc.shape)
+        if acc[r_idx, t_idx] < min_len * vote_scale:
+            break
+        theta = thetas[t_idx]
+        nx, ny = math.cos(theta), math.sin(theta)
+        ux, uy = -ny, nx
+        dist = xs * nx + ys * ny - (r_idx - diag)
+        near = remaining & (np.abs(dist) <= max(min_thick * 2, 4))
+        proj = xs * ux + ys * uy
+        order = np.sort(proj[near])
+        breaks = np.nonzero(np.diff(order) > min_thick * 2)[0]
+        bounds = np.concatenate(([0], breaks + 1, [len(order)]))
+        lengths = order[bounds[1:] - 1] - order[bounds[:-1]]
+        best = int(np.argmax(lengths))
+        t0, t1 = float(order[bounds[best]]), float(order[bounds[best + 1] - 1])
+        in_span = (proj >= t0) & (proj <= t1)
+        center = float(np.median(dist[near & in_span]))
+        # Полоса стены вокруг уточненной оси: оценка толщины и удаление ее точек
+        band = remaining & in_span & (np.abs(dist - center) <= params.max_wall_thickness_ratio * min(mask.shape))
+        offsets = np.sort(dist[band] - center)
+        lo, hi = np.percentile(offsets, [2, 98]) if len(offsets) else (0.0, 0.0)
+        thickness = float(hi - lo + 1)
+        remaining &= ~(in_span & (dist >= lo + center - 1.5) & (dist <= hi + center + 1.5))
+        if t1 - t0 < min_len or thickness < min_thick:
+            continue
+        offset = (r_idx - diag) + center + (lo + hi) / 2
+        walls.append(DetectedWall(
+            nx * offset + ux * t0, ny * offset + uy * t0,
+            nx * offset + ux * t1, ny * offset + uy * t1,
+            thickness, "d",
+        ))
+    return walls
+
+
+# --- проемы и стыковка ------------------------------------------------------
+
+
+def _merge_openings(walls: list[DetectedWall], mask: np.ndarray, min_gap: float, max_gap: float) -> list[DetectedWall]:
+    """Соосные стены одной толщины с разрывом допустимой ширины — одна стена с проемом"""
+    result: list[DetectedWall] = [w for w in walls if w.orientation == "d"]
+    for orientation in ("h", "v"):
+        group = [w for w in walls if w.orientation == orientation]
+        key = (lambda w: (w.y1, w.x1)) if orientation == "h" else (lambda w: (w.x1, w.y1))
+        group.sort(key=key)
+        merged: list[DetectedWall] = []
+        for wall in group:
+            prev = merged[-1] if merged else None
+            if prev is not None:
+                if orientation == "h":
+                    same_line = abs(prev.y1 - wall.y1) <= max(prev.thickness, wall.thickness) / 2
+                    gap_start, gap_end = prev.x2, wall.x1
+                else:
+                    same_line = abs(prev.x1 - wall.x1) <= max(prev.thickness, wall.thickness) / 2
+                    gap_start, gap_end = prev.y2, wall.y1
+                similar = abs(prev.thickness - wall.thickness) <= max(2.0, 0.25 * prev.thickness)
+                gap = gap_end - gap_start
+                if same_line and similar and min_gap <= gap <= max_gap:
+                    half = int(max(prev.thickness / 2, 1))
+                    if orientation == "h":
+                        c = int(round(prev.y1))
+                        region = mask[max(c - half, 0): c + half, int(gap_start): int(gap_end)]
+                    else:
+                        c = int(round(prev.x1))
+                        region = mask[int(gap_start): int(gap_end), max(c - half, 0): c + half]
+                    kind = "window" if region.size and region.mean() > 0.1 else "door"
+                    offset = prev.length
+                    prev.openings.append((offset, offset + gap, kind))
+                    prev.openings.extend((offset + gap + a, offset + gap + b, k) for a, b, k in wall.openings)
+                    if orientation == "h":
+                        prev.x2 = wall.x2
+                    else:
+                        prev.y2 = wall.y2
+                    prev.thickness = max(prev.thickness, wall.thickness)
+                    continue
+            merged.append(wall)
+        result.extend(merged)
+    return result
+
+
+def _snap_endpoints(walls: list[DetectedWall]) -> None:
+    """Подтянуть концы осевых стен к осям перпендикулярных стен на стыках"""
+    horizontal = [w for w in walls if w.orientation == "h"]
+    vertical = [w for w in walls if w.orientation == "v"]
+    for hw in horizontal:
+        for attr in ("x1", "x2"):
+            x = getattr(hw, attr)
+            for vw in vertical:
+                tol = max(hw.thickness, vw.thickness)
+                if abs(vw.x1 - x) <= tol and min(vw.y1, vw.y2) - tol <= hw.y1 <= max(vw.y1, vw.y2) + tol:
+                    shift = vw.x1 - x
+                    if attr == "x1":
+                        hw.openings = [(a - shift, b - shift, k) for a, b, k in hw.openings]
+                    setattr(hw, attr, vw.x1)
+                    break
+    for vw in vertical:
+        for attr in ("y1", "y2"):
+            y = getattr(vw, attr)
+            for hw in horizontal:
+                tol = max(hw.thickness, vw.thickness)
+                if abs(hw.y1 - y) <= tol and min(hw.x1, hw.x2) - tol <= vw.x1 <= max(hw.x1, hw.x2) + tol:
+                    shift = hw.y1 - y
+                    if attr == "y1":
+                        vw.openings = [(a - shift, b - shift, k) for a, b, k in vw.openings]
+                    setattr(vw, attr, hw.y1)
+                    break
+
+
+# --- помещения --------------------------------------------------------------
+
+
+def _label_components(free: np.ndarray) -> tuple[np.ndarray, int]:
+    """Разметка 4-связных компонент (обход в ширину по уменьшенной сетке)"""
+    h, w = free.shape
+    labels = np.zeros((h, w), dtype=np.int32)
+    flat_free = free.ravel()
+    flat_labels = labels.ravel()
+    current = 0
+    for start in np.flatnonzero(flat_free):
+        if flat_labels[start]:
+            continue
+        current += 1
+        flat_labels[start] = current
+        queue = deque([int(start)])
+        while queue:
+            idx = queue.popleft()
+            r, c = divmod(idx, w)
+            for n, ok in ((idx - w, r > 0), (idx + w, r < h - 1), (idx - 1, c > 0), (idx + 1, c < w - 1)):
+                if ok and flat_free[n] and not flat_labels[n]:
+                    flat_labels[n] = current
+                    queue.append(n)
+    return labels, current
+
+
+def _trace_outline(component: np.ndarray) -> list[tuple[int, int]]:
+    """Внешний контур компоненты по граням ячеек с удалением коллинеарных вершин"""
+    m = np.pad(component, 1)
+    edges: dict[tuple[int, int], list[tuple[int, int]]] = {}
+
+    def add(a: tuple[int, int], b: tuple[int, int]) -> None:
+        edges.setdefault(a, []).append(b)
+
+    inside = m[1:-1, 1:-1]
+    for dy, dx, make in (
+        (-1, 0, lambda y, x: ((x, y), (x + 1, y))),
+        (1, 0, lambda y, x: ((x + 1, y + 1), (x, y + 1))),
+        (0, -1, lambda y, x: ((x, y + 1), (x, y))),
+        (0, 1, lambda y, x: ((x + 1, y), (x + 1, y + 1))),
+    ):
+        neighbour = m[1 + dy: m.shape[0] - 1 + dy, 1 + dx: m.shape[1] - 1 + dx]
+        for y, x in zip(*np.nonzero(inside & ~neighbour)):
+            add(*make(int(y), int(x)))
+
+    loops: list[list[tuple[int, int]]] = []
+    while edges:
+        start = next(iter(edges))
+        loop = [start]
+        current = start
+        while True:
+            targets = edges.get(current)
+            if not targets:
+                break
+            nxt = targets.pop()
+            if not targets:
+                del edges[current]
+            if nxt == start:
+                break
+            loop.append(nxt)
+            current = nxt
+        loops.append(loop)
+    outline = max(loops, key=len) if loops else []
+
+    simplified: list[tuple[int, int]] = []
+    n = len(outline)
+    for i, p in enumerate(outline):
+        a, b = outline[i - 1], outline[(i + 1) % n]
+        if (p[0] - a[0]) * (b[1] - p[1]) - (p[1] - a[1]) * (b[0] - p[0]) != 0:
+            simplified.append(p)
+    return simplified
+
+
+def _simplify(points: list[tuple[float, float]], tolerance: float) -> list[tuple[float, float]]:
+    """Дуглас-Пекер для замкнутого контура (сглаживает «лесенку» наклонных стен)"""
+    if len(points) <= 4:
+        return points
+    pts = np.asarray(points, dtype=np.float64)
+    keep = np.zeros(len(pts), dtype=bool)
+    # Опорные точки — самая левая-верхняя и самая удаленная от нее
+    first = int(np.argmin(pts[:, 0] + pts[:, 1]))
+    second = int(np.argmax(np.hypot(*(pts - pts[first]).T)))
+    keep[[first, second]] = True
+    stack = [(first, second), (second, first)]
+    n = len(pts)
+    while stack:
+        a, b = stack.pop()
+        idx = (np.arange(a + 1, a + ((b - a) % n)) % n)
+        if len(idx) == 0:
+            continue
+        seg = pts[b] - pts[a]
+        norm = math.hypot(*seg) or 1.0
+        d = np.abs(seg[0] * (pts[idx, 1] - pts[a, 1]) - seg[1] * (pts[idx, 0] - pts[a, 0])) / norm
+        worst = int(np.argmax(d))
+        if d[worst] > tolerance:
+            mid = int(idx[worst])
+            keep[mid] = True
+            stack.extend(((a, mid), (mid, b)))
+    return [tuple(p) for p in pts[keep]]
+
+
+def _polygon_area(points: list[tuple[float, float]]) -> float:
+    xs = np.array([p[0] for p in points], dtype=np.float64)
+    ys = np.array([p[1] for p in points], dtype=np.float64)
+    return float(abs(np.dot(xs, np.roll(ys, -1)) - np.dot(ys, np.roll(xs, -1))) / 2)
+
+
+def _detect_rooms(shape: tuple[int, int], walls: list[DetectedWall], params: RecognitionParams, px_per_meter: float) -> list[list[tuple[float, float]]]:
+    h, w = shape
+    factor = max(1, int(math.ceil(max(h, w) / params.grid_max_side)))
+    scale = 1.0 / factor
+    grid_shape = (int(math.ceil(h * scale)), int(math.ceil(w * scale)))
+    # Проемы закрыты: стены растеризуются целиком, чтобы помещения не сливались
+    closed = _rasterize_walls(grid_shape, walls, scale=scale, pad=factor / 2)
+    labels, count = _label_components(~closed)
+    if count == 0:
+        return []
+    border = np.unique(np.concatenate((labels[0], labels[-1], labels[:, 0], labels[:, -1])))
+    sizes = np.bincount(labels.ravel(), minlength=count + 1)
+    min_cells = params.min_room_area_m2 * (px_per_meter * scale) ** 2
+    rooms: list[list[tuple[float, float]]] = []
+    for label in range(1, count + 1):
+        if label in border or sizes[label] < min_cells:
+            continue
+        outline = _simplify(_trace_outline(labels == label), tolerance=1.5)
+        if len(outline) >= 3:
+            rooms.append([(x * factor, y * factor) for x, y in outline])
+    return rooms
+
+
+# --- сборка плана -----------------------------------------------------------
+
+
+def _estimate_scale(walls: list[DetectedWall], params: RecognitionParams) -> tuple[float, bool]:
+    doors = [b - a for w in walls for a, b, k in w.openings if k == "door"]
+    if doors:
+        return float(np.median(doors)) / DOOR_WIDTH_M, True
+    return params.default_px_per_meter, False
+
+
+def _build_plan(shape: tuple[int, int], walls: list[DetectedWall], rooms: list[list[tuple[float, float]]], px_per_meter: float, params: RecognitionParams) -> dict:
+    h, w = shape
+    median_thickness = float(np.median([wall.thickness for wall in walls])) if walls else 0.0
+    elements: list[dict] = []
+    for idx, wall in enumerate(walls, start=1):
+        openings = []
+        for o_idx, (a, b, kind) in enumerate(sorted(wall.openings), start=1):
+            bottom, top = (0.0, 2.0) if kind == "door" else (0.9, 2.1)
+            openings.append({
+                "id": f"opening_{idx}_{o_idx}",
+                "type": kind,
+                "from_m": round(float(max(a, 0.0)) / px_per_meter, 3),
+                "to_m": round(float(max(b, 0.0)) / px_per_meter, 3),
+                "bottom_m": bottom,
+                "top_m": top,
+            })
+        elements.append({
+            "id": f"wall_{idx}",
+            "type": "wall",
+            "role": "EXISTING",
+            "loadBearing": bool(wall.thickness >= median_thickness * params.load_bearing_thickness_ratio),
+            "thickness": round(float(wall.thickness), 1),
+            "geometry": {
+                "kind": "segment",
+                "points": [round(float(v), 1) for v in (wall.x1, wall.y1, wall.x2, wall.y2)],
+                "openings": openings or None,
+            },
+        })
+    for idx, outline in enumerate(rooms, start=1):
+        elements.append({
+            "id": f"zone_{idx}",
+            "type": "zone",
+            "role": "EXISTING",
+            "zoneType": "room",
+            "geometry": {"kind": "polygon", "points": [round(float(v), 1) for p in outline for v in p]},
+        })
+    return {
+        "meta": {
+            "width": float(w),
+            "height": float(h),
+            "unit": "px",
+            "scale": {"px_per_meter": round(float(px_per_meter), 3)},
+            "background": None,
+        },
+        "elements": elements,
+        "objects3d": [],
+    }
+
+
+def recognize_array(gray: np.ndarray, params: RecognitionParams | None = None) -> RecognitionResult:
+    """Распознать план по изображению в оттенках серого (uint8, HxW)"""
+    params = params or RecognitionParams()
+    started = time.perf_counter()
+    errors: list[str] = []
+    h, w = gray.shape
+    mask = binarize(gray)
+    solid = majority_filter(mask)
+
+    min_len = max(int(params.min_wall_length_ratio * max(h, w)), 10)
+    min_thick = params.min_wall_thickness_px
+    max_thick = max(int(params.max_wall_thickness_ratio * min(h, w)), min_thick + 1)
+
+    walls = _axis_walls(solid, min_len, min_thick, max_thick, "h") + _axis_walls(solid, min_len, min_thick, max_thick, "v")
+    # Тонкие линии (окна, мебель, надписи) уже отброшены фильтром, остаток — кандидаты в наклонные стены
+    residual = solid & ~_rasterize_walls(mask.shape, walls, pad=2.0)
+    walls += _hough_walls(residual, params, min_len, min_thick)
+
+    min_gap = params.min_opening_m * params.default_px_per_meter * 0.5
+    max_gap = params.max_opening_m * params.default_px_per_meter * 2.0
+    walls = _merge_openings(walls, mask, min_gap, max_gap)
+    _snap_endpoints(walls)
+
+    px_per_meter, scale_found = _estimate_scale(walls, params)
+    if not scale_found:
+        errors.append(f"Масштаб не определен, принят {px_per_meter:g} px/м")
+
+    rooms = _detect_rooms(mask.shape, walls, params, px_per_meter) if walls else []
+    if not walls:
+        errors.append("Стены не обнаружены")
+    elif not rooms:
+        errors.append("Не удалось выделить помещения: контур стен не замкнут")
+
+    ink = mask.sum()
+    coverage = float((mask & _rasterize_walls(mask.shape, walls, pad=1.0)).sum() / ink) if ink else 0.0
+    closure = 0.0
+    if rooms:
+        xs = [p for wall in walls for p in (wall.x1, wall.x2)]
+        ys = [p for wall in walls for p in (wall.y1, wall.y2)]
+        envelope = max((max(xs) - min(xs)) * (max(ys) - min(ys)), 1.0)
+        closure = min(sum(_polygon_area(r) for r in rooms) / envelope, 1.0)
+    confidence = round(max(0.0, min(1.0, 0.6 * coverage + 0.4 * closure)), 3)
+
+    plan = _build_plan(mask.shape, walls, rooms, px_per_meter, params)
+    elapsed_ms = int((time.perf_counter() - started) * 1000)
+    return RecognitionResult(plan=plan, confidence=confidence, errors=errors, processing_time_ms=elapsed_ms)
+
+
+def recognize_file(path: str, params: RecognitionParams | None = None) -> RecognitionResult:
+    started = time.perf_counter()
+    gray = load_grayscale(path)
+    result = recognize_array(gray, params)
+    result.processing_time_ms = int((time.perf_counter() - started) * 1000)
+    return result
@@ -0,0 +1,264 @@
+"""Упрощенные уровни детализации (LOD) плана для обзорных экранов и превью.
+
+Уровень 0 — план целиком. Для уровней 1 и 2 допуск и порог размера задаются
+долей диагонали габаритов плана:
+
+* полигоны зон упрощаются по Дугласу–Пекеру, слишком мелкие зоны отбрасываются;
+* стены одного вида (роль, несущая, толщина), сходящиеся в точке только
+  вдвоем и лежащие на одной прямой в пределах допуска, сливаются в одну,
+  проемы переносятся со сдвигом;
+* короткие стены, мелкие объекты и (на уровне 2) подписи и проемы отбрасываются;
+* координаты округляются до 0.1 px.
+
+Все уровни версии строятся за один раз и кэшируются по хэшу содержимого.
+"""
+from __future__ import annotations
+
+import math
+import threading
+from collections import OrderedDict
+from copy import deepcopy
+from dataclasses import dataclass
+
+import numpy as np
+
+from app.core.config import settings
+from app.models.order import plan_content_hash
+from app.services import plan_geometry
+
+LOD_FORMAT_VERSION = 1
+MAX_LEVEL = 2
+
+
+@dataclass(frozen=True)
+class LodLevel:
+    tolerance: float  # допуск упрощения, доля диагонали плана
+    min_size: float  # элементы меньше этого (доля диагонали) отбрасываются
+    labels: bool  # оставлять подписи
+    openings: bool  # оставлять проемы стен
+
+
+LEVELS = {
+    1: LodLevel(tolerance=0.002, min_size=0.01, labels=True, openings=True),
+    2: LodLevel(tolerance=0.006, min_size=0.03, labels=False, openings=False),
+}
+
+
+def douglas_peucker(points: np.ndarray, tolerance: float) -> np.ndarray:
+    """Упростить ломаную (K, 2); концы сохраняются"""
+    if len(points) < 3:
+        return points
+    keep = np.zeros(len(points), dtype=bool)
+    keep[0] = keep[-1] = True
+    stack = [(0, len(points) - 1)]
+    while stack:
+        first, last = stack.pop()
+        if last - first < 2:
+            continue
+        start, end = points[first], points[last]
+        inner = points[first + 1:last]
+        dx, dy = end - start
+        length = math.hypot(dx, dy)
+        if length == 0:
+            distances = np.hypot(inner[:, 0] - start[0], inner[:, 1] - start[1])
+        else:
+            distances = np.abs(dx * (inner[:, 1] - start[1]) - dy * (inner[:, 0] - start[0])) / length
+        idx = int(np.argmax(distances))
+        if distances[idx] > tolerance:
+            split = first + 1 + idx
+            keep[split] = True
+            stack.append((first, split))
+            stack.append((split, last))
+    return points[keep]
+
+
+def simplify_polygon(points: np.ndarray, tolerance: float) -> np.ndarray:
+    """Упростить замкнутый полигон (K, 2): две ломаные между вершиной 0 и самой дальней от нее"""
+    if len(points) <= 3:
+        return points
+    far = int(np.argmax(np.hypot(points[:, 0] - points[0, 0], points[:, 1] - points[0, 1])))
+    if far == 0:
+        return points
+    first = douglas_peucker(points[: far + 1], tolerance)
+    second = douglas_peucker(np.vstack((points[far:], points[:1])), tolerance)
+    result = np.vstack((first, second[1:-1]))
+    return result if len(result) >= 3 else points
+
+
+# --- слияние стен -----------------------------------------------------------
+
+
+def _wall_kind(elem: dict) -> tuple:
+    return (
+        elem.get("type"), elem.get("role"), bool(elem.get("loadBearing")),
+        round(float(elem.get("thickness") or 0), 3), (elem.get("style") or {}).get("color"),
+    )
+
+
+def _reversed_wall(elem: dict, length_m: float) -> dict:
+    geometry = elem["geometry"]
+    x1, y1, x2, y2 = geometry["points"]
+    openings = [
+        {**o, "from_m": max(length_m - float(o.get("to_m") or 0), 0.0), "to_m": max(length_m - float(o.get("from_m") or 0), 0.0)}
+        for o in geometry.get("openings") or []
+    ]
+    return {**elem, "geometry": {**geometry, "points": [x2, y2, x1, y1], "openings": openings or None}}
+
+
+def merge_collinear_walls(walls: list[dict], tolerance_px: float, px_per_meter: float) -> list[dict]:
+    """Слить цепочки стен одного вида, лежащие на одной прямой (порядок первых стен сохраняется)"""
+    walls = list(walls)
+    cell = max(tolerance_px, 1e-6)
+
+    def node(x: float, y: float) -> tuple[int, int]:
+        return round(x / cell), round(y / cell)
+
+    while True:
+        ends: dict[tuple[int, int], list[tuple[int, int]]] = {}
+        for idx, wall in enumerate(walls):
+            if wall is None:
+                continue
+            x1, y1, x2, y2 = wall["geometry"]["points"]
+            ends.setdefault(node(x1, y1), []).append((idx, 0))
+            ends.setdefault(node(x2, y2), []).append((idx, 1))
+        used: set[int] = set()
+        merged = False
+        for pair in ends.values():
+            if len(pair) != 2:
+                continue
+            (i, end_i), (j, end_j) = pair
+            if i == j or i in used or j in used or _wall_kind(walls[i]) != _wall_kind(walls[j]):
+                continue
+            a, b = walls[i], walls[j]
+            len_a = math.dist(a["geometry"]["points"][:2], a["geometry"]["points"][2:]) / px_per_meter
+            len_b = math.dist(b["geometry"]["points"][:2], b["geometry"]["points"][2:]) / px_per_meter
+            # a заканчивается в общей точке, b из нее начинается
+            if end_i == 0:
+                a = _reversed_wall(a, len_a)
+            if end_j == 1:
+                b = _reversed_wall(b, len_b)
+            ax1, ay1, ax2, ay2 = a["geometry"]["points"]
+            bx1, by1, bx2, by2 = b["geometry"]["points"]
+            dx, dy = bx2 - ax1, by2 - ay1
+            span = math.hypot(dx, dy)
+            if span == 0 or (ax2 - ax1) * (bx2 - bx1) + (ay2 - ay1) * (by2 - by1) <= 0:
+                continue
+            if abs(dx * (ay2 - ay1) - dy * (ax2 - ax1)) / span > tolerance_px:
+                continue
+            openings = list(a["geometry"].get("openings") or []) + [
+                {**o, "from_m": float(o.get("from_m") or 0) + len_a, "to_m": float(o.get("to_m") or 0) + len_a}
+                for o in b["geometry"].get("openings") or []
+            ]
+            # Слитая стена сохраняет id первой: схема плана не допускает лишних полей
+            walls[i] = {
+                **a,
+                "id": walls[i].get("id"),
+                "geometry": {**a["geometry"], "points": [ax1, ay1, bx2, by2], "openings": openings or None},
+            }
+            walls[j] = None
+            used.update((i, j))
+            merged = True
+        if not merged:
+            return [wall for wall in walls if wall is not None]
+
+
+# --- уровни -----------------------------------------------------------------
+
+
+def _round(values, digits: int = 1) -> list[float]:
+    return [round(float(v), digits) for v in values]
+
+
+def build_level(plan: dict, level: int) -> dict:
+    """Упрощенный план уровня level (1..MAX_LEVEL); исходный план не меняется"""
+    params = LEVELS[level]
+    arrays = plan_geometry.load(plan)
+    bbox = plan_geometry.plan_bbox(arrays)
+    diagonal = math.hypot(bbox[2] - bbox[0], bbox[3] - bbox[1]) if bbox else 0.0
+    tolerance = params.tolerance * diagonal
+    min_size = params.min_size * diagonal
+    scale = plan_geometry.px_per_meter(plan)
+
+    sizes = plan_geometry.element_bboxes(arrays)
+    extent = np.fmax(sizes[:, 2] - sizes[:, 0], sizes[:, 3] - sizes[:, 1])
+    polygon_index = {int(row): i for i, row in enumerate(arrays.polygon_rows)}
+    offsets = arrays.polygon_offsets
+
+    elements: list[dict] = []
+    walls: list[dict] = []
+    for row, elem in enumerate(arrays.elements):
+        geometry = elem.get("geometry") or {}
+        kind = geometry.get("kind")
+        if kind == "point":
+            if params.labels:
+                elements.append(elem)
+        elif kind == "segment":
+            if elem.get("type") == "wall" and len(geometry.get("points") or []) == 4:
+                walls.append(elem)
+            elif not (extent[row] < min_size):
+                elements.append(elem)
+        elif kind == "polygon" and row in polygon_index:
+            if extent[row] < min_size:
+                continue
+            i = polygon_index[row]
+            simplified = simplify_polygon(arrays.vertices[offsets[i]:offsets[i + 1]], tolerance)
+            elements.append({**elem, "geometry": {**geometry, "points": _round(simplified.reshape(-1))}})
+        else:
+            elements.append(elem)
+
+    for wall in merge_collinear_walls(walls, tolerance, scale):
+        geometry = wall["geometry"]
+        points = geometry["points"]
+        if math.dist(points[:2], points[2:]) < min_size:
+            continue
+        openings = geometry.get("openings") if params.openings else None
+        elements.append({**wall, "geometry": {**geometry, "points": _round(points), "openings": openings or None}})
+
+    for elem in elements:
+        if elem.get("geometry", {}).get("kind") == "segment" and elem.get("type") != "wall":
+            elem["geometry"] = {**elem["geometry"], "points": _round(elem["geometry"].get("points") or [])}
+
+    objects = []
+    for obj in plan.get("objects3d") or []:
+        size = obj.get("size") or {}
+        footprint = max(float(size.get("x") or 0), float(size.get("z") or 0)) * scale
+        if footprint >= min_size:
+            objects.append(obj)
+
+    result = {key: deepcopy(value) for key, value in plan.items() if key not in ("elements", "objects3d")}
+    result["elements"] = deepcopy(elements)
+    result["objects3d"] = deepcopy(objects)
+    return result
+
+
+def build_levels(plan: dict) -> dict[int, dict]:
+    return {level: build_level(plan, level) for level in LEVELS}
+
+
+_cache: OrderedDict[str, dict[int, dict]] = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def lod_key(plan_hash: str, level: int) -> str:
+    """Ключ для ETag: хэш содержимого плана, уровень и версия алгоритма"""
+    return f"{plan_hash}-l{level}v{LOD_FORMAT_VERSION}"
+
+
+def get_level(plan: dict, level: int, plan_hash: str | None = None) -> dict:
+    """План уровня level; уровни версии строятся вместе и кэшируются"""
+    if level <= 0:
+        return plan
+    level = min(level, MAX_LEVEL)
+    key = plan_hash or plan_content_hash(plan)
+    with _cache_lock:
+        cached = _cache.get(key)
+        if cached is not None:
+            _cache.move_to_end(key)
+            return cached[level]
+    levels = build_levels(plan)
+    with _cache_lock:
+        _cache[key] = levels
+        _cache.move_to_end(key)
+        while len(_cache) > settings.plan_lod_cache_size:
+            _cache.popitem(last=False)
+    return levels[level]
@@ -0,0 +1,391 @@
+"""Построение 3D-сцены плана на сервере в формате glTF (.glb).
+
+Повторяет то, что делает 3D-вьюер фронтенда (``utils/plan3d.ts``): стены —
+параллелепипеды высотой ``ceiling_height_m`` с вырезами под проемы
+(``from_m``/``to_m`` вдоль стены, ``bottom_m``/``top_m`` по высоте), зоны —
+полы по полигонам, ``objects3d`` — коробки с поворотом вокруг Y. Координаты
+в метрах: x — вправо, z — вниз по плану, y — вверх.
+
+Вершины всех параллелепипедов строятся одним векторизованным проходом
+NumPy. Результат кэшируется в памяти по хэшу содержимого плана.
+"""
+from __future__ import annotations
+
+import json
+import math
+import struct
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from app.core.config import settings
+from app.models.order import plan_content_hash
+
+MESH_FORMAT_VERSION = 1
+DEFAULT_PX_PER_METER = 100.0
+DEFAULT_WALL_HEIGHT_M = 2.7
+DEFAULT_WALL_THICKNESS_M = 0.2
+DEFAULT_OBJECT_SIZE = (2.0, 0.8, 1.0)
+FLOOR_OFFSET_M = 0.001
+
+WALL_COLOR = "#9ca3af"
+LOAD_BEARING_WALL_COLOR = "#475569"
+OBJECT_COLOR = "#94a3b8"
+ZONE_COLORS = {
+    "kitchen": "#f59e0b",
+    "bathroom": "#38bdf8",
+    "living_room": "#34d399",
+    "bedroom": "#a855f7",
+}
+DEFAULT_ZONE_COLOR = "#e2e8f0"
+ZONE_OPACITY = 0.75
+
+# Единичный куб в локальных осях (u — вдоль стены, y — вверх, v — по нормали):
+# 6 граней по 4 вершины, обход против часовой стрелки снаружи
+_CUBE_CORNERS = np.array([
+    [(1, 0, 0), (1, 1, 0), (1, 1, 1), (1, 0, 1)],  # +u
+    [(0, 0, 0), (0, 0, 1), (0, 1, 1), (0, 1, 0)],  # -u
+    [(0, 1, 0), (0, 1, 1), (1, 1, 1), (1, 1, 0)],  # +y
+    [(0, 0, 0), (1, 0, 0), (1, 0, 1), (0, 0, 1)],  # -y
+    [(0, 0, 1), (1, 0, 1), (1, 1, 1), (0, 1, 1)],  # +v
+    [(0, 0, 0), (0, 1, 0), (1, 1, 0), (1, 0, 0)],  # -v
+], dtype=np.float64).reshape(24, 3)
+_CUBE_NORMALS = np.repeat(np.array([
+    (1, 0, 0), (-1, 0, 0), (0, 1, 0), (0, -1, 0), (0, 0, 1), (0, 0, -1),
+], dtype=np.float64), 4, axis=0)
+_CUBE_INDICES = (np.arange(6)[:, None] * 4 + np.array([0, 1, 2, 0, 2, 3])).reshape(-1)
+
+
+class _Boxes:
+    """Накопитель параметров параллелепипедов одного материала"""
+
+    def __init__(self):
+        self.rows: list[tuple] = []
+        self.owners: list[str] = []
+
+    def add(self, owner: str, ox: float, oz: float, dx: float, dz: float,
+            u0: float, u1: float, y0: float, y1: float, half: float) -> None:
+        if u1 - u0 > 1e-6 and y1 - y0 > 1e-6 and half > 0:
+            self.rows.append((ox, oz, dx, dz, u0, u1, y0, y1, half))
+            self.owners.append(owner)
+
+
+def box_vertices(params: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Вершины, нормали и индексы для N параллелепипедов.
+
+    params — массив (N, 9): начало (ox, oz), единичное направление (dx, dz),
+    интервал вдоль направления (u0, u1), по высоте (y0, y1), половина толщины.
+    """
+    n = len(params)
+    ox, oz, dx, dz, u0, u1, y0, y1, half = (params[:, i:i + 1] for i in range(9))
+    su, sy, sv = _CUBE_CORNERS[:, 0], _CUBE_CORNERS[:, 1], _CUBE_CORNERS[:, 2]
+    u = u0 + su * (u1 - u0)  # (N, 24)
+    v = -half + sv * (2 * half)
+    # Нормаль к стене (-dz, dx): тройка (dir, up, nrm) правая, обход граней сохраняется
+    positions = np.empty((n, 24, 3), dtype=np.float32)
+    positions[..., 0] = ox + dx * u - dz * v
+    positions[..., 1] = y0 + sy * (y1 - y0)
+    positions[..., 2] = oz + dz * u + dx * v
+
+    nu, ny, nv = _CUBE_NORMALS[:, 0], _CUBE_NORMALS[:, 1], _CUBE_NORMALS[:, 2]
+    normals = np.empty((n, 24, 3), dtype=np.float32)
+    normals[..., 0] = dx * nu - dz * nv
+    normals[..., 1] = np.broadcast_to(ny, (n, 24))
+    normals[..., 2] = dz * nu + dx * nv
+
+    indices = (_CUBE_INDICES[None, :] + 24 * np.arange(n)[:, None]).astype(np.uint32)
+    return positions.reshape(-1, 3), normals.reshape(-1, 3), indices.reshape(-1)
+
+
+def _wall_intervals(length: float, height: float, openings: list[dict]) -> list[tuple[float, float, float, float]]:
+    """Куски стены (u0, u1, y0, y1) с вырезами под проемы"""
+    cuts = []
+    for opening in openings or []:
+        start = min(max(float(opening.get("from_m") or 0.0), 0.0), length)
+        end = min(max(float(opening.get("to_m") or 0.0), 0.0), length)
+        if end - start <= 1e-6:
+            continue
+        bottom = min(max(float(opening.get("bottom_m") or 0.0), 0.0), height)
+        top = min(max(float(opening.get("top_m") or height), bottom), height)
+        cuts.append((start, end, bottom, top))
+    cuts.sort()
+
+    pieces = []
+    cursor = 0.0
+    for start, end, bottom, top in cuts:
+        start = max(start, cursor)
+        if end <= start:
+            continue
+        if start > cursor:
+            pieces.append((cursor, start, 0.0, height))
+        if bottom > 0:
+            pieces.append((start, end, 0.0, bottom))
+        if top < height:
+            pieces.append((start, end, top, height))
+        cursor = end
+    if cursor < length:
+        pieces.append((cursor, length, 0.0, height))
+    return pieces
+
+
+def _triangulate(points: np.ndarray) -> list[tuple[int, int, int]]:
+    """Триангуляция простого полигона отсечением ушей"""
+    n = len(points)
+    if n < 3:
+        return []
+    x, z = points[:, 0], points[:, 1]
+    area = float(np.dot(x, np.roll(z, -1)) - np.dot(z, np.roll(x, -1))) / 2
+    order = list(range(n)) if area > 0 else list(range(n - 1, -1, -1))
+
+    def cross(a, b, c) -> float:
+        return (points[b, 0] - points[a, 0]) * (points[c, 1] - points[a, 1]) - \
+               (points[b, 1] - points[a, 1]) * (points[c, 0] - points[a, 0])
+
+    def inside(p, a, b, c) -> bool:
+        return cross(a, b, p) >= 0 and cross(b, c, p) >= 0 and cross(c, a, p) >= 0
+
+    triangles = []
+    guard = 0
+    while len(order) > 3 and guard < n * n:
+        guard += 1
+        for i in range(len(order)):
+            a, b, c = order[i - 1], order[i], order[(i + 1) % len(order)]
+            if cross(a, b, c) <= 1e-12:
+                continue
+            if any(inside(p, a, b, c) for p in order if p not in (a, b, c)):
+                continue
+            triangles.append((a, b, c))
+            order.pop(i)
+            break
+        else:
+            break  # Вырожденный полигон: остаток режем веером
+    for i in range(1, len(order) - 1):
+        triangles.append((order[0], order[i], order[i + 1]))
+    return triangles
+
+
+def _hex_to_rgba(color: str | None, alpha: float = 1.0) -> list[float]:
+    value = (color or "").lstrip("#")
+    if len(value) not in (6, 8):
+        value = "cccccc"
+    channels = [int(value[i:i + 2], 16) / 255 for i in range(0, len(value), 2)]
+    if len(channels) == 3:
+        channels.append(alpha)
+    else:
+        channels[3] *= alpha
+    # glTF ожидает линейный цвет
+    return [round(c ** 2.2, 4) for c in channels[:3]] + [round(channels[3], 4)]
+
+
+class _GlbWriter:
+    def __init__(self):
+        self.buffer = bytearray()
+        self.doc: dict = {
+            "asset": {"version": "2.0", "generator": "bti plan_mesh"},
+            "scene": 0,
+            "scenes": [{"nodes": []}],
+            "nodes": [],
+            "meshes": [],
+            "materials": [],
+            "accessors": [],
+            "bufferViews": [],
+            "buffers": [],
+        }
+
+    def _view(self, data: bytes, target: int) -> int:
+        while len(self.buffer) % 4:
+            self.buffer.append(0)
+        self.doc["bufferViews"].append({
+            "buffer": 0, "byteOffset": len(self.buffer), "byteLength": len(data), "target": target,
+        })
+        self.buffer.extend(data)
+        return len(self.doc["bufferViews"]) - 1
+
+    def _accessor(self, array: np.ndarray, kind: str, component: int, target: int, bounds: bool = False) -> int:
+        accessor = {
+            "bufferView": self._view(array.tobytes(), target),
+            "componentType": component,
+            "count": int(len(array)),
+            "type": kind,
+        }
+        if bounds:
+            accessor["min"] = [float(v) for v in array.min(axis=0)]
+            accessor["max"] = [float(v) for v in array.max(axis=0)]
+        self.doc["accessors"].append(accessor)
+        return len(self.doc["accessors"]) - 1
+
+    def material(self, name: str, rgba: list[float], blend: bool = False, double_sided: bool = False) -> int:
+        material = {
+            "name": name,
+            "pbrMetallicRoughness": {"baseColorFactor": rgba, "metallicFactor": 0.0, "roughnessFactor": 0.9},
+            "doubleSided": double_sided,
+        }
+        if blend:
+            material["alphaMode"] = "BLEND"
+        self.doc["materials"].append(material)
+        return len(self.doc["materials"]) - 1
+
+    def primitive(self, positions: np.ndarray, normals: np.ndarray, indices: np.ndarray,
+                  material: int, extras: dict | None = None) -> dict:
+        primitive = {
+            "attributes": {
+                "POSITION": self._accessor(positions, "VEC3", 5126, 34962, bounds=True),
+                "NORMAL": self._accessor(normals, "VEC3", 5126, 34962),
+            },
+            "indices": self._accessor(indices, "SCALAR", 5125, 34963),
+            "material": material,
+            "mode": 4,
+        }
+        if extras:
+            primitive["extras"] = extras
+        return primitive
+
+    def node(self, name: str, primitives: list[dict]) -> None:
+        if not primitives:
+            return
+        self.doc["meshes"].append({"name": name, "primitives": primitives})
+        self.doc["nodes"].append({"name": name, "mesh": len(self.doc["meshes"]) - 1})
+        self.doc["scenes"][0]["nodes"].append(len(self.doc["nodes"]) - 1)
+
+    def to_bytes(self) -> bytes:
+        while len(self.buffer) % 4:
+            self.buffer.append(0)
+        self.doc["buffers"] = [{"byteLength": len(self.buffer)}] if self.buffer else []
+        if not self.buffer:
+            self.doc.pop("bufferViews")
+            self.doc.pop("accessors")
+        for key in ("meshes", "materials"):
+            if not self.doc[key]:
+                self.doc.pop(key)
+        header_json = json.dumps(self.doc, separators=(",", ":")).encode("utf-8")
+        header_json += b" " * (-len(header_json) % 4)
+        chunks = struct.pack("<II", len(header_json), 0x4E4F534A) + header_json
+        if self.buffer:
+            chunks += struct.pack("<II", len(self.buffer), 0x004E4942) + bytes(self.buffer)
+        return struct.pack("<III", 0x46546C67, 2, 12 + len(chunks)) + chunks
+
+
+def _owner_ranges(owners: list[str], indices_per_owner: int) -> list[list]:
+    """[id, первый индекс, число индексов] для выбора элемента по треугольнику"""
+    ranges: list[list] = []
+    for i, owner in enumerate(owners):
+        if ranges and ranges[-1][0] == owner:
+            ranges[-1][2] += indices_per_owner
+        else:
+            ranges.append([owner, i * indices_per_owner, indices_per_owner])
+    return ranges
+
+
+def build_glb(plan: dict) -> bytes:
+    """Собрать .glb по плану (dict в JSON-форме схемы Plan)"""
+    meta = plan.get("meta") or {}
+    scale = float(((meta.get("scale") or {}).get("px_per_meter")) or DEFAULT_PX_PER_METER)
+    height = float(meta.get("ceiling_height_m") or DEFAULT_WALL_HEIGHT_M)
+    writer = _GlbWriter()
+
+    wall_boxes: dict[str, _Boxes] = {}
+    zones: dict[str, list[tuple[str, np.ndarray]]] = {}
+    for elem in plan.get("elements") or []:
+        geometry = elem.get("geometry") or {}
+        points = geometry.get("points") or []
+        if elem.get("type") == "wall" and geometry.get("kind") == "segment" and len(points) >= 4:
+            x1, z1, x2, z2 = (float(p) / scale for p in points[:4])
+            length = math.hypot(x2 - x1, z2 - z1)
+            if length <= 1e-4:
+                continue
+            thickness = float(elem["thickness"]) / scale if elem.get("thickness") else DEFAULT_WALL_THICKNESS_M
+            color = (elem.get("style") or {}).get("color") or (
+                LOAD_BEARING_WALL_COLOR if elem.get("loadBearing") else WALL_COLOR
+            )
+            boxes = wall_boxes.setdefault(color, _Boxes())
+            dx, dz = (x2 - x1) / length, (z2 - z1) / length
+            for u0, u1, y0, y1 in _wall_intervals(length, height, geometry.get("openings") or []):
+                boxes.add(elem.get("id"), x1, z1, dx, dz, u0, u1, y0, y1, thickness / 2)
+        elif elem.get("type") == "zone" and geometry.get("kind") == "polygon" and len(points) >= 6:
+            color = (elem.get("style") or {}).get("color") or ZONE_COLORS.get(elem.get("zoneType"), DEFAULT_ZONE_COLOR)
+            ring = np.asarray(points[: len(points) // 2 * 2], dtype=np.float64).reshape(-1, 2) / scale
+            zones.setdefault(color, []).append((elem.get("id"), ring))
+
+    primitives = []
+    for color, boxes in wall_boxes.items():
+        if not boxes.rows:
+            continue
+        positions, normals, indices = box_vertices(np.asarray(boxes.rows, dtype=np.float64))
+        material = writer.material(f"wall {color}", _hex_to_rgba(color))
+        primitives.append(writer.primitive(
+            positions, normals, indices, material, {"elements": _owner_ranges(boxes.owners, 36)},
+        ))
+    writer.node("walls", primitives)
+
+    primitives = []
+    for color, rings in zones.items():
+        vertices, triangles, ranges = [], [], []
+        offset = 0
+        for zone_id, ring in rings:
+            tris = _triangulate(ring)
+            if not tris:
+                continue
+            ranges.append([zone_id, len(triangles) * 3, len(tris) * 3])
+            vertices.append(ring)
+            # Треугольники смотрят вверх (+y): в осях (x, z) обход по часовой
+            triangles.extend((offset + a, offset + c, offset + b) for a, b, c in tris)
+            offset += len(ring)
+        if not triangles:
+            continue
+        flat = np.concatenate(vertices)
+        positions = np.column_stack((flat[:, 0], np.full(len(flat), FLOOR_OFFSET_M), flat[:, 1])).astype(np.float32)
+        normals = np.tile(np.array([0, 1, 0], dtype=np.float32), (len(flat), 1))
+        material = writer.material(f"zone {color}", _hex_to_rgba(color, ZONE_OPACITY), blend=True, double_sided=True)
+        primitives.append(writer.primitive(
+            positions, normals, np.asarray(triangles, dtype=np.uint32).reshape(-1), material, {"elements": ranges},
+        ))
+    writer.node("zones", primitives)
+
+    object_boxes = _Boxes()
+    for obj in plan.get("objects3d") or []:
+        size = obj.get("size") or {}
+        sx = float(size.get("x") or DEFAULT_OBJECT_SIZE[0])
+        sy = float(size.get("y") or DEFAULT_OBJECT_SIZE[1])
+        sz = float(size.get("z") or DEFAULT_OBJECT_SIZE[2])
+        position = obj.get("position") or {}
+        cx, cz = float(position.get("x") or 0.0), float(position.get("z") or 0.0)
+        cy = float(position["y"]) if position.get("y") is not None else sy / 2
+        angle = float((obj.get("rotation") or {}).get("y") or 0.0)
+        # Поворот вокруг Y как в three.js: ось X переходит в (cos, 0, -sin)
+        dx, dz = math.cos(angle), -math.sin(angle)
+        object_boxes.add(obj.get("id"), cx - dx * sx / 2, cz - dz * sx / 2, dx, dz, 0.0, sx, cy - sy / 2, cy + sy / 2, sz / 2)
+    if object_boxes.rows:
+        positions, normals, indices = box_vertices(np.asarray(object_boxes.rows, dtype=np.float64))
+        material = writer.material("object", _hex_to_rgba(OBJECT_COLOR))
+        writer.node("objects3d", [writer.primitive(
+            positions, normals, indices, material, {"elements": _owner_ranges(object_boxes.owners, 36)},
+        )])
+
+    return writer.to_bytes()
+
+
+_cache: OrderedDict[str, bytes] = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def mesh_key(plan_hash: str) -> str:
+    """Ключ кэша и ETag: хэш содержимого плана и версия формата сцены"""
+    return f"{plan_hash}-m{MESH_FORMAT_VERSION}"
+
+
+def get_glb(plan: dict, plan_hash: str | None = None) -> tuple[str, bytes]:
+    """.glb плана из кэша или построенный заново; возвращает (ключ, байты)"""
+    key = mesh_key(plan_hash or plan_content_hash(plan))
+    with _cache_lock:
+        cached = _cache.get(key)
+        if cached is not None:
+            _cache.move_to_end(key)
+            return key, cached
+    data = build_glb(plan)
+    with _cache_lock:
+        _cache[key] = data
+        _cache.move_to_end(key)
+        while len(_cache) > settings.plan_mesh_cache_size:
+            _cache.popitem(last=False)
+    return key, data
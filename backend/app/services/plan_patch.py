@@ -0,0 +1,88 @@
+"""Инкрементальное редактирование плана.
+
+Изменение приходит как JSON Patch (RFC 6902) и/или список операций над
+элементами по id: add — новый элемент, update — JSON Merge Patch (RFC 7386)
+к элементу, delete — удаление. Применяется к плану базовой ревизии истории,
+поэтому id — как в сохраненном плане: стены в нем не разрезаны по проемам
+(GET /plan?split=false), а сегменты разрезки (wall_seg1) не редактируются.
+После операций над элементами проверяются только затронутые элементы, после
+JSON Patch — весь план.
+"""
+from __future__ import annotations
+
+from typing import Iterable
+
+from app.schemas.orders import PlanElementOp
+from app.schemas.plan import validated_element_data, validated_plan_data
+from app.services.json_patch import JsonPatchError, apply_patch, merge_patch
+
+
+class PlanPatchError(ValueError):
+    """Операции нельзя применить к базовому плану"""
+
+
+def _not_found_message(elem_id: str, position: dict) -> str:
+    wall_id, sep, suffix = elem_id.rpartition("_seg")
+    if sep and suffix.isdigit() and wall_id in position:
+        return (
+            f"Element '{elem_id}' is a display segment of wall '{wall_id}'; "
+            f"edit '{wall_id}' using ids from GET /plan?split=false"
+        )
+    return f"Element '{elem_id}' not found"
+
+
+def apply_element_ops(plan: dict, ops: Iterable[PlanElementOp]) -> set[str]:
+    """Применить операции к plan["elements"] на месте; вернуть id добавленных и измененных элементов"""
+    elements: list[dict | None] = list(plan.get("elements") or [])
+    position = {elem.get("id"): idx for idx, elem in enumerate(elements)}
+    touched: set[str] = set()
+    for op in ops:
+        idx = position.get(op.id)
+        if op.op == "add":
+            if idx is not None:
+                raise PlanPatchError(f"Element '{op.id}' already exists")
+            if not op.element:
+                raise PlanPatchError(f"Operation 'add' for '{op.id}' requires an element")
+            if op.element.get("id", op.id) != op.id:
+                raise PlanPatchError(f"Element id does not match '{op.id}'")
+            position[op.id] = len(elements)
+            elements.append({**op.element, "id": op.id})
+            touched.add(op.id)
+            continue
+        if idx is None:
+            raise PlanPatchError(_not_found_message(op.id, position))
+        if op.op == "delete":
+            elements[idx] = None
+            del position[op.id]
+            touched.discard(op.id)
+        else:
+            if not op.fields:
+                raise PlanPatchError(f"Operation 'update' for '{op.id}' requires fields")
+            if op.fields.get("id", op.id) != op.id:
+                raise PlanPatchError("Element id cannot be changed by 'update'")
+            elements[idx] = merge_patch(elements[idx], op.fields)
+            touched.add(op.id)
+    plan["elements"] = [elem for elem in elements if elem is not None]
+    return touched
+
+
+def apply(plan: dict, patch: list[dict] | None, element_ops: list[PlanElementOp] | None) -> dict:
+    """Применить изменения к копии базового плана (plan меняется на месте) и проверить результат.
+
+    Ошибки применения — PlanPatchError, ошибки схемы — pydantic.ValidationError.
+    """
+    if patch:
+        try:
+            plan = apply_patch(plan, patch, in_place=True)
+        except JsonPatchError as exc:
+            raise PlanPatchError(str(exc)) from exc
+        if not isinstance(plan, dict):
+            raise PlanPatchError("Patched document is not a plan")
+    touched = apply_element_ops(plan, element_ops or [])
+    if patch:
+        return validated_plan_data(plan)
+    # Базовый план уже проверен при сохранении: достаточно проверить затронутые элементы
+    plan["elements"] = [
+        validated_element_data(elem) if elem.get("id") in touched else elem for elem in plan["elements"]
+    ]
+    return plan
@@ -1,8 +1,20 @@
+import asyncio
+import json
+import logging
 import os
-import copy
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass, field
 from pathlib import Path
 
+from app.core.config import settings
 from app.schemas.plan import Plan
+from app.services.plan_image_recognition import RecognitionParams, RecognitionResult, recognize_file
+
+logger = logging.getLogger(__name__)
 
 # Predefined plan templates; keys are internal template ids
 PLAN_LIBRARY: dict[str, dict] = {
@@ -387,16 +399,199 @@ def normalize_filename(filename: str) -> str:
     return name.lower()
 
 
+@dataclass(frozen=True)
+class PlanTemplate:
+    """Проверенный шаблон плана; экземпляр Plan общий для всех запросов, поэтому наружу отдается только копия"""
+    template_id: str
+    validated_plan: Plan = field(repr=False)
+    source: Path | None = None
+    mtime: float | None = None
+
+    @property
+    def plan(self) -> Plan:
+        """Копия плана шаблона: ее можно менять, шаблон в реестре остается прежним"""
+        return self.validated_plan.model_copy(deep=True)
+
+
+def _compile_template(template_id: str, data: dict, source: Path | None = None, mtime: float | None = None) -> PlanTemplate:
+    return PlanTemplate(
+        template_id=template_id,
+        validated_plan=Plan.model_validate(data),
+        source=source,
+        mtime=mtime,
+    )
+
+
+class TemplateRegistry:
+    """Реестр шаблонов планов.
+
+    Встроенные шаблоны (PLAN_LIBRARY) валидируются один раз при первом обращении.
+    Дополнительные шаблоны читаются из каталога ``settings.plan_templates_dir``:
+    файл ``<template_id>.json`` содержит план либо ``{"plan": {...}, "filenames": [...]}``.
+    Каталог перечитывается не чаще раза в ``plan_templates_reload_seconds``,
+    повторно разбираются только файлы с изменившимся mtime.
+    """
+
+    def __init__(self, library: dict[str, dict], filename_map: dict[str, str], directory: str | None = None):
+        self._library = library
+        self._builtin_filenames = dict(filename_map)
+        self._directory = Path(directory) if directory else None
+        self._templates: dict[str, PlanTemplate] = {}
+        self._filenames: dict[str, str] = {}
+        self._file_templates: dict[Path, tuple[PlanTemplate, list[str]]] = {}
+        self._failed_files: dict[Path, float] = {}
+        self._builtin_loaded = False
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def _load_builtin(self) -> None:
+        for template_id, data in self._library.items():
+            self._templates[template_id] = _compile_template(template_id, data)
+        self._builtin_loaded = True
+
+    def _load_file(self, path: Path, mtime: float) -> tuple[PlanTemplate, list[str]] | None:
+        try:
+            data = json.loads(path.read_text(encoding="utf-8"))
+            if isinstance(data, dict) and "plan" in data:
+                filenames = [normalize_filename(name) for name in data.get("filenames") or []]
+                data = data["plan"]
+            else:
+                filenames = []
+            template = _compile_template(path.stem, data, source=path, mtime=mtime)
+        except (OSError, ValueError) as exc:
+            logger.warning("Skipping plan template %s: %s", path, exc)
+            return None
+        return template, filenames or [normalize_filename(path.stem)]
+
+    def _scan_directory(self) -> None:
+        if self._directory is None or not self._directory.is_dir():
+            loaded: dict[Path, tuple[PlanTemplate, list[str]]] = {}
+        else:
+            loaded = {}
+            for path in sorted(self._directory.glob("*.json")):
+                mtime = path.stat().st_mtime
+                cached = self._file_templates.get(path)
+                if cached and cached[0].mtime == mtime:
+                    loaded[path] = cached
+                    continue
+                if self._failed_files.get(path) == mtime:
+                    continue
+                entry = self._load_file(path, mtime)
+                if entry:
+                    loaded[path] = entry
+                    self._failed_files.pop(path, None)
+                else:
+                    self._failed_files[path] = mtime
+        if loaded.keys() == self._file_templates.keys() and all(
+            loaded[p] is self._file_templates[p] for p in loaded
+        ):
+            return
+        self._file_templates = loaded
+        self._rebuild_index()
+
+    def _rebuild_index(self) -> None:
+        templates = {tid: tpl for tid, tpl in self._templates.items() if tpl.source is None}
+        filenames = dict(self._builtin_filenames)
+        for template, names in self._file_templates.values():
+            templates[template.template_id] = template
+            for name in names:
+                filenames[name] = template.template_id
+        self._templates = templates
+        self._filenames = filenames
+
+    def _ensure_fresh(self) -> None:
+        now = time.monotonic()
+        if self._builtin_loaded and now - self._checked_at < settings.plan_templates_reload_seconds:
+            return
+        with self._lock:
+            if not self._builtin_loaded:
+                self._load_builtin()
+                self._rebuild_index()
+            self._scan_directory()
+            self._checked_at = now
+
+    def get(self, template_id: str) -> PlanTemplate | None:
+        self._ensure_fresh()
+        return self._templates.get(template_id)
+
+    def get_by_filename(self, filename: str) -> PlanTemplate | None:
+        self._ensure_fresh()
+        template_id = self._filenames.get(normalize_filename(filename))
+        return self._templates.get(template_id) if template_id else None
+
+    def supported_filenames(self) -> list[str]:
+        self._ensure_fresh()
+        return sorted(name for name, tid in self._filenames.items() if tid in self._templates)
+
+    def template_ids(self) -> list[str]:
+        self._ensure_fresh()
+        return sorted(self._templates)
+
+
+template_registry = TemplateRegistry(PLAN_LIBRARY, PLAN_TEMPLATES, settings.plan_templates_dir)
+
+
+def get_template_by_filename(filename: str) -> PlanTemplate | None:
+    return template_registry.get_by_filename(filename)
+
+
 def get_plan_by_filename(filename: str) -> Plan | None:
-    key = normalize_filename(filename)
-    template_id = PLAN_TEMPLATES.get(key)
-    if not template_id:
-        return None
-    template = PLAN_LIBRARY.get(template_id)
-    if not template:
-        return None
-    return Plan.model_validate(copy.deepcopy(template))
+    template = template_registry.get_by_filename(filename)
+    # Копия вместо повторной валидации: шаблон в реестре остается неизменным
+    return template.plan if template else None
 
 
 def list_supported_filenames() -> list[str]:
-    return sorted(PLAN_TEMPLATES.keys())
+    return template_registry.supported_filenames()
+
+
+class RecognitionTimeoutError(Exception):
+    """Распознавание изображения не уложилось в таймаут"""
+
+
+_pool: ProcessPoolExecutor | None = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn: дочерние процессы не наследуют соединения с БД и потоки родителя
+            _pool = ProcessPoolExecutor(
+                max_workers=max(settings.recognition_workers, 1),
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _pool
+
+
+def _reset_pool() -> None:
+    """Остановить пул вместе с зависшими процессами; следующий вызов создаст новый"""
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is None:
+        return
+    for process in list(getattr(pool, "_processes", {}).values()):
+        process.terminate()
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+async def recognize_image(path: str | Path, timeout: float | None = None) -> RecognitionResult:
+    """Распознать план по изображению в отдельном процессе с таймаутом.
+
+    Ожидание не блокирует цикл событий, поэтому воркер может распознавать
+    несколько изображений параллельно (до recognition_workers процессов).
+    """
+    params = RecognitionParams(default_px_per_meter=settings.recognition_default_px_per_meter)
+    timeout = timeout if timeout is not None else settings.recognition_timeout_seconds
+    future = _get_pool().submit(recognize_file, str(path), params)
+    try:
+        return await asyncio.wait_for(asyncio.wrap_future(future), timeout)
+    except asyncio.TimeoutError as exc:
+        _reset_pool()
+        raise RecognitionTimeoutError(f"Plan recognition timed out after {timeout:g}s") from exc
+    except BrokenProcessPool:
+        # Процесс упал (например, по памяти): пересоздаем пул, задача уйдет на повтор
+        _reset_pool()
+        raise
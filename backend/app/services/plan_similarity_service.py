@@ -0,0 +1,253 @@
+"""Поиск похожих планов по числовым признакам.
+
+Каждый план сводится к короткому вектору признаков (число помещений, площади
+по типам зон, гистограмма длин стен, пропорции габаритов). Векторы хранятся
+в одной матрице float32, поиск top-k по косинусной близости — одно матричное
+умножение и argpartition. В индекс входят шаблоны библиотеки и ORIGINAL-версии
+планов из заказов.
+"""
+from __future__ import annotations
+
+import math
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.order import OrderPlanVersion, PlanBlob
+from app.schemas.plan import Plan
+from app.services import plan_geometry, plan_recognition_service
+
+ZONE_TYPES = ("living_room", "bedroom", "kitchen", "bathroom", "room")
+WALL_LENGTH_BINS_M = (1.0, 2.0, 3.5, 5.0, 8.0)
+FEATURE_SIZE = 1 + (len(ZONE_TYPES) + 1) + (len(WALL_LENGTH_BINS_M) + 1) + 2
+DEFAULT_PX_PER_METER = 100.0
+
+
+@dataclass(frozen=True)
+class SimilarPlan:
+    source: str  # "template" или "order"
+    score: float
+    template_id: str | None = None
+    order_id: uuid.UUID | None = None
+    version_id: uuid.UUID | None = None
+
+
+def plan_features(plan: dict | Plan) -> np.ndarray:
+    """Вектор признаков плана (L2-нормированный, float32)"""
+    data = plan.model_dump(by_alias=True) if isinstance(plan, Plan) else plan
+    meta = data.get("meta") or {}
+    scale = plan_geometry.px_per_meter(data, default=DEFAULT_PX_PER_METER)
+    arrays = plan_geometry.load(data)
+    types = np.array([elem.get("type") for elem in arrays.elements], dtype=object)
+
+    rooms = int(np.count_nonzero(types == "zone"))
+    zone_areas = np.zeros(len(ZONE_TYPES) + 1, dtype=np.float64)
+    polygon_types = types[arrays.polygon_rows] if len(arrays.polygon_rows) else np.zeros(0, dtype=object)
+    is_zone = polygon_types == "zone"
+    if is_zone.any():
+        slots = np.array([
+            ZONE_TYPES.index(z) if z in ZONE_TYPES else len(ZONE_TYPES)
+            for z in (arrays.elements[row].get("zoneType") for row in arrays.polygon_rows[is_zone])
+        ], dtype=np.int64)
+        areas = plan_geometry.polygon_areas(arrays)[is_zone] / (scale * scale)
+        zone_areas += np.bincount(slots, weights=areas, minlength=len(zone_areas))
+
+    wall_types = types[arrays.wall_rows] if len(arrays.wall_rows) else np.zeros(0, dtype=object)
+    wall_lengths = plan_geometry.wall_lengths(arrays)[wall_types == "wall"] / scale
+    histogram = np.bincount(
+        np.searchsorted(WALL_LENGTH_BINS_M, wall_lengths, side="right"),
+        minlength=len(WALL_LENGTH_BINS_M) + 1,
+    )
+
+    coords = np.concatenate((arrays.walls.reshape(-1, 2), arrays.vertices))
+    if len(coords):
+        width, height = np.ptp(coords, axis=0)
+    else:
+        width, height = float(meta.get("width") or 0), float(meta.get("height") or 0)
+    aspect = min(width, height) / max(width, height) if max(width, height) > 0 else 0.0
+
+    vector = np.concatenate((
+        [math.log1p(rooms)],
+        np.log1p(zone_areas),
+        np.log1p(histogram),
+        [aspect, math.log1p(float(wall_lengths.sum()))],
+    )).astype(np.float32)
+    norm = float(np.linalg.norm(vector))
+    return vector / norm if norm > 0 else vector
+
+
+class PlanSimilarityIndex:
+    """Матрица векторов признаков с поиском top-k по косинусу"""
+
+    def __init__(self, capacity: int = 1024):
+        self._matrix = np.zeros((capacity, FEATURE_SIZE), dtype=np.float32)
+        self._keys: list[str] = []
+        self._rows: dict[str, int] = {}
+        self._groups: dict[str, set[str]] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._rows
+
+    def keys(self, group: str | None = None) -> set[str]:
+        with self._lock:
+            return set(self._groups.get(group, ())) if group is not None else set(self._rows)
+
+    def add(self, key: str, vector: np.ndarray, group: str | None = None) -> None:
+        with self._lock:
+            if group is not None:
+                self._groups.setdefault(group, set()).add(key)
+            row = self._rows.get(key)
+            if row is None:
+                row = len(self._keys)
+                if row == len(self._matrix):
+                    grown = np.zeros((len(self._matrix) * 2, FEATURE_SIZE), dtype=np.float32)
+                    grown[:row] = self._matrix
+                    self._matrix = grown
+                self._keys.append(key)
+                self._rows[key] = row
+            self._matrix[row] = vector
+
+    def discard(self, key: str) -> None:
+        """Удалить ключ, переместив последнюю строку на его место"""
+        with self._lock:
+            row = self._rows.pop(key, None)
+            if row is None:
+                return
+            for members in self._groups.values():
+                members.discard(key)
+            last = len(self._keys) - 1
+            if row != last:
+                moved = self._keys[last]
+                self._matrix[row] = self._matrix[last]
+                self._keys[row] = moved
+                self._rows[moved] = row
+            self._keys.pop()
+
+    def search(self, vector: np.ndarray, k: int = 5, exclude: set[str] | None = None) -> list[tuple[str, float]]:
+        with self._lock:
+            count = len(self._keys)
+            if count == 0:
+                return []
+            scores = self._matrix[:count] @ vector.astype(np.float32)
+            keys = self._keys
+            take = min(k + len(exclude or ()), count)
+            top = np.argpartition(-scores, take - 1)[:take] if take < count else np.arange(count)
+            top = top[np.argsort(-scores[top])]
+            result = [(keys[i], float(scores[i])) for i in top if not exclude or keys[i] not in exclude]
+        return result[:k]
+
+
+def _template_key(template_id: str) -> str:
+    return f"template:{template_id}"
+
+
+def _version_key(order_id: uuid.UUID, version_id: uuid.UUID) -> str:
+    return f"order:{order_id}:{version_id}"
+
+
+_index = PlanSimilarityIndex()
+# versions — plan_hash проиндексированных ORIGINAL-версий по ключу индекса
+_state = {"loaded": False, "refreshed_at": 0.0, "templates": frozenset(), "versions": {}}
+_refresh_lock = threading.Lock()
+
+
+def _sync_templates() -> None:
+    current = frozenset(plan_recognition_service.template_registry.template_ids())
+    for template_id in _state["templates"] - current:
+        _index.discard(_template_key(template_id))
+    for template_id in current:
+        template = plan_recognition_service.template_registry.get(template_id)
+        if template:
+            _index.add(_template_key(template_id), plan_features(template.plan))
+    _state["templates"] = current
+
+
+def _load_versions(db: Session) -> None:
+    """Привести ORIGINAL-версии в индексе к БД: новые и измененные (другой plan_hash) пересчитать, удаленные убрать"""
+    indexed: dict[str, str | None] = _state["versions"]
+    rows = db.execute(
+        select(OrderPlanVersion.id, OrderPlanVersion.order_id, OrderPlanVersion.plan_hash)
+        .where(OrderPlanVersion.version_type == "ORIGINAL")
+    ).all()
+    current = {_version_key(order_id, version_id): plan_hash for version_id, order_id, plan_hash in rows}
+    for key in indexed.keys() - current.keys():
+        _index.discard(key)
+        del indexed[key]
+    stale = [
+        version_id for version_id, order_id, plan_hash in rows
+        if _version_key(order_id, version_id) not in indexed or indexed[_version_key(order_id, version_id)] != plan_hash
+    ]
+    for start in range(0, len(stale), 500):
+        batch = stale[start: start + 500]
+        for version_id, order_id, plan_hash, body, legacy_plan in db.execute(
+            select(
+                OrderPlanVersion.id, OrderPlanVersion.order_id, OrderPlanVersion.plan_hash,
+                PlanBlob.body, OrderPlanVersion.legacy_plan,
+            )
+            .outerjoin(PlanBlob, PlanBlob.hash == OrderPlanVersion.plan_hash)
+            .where(OrderPlanVersion.id.in_(batch))
+        ):
+            key = _version_key(order_id, version_id)
+            plan = body or legacy_plan
+            if plan:
+                _index.add(key, plan_features(plan), group=str(order_id))
+            else:
+                _index.discard(key)
+            indexed[key] = plan_hash
+
+
+def ensure_index(db: Session) -> PlanSimilarityIndex:
+    """Построить индекс при первом обращении и периодически дополнять новыми версиями"""
+    now = time.monotonic()
+    if _state["loaded"] and now - _state["refreshed_at"] < settings.plan_similarity_refresh_seconds:
+        return _index
+    with _refresh_lock:
+        if not _state["loaded"] or now - _state["refreshed_at"] >= settings.plan_similarity_refresh_seconds:
+            _sync_templates()
+            _load_versions(db)
+            _state["loaded"] = True
+            _state["refreshed_at"] = now
+    return _index
+
+
+def index_plan_version(version: OrderPlanVersion) -> None:
+    """Обновить вектор версии после сохранения (если индекс уже построен)"""
+    if _state["loaded"] and version.version_type == "ORIGINAL" and version.plan:
+        key = _version_key(version.order_id, version.id)
+        with _refresh_lock:
+            _index.add(key, plan_features(version.plan), group=str(version.order_id))
+            _state["versions"][key] = version.plan_hash
+
+
+def find_similar(
+    db: Session,
+    plan: dict | Plan,
+    k: int = 5,
+    exclude_order_id: uuid.UUID | None = None,
+) -> list[SimilarPlan]:
+    """Top-k ближайших планов из библиотеки шаблонов и истории заказов"""
+    index = ensure_index(db)
+    exclude = index.keys(str(exclude_order_id)) if exclude_order_id is not None else None
+    matches: list[SimilarPlan] = []
+    for key, score in index.search(plan_features(plan), k=k, exclude=exclude):
+        if key.startswith("template:"):
+            matches.append(SimilarPlan(source="template", score=score, template_id=key.split(":", 1)[1]))
+        else:
+            _prefix, order_id, version_id = key.split(":")
+            matches.append(SimilarPlan(
+                source="order",
+                score=score,
+                order_id=uuid.UUID(order_id),
+                version_id=uuid.UUID(version_id),
+            ))
+    return matches
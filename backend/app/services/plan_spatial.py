@@ -0,0 +1,319 @@
+"""Пространственный индекс элементов плана.
+
+Равномерная сетка над габаритами элементов: записи (ячейка, элемент) лежат
+в массиве, отсортированном по номеру ячейки, так что содержимое ячейки — срез,
+найденный бинарным поиском (O(log n) на ячейку). Элементы, которые накрыли бы
+слишком много ячеек, хранятся отдельным списком и проверяются всегда. Запросы
+пакетные: массив прямоугольников -> пары (номер запроса, строка элемента).
+
+Индекс версии плана кэшируется в памяти по хэшу содержимого.
+"""
+from __future__ import annotations
+
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from app.core.config import settings
+from app.models.order import plan_content_hash
+from app.services import plan_geometry
+from app.services.plan_transform import split_wall_segments
+
+MAX_CELLS_PER_ELEMENT = 64
+MAX_CELLS_PER_QUERY = 4096
+
+
+def _expand(c0: np.ndarray, span: np.ndarray, ny: int) -> tuple[np.ndarray, np.ndarray]:
+    """Все ячейки прямоугольников сетки: (номер прямоугольника, ключ ячейки)"""
+    counts = span[:, 0] * span[:, 1]
+    owner = np.repeat(np.arange(len(counts)), counts)
+    local = np.arange(int(counts.sum())) - np.repeat(np.cumsum(counts) - counts, counts)
+    cx = c0[owner, 0] + local // span[owner, 1]
+    cy = c0[owner, 1] + local % span[owner, 1]
+    return owner, cx * ny + cy
+
+
+def _overlaps(boxes: np.ndarray, query: np.ndarray) -> np.ndarray:
+    return (
+        (boxes[:, 0] <= query[:, 2]) & (boxes[:, 2] >= query[:, 0])
+        & (boxes[:, 1] <= query[:, 3]) & (boxes[:, 3] >= query[:, 1])
+    )
+
+
+class GridIndex:
+    """Сетка над прямоугольниками (N, 4): min x, min y, max x, max y; строки с NaN не индексируются"""
+
+    def __init__(self, boxes: np.ndarray, cell: float | None = None):
+        self.boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+        rows = np.nonzero(~np.isnan(self.boxes).any(axis=1))[0]
+        valid = self.boxes[rows]
+        if cell is None:
+            cell = self._auto_cell(valid)
+        self.cell = float(cell) if cell and cell > 0 else 1.0
+        self.origin = valid[:, :2].min(axis=0) if len(valid) else np.zeros(2)
+
+        c0, c1 = self._cells(valid)
+        self.nx = int(c1[:, 0].max()) + 1 if len(valid) else 1
+        self.ny = int(c1[:, 1].max()) + 1 if len(valid) else 1
+        span = c1 - c0 + 1
+        large = span[:, 0] * span[:, 1] > MAX_CELLS_PER_ELEMENT
+        self.large = rows[large]
+        owner, keys = _expand(c0[~large], span[~large], self.ny)
+        order = np.argsort(keys, kind="stable")
+        self.keys = keys[order]
+        self.entries = rows[~large][owner[order]]
+
+    @staticmethod
+    def _auto_cell(boxes: np.ndarray) -> float:
+        """Шаг сетки: порядка одного элемента на ячейку, но не меньше типичного элемента"""
+        if not len(boxes):
+            return 1.0
+        extent = boxes[:, 2:].max(axis=0) - boxes[:, :2].min(axis=0)
+        sizes = np.maximum(boxes[:, 2] - boxes[:, 0], boxes[:, 3] - boxes[:, 1])
+        by_density = float(np.sqrt(max(extent[0], 1.0) * max(extent[1], 1.0) / len(boxes)))
+        return max(by_density, float(np.median(sizes)), 1e-6)
+
+    def _cells(self, boxes: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        c0 = np.floor((boxes[:, :2] - self.origin) / self.cell).astype(np.int64)
+        c1 = np.floor((boxes[:, 2:] - self.origin) / self.cell).astype(np.int64)
+        return c0, c1
+
+    def __len__(self) -> int:
+        return len(self.boxes)
+
+    def query_boxes(self, queries: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """Пары (номер запроса, строка) для всех пересечений прямоугольников запросов с индексом"""
+        queries = np.asarray(queries, dtype=np.float64).reshape(-1, 4)
+        parts_q: list[np.ndarray] = []
+        parts_r: list[np.ndarray] = []
+
+        missing = np.isnan(queries).any(axis=1)
+        c0, c1 = self._cells(np.where(missing[:, None], 0.0, queries))
+        c0 = np.maximum(c0, 0)
+        c1 = np.minimum(c1, (self.nx - 1, self.ny - 1))
+        span = np.maximum(c1 - c0 + 1, 0)
+        counts = np.where(missing, 0, span[:, 0] * span[:, 1])
+        huge = counts > MAX_CELLS_PER_QUERY
+        # Запрос шире большей части сетки: проще проверить все прямоугольники
+        for q in np.nonzero(huge)[0]:
+            rows = np.nonzero(_overlaps(self.boxes, queries[q:q + 1]))[0]
+            parts_q.append(np.full(len(rows), q))
+            parts_r.append(rows)
+
+        small = np.nonzero(~huge & (counts > 0))[0]
+        if len(small) and len(self.keys):
+            owner, keys = _expand(c0[small], span[small], self.ny)
+            lo = np.searchsorted(self.keys, keys, side="left")
+            hi = np.searchsorted(self.keys, keys, side="right")
+            hits = hi - lo
+            positions = np.arange(int(hits.sum())) - np.repeat(np.cumsum(hits) - hits, hits) + np.repeat(lo, hits)
+            parts_q.append(small[np.repeat(owner, hits)])
+            parts_r.append(self.entries[positions])
+        if len(self.large):
+            rest = np.nonzero(~huge & ~missing)[0]
+            parts_q.append(np.repeat(rest, len(self.large)))
+            parts_r.append(np.tile(self.large, len(rest)))
+
+        if not parts_q:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+        qi = np.concatenate(parts_q).astype(np.int64)
+        rows = np.concatenate(parts_r).astype(np.int64)
+        pair = np.unique(qi * max(len(self.boxes), 1) + rows)
+        qi, rows = pair // max(len(self.boxes), 1), pair % max(len(self.boxes), 1)
+        keep = _overlaps(self.boxes[rows], queries[qi])
+        return qi[keep], rows[keep]
+
+    def query(self, bbox: tuple[float, float, float, float]) -> np.ndarray:
+        """Строки, габариты которых пересекают bbox"""
+        return self.query_boxes(np.asarray([bbox], dtype=np.float64))[1]
+
+    def near_points(self, points: np.ndarray, radius: float) -> tuple[np.ndarray, np.ndarray]:
+        """Пары (номер точки, строка) с габаритом в пределах radius от точки по каждой оси"""
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        return self.query_boxes(np.column_stack((points - radius, points + radius)))
+
+
+def _point_in_polygon(x: float, y: float, polygon: np.ndarray) -> bool:
+    xs, ys = polygon[:, 0], polygon[:, 1]
+    xn, yn = np.roll(xs, -1), np.roll(ys, -1)
+    crosses = (ys > y) != (yn > y)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        at = xs + (y - ys) * (xn - xs) / (yn - ys)
+    return bool(np.count_nonzero(crosses & (x < at)) % 2)
+
+
+def _segment_distance(x: float, y: float, segment: np.ndarray) -> float:
+    x1, y1, x2, y2 = segment
+    dx, dy = x2 - x1, y2 - y1
+    length2 = dx * dx + dy * dy
+    t = 0.0 if length2 == 0 else min(max(((x - x1) * dx + (y - y1) * dy) / length2, 0.0), 1.0)
+    return float(np.hypot(x - (x1 + t * dx), y - (y1 + t * dy)))
+
+
+def _polygon_distance(x: float, y: float, polygon: np.ndarray) -> float:
+    """Расстояние от точки до границы полигона"""
+    edges = np.column_stack((polygon, np.roll(polygon, -1, axis=0)))
+    return min(_segment_distance(x, y, edge) for edge in edges)
+
+
+def _points_inside(points: np.ndarray, polygon: np.ndarray, margin: float) -> np.ndarray:
+    """Какие точки (K, 2) лежат внутри полигона дальше margin от его границы (NaN — снаружи)"""
+    xs, ys = polygon[:, 0], polygon[:, 1]
+    xn, yn = np.roll(xs, -1), np.roll(ys, -1)
+    px, py = points[:, :1], points[:, 1:]
+    crosses = (ys > py) != (yn > py)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        at = xs + (py - ys) * (xn - xs) / (yn - ys)
+    inside = np.count_nonzero(crosses & (px < at), axis=1) % 2 == 1
+    dx, dy = xn - xs, yn - ys
+    length2 = dx * dx + dy * dy
+    with np.errstate(divide="ignore", invalid="ignore"):
+        t = np.clip(np.where(length2 > 0, ((px - xs) * dx + (py - ys) * dy) / length2, 0.0), 0.0, 1.0)
+    distance = np.hypot(px - (xs + t * dx), py - (ys + t * dy)).min(axis=1)
+    return inside & (distance > margin)
+
+
+class PlanSpatialIndex:
+    """Индекс элементов одного плана по их габаритам"""
+
+    def __init__(self, plan: dict | None):
+        self.arrays = plan_geometry.load(plan)
+        self.grid = GridIndex(plan_geometry.element_bboxes(self.arrays))
+        self.elements = self.arrays.elements
+        self._polygon_of = {int(row): i for i, row in enumerate(self.arrays.polygon_rows)}
+        self._wall_of = {int(row): i for i, row in enumerate(self.arrays.wall_rows)}
+
+    def query(self, bbox: tuple[float, float, float, float], types: set[str] | None = None) -> list[dict]:
+        """Элементы, габариты которых пересекают bbox (в px), в порядке плана"""
+        rows = self.grid.query(bbox)
+        return [self.elements[row] for row in rows.tolist() if not types or self.elements[row].get("type") in types]
+
+    def polygon(self, row: int) -> np.ndarray | None:
+        index = self._polygon_of.get(row)
+        if index is None:
+            return None
+        offsets = self.arrays.polygon_offsets
+        return self.arrays.vertices[offsets[index]:offsets[index + 1]]
+
+    def segment(self, row: int) -> np.ndarray | None:
+        index = self._wall_of.get(row)
+        return None if index is None else self.arrays.walls[index]
+
+    def zone_rows_at(self, x: float, y: float, tolerance: float = 0.0) -> list[int]:
+        """Строки зон, внутри полигона которых лежит точка (или ближе tolerance к его границе)"""
+        result = []
+        for row in self.grid.query((x - tolerance, y - tolerance, x + tolerance, y + tolerance)).tolist():
+            polygon = self.polygon(row)
+            if self.elements[row].get("type") != "zone" or polygon is None:
+                continue
+            if _point_in_polygon(x, y, polygon) or (
+                tolerance > 0 and _polygon_distance(x, y, polygon) <= tolerance
+            ):
+                result.append(row)
+        return result
+
+    def zones_at(self, x: float, y: float, tolerance: float = 0.0) -> list[dict]:
+        """Зоны, внутри полигона которых лежит точка (или ближе tolerance к его границе)"""
+        return [self.elements[row] for row in self.zone_rows_at(x, y, tolerance)]
+
+    def points_in_polygon(self, row: int, points: np.ndarray, margin: float = 0.0) -> np.ndarray:
+        """Какие точки (K, 2) лежат внутри полигона элемента row; для не-полигонов все False"""
+        polygon = self.polygon(row)
+        if polygon is None or not len(points):
+            return np.zeros(len(points), dtype=bool)
+        return _points_inside(points, polygon, margin)
+
+    def polygons_overlap(self, row_a: int, row_b: int, margin: float = 0.0) -> bool:
+        """Заходит ли один полигон внутрь другого глубже margin; общая граница не считается.
+
+        Проверяются вершины, середины ребер и центр каждого полигона, поэтому
+        пересечение, при котором ни одна из этих точек не попадает внутрь
+        другого полигона, не находится.
+        """
+        a, b = self.polygon(row_a), self.polygon(row_b)
+        if a is None or b is None:
+            return False
+        for inner, outer in ((a, b), (b, a)):
+            probes = np.concatenate((inner, (inner + np.roll(inner, -1, axis=0)) / 2, inner.mean(axis=0, keepdims=True)))
+            if _points_inside(probes, outer, margin).any():
+                return True
+        return False
+
+    def walls_near(self, x: float, y: float, radius: float) -> list[tuple[float, dict]]:
+        """Стены в пределах radius от точки: (расстояние, элемент), ближайшие первыми"""
+        found = []
+        for row in self.grid.query((x - radius, y - radius, x + radius, y + radius)).tolist():
+            segment = self.segment(row)
+            if self.elements[row].get("type") != "wall" or segment is None:
+                continue
+            distance = _segment_distance(x, y, segment)
+            if distance <= radius:
+                found.append((distance, self.elements[row]))
+        return sorted(found, key=lambda item: item[0])
+
+
+def check_object_links(plan: dict | None, index: PlanSpatialIndex | None = None, tolerance_m: float = 0.3) -> list[str]:
+    """Проверить привязки objects3d (wallId/zoneId) к геометрии плана.
+
+    Позиция объекта задана в метрах (x, z), план — в px. Возвращает описания
+    несоответствий: ссылка на несуществующий элемент, объект вне своей зоны,
+    объект дальше tolerance_m от своей стены.
+    """
+    objects = (plan or {}).get("objects3d") or []
+    if not objects:
+        return []
+    index = index or PlanSpatialIndex(plan)
+    scale = plan_geometry.px_per_meter(plan)
+    by_id = {elem.get("id"): elem for elem in index.elements}
+    issues: list[str] = []
+    for obj in objects:
+        position = obj.get("position") or {}
+        x, y = float(position.get("x") or 0) * scale, float(position.get("z") or 0) * scale
+        zone_id, wall_id = obj.get("zoneId"), obj.get("wallId")
+        if zone_id and zone_id not in by_id:
+            issues.append(f"объект {obj.get('id')}: зона {zone_id} не найдена")
+        elif zone_id and not wall_id and all(zone.get("id") != zone_id for zone in index.zones_at(x, y, tolerance_m * scale)):
+            # Двери и окна стоят в стене между зонами, для них проверяется только стена
+            issues.append(f"объект {obj.get('id')}: находится вне зоны {zone_id}")
+        if wall_id:
+            wall = by_id.get(wall_id)
+            if wall is None:
+                issues.append(f"объект {obj.get('id')}: стена {wall_id} не найдена")
+                continue
+            radius = tolerance_m * scale + float(wall.get("thickness") or 0) / 2
+            if all(near.get("id") != wall_id for _distance, near in index.walls_near(x, y, radius)):
+                issues.append(f"объект {obj.get('id')}: дальше {tolerance_m} м от стены {wall_id}")
+    return issues
+
+
+_cache: OrderedDict[str, PlanSpatialIndex] = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def parse_bbox(value: str) -> tuple[float, float, float, float]:
+    """Разобрать ``x1,y1,x2,y2`` в упорядоченный прямоугольник"""
+    try:
+        x1, y1, x2, y2 = (float(part) for part in value.split(","))
+    except ValueError as exc:
+        raise ValueError("bbox must be four numbers: x1,y1,x2,y2") from exc
+    if not all(np.isfinite((x1, y1, x2, y2))):
+        raise ValueError("bbox must be finite")
+    return min(x1, x2), min(y1, y2), max(x1, x2), max(y1, y2)
+
+
+def get_index(plan: dict, plan_hash: str | None = None, split: bool = False) -> PlanSpatialIndex:
+    """Индекс плана из кэша или построенный заново; split — по плану со стенами, разрезанными по проемам"""
+    key = (plan_hash or plan_content_hash(plan)) + ("-split" if split else "")
+    with _cache_lock:
+        cached = _cache.get(key)
+        if cached is not None:
+            _cache.move_to_end(key)
+            return cached
+    index = PlanSpatialIndex(split_wall_segments(plan) if split else plan)
+    with _cache_lock:
+        _cache[key] = index
+        _cache.move_to_end(key)
+        while len(_cache) > settings.plan_spatial_cache_size:
+            _cache.popitem(last=False)
+    return index
@@ -0,0 +1,51 @@
+from __future__ import annotations
+
+from copy import deepcopy
+
+from app.services import plan_geometry
+
+
+def split_wall_segments(plan: dict) -> dict:
+    """Split walls with openings into separate wall elements without openings.
+
+    Elements that are not split are shared with the source plan, not copied.
+    """
+    if not plan:
+        return plan
+    elements = plan.get("elements", [])
+    arrays = plan_geometry.load(plan, elements)
+    split = plan_geometry.split_walls(arrays)
+
+    # Куски по элементам: только стены (type == "wall")
+    pieces: dict[int, list[tuple[int, list[float]]]] = {}
+    rows = arrays.wall_rows[split.walls].tolist()
+    for row, seq, points in zip(rows, split.seq.tolist(), split.points.tolist()):
+        if elements[row].get("type") == "wall":
+            pieces.setdefault(row, []).append((seq, points))
+
+    result = []
+    for row, elem in enumerate(elements):
+        parts = pieces.get(row)
+        if not parts:
+            result.append(elem)
+            continue
+        geom = elem["geometry"]
+        for seq, points in parts:
+            new_elem = {k: deepcopy(v) for k, v in elem.items() if k not in ("id", "geometry")}
+            new_elem["id"] = f"{elem.get('id')}_seg{seq}"
+            new_elem_geom = {k: deepcopy(v) for k, v in geom.items() if k not in ("points", "openings")}
+            new_elem_geom["points"] = points
+            new_elem_geom["openings"] = None
+            new_elem["geometry"] = new_elem_geom
+            result.append(new_elem)
+
+    plan_copy = {k: deepcopy(v) for k, v in plan.items() if k != "elements"}
+    plan_copy["elements"] = result
+    return plan_copy
+
+
+def apply_split_to_plan_version(plan_version):
+    if not plan_version or not getattr(plan_version, "plan", None):
+        return plan_version
+    plan_version.plan = split_wall_segments(plan_version.plan)
+    return plan_version
@@ -1,10 +1,83 @@
 from __future__ import annotations
 
+import threading
+import time
+from dataclasses import dataclass, field
+
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 
+from app.core.config import settings
 from app.models.directory import District, HouseType
 from app.models.order import Order
 from app.schemas.pricing import PriceBreakdown
+from app.services import directory_service, tariff_service
+from app.services.pricing_rules import DEFAULT_RULES, Evaluator, compile_rules
+
+
+@dataclass(frozen=True)
+class PricingSnapshot:
+    """Все, что нужно для расчета без обращений к БД: коэффициенты районов и типов
+    домов и скомпилированный действующий тариф"""
+    version: tuple[int, int]  # (версия справочников, версия набора тарифов)
+    evaluate: Evaluator
+    tariff_version: int | None = None
+    districts: dict[str, float] = field(default_factory=dict)
+    house_types: dict[str, float] = field(default_factory=dict)
+    loaded_at: float = 0.0
+
+    def district(self, code: str | None) -> float:
+        return self.districts.get(code, 1.0) if code else 1.0
+
+    def house_type(self, code: str | None) -> float:
+        return self.house_types.get(code, 1.0) if code else 1.0
+
+
+_snapshot: PricingSnapshot | None = None
+_snapshot_lock = threading.Lock()
+_default_evaluate = compile_rules(DEFAULT_RULES)
+
+
+def _current_version() -> tuple[int, int]:
+    return directory_service.coefficients_version(), tariff_service.tariffs_version()
+
+
+def _load_snapshot(db: Session, version: tuple[int, int]) -> PricingSnapshot:
+    districts = {
+        code: float(coef) for code, coef in db.execute(select(District.code, District.price_coef)) if coef is not None
+    }
+    house_types = {
+        code: float(coef) for code, coef in db.execute(select(HouseType.code, HouseType.price_coef)) if coef is not None
+    }
+    tariff = tariff_service.get_active_tariff(db)
+    # Без действующего тарифа (пустая БД) считаем по базовым правилам
+    evaluate = tariff_service.compiled(tariff) if tariff else _default_evaluate
+    return PricingSnapshot(
+        version, evaluate, tariff.version if tariff else None, districts, house_types, time.monotonic()
+    )
+
+
+def _is_fresh(snapshot: PricingSnapshot | None, version: tuple[int, int]) -> bool:
+    return (
+        snapshot is not None
+        and snapshot.version == version
+        and time.monotonic() - snapshot.loaded_at < settings.price_coefficients_refresh_seconds
+    )
+
+
+def get_snapshot(db: Session, reload: bool = False) -> PricingSnapshot:
+    """Снимок для расчета; перечитывается после изменений справочников и тарифов в этом
+    процессе и не реже price_coefficients_refresh_seconds (записи из других процессов).
+    reload=True — прочитать заново (фоновые задачи в отдельном процессе)"""
+    global _snapshot
+    version = _current_version()
+    snapshot = _snapshot
+    if not reload and _is_fresh(snapshot, version):
+        return snapshot
+    with _snapshot_lock:
+        if reload or not _is_fresh(_snapshot, version):
+            _snapshot = _load_snapshot(db, version)
+        return _snapshot
 
 
 def calculate_price(
@@ -13,6 +86,10 @@ def calculate_price(
     house_type_code: str | None,
     calculator_input: dict | None,
 ) -> tuple[float, PriceBreakdown]:
+    return price_with(get_snapshot(db), district_code, house_type_code, calculator_input)
+
+
+def _normalized_input(calculator_input: dict | None) -> dict:
     calc = dict(calculator_input or {})
 
     # Backward compatibility: старые заказы могли присылать hasBasement на верхнем уровне
@@ -20,43 +97,19 @@ def calculate_price(
     if "hasBasement" in calc and "basement" not in features:
         features["basement"] = bool(calc.get("hasBasement"))
     calc["features"] = features
+    return calc
 
-    district_coef = 1.0
-    if district_code:
-        district = db.get(District, district_code)
-        if district and district.price_coef is not None:
-            district_coef = float(district.price_coef)
-
-    house_coef = 1.0
-    if house_type_code:
-        house = db.get(HouseType, house_type_code)
-        if house and house.price_coef is not None:
-            house_coef = float(house.price_coef)
-
-    base_component = 0.0
-
-    area = float(calc.get("area") or 0)
-    price_per_m2 = 500.0
-    area_cost = area * price_per_m2
-
-    works = calc.get("works") or {}
-    works_cost = 0.0
-    if works.get("walls"):
-        works_cost += 3000
-    if works.get("wet_zone"):
-        works_cost += 7000
-    if works.get("doorways"):
-        works_cost += 5000
-    works_component = area_cost + works_cost
-
-    features = calc.get("features") or {}
-    coef_features = 1.0
-    if features.get("basement"):
-        coef_features *= 1.2
-    if features.get("join_apartments"):
-        coef_features *= 1.5
-    if calc.get("urgent"):
-        coef_features *= 1.3
+
+def price_with(
+    snapshot: PricingSnapshot,
+    district_code: str | None,
+    house_type_code: str | None,
+    calculator_input: dict | None,
+) -> tuple[float, PriceBreakdown]:
+    calc = _normalized_input(calculator_input)
+    district_coef = snapshot.district(district_code)
+    house_coef = snapshot.house_type(house_type_code)
+    base_component, works_component, coef_features = snapshot.evaluate(calc)
 
     # район и тип дома влияют на общую стоимость
     estimated = (base_component + works_component) * coef_features * district_coef * house_coef
@@ -64,23 +117,37 @@ def calculate_price(
         baseComponent=round(base_component, 2),
         worksComponent=round(works_component * district_coef * house_coef, 2),
         featuresCoef=round(coef_features, 2),
+        tariffVersion=snapshot.tariff_version,
         raw=calc,
     )
     return round(estimated, 2), breakdown
 
 
+def estimate_with(
+    snapshot: PricingSnapshot,
+    district_code: str | None,
+    house_type_code: str | None,
+    calculator_input: dict | None,
+) -> float:
+    """Только итоговая цена, как в price_with, без детализации (пакетный пересчет)"""
+    base_component, works_component, coef_features = snapshot.evaluate(_normalized_input(calculator_input))
+    estimated = (base_component + works_component) * coef_features
+    return round(estimated * snapshot.district(district_code) * snapshot.house_type(house_type_code), 2)
+
+
 def calculate_order_price(
     db: Session,
     order: Order,
     calculator_input: dict | None = None,
-) -> tuple[float | None, float | None]:
+) -> tuple[float | None, int | None]:
+    """Цена заказа и версия тарифа, по которой она рассчитана"""
     try:
-        estimated, _ = calculate_price(
+        estimated, breakdown = calculate_price(
             db=db,
             district_code=order.district_code,
             house_type_code=order.house_type_code,
             calculator_input=calculator_input or {},
         )
-        return estimated, None
+        return estimated, breakdown.tariff_version
     except Exception:
         return None, None
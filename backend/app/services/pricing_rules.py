@@ -0,0 +1,184 @@
+"""Декларативные правила тарифа калькулятора стоимости.
+
+Тариф хранится как данные (таблица pricing_tariffs) и один раз компилируется
+в функцию evaluate(calculator_input) -> (base, works, coef):
+
+* lineItems — строки сметы: фиксированная сумма amount или ставка amount за
+  единицу поля perUnit (например, за м² из area); component — base или works;
+* multipliers — множители factor;
+* when — условие на поля calculator_input (путь через точку):
+  {"field": "works.walls"} (истинно), {"field": "area", "op": "gt", "value": 100},
+  {"all": [...]}, {"any": [...]}, {"not": {...}}.
+
+Правила проверяются и переводятся в исходный код одной функции без циклов
+и вызовов на каждое условие, поэтому расчет по тарифу не медленнее прежней
+формулы в коде. В исходный код попадают только repr() проверенных чисел и
+ключей; значения для сравнения передаются через пространство имен функции.
+"""
+from __future__ import annotations
+
+import math
+from typing import Any, Callable
+
+Evaluator = Callable[[dict], tuple[float, float, float]]
+
+# Формула, действовавшая до появления тарифов (версия 1)
+DEFAULT_RULES: dict = {
+    "lineItems": [
+        {"id": "area", "component": "works", "perUnit": "area", "amount": 500},
+        {"id": "walls", "component": "works", "when": {"field": "works.walls"}, "amount": 3000},
+        {"id": "wet_zone", "component": "works", "when": {"field": "works.wet_zone"}, "amount": 7000},
+        {"id": "doorways", "component": "works", "when": {"field": "works.doorways"}, "amount": 5000},
+    ],
+    "multipliers": [
+        {"id": "basement", "when": {"field": "features.basement"}, "factor": 1.2},
+        {"id": "join_apartments", "when": {"field": "features.join_apartments"}, "factor": 1.5},
+        {"id": "urgent", "when": {"field": "urgent"}, "factor": 1.3},
+    ],
+}
+
+COMPONENTS = ("base", "works")
+
+_COMPARISONS = {"eq": "==", "ne": "!=", "gt": ">", "gte": ">=", "lt": "<", "lte": "<="}
+
+
+class PricingRulesError(ValueError):
+    """Правила тарифа не прошли проверку"""
+
+
+def _number(value: Any, where: str) -> float:
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or not math.isfinite(value):
+        raise PricingRulesError(f"{where}: expected a finite number")
+    return float(value)
+
+
+class _Codegen:
+    """Сборка исходного кода функции evaluate по правилам тарифа"""
+
+    def __init__(self) -> None:
+        self.prologue: list[str] = []
+        self.namespace: dict[str, Any] = {"_EMPTY": {}, "_NUMBER": (int, float)}
+        self._dicts: dict[tuple[str, ...], str] = {(): "calc"}
+        self._names = 0
+
+    def name(self, prefix: str) -> str:
+        self._names += 1
+        return f"{prefix}{self._names}"
+
+    def constant(self, value: Any) -> str:
+        name = self.name("_c")
+        self.namespace[name] = value
+        return name
+
+    def _dict(self, keys: tuple[str, ...]) -> str:
+        """Переменная с вложенным словарем calc[k1][k2]...; пустой словарь, если ключа нет"""
+        if keys not in self._dicts:
+            parent = self._dict(keys[:-1])
+            name = self.name("d")
+            # Как в прежней формуле (calc.get("works") or {}): не-словарь на пути — ошибка входных данных
+            self.prologue.append(f"{name} = {parent}.get({keys[-1]!r}) or _EMPTY")
+            self._dicts[keys] = name
+        return self._dicts[keys]
+
+    def field(self, path: Any, where: str) -> str:
+        if not isinstance(path, str) or not path or any(not key for key in path.split(".")):
+            raise PricingRulesError(f"{where}: field must be a dotted path")
+        keys = tuple(path.split("."))
+        return f"{self._dict(keys[:-1])}.get({keys[-1]!r})"
+
+    def condition(self, spec: Any, where: str) -> str:
+        if not isinstance(spec, dict):
+            raise PricingRulesError(f"{where}: condition must be an object")
+        for key, joiner in (("all", " and "), ("any", " or ")):
+            if key in spec:
+                parts = spec[key]
+                if not isinstance(parts, list) or not parts:
+                    raise PricingRulesError(f"{where}.{key}: expected a non-empty list")
+                return "(" + joiner.join(self.condition(part, f"{where}.{key}[{i}]") for i, part in enumerate(parts)) + ")"
+        if "not" in spec:
+            return f"(not {self.condition(spec['not'], f'{where}.not')})"
+
+        value = self.field(spec.get("field"), where)
+        op = spec.get("op", "truthy")
+        if op == "truthy":
+            return value
+        if op == "in":
+            if not isinstance(spec.get("value"), list):
+                raise PricingRulesError(f"{where}: 'in' expects a list value")
+            return f"({value} in {self.constant(tuple(spec['value']))})"
+        if op not in _COMPARISONS:
+            raise PricingRulesError(f"{where}: unknown op '{op}'")
+        if op in ("eq", "ne"):
+            return f"({value} {_COMPARISONS[op]} {self.constant(spec.get('value'))})"
+        bound = _number(spec.get("value"), where)
+        var = self.name("v")
+        return f"(({var} := {value}).__class__ in _NUMBER and {var} {_COMPARISONS[op]} {bound!r})"
+
+
+def compile_rules(rules: Any) -> Evaluator:
+    """Проверить правила тарифа и собрать функцию расчета"""
+    if not isinstance(rules, dict):
+        raise PricingRulesError("rules must be an object")
+    line_items = rules.get("lineItems") or []
+    multipliers = rules.get("multipliers") or []
+    if not isinstance(line_items, list) or not isinstance(multipliers, list):
+        raise PricingRulesError("lineItems and multipliers must be lists")
+
+    gen = _Codegen()
+    # Для каждой составляющей: фиксированные суммы (как works_cost в прежней формуле) и ставки за единицу
+    fixed: dict[str, list[str]] = {component: [] for component in COMPONENTS}
+    per_unit: dict[str, list[str]] = {component: [] for component in COMPONENTS}
+    constant = {component: 0.0 for component in COMPONENTS}
+    for i, item in enumerate(line_items):
+        where = f"lineItems[{i}]"
+        if not isinstance(item, dict):
+            raise PricingRulesError(f"{where}: expected an object")
+        component = item.get("component", "works")
+        if component not in COMPONENTS:
+            raise PricingRulesError(f"{where}: component must be one of {', '.join(COMPONENTS)}")
+        amount = _number(item.get("amount"), f"{where}.amount")
+        when = gen.condition(item["when"], f"{where}.when") if item.get("when") is not None else None
+        if item.get("perUnit") is not None:
+            term = f"float({gen.field(item['perUnit'], f'{where}.perUnit')} or 0) * {amount!r}"
+            per_unit[component].append(f"if {when}: {component}_units += {term}" if when else f"{component}_units += {term}")
+        elif when is None:
+            constant[component] += amount
+        else:
+            fixed[component].append(f"if {when}: {component}_fixed += {amount!r}")
+
+    factors = []
+    for i, item in enumerate(multipliers):
+        where = f"multipliers[{i}]"
+        if not isinstance(item, dict):
+            raise PricingRulesError(f"{where}: expected an object")
+        factor = _number(item.get("factor"), f"{where}.factor")
+        if item.get("when") is None:
+            raise PricingRulesError(f"{where}: condition 'when' is required")
+        factors.append(f"if {gen.condition(item['when'], f'{where}.when')}: coef *= {factor!r}")
+
+    lines: list[str] = []
+    totals = []
+    for component in COMPONENTS:
+        if not fixed[component] and not per_unit[component]:
+            totals.append(repr(constant[component]))
+            continue
+        lines.append(f"{component}_fixed = {constant[component]!r}")
+        lines.extend(fixed[component])
+        if per_unit[component]:
+            units = per_unit[component]
+            if units[0].startswith(f"{component}_units += "):
+                units = [units[0].replace("+=", "=", 1), *units[1:]]
+            else:
+                lines.append(f"{component}_units = 0.0")
+            lines.extend(units)
+            totals.append(f"{component}_units + {component}_fixed")
+        else:
+            totals.append(f"{component}_fixed")
+    lines.append("coef = 1.0")
+    lines.extend(factors)
+    lines.append(f"return {', '.join(totals)}, coef")
+    source = "def evaluate(calc):\n" + "".join(f"    {line}\n" for line in gen.prologue + lines)
+    exec(compile(source, "<pricing rules>", "exec"), gen.namespace)
+    evaluate = gen.namespace["evaluate"]
+    evaluate.source = source
+    return evaluate
@@ -0,0 +1,129 @@
+"""Кэш эмбеддингов чанков RAG на диске.
+
+Ключ — (модель, хэш текста чанка): у каждой модели свой каталог
+<rag_embedding_cache_dir>/<модель>/, в нем сегменты из двух файлов:
+<id>.keys.npy (blake2b-16 текстов) и <id>.vectors.npy (float32, открывается
+через memmap). Сегмент только дописывается; файл ключей появляется последним,
+поэтому недописанный сегмент не читается. merge() сливает сегменты в один.
+"""
+from __future__ import annotations
+
+import hashlib
+import os
+import re
+import uuid
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+
+KEY_DTYPE = np.dtype("S16")
+_KEYS_SUFFIX = ".keys.npy"
+_VECTORS_SUFFIX = ".vectors.npy"
+_MERGE_BLOCK = 65536
+
+
+def chunk_hash(text: str) -> bytes:
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+
+
+def chunk_hashes(texts: list[str]) -> np.ndarray:
+    return np.asarray([chunk_hash(text) for text in texts], dtype=KEY_DTYPE)
+
+
+def _model_dir_name(model: str) -> str:
+    return re.sub(r"[^\w.-]+", "_", model)
+
+
+class EmbeddingCache:
+    def __init__(self, root: Path, model: str, dim: int):
+        self.path = root / _model_dir_name(model)
+        self.dim = dim
+        self._reload()
+
+    def _segment_names(self) -> list[str]:
+        if not self.path.is_dir():
+            return []
+        return sorted(p.name[:-len(_KEYS_SUFFIX)] for p in self.path.glob(f"*{_KEYS_SUFFIX}")
+                      if not p.name.startswith("."))
+
+    def _reload(self) -> None:
+        keys, segments, rows = [], [], []
+        self._vectors: list[np.ndarray] = []
+        for name in self._segment_names():
+            vectors = np.load(self.path / f"{name}{_VECTORS_SUFFIX}", mmap_mode="r")
+            if vectors.ndim != 2 or vectors.shape[1] != self.dim:
+                continue
+            segment_keys = np.load(self.path / f"{name}{_KEYS_SUFFIX}")
+            keys.append(segment_keys)
+            segments.append(np.full(len(segment_keys), len(self._vectors), dtype=np.int32))
+            rows.append(np.arange(len(segment_keys), dtype=np.int64))
+            self._vectors.append(vectors)
+        self._keys = np.concatenate(keys) if keys else np.empty(0, dtype=KEY_DTYPE)
+        self._segments = np.concatenate(segments) if segments else np.empty(0, dtype=np.int32)
+        self._rows = np.concatenate(rows) if rows else np.empty(0, dtype=np.int64)
+        # Отсортированные ключи для поиска searchsorted; при повторах берется любой — векторы одинаковы
+        self._order = np.argsort(self._keys, kind="stable")
+        self._sorted_keys = self._keys[self._order]
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    @property
+    def segment_count(self) -> int:
+        return len(self._vectors)
+
+    def _positions(self, keys: np.ndarray) -> np.ndarray:
+        """Индекс ключа в self._keys или -1"""
+        if not len(self._keys):
+            return np.full(len(keys), -1, dtype=np.int64)
+        at = np.minimum(np.searchsorted(self._sorted_keys, keys), len(self._keys) - 1)
+        return np.where(self._sorted_keys[at] == keys, self._order[at], -1)
+
+    def fill(self, keys: np.ndarray, out: np.ndarray) -> np.ndarray:
+        """Записать в out найденные векторы; маска ключей, которых в кэше нет"""
+        positions = self._positions(np.asarray(keys, dtype=KEY_DTYPE))
+        found = np.flatnonzero(positions >= 0)
+        for segment in np.unique(self._segments[positions[found]]):
+            at = found[self._segments[positions[found]] == segment]
+            out[at] = self._vectors[segment][self._rows[positions[at]]]
+        return positions < 0
+
+    def add(self, keys: np.ndarray, vectors: np.ndarray) -> None:
+        if not len(keys):
+            return
+        name = self._new_segment_name()
+        np.save(self.path / f".{name}{_VECTORS_SUFFIX}", np.asarray(vectors, dtype=np.float32))
+        np.save(self.path / f".{name}{_KEYS_SUFFIX}", np.asarray(keys, dtype=KEY_DTYPE))
+        self._publish(name)
+        self._reload()
+
+    def _new_segment_name(self) -> str:
+        self.path.mkdir(parents=True, exist_ok=True)
+        return f"{datetime.utcnow():%Y%m%d%H%M%S%f}-{uuid.uuid4().hex[:8]}"
+
+    def _publish(self, name: str) -> None:
+        """Переименовать временные файлы сегмента: ключи — последними"""
+        for suffix in (_VECTORS_SUFFIX, _KEYS_SUFFIX):
+            os.replace(self.path / f".{name}{suffix}", self.path / f"{name}{suffix}")
+
+    def merge(self) -> None:
+        """Слить сегменты в один без повторов ключей"""
+        names = self._segment_names()
+        if len(names) < 2:
+            return
+        keys = np.unique(self._keys)
+        name = self._new_segment_name()
+        vectors = np.lib.format.open_memmap(
+            self.path / f".{name}{_VECTORS_SUFFIX}", mode="w+", dtype=np.float32, shape=(len(keys), self.dim),
+        )
+        for start in range(0, len(keys), _MERGE_BLOCK):
+            self.fill(keys[start:start + _MERGE_BLOCK], vectors[start:start + _MERGE_BLOCK])
+        vectors.flush()
+        del vectors
+        np.save(self.path / f".{name}{_KEYS_SUFFIX}", keys)
+        self._publish(name)
+        for old in names:
+            (self.path / f"{old}{_KEYS_SUFFIX}").unlink(missing_ok=True)
+            (self.path / f"{old}{_VECTORS_SUFFIX}").unlink(missing_ok=True)
+        self._reload()
@@ -0,0 +1,177 @@
+"""Локальные эмбеддинги текста для RAG (на CPU).
+
+Модель задается settings.local_embedding_model: имя модели
+sentence-transformers (по умолчанию all-MiniLM-L6-v2) или ``hashing`` —
+лексические векторы признакового хэширования слов и пар слов без внешних
+зависимостей. Если sentence-transformers не установлен, используется
+``hashing`` (с предупреждением в лог). Векторы float32 нормированы по L2,
+так что скалярное произведение — косинусная близость.
+"""
+from __future__ import annotations
+
+import logging
+import os
+import re
+import threading
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from typing import Protocol
+
+import numpy as np
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+HASHING_MODEL = "hashing"
+HASHING_DIM = 384
+_STEM_LENGTH = 5
+
+_TOKEN = re.compile(r"\w+", re.UNICODE)
+
+
+class Embedder(Protocol):
+    name: str
+    dim: int
+
+    def embed(self, texts: list[str]) -> np.ndarray:
+        """Матрица (len(texts), dim) float32 с нормированными строками"""
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    np.divide(vectors, norms, out=vectors, where=norms > 0)
+    return vectors
+
+
+class HashingEmbedder:
+    """Признаковое хэширование: слова, их начала (грубая основа для словоформ) и пары
+    соседних основ в dim корзин со знаком, вес 1 + log(tf)"""
+
+    def __init__(self, dim: int = HASHING_DIM):
+        self.dim = dim
+        self.name = f"{HASHING_MODEL}-{dim}"
+
+    def _features(self, text: str) -> dict[tuple[int, float], int]:
+        """(корзина, знак) -> число вхождений"""
+        tokens = _TOKEN.findall(text.lower())
+        stems = [f"{token[:_STEM_LENGTH]}~" for token in tokens]
+        counts: dict[tuple[int, float], int] = {}
+        for feature in (*tokens, *stems, *(f"{a} {b}" for a, b in zip(stems, stems[1:]))):
+            # crc32 стабилен между процессами (hash() строк — нет), а индекс хранится на диске
+            code = zlib.crc32(feature.encode("utf-8"))
+            key = (code % self.dim, 1.0 if code & 0x80000000 else -1.0)
+            counts[key] = counts.get(key, 0) + 1
+        return counts
+
+    def embed(self, texts: list[str]) -> np.ndarray:
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            features = self._features(text)
+            if not features:
+                continue
+            keys = np.array(list(features), dtype=np.float64)
+            weights = 1.0 + np.log(np.fromiter(features.values(), dtype=np.float64, count=len(features)))
+            np.add.at(vectors[row], keys[:, 0].astype(np.int64), (keys[:, 1] * weights).astype(np.float32))
+        return _normalize(vectors)
+
+
+class SentenceTransformerEmbedder:
+    def __init__(self, model_name: str):
+        from sentence_transformers import SentenceTransformer
+
+        self.model = SentenceTransformer(model_name, device="cpu")
+        self.name = model_name
+        self.dim = int(self.model.get_sentence_embedding_dimension())
+
+    def embed(self, texts: list[str]) -> np.ndarray:
+        vectors = self.model.encode(
+            texts, batch_size=settings.rag_embedding_batch_size, normalize_embeddings=True,
+            convert_to_numpy=True, show_progress_bar=False,
+        )
+        return np.asarray(vectors, dtype=np.float32).reshape(len(texts), self.dim)
+
+
+def create_embedder(model_name: str | None = None) -> Embedder:
+    model_name = model_name or settings.local_embedding_model
+    if model_name.startswith(HASHING_MODEL):
+        return HashingEmbedder()
+    try:
+        return SentenceTransformerEmbedder(model_name)
+    except ImportError:
+        logger.warning("sentence-transformers is not installed, using %s embeddings instead of %s", HASHING_MODEL, model_name)
+        return HashingEmbedder()
+
+
+_embedder: Embedder | None = None
+_embedder_lock = threading.Lock()
+
+
+def get_embedder() -> Embedder:
+    """Модель эмбеддингов процесса (загружается один раз)"""
+    global _embedder
+    if _embedder is None:
+        with _embedder_lock:
+            if _embedder is None:
+                _embedder = create_embedder()
+    return _embedder
+
+
+def resolve_workers(workers: int | None = None) -> int:
+    """Число процессов эмбеддинга: 0 — по числу ядер"""
+    workers = settings.rag_workers if workers is None else workers
+    return workers if workers > 0 else os.cpu_count() or 1
+
+
+_worker_embedder: Embedder | None = None
+
+
+def _init_worker(model_name: str) -> None:
+    global _worker_embedder
+    if not model_name.startswith(HASHING_MODEL):
+        try:
+            import torch
+
+            # Ядра делятся между процессами, а не между потоками одного процесса
+            torch.set_num_threads(1)
+        except ImportError:
+            pass
+    _worker_embedder = create_embedder(model_name)
+
+
+def _embed_in_worker(texts: list[str]) -> np.ndarray:
+    return _worker_embedder.embed(texts)
+
+
+class EmbeddingPool:
+    """Эмбеддинг порциями rag_embedding_batch_size в пуле процессов (при workers <= 1 — в текущем).
+
+    Процессы запускаются при первой большой порции и загружают модель сами.
+    """
+
+    def __init__(self, embedder: Embedder, workers: int | None = None):
+        self.embedder = embedder
+        self.workers = resolve_workers(workers)
+        self._executor: ProcessPoolExecutor | None = None
+
+    def __enter__(self) -> EmbeddingPool:
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def embed(self, texts: list[str]) -> np.ndarray:
+        size = max(settings.rag_embedding_batch_size, 1)
+        batches = [texts[start:start + size] for start in range(0, len(texts), size)]
+        if not batches:
+            return np.zeros((0, self.embedder.dim), dtype=np.float32)
+        if self.workers <= 1 or len(batches) == 1:
+            return np.concatenate([self.embedder.embed(batch) for batch in batches])
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(self.workers, initializer=_init_worker, initargs=(self.embedder.name,))
+        return np.concatenate(list(self._executor.map(_embed_in_worker, batches)))
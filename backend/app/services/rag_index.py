@@ -0,0 +1,678 @@
+"""Векторный индекс RAG: чанки нормативных документов и их эмбеддинги на диске.
+
+Каждая сборка лежит в своем каталоге <index_dir>/<build_id>/:
+
+* chunks.jsonl — чанки (документ, номер, текст) по строке, chunk_offsets.npy —
+  смещения строк, чтобы читать только найденные чанки;
+* vectors.npy — матрица эмбеддингов float32 (N, D), открывается через memmap;
+* ids.npy — номер чанка для каждой строки vectors (строки упорядочены по спискам);
+* centroids.npy, list_offsets.npy — центры списков и границы их строк в vectors;
+* chunk_hashes.npy — хэш текста каждого чанка (ключ кэша эмбеддингов rag_cache);
+* documents.json — хэш текста и диапазон номеров чанков каждого документа;
+* meta.json — модель эмбеддингов, размерность, число чанков, параметры нарезки.
+
+Обновление (update_index) эмбеддит только чанки новых и измененных документов:
+файлы основы переходят в новую сборку жесткими ссылками, чанки прежних версий
+документов попадают в deleted.npy, а новые — в дельту (delta_chunks.jsonl,
+delta_vectors.npy и т.д.), которая просматривается целиком. Когда дельта и
+удаленные чанки превышают rag_compact_ratio основы, compact_index (фоновая
+задача) сливает их в новую основу без повторного эмбеддинга.
+
+Файл CURRENT в index_dir называет действующую сборку и заменяется атомарно,
+поэтому читатели в других процессах переключаются на новую сборку целиком.
+Сборка, обновление и уплотнение выполняются под файловой блокировкой index_dir.
+
+Корпус от rag_ivf_min_chunks чанков делится сферическим k-means на ~sqrt(N)
+списков (IVF), и запрос просматривает только rag_nprobe ближайших к нему
+списков: на 1M чанков это тысячи строк вместо миллиона. Меньший корпус
+просматривается целиком (точный поиск).
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import shutil
+import uuid
+from collections.abc import Iterable, Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: сборки не защищены от параллельного запуска
+    fcntl = None
+
+from app.core.config import settings
+from app.services.rag_cache import KEY_DTYPE, EmbeddingCache, chunk_hash
+from app.services.rag_embeddings import Embedder, EmbeddingPool
+
+CURRENT_FILE = "CURRENT"
+LOCK_FILE = ".lock"
+FORMAT_VERSION = 2
+DELTA = "delta_"
+BASE_FILES = (
+    "chunks.jsonl", "chunk_offsets.npy", "chunk_hashes.npy",
+    "vectors.npy", "ids.npy", "centroids.npy", "list_offsets.npy",
+)
+_BLOCK_ROWS = 65536
+_EMBED_BLOCK_ROWS = 4096
+_MAX_CACHE_SEGMENTS = 32
+_KMEANS_ITERATIONS = 8
+_KMEANS_SAMPLE_PER_LIST = 40
+
+
+@dataclass(frozen=True)
+class Document:
+    name: str
+    text: str
+
+
+def chunk_text(text: str, size: int, overlap: int) -> list[str]:
+    """Нарезать текст на чанки до size символов с перекрытием overlap.
+
+    Конец чанка переносится на ближайшую границу абзаца, строки, предложения
+    или слова во второй половине окна, чтобы не резать слова.
+    """
+    text = (text or "").strip()
+    if not text:
+        return []
+    size = max(size, 1)
+    overlap = min(max(overlap, 0), size - 1)
+    chunks = []
+    start = 0
+    while start < len(text):
+        end = min(start + size, len(text))
+        if end < len(text):
+            window = text[start:end]
+            for separator in ("\n\n", "\n", ". ", " "):
+                cut = window.rfind(separator, size // 2)
+                if cut != -1:
+                    end = start + cut + len(separator)
+                    break
+        chunk = text[start:end].strip()
+        if chunk:
+            chunks.append(chunk)
+        if end >= len(text):
+            break
+        start = max(end - overlap, start + 1)
+        # Перекрытие начинается с целого слова
+        space = text.find(" ", start, end)
+        if 0 < start < end and not text[start - 1].isspace() and space != -1:
+            start = space + 1
+    return chunks
+
+
+def _normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    np.divide(vectors, norms, out=vectors, where=norms > 0)
+    return vectors
+
+
+def document_hash(text: str) -> str:
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).hexdigest()
+
+
+class _ChunkWriter:
+    """Пишет <prefix>chunks.jsonl с <prefix>chunk_offsets.npy и <prefix>chunk_hashes.npy;
+    номера чанков начинаются с first_id"""
+
+    def __init__(self, path: Path, prefix: str = "", first_id: int = 0):
+        self.path = path
+        self.prefix = prefix
+        self.first_id = first_id
+        self._out = open(path / f"{prefix}chunks.jsonl", "wb")
+        self._offsets: list[int] = []
+        self._hashes: list[bytes] = []
+
+    @property
+    def next_id(self) -> int:
+        return self.first_id + len(self._offsets)
+
+    def add_line(self, line: bytes, key: bytes) -> None:
+        self._offsets.append(self._out.tell())
+        self._hashes.append(key)
+        self._out.write(line)
+
+    def add_document(self, document: Document, size: int, overlap: int) -> dict:
+        """Нарезать документ; запись для documents.json"""
+        first = self.next_id
+        for seq, text in enumerate(chunk_text(document.text, size, overlap)):
+            line = json.dumps({"doc": document.name, "seq": seq, "text": text}, ensure_ascii=False).encode("utf-8")
+            self.add_line(line + b"\n", chunk_hash(text))
+        return {"hash": document_hash(document.text), "range": [first, self.next_id]}
+
+    def close(self) -> int:
+        """Закрыть файлы; число записанных чанков"""
+        self._out.close()
+        np.save(self.path / f"{self.prefix}chunk_offsets.npy", np.asarray(self._offsets, dtype=np.int64))
+        np.save(self.path / f"{self.prefix}chunk_hashes.npy", np.asarray(self._hashes, dtype=KEY_DTYPE))
+        return len(self._offsets)
+
+
+def write_chunks(path: Path, documents: Iterable[Document], size: int, overlap: int) -> dict[str, dict]:
+    """Записать чанки документов основы; содержимое documents.json"""
+    writer = _ChunkWriter(path)
+    manifest = {document.name: writer.add_document(document, size, overlap) for document in documents}
+    writer.close()
+    return manifest
+
+
+def iter_chunk_batches(path: Path, batch_size: int, prefix: str = "", skip: int = 0) -> Iterator[tuple[int, list[str]]]:
+    """(номер первого чанка в файле, тексты) порциями по batch_size, начиная с чанка skip"""
+    batch, start = [], skip
+    with open(path / f"{prefix}chunks.jsonl", "rb") as source:
+        for row, line in enumerate(source):
+            if row < skip:
+                continue
+            batch.append(json.loads(line)["text"])
+            if len(batch) >= batch_size:
+                yield start, batch
+                start += len(batch)
+                batch = []
+    if batch:
+        yield start, batch
+
+
+def embed_chunks(
+    path: Path, out: np.ndarray, pool: EmbeddingPool, cache: EmbeddingCache | None,
+    prefix: str = "", skip: int = 0,
+) -> int:
+    """Заполнить out эмбеддингами чанков файла (с чанка skip); в модель идут только
+    тексты, которых нет в кэше. Число эмбеддингов, посчитанных моделью"""
+    hashes = np.load(path / f"{prefix}chunk_hashes.npy")
+    pending_keys: list[np.ndarray] = []
+    pending_vectors: list[np.ndarray] = []
+    pending = embedded = 0
+    for start, texts in iter_chunk_batches(path, _EMBED_BLOCK_ROWS, prefix, skip):
+        keys = hashes[start:start + len(texts)]
+        missing = np.flatnonzero(cache.fill(keys, out[start:start + len(texts)]) if cache else np.ones(len(texts), bool))
+        if not len(missing):
+            continue
+        vectors = pool.embed([texts[i] for i in missing])
+        out[start + missing] = vectors
+        embedded += len(missing)
+        if cache is not None:
+            pending_keys.append(keys[missing])
+            pending_vectors.append(vectors)
+            pending += len(missing)
+            # Сегменты кэша пишутся крупными, чтобы их не набиралось тысячи
+            if pending >= _BLOCK_ROWS:
+                cache.add(np.concatenate(pending_keys), np.concatenate(pending_vectors))
+                pending_keys, pending_vectors, pending = [], [], 0
+    if cache is not None and pending:
+        cache.add(np.concatenate(pending_keys), np.concatenate(pending_vectors))
+    if cache is not None and cache.segment_count > _MAX_CACHE_SEGMENTS:
+        cache.merge()
+    return embedded
+
+
+def _train_centroids(vectors: np.ndarray, n_lists: int, rng: np.random.Generator) -> np.ndarray:
+    """Сферический k-means по случайной выборке строк"""
+    sample_size = min(len(vectors), n_lists * _KMEANS_SAMPLE_PER_LIST)
+    sample = np.asarray(vectors[np.sort(rng.choice(len(vectors), sample_size, replace=False))], dtype=np.float32)
+    centroids = sample[rng.choice(sample_size, n_lists, replace=False)].copy()
+    for _ in range(_KMEANS_ITERATIONS):
+        assign = np.argmax(sample @ centroids.T, axis=1)
+        order = np.argsort(assign, kind="stable")
+        counts = np.bincount(assign, minlength=n_lists)
+        filled = np.flatnonzero(counts)
+        starts = np.concatenate(([0], np.cumsum(counts)[:-1]))[filled]
+        sums = np.zeros_like(centroids)
+        sums[filled] = np.add.reduceat(sample[order], starts, axis=0)
+        empty = np.flatnonzero(counts == 0)
+        if len(empty):
+            # Пустой список получает случайную точку выборки
+            sums[empty] = sample[rng.choice(sample_size, len(empty))]
+        centroids = _normalize_rows(sums)
+    return centroids
+
+
+def _assign(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    result = np.empty(len(vectors), dtype=np.int64)
+    for start in range(0, len(vectors), _BLOCK_ROWS):
+        block = np.asarray(vectors[start:start + _BLOCK_ROWS])
+        result[start:start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+    return result
+
+
+def write_layout(path: Path, raw: np.ndarray, chunk_ids: np.ndarray | None = None, seed: int = 0) -> int:
+    """Разложить векторы raw (N, D) по спискам IVF в vectors.npy/ids.npy; число списков.
+
+    chunk_ids — номер чанка каждой строки raw (по умолчанию 0..N-1).
+    """
+    count, dim = raw.shape
+    chunk_ids = np.arange(count, dtype=np.int64) if chunk_ids is None else np.asarray(chunk_ids, dtype=np.int64)
+    if count >= max(settings.rag_ivf_min_chunks, 2):
+        n_lists = max(int(np.sqrt(count)), 2)
+        centroids = _train_centroids(raw, n_lists, np.random.default_rng(seed))
+        assign = _assign(raw, centroids)
+        order = np.argsort(assign, kind="stable")
+        list_offsets = np.concatenate(([0], np.cumsum(np.bincount(assign, minlength=n_lists)))).astype(np.int64)
+    else:
+        centroids = np.zeros((0, dim), dtype=np.float32)
+        order = np.arange(count, dtype=np.int64)
+        list_offsets = np.asarray([0, count], dtype=np.int64)
+
+    vectors = np.lib.format.open_memmap(path / "vectors.npy", mode="w+", dtype=np.float32, shape=(count, dim))
+    for start in range(0, count, _BLOCK_ROWS):
+        rows = order[start:start + _BLOCK_ROWS]
+        # Чтение raw по возрастанию строк, запись в порядке списков
+        by_row = np.argsort(rows)
+        block = np.empty((len(rows), dim), dtype=np.float32)
+        block[by_row] = raw[rows[by_row]]
+        vectors[start:start + len(rows)] = block
+    vectors.flush()
+    del vectors
+    np.save(path / "ids.npy", chunk_ids[order])
+    np.save(path / "centroids.npy", centroids.astype(np.float32))
+    np.save(path / "list_offsets.npy", list_offsets)
+    return len(centroids)
+
+
+def write_meta(
+    path: Path, model: str, dim: int, lists: int, size: int, overlap: int,
+    base: int, delta: int = 0, deleted: int = 0, embedded: int = 0,
+) -> None:
+    meta = {
+        "format": FORMAT_VERSION,
+        "model": model,
+        "dim": dim,
+        "chunks": base - deleted + delta,
+        "baseChunks": base,
+        "deltaChunks": delta,
+        "deletedChunks": deleted,
+        "embeddedChunks": embedded,
+        "lists": lists,
+        "chunkSize": size,
+        "chunkOverlap": overlap,
+        "builtAt": datetime.utcnow().isoformat(),
+    }
+    (path / "meta.json").write_text(json.dumps(meta, ensure_ascii=False, indent=2), encoding="utf-8")
+
+
+def read_meta(path: Path) -> dict:
+    return json.loads((path / "meta.json").read_text(encoding="utf-8"))
+
+
+def _write_manifest(path: Path, manifest: dict[str, dict]) -> None:
+    (path / "documents.json").write_text(json.dumps(manifest, ensure_ascii=False), encoding="utf-8")
+
+
+def _read_manifest(path: Path) -> dict[str, dict]:
+    return json.loads((path / "documents.json").read_text(encoding="utf-8"))
+
+
+def needs_compaction(meta: dict) -> bool:
+    """Дельта и удаленные чанки заметны на фоне основы"""
+    changed = meta.get("deltaChunks", 0) + meta.get("deletedChunks", 0)
+    return changed > 0 and changed > settings.rag_compact_ratio * meta.get("baseChunks", 0)
+
+
+@contextmanager
+def index_lock(index_dir: Path) -> Iterator[None]:
+    """Исключительная блокировка каталога индекса между процессами"""
+    index_dir.mkdir(parents=True, exist_ok=True)
+    with open(index_dir / LOCK_FILE, "a") as lock:
+        if fcntl is not None:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+        yield
+
+
+def new_build_dir(index_dir: Path) -> Path:
+    path = index_dir / f"{datetime.utcnow():%Y%m%d%H%M%S}-{uuid.uuid4().hex[:8]}"
+    path.mkdir(parents=True)
+    return path
+
+
+def activate(index_dir: Path, path: Path, keep_previous: bool = False) -> None:
+    """Сделать сборку path действующей (атомарная замена CURRENT) и удалить прежние сборки"""
+    pointer = index_dir / f".{CURRENT_FILE}.{uuid.uuid4().hex}"
+    pointer.write_text(path.name, encoding="utf-8")
+    os.replace(pointer, index_dir / CURRENT_FILE)
+    if keep_previous:
+        return
+    # Открытые другими процессами файлы удаленной сборки остаются доступны им до закрытия
+    for other in index_dir.iterdir():
+        if other.is_dir() and other.name != path.name:
+            shutil.rmtree(other, ignore_errors=True)
+
+
+def current_build(index_dir: Path) -> Path | None:
+    try:
+        name = (index_dir / CURRENT_FILE).read_text(encoding="utf-8").strip()
+    except FileNotFoundError:
+        return None
+    path = index_dir / name
+    return path if name and (path / "meta.json").is_file() else None
+
+
+def _chunk_params(size: int | None, overlap: int | None) -> tuple[int, int]:
+    return size or settings.rag_chunk_size, settings.rag_chunk_overlap if overlap is None else overlap
+
+
+def _finish_layout(path: Path, raw_name: str) -> int:
+    """Разложить векторы из временного файла по спискам и удалить его; число списков"""
+    raw = np.load(path / raw_name, mmap_mode="r")
+    lists = write_layout(path, raw)
+    del raw
+    (path / raw_name).unlink()
+    return lists
+
+
+def _build(
+    documents: Iterable[Document], embedder: Embedder, index_dir: Path, size: int, overlap: int,
+    cache: EmbeddingCache | None, workers: int | None,
+) -> Path:
+    path = new_build_dir(index_dir)
+    manifest = write_chunks(path, documents, size, overlap)
+    count = sum(entry["range"][1] - entry["range"][0] for entry in manifest.values())
+    raw = np.lib.format.open_memmap(path / "vectors.raw.npy", mode="w+", dtype=np.float32, shape=(count, embedder.dim))
+    with EmbeddingPool(embedder, workers) as pool:
+        embedded = embed_chunks(path, raw, pool, cache)
+    raw.flush()
+    del raw
+    lists = _finish_layout(path, "vectors.raw.npy")
+    _write_manifest(path, manifest)
+    write_meta(path, embedder.name, embedder.dim, lists, size, overlap, base=count, embedded=embedded)
+    activate(index_dir, path)
+    return path
+
+
+def build_index(
+    documents: Iterable[Document],
+    embedder: Embedder,
+    index_dir: Path,
+    size: int | None = None,
+    overlap: int | None = None,
+    cache: EmbeddingCache | None = None,
+    workers: int | None = None,
+) -> Path:
+    """Собрать индекс документов целиком и сделать его действующим.
+
+    Эмбеддинги текстов из cache не пересчитываются; остальные считаются в
+    workers процессах (0 — по числу ядер) и добавляются в cache.
+    """
+    size, overlap = _chunk_params(size, overlap)
+    with index_lock(index_dir):
+        return _build(documents, embedder, index_dir, size, overlap, cache, workers)
+
+
+def _link(source: Path, target: Path) -> None:
+    try:
+        os.link(source, target)
+    except OSError:
+        shutil.copy2(source, target)
+
+
+def _is_compatible(meta: dict, embedder: Embedder, size: int, overlap: int) -> bool:
+    return (
+        meta.get("format") == FORMAT_VERSION
+        and meta.get("model") == embedder.name
+        and meta.get("dim") == embedder.dim
+        and meta.get("chunkSize") == size
+        and meta.get("chunkOverlap") == overlap
+    )
+
+
+def update_index(
+    documents: Iterable[Document],
+    embedder: Embedder,
+    index_dir: Path,
+    size: int | None = None,
+    overlap: int | None = None,
+    cache: EmbeddingCache | None = None,
+    workers: int | None = None,
+) -> Path | None:
+    """Обновить индекс по измененным документам; None, если изменений нет.
+
+    Документ сравнивается по хэшу текста. Чанки удаленных и прежних версий
+    измененных документов помечаются удаленными, новые версии дописываются в
+    дельту. Если индекса нет или он собран с другой моделью или нарезкой,
+    собирается заново.
+    """
+    size, overlap = _chunk_params(size, overlap)
+    with index_lock(index_dir):
+        current = current_build(index_dir)
+        meta = read_meta(current) if current else {}
+        if current is None or not _is_compatible(meta, embedder, size, overlap):
+            return _build(documents, embedder, index_dir, size, overlap, cache, workers)
+
+        manifest = _read_manifest(current)
+        kept: dict[str, dict] = {}
+        changed: list[Document] = []
+        for document in documents:
+            entry = manifest.get(document.name)
+            if entry is not None and entry["hash"] == document_hash(document.text):
+                kept[document.name] = entry
+            else:
+                changed.append(document)
+        if not changed and len(kept) == len(manifest):
+            return None
+
+        base = meta["baseChunks"]
+        deleted = [np.load(current / "deleted.npy")] if (current / "deleted.npy").is_file() else []
+        for name, entry in manifest.items():
+            start, end = entry["range"]
+            if name not in kept and end <= base:
+                deleted.append(np.arange(start, end, dtype=np.int64))
+        deleted = np.unique(np.concatenate(deleted)) if deleted else np.empty(0, dtype=np.int64)
+
+        path = new_build_dir(index_dir)
+        for name in BASE_FILES:
+            _link(current / name, path / name)
+        np.save(path / "deleted.npy", deleted)
+
+        # Дельта: живые чанки прежней дельты, затем новые версии документов
+        writer = _ChunkWriter(path, DELTA, first_id=base)
+        old_rows: list[np.ndarray] = []
+        old_delta = _ChunkFile(current, DELTA) if (current / f"{DELTA}chunks.jsonl").is_file() else None
+        for name, entry in kept.items():
+            start, end = entry["range"]
+            if start < base:
+                continue
+            first = writer.next_id
+            for row in range(start - base, end - base):
+                writer.add_line(old_delta.line(row), old_delta.hashes[row])
+            old_rows.append(np.arange(start - base, end - base, dtype=np.int64))
+            kept[name] = {"hash": entry["hash"], "range": [first, writer.next_id]}
+        copied = writer.next_id - base
+        for document in changed:
+            kept[document.name] = writer.add_document(document, size, overlap)
+        delta = writer.close()
+
+        vectors = np.lib.format.open_memmap(
+            path / f"{DELTA}vectors.npy", mode="w+", dtype=np.float32, shape=(delta, embedder.dim),
+        )
+        if copied:
+            vectors[:copied] = np.load(current / f"{DELTA}vectors.npy", mmap_mode="r")[np.concatenate(old_rows)]
+        if old_delta is not None:
+            old_delta.close()
+        with EmbeddingPool(embedder, workers) as pool:
+            embedded = embed_chunks(path, vectors, pool, cache, DELTA, skip=copied)
+        vectors.flush()
+        del vectors
+
+        _write_manifest(path, kept)
+        write_meta(
+            path, embedder.name, embedder.dim, meta["lists"], size, overlap,
+            base=base, delta=delta, deleted=len(deleted), embedded=embedded,
+        )
+        activate(index_dir, path)
+        return path
+
+
+def compact_index(index_dir: Path) -> Path | None:
+    """Слить дельту и удаленные чанки действующей сборки в новую основу; None, если нечего сливать.
+
+    Эмбеддинги берутся из сборки, модель не нужна; списки IVF обучаются заново.
+    """
+    with index_lock(index_dir):
+        current = current_build(index_dir)
+        if current is None:
+            return None
+        meta = read_meta(current)
+        if not meta.get("deltaChunks") and not meta.get("deletedChunks"):
+            return None
+        base, dim = meta["baseChunks"], meta["dim"]
+        deleted = np.load(current / "deleted.npy") if (current / "deleted.npy").is_file() else np.empty(0, dtype=np.int64)
+        live = np.setdiff1d(np.arange(base, dtype=np.int64), deleted, assume_unique=True)
+        new_ids = np.full(base, -1, dtype=np.int64)
+        new_ids[live] = np.arange(len(live))
+        has_delta = (current / f"{DELTA}chunks.jsonl").is_file()
+
+        path = new_build_dir(index_dir)
+        writer = _ChunkWriter(path)
+        base_hashes = np.load(current / "chunk_hashes.npy")
+        with open(current / "chunks.jsonl", "rb") as source:
+            for row, line in enumerate(source):
+                if new_ids[row] >= 0:
+                    writer.add_line(line, base_hashes[row])
+        delta = 0
+        if has_delta:
+            delta_hashes = np.load(current / f"{DELTA}chunk_hashes.npy")
+            with open(current / f"{DELTA}chunks.jsonl", "rb") as source:
+                for row, line in enumerate(source):
+                    writer.add_line(line, delta_hashes[row])
+            delta = len(delta_hashes)
+        count = writer.close()
+
+        raw = np.lib.format.open_memmap(path / "vectors.raw.npy", mode="w+", dtype=np.float32, shape=(count, dim))
+        vectors = np.load(current / "vectors.npy", mmap_mode="r")
+        ids = np.load(current / "ids.npy", mmap_mode="r")
+        for start in range(0, len(vectors), _BLOCK_ROWS):
+            targets = new_ids[ids[start:start + _BLOCK_ROWS]]
+            keep = np.flatnonzero(targets >= 0)
+            # Запись по возрастанию номеров — последовательнее для memmap
+            keep = keep[np.argsort(targets[keep])]
+            raw[targets[keep]] = vectors[start + keep]
+        if delta:
+            raw[len(live):] = np.load(current / f"{DELTA}vectors.npy", mmap_mode="r")
+        raw.flush()
+        del raw, vectors, ids
+        lists = _finish_layout(path, "vectors.raw.npy")
+
+        manifest = _read_manifest(current)
+        for entry in manifest.values():
+            start, end = entry["range"]
+            first = int(np.searchsorted(live, start)) if start < base else len(live) + start - base
+            entry["range"] = [first, first + end - start]
+        _write_manifest(path, manifest)
+        write_meta(path, meta["model"], dim, lists, meta["chunkSize"], meta["chunkOverlap"], base=count)
+        activate(index_dir, path)
+        return path
+
+
+@dataclass(frozen=True)
+class RetrievedChunk:
+    document: str
+    seq: int
+    text: str
+    score: float
+
+
+class _ChunkFile:
+    """<prefix>chunks.jsonl сборки: строки читаются по смещениям через pread"""
+
+    def __init__(self, path: Path, prefix: str = ""):
+        self.offsets = np.load(path / f"{prefix}chunk_offsets.npy", mmap_mode="r")
+        self.hashes = np.load(path / f"{prefix}chunk_hashes.npy", mmap_mode="r")
+        self._fd = os.open(path / f"{prefix}chunks.jsonl", os.O_RDONLY)
+        self._size = os.fstat(self._fd).st_size
+
+    def __len__(self) -> int:
+        return len(self.offsets)
+
+    def close(self) -> None:
+        os.close(self._fd)
+
+    def line(self, row: int) -> bytes:
+        start = int(self.offsets[row])
+        end = int(self.offsets[row + 1]) if row + 1 < len(self.offsets) else self._size
+        return os.pread(self._fd, end - start, start)
+
+    def read(self, row: int) -> dict:
+        return json.loads(self.line(row))
+
+
+class RagIndex:
+    """Открытая сборка индекса: векторы через memmap, чанки читаются по смещениям.
+
+    Номера чанков основы — 0..base-1, дельты — с base; удаленные чанки основы
+    (deleted) отбрасываются при поиске.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.build_id = path.name
+        self.meta = read_meta(path)
+        self.vectors = np.load(path / "vectors.npy", mmap_mode="r")
+        self.ids = np.load(path / "ids.npy", mmap_mode="r")
+        self.centroids = np.load(path / "centroids.npy")
+        self.list_offsets = np.load(path / "list_offsets.npy")
+        self.chunks = _ChunkFile(path)
+        self.base = len(self.chunks)
+        deleted = path / "deleted.npy"
+        self.deleted = np.load(deleted) if deleted.is_file() else np.empty(0, dtype=np.int64)
+        if (path / f"{DELTA}chunks.jsonl").is_file():
+            self.delta_vectors = np.load(path / f"{DELTA}vectors.npy", mmap_mode="r")
+            self.delta_chunks: _ChunkFile | None = _ChunkFile(path, DELTA)
+        else:
+            self.delta_vectors = np.zeros((0, self.vectors.shape[1]), dtype=np.float32)
+            self.delta_chunks = None
+
+    def __len__(self) -> int:
+        return self.base - len(self.deleted) + len(self.delta_vectors)
+
+    def close(self) -> None:
+        self.chunks.close()
+        if self.delta_chunks is not None:
+            self.delta_chunks.close()
+
+    def _spans(self, query: np.ndarray, nprobe: int) -> list[tuple[int, int]]:
+        if not len(self.centroids):
+            return [(0, len(self.vectors))]
+        nprobe = min(max(nprobe, 1), len(self.centroids))
+        lists = np.argpartition(-(self.centroids @ query), nprobe - 1)[:nprobe]
+        return [(int(self.list_offsets[i]), int(self.list_offsets[i + 1])) for i in np.sort(lists)]
+
+    def search(self, query: np.ndarray, k: int, nprobe: int | None = None) -> list[tuple[int, float]]:
+        """(номер чанка, близость) k ближайших, лучшие первыми"""
+        if k <= 0 or not len(self):
+            return []
+        query = np.asarray(query, dtype=np.float32).reshape(-1)
+        spans = [span for span in self._spans(query, nprobe or settings.rag_nprobe) if span[1] > span[0]]
+        scores = [self.vectors[start:end] @ query for start, end in spans]
+        chunk_ids = [np.asarray(self.ids[start:end]) for start, end in spans]
+        if len(self.delta_vectors):
+            scores.append(self.delta_vectors @ query)
+            chunk_ids.append(np.arange(self.base, self.base + len(self.delta_vectors), dtype=np.int64))
+        if not scores:
+            return []
+        scores = np.concatenate(scores)
+        chunk_ids = np.concatenate(chunk_ids)
+        if len(self.deleted):
+            live = ~np.isin(chunk_ids, self.deleted)
+            scores, chunk_ids = scores[live], chunk_ids[live]
+        k = min(k, len(scores))
+        if not k:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(int(chunk_ids[i]), float(scores[i])) for i in top]
+
+    def chunk(self, chunk_id: int) -> dict:
+        if chunk_id >= self.base and self.delta_chunks is not None:
+            return self.delta_chunks.read(chunk_id - self.base)
+        return self.chunks.read(chunk_id)
+
+    def retrieve(self, query: np.ndarray, k: int, nprobe: int | None = None) -> list[RetrievedChunk]:
+        result = []
+        for chunk_id, score in self.search(query, k, nprobe):
+            chunk = self.chunk(chunk_id)
+            result.append(RetrievedChunk(chunk["doc"], chunk["seq"], chunk["text"], score))
+        return result
@@ -0,0 +1,139 @@
+"""RAG по нормативным документам: сборка индекса из rag_documents_dir и поиск
+выдержек для промптов анализа и чата.
+
+Индекс (rag_index) открывается один раз на процесс и переоткрывается, когда
+сборка в rag_index_dir сменилась. Эмбеддинги чанков кэшируются на диске
+(rag_cache), поэтому пересборка и обновление считают только новые тексты. Нет индекса или он собран другой моделью
+эмбеддингов — выдержек нет, промпты строятся как раньше.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import threading
+from collections.abc import Iterator
+from pathlib import Path
+
+from app.core.config import settings
+from app.services import rag_index
+from app.services.rag_cache import EmbeddingCache
+from app.services.rag_embeddings import Embedder, get_embedder
+from app.services.rag_index import Document, RagIndex, RetrievedChunk
+
+logger = logging.getLogger(__name__)
+
+DOCUMENT_SUFFIXES = (".txt", ".md")
+
+
+def documents_dir() -> Path:
+    return Path(settings.rag_documents_dir)
+
+
+def index_dir() -> Path:
+    return Path(settings.rag_index_dir)
+
+
+def load_documents(root: Path | None = None) -> Iterator[Document]:
+    """Документы каталога (рекурсивно) в порядке путей; имя — путь относительно каталога"""
+    root = root or documents_dir()
+    if not root.is_dir():
+        return
+    for path in sorted(p for p in root.rglob("*") if p.is_file() and p.suffix.lower() in DOCUMENT_SUFFIXES):
+        yield Document(path.relative_to(root).as_posix(), path.read_text(encoding="utf-8", errors="replace"))
+
+
+def embedding_cache(embedder: Embedder) -> EmbeddingCache:
+    return EmbeddingCache(Path(settings.rag_embedding_cache_dir), embedder.name, embedder.dim)
+
+
+def rebuild_index(workers: int | None = None) -> Path:
+    """Собрать индекс по всем документам заново (эмбеддинги — из кэша, где есть)"""
+    embedder = get_embedder()
+    path = rag_index.build_index(load_documents(), embedder, index_dir(), cache=embedding_cache(embedder), workers=workers)
+    _reset()
+    return path
+
+
+def update_index(workers: int | None = None) -> Path | None:
+    """Обновить индекс по новым, измененным и удаленным документам; None, если изменений нет"""
+    embedder = get_embedder()
+    path = rag_index.update_index(load_documents(), embedder, index_dir(), cache=embedding_cache(embedder), workers=workers)
+    if path is not None:
+        _reset()
+    return path
+
+
+def needs_compaction() -> bool:
+    path = rag_index.current_build(index_dir())
+    return path is not None and rag_index.needs_compaction(rag_index.read_meta(path))
+
+
+def compact_index() -> Path | None:
+    """Слить дельту действующей сборки в основу (фоновая задача rag_compact)"""
+    path = rag_index.compact_index(index_dir())
+    if path is not None:
+        _reset()
+    return path
+
+
+_index: RagIndex | None = None
+_index_lock = threading.Lock()
+
+
+def _reset() -> None:
+    global _index
+    with _index_lock:
+        if _index is not None:
+            _index.close()
+        _index = None
+
+
+def get_index() -> RagIndex | None:
+    """Действующая сборка индекса или None"""
+    global _index
+    path = rag_index.current_build(index_dir())
+    index = _index
+    if path is None:
+        return None
+    if index is not None and index.path == path:
+        return index
+    with _index_lock:
+        if _index is None or _index.path != path:
+            if _index is not None:
+                _index.close()
+            _index = RagIndex(path)
+        return _index
+
+
+def corpus_version() -> str:
+    """Идентификатор действующей сборки (пустая строка, если индекса нет)"""
+    path = rag_index.current_build(index_dir())
+    return path.name if path else ""
+
+
+def retrieve(query: str, k: int | None = None) -> list[RetrievedChunk]:
+    """k ближайших к запросу чанков нормативных документов"""
+    query = (query or "").strip()
+    index = get_index()
+    if not query or index is None or not len(index):
+        return []
+    embedder = get_embedder()
+    if index.meta.get("model") != embedder.name:
+        logger.warning("RAG index %s is built with %s, current model is %s: rebuild the index",
+                       index.build_id, index.meta.get("model"), embedder.name)
+        return []
+    return index.retrieve(embedder.embed([query])[0], k or settings.rag_top_k)
+
+
+def format_context(chunks: list[RetrievedChunk]) -> str:
+    return "\n\n".join(f"[{chunk.document}]\n{chunk.text}" for chunk in chunks)
+
+
+async def regulations_context(query: str, k: int | None = None) -> str:
+    """Выдержки из нормативов для промпта (пустая строка, если их нет); эмбеддинг запроса — в потоке"""
+    try:
+        chunks = await asyncio.to_thread(retrieve, query, k)
+    except (OSError, ValueError) as exc:
+        logger.error("RAG retrieval failed: %s", exc)
+        return ""
+    return format_context(chunks)
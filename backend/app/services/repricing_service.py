@@ -0,0 +1,148 @@
+"""Массовый пересчет estimated_price открытых заказов.
+
+Заказы читаются порциями по первичному ключу (только нужные колонки, без ORM
+объектов), цены считаются на одном свежем снимке коэффициентов и тарифа
+(price_calculator.get_snapshot), изменившиеся строки записываются одним
+executemany UPDATE на порцию. UPDATE условный (updated_at не изменился с
+чтения): заказ, который за это время отредактировали, пропускается и
+попадает в счетчик skipped — его цену уже пересчитал API, а следующий запуск
+подхватит его снова. В пробном режиме ничего не пишется, в результат
+попадают изменения цен. Повторный запуск безопасен: уже пересчитанные заказы
+не меняются.
+"""
+from __future__ import annotations
+
+from collections.abc import Callable
+from datetime import datetime
+
+from sqlalchemy import bindparam, func, select, update
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.order import Order, OrderStatus
+from app.services.price_calculator import estimate_with, get_snapshot
+
+CLOSED_STATUSES = (OrderStatus.COMPLETED, OrderStatus.CANCELLED, OrderStatus.REJECTED)
+
+ProgressCallback = Callable[[dict], None]
+
+_orders = Order.__table__
+# Цена пишется, только если заказ не меняли после чтения порции
+_conditional_update = (
+    update(_orders)
+    .where(_orders.c.id == bindparam("b_id"), _orders.c.updated_at.is_not_distinct_from(bindparam("b_updated_at")))
+    .values(
+        estimated_price=bindparam("b_price"),
+        tariff_version=bindparam("b_tariff_version"),
+        updated_at=bindparam("b_now"),
+    )
+)
+
+
+def _filters(district_codes: list[str] | None, house_type_codes: list[str] | None) -> list:
+    conditions = [Order.status.not_in(CLOSED_STATUSES)]
+    if district_codes:
+        conditions.append(Order.district_code.in_(district_codes))
+    if house_type_codes:
+        conditions.append(Order.house_type_code.in_(house_type_codes))
+    return conditions
+
+
+def _write_prices(db: Session, updates: list[dict]) -> set:
+    """Записать цены порции одним executemany; вернуть id обновленных заказов"""
+    now = datetime.utcnow()
+    rowcount = db.execute(_conditional_update, [{**values, "b_now": now} for values in updates]).rowcount
+    ids = [values["b_id"] for values in updates]
+    if rowcount == len(ids) and db.get_bind().dialect.supports_sane_multi_rowcount:
+        return set(ids)
+    # Часть заказов изменили после чтения (или драйвер не считает строки executemany):
+    # записанные строки — те, что получили метку времени этой порции
+    return set(db.scalars(select(_orders.c.id).where(_orders.c.id.in_(ids), _orders.c.updated_at == now)))
+
+
+def reprice_orders(
+    db: Session,
+    district_codes: list[str] | None = None,
+    house_type_codes: list[str] | None = None,
+    dry_run: bool = False,
+    chunk_size: int | None = None,
+    on_progress: ProgressCallback | None = None,
+) -> dict:
+    """Пересчитать цены открытых заказов (с фильтром по районам и типам домов)"""
+    chunk_size = chunk_size or settings.reprice_chunk_size
+    conditions = _filters(district_codes, house_type_codes)
+    total = db.scalar(select(func.count()).select_from(Order).where(*conditions)) or 0
+    # Коэффициенты могли измениться в процессе API: снимок этого процесса не годится
+    snapshot = get_snapshot(db, reload=True)
+    columns = select(
+        Order.id, Order.district_code, Order.house_type_code, Order.calculator_input,
+        Order.estimated_price, Order.tariff_version, Order.updated_at,
+    ).where(*conditions).order_by(Order.id).limit(chunk_size)
+
+    processed = changed = failed = skipped = 0
+    delta_total = 0.0
+    diff: list[dict] = []
+    last_id = None
+    while True:
+        query = columns if last_id is None else columns.where(Order.id > last_id)
+        rows = db.execute(query).all()
+        if not rows:
+            break
+        last_id = rows[-1].id
+        updates = []
+        deltas = {}
+        for row in rows:
+            try:
+                price = estimate_with(snapshot, row.district_code, row.house_type_code, row.calculator_input)
+            except (TypeError, ValueError, AttributeError):
+                # Некорректный calculator_input: как и calculate_order_price, такой заказ не трогаем
+                failed += 1
+                continue
+            if price == row.estimated_price and row.tariff_version == snapshot.tariff_version:
+                continue
+            delta = price - (row.estimated_price or 0.0)
+            if dry_run:
+                changed += 1
+                delta_total += delta
+                if len(diff) < settings.reprice_diff_limit:
+                    diff.append({
+                        "orderId": str(row.id),
+                        "oldPrice": row.estimated_price,
+                        "newPrice": price,
+                        "delta": round(delta, 2),
+                        "oldTariffVersion": row.tariff_version,
+                    })
+            else:
+                updates.append({
+                    "b_id": row.id,
+                    "b_updated_at": row.updated_at,
+                    "b_price": price,
+                    "b_tariff_version": snapshot.tariff_version,
+                })
+                deltas[row.id] = delta
+        if updates:
+            written = _write_prices(db, updates)
+            db.commit()
+            changed += len(written)
+            skipped += len(updates) - len(written)
+            delta_total += sum(deltas[order_id] for order_id in written)
+        processed += len(rows)
+        if on_progress:
+            on_progress({
+                "processed": processed, "total": total, "changed": changed, "failed": failed, "skipped": skipped,
+            })
+
+    result = {
+        "dryRun": dry_run,
+        "total": total,
+        "processed": processed,
+        "changed": changed,
+        "failed": failed,
+        "skipped": skipped,
+        "deltaTotal": round(delta_total, 2),
+        "tariffVersion": snapshot.tariff_version,
+    }
+    if dry_run:
+        result["diff"] = diff
+        result["diffTruncated"] = changed > len(diff)
+    return result
@@ -0,0 +1,375 @@
+"""Язык условий правил AI (AIRule.trigger_condition).
+
+Условие записывается выражением в синтаксисе Python и проверяется локально
+по массивам элементов плана и его пространственному индексу:
+
+* ``walls``, ``zones``, ``doors``, ``windows``, ``labels``, ``elements`` —
+  наборы элементов; вызов с именованными аргументами отбирает элементы по
+  полям, кортеж или список — одно из значений:
+  ``walls(role="TO_DELETE", loadBearing=True)``,
+  ``zones(zoneType=("kitchen", "bathroom"))``;
+* ``count(S)``, ``area(S)`` (м², зоны), ``length(S)`` (м, стены) — агрегаты;
+* ``overlaps(A, B)`` — элементы A, полигон которых заходит внутрь полигона
+  элемента из B; ``within(A, B)`` — элементы A, опорная точка которых лежит
+  в зоне из B;
+* сравнения (``==``, ``!=``, ``<``, ``<=``, ``>``, ``>=``, ``in``),
+  ``and`` / ``or`` / ``not``, числа, строки, True / False / None.
+
+Типы операндов проверяются при разборе: ``<``, ``<=``, ``>``, ``>=`` — только
+числа, ``==`` / ``!=`` — значения одного типа, ``in`` — только с кортежем
+литералов справа; значения фильтров — литерал или плоский кортеж литералов.
+Поэтому разобранное условие не падает при проверке на плане.
+
+Правило срабатывает, если выражение истинно; набор истинен, если не пуст, и
+найденные элементы попадают в зону риска. Текст, который не разбирается как
+выражение, остается описанием правила для LLM. Разбор идет по белому списку
+узлов ast и собирает замыкания; eval и имена из окружения не используются.
+"""
+from __future__ import annotations
+
+import ast
+import operator
+from dataclasses import dataclass
+from functools import cached_property
+from typing import Any, Callable
+
+import numpy as np
+
+from app.services import plan_geometry
+from app.services.plan_spatial import PlanSpatialIndex
+
+MAX_EXPRESSION_LENGTH = 2000
+
+SELECTORS: dict[str, str | None] = {
+    "elements": None,
+    "walls": "wall",
+    "zones": "zone",
+    "doors": "door",
+    "windows": "window",
+    "labels": "label",
+}
+
+_ORDERINGS = (ast.Lt, ast.LtE, ast.Gt, ast.GtE)
+_MEMBERSHIP = (ast.In, ast.NotIn)
+
+_COMPARISONS = {
+    ast.Eq: operator.eq,
+    ast.NotEq: operator.ne,
+    ast.Lt: operator.lt,
+    ast.LtE: operator.le,
+    ast.Gt: operator.gt,
+    ast.GtE: operator.ge,
+    ast.In: lambda a, b: a in b,
+    ast.NotIn: lambda a, b: a not in b,
+}
+
+# Типы узлов при разборе: набор элементов, число, логическое, строка, None, кортеж литералов
+SET, NUMBER, BOOL, STRING, NONE, TUPLE = "set", "number", "bool", "string", "none", "tuple"
+
+
+class RuleExpressionError(ValueError):
+    """Условие правила не является выражением языка условий"""
+
+
+class Selection(tuple):
+    """Строки элементов плана, отобранные условием, в порядке плана"""
+
+
+class PlanContext:
+    """План, подготовленный для проверки условий; площади, длины и опорные точки
+    считаются один раз на все правила"""
+
+    def __init__(self, index: PlanSpatialIndex):
+        self.index = index
+        self.elements = index.elements
+        self.scale = index.arrays.px_per_meter
+        # Насколько полигон должен зайти в другой, чтобы это не было общей стеной
+        self.overlap_margin = 0.02 * self.scale
+        self._columns: dict[str, np.ndarray] = {}
+        self._rows_by_type: dict[str | None, Selection] = {}
+
+    def column(self, key: str) -> np.ndarray:
+        """Значения поля key всех элементов (object-массив), чтобы отбор шел масками numpy"""
+        column = self._columns.get(key)
+        if column is None:
+            column = np.fromiter((elem.get(key) for elem in self.elements), dtype=object, count=len(self.elements))
+            self._columns[key] = column
+        return column
+
+    def mask(self, key: str, values: tuple) -> np.ndarray:
+        column = self.column(key)
+        result = column == values[0]
+        for value in values[1:]:
+            result |= column == value
+        return result
+
+    def rows(self, element_type: str | None) -> Selection:
+        rows = self._rows_by_type.get(element_type)
+        if rows is None:
+            if element_type is None:
+                rows = Selection(range(len(self.elements)))
+            else:
+                rows = Selection(np.flatnonzero(self.mask("type", (element_type,))).tolist())
+            self._rows_by_type[element_type] = rows
+        return rows
+
+    @cached_property
+    def areas(self) -> dict[int, float]:
+        arrays = self.index.arrays
+        return dict(zip(arrays.polygon_rows.tolist(), (plan_geometry.polygon_areas(arrays) / self.scale ** 2).tolist()))
+
+    @cached_property
+    def lengths(self) -> dict[int, float]:
+        arrays = self.index.arrays
+        return dict(zip(arrays.wall_rows.tolist(), (plan_geometry.wall_lengths(arrays) / self.scale).tolist()))
+
+    @cached_property
+    def anchors(self) -> np.ndarray:
+        return plan_geometry.anchors(self.index.arrays)
+
+    def element_ids(self, rows: Selection) -> list[str]:
+        return [str(self.elements[row].get("id")) for row in rows]
+
+
+Compiled = Callable[[PlanContext], Any]
+
+
+@dataclass(frozen=True)
+class Condition:
+    source: str
+    evaluate: Compiled
+
+    def matches(self, context: PlanContext) -> tuple[bool, list[str]]:
+        """Сработало ли условие и id найденных элементов (если результат — набор)"""
+        result = self.evaluate(context)
+        if isinstance(result, Selection):
+            return bool(result), context.element_ids(result)
+        return bool(result), []
+
+
+def _scalar(node: ast.AST) -> tuple[Any, str]:
+    """Литерал-скаляр и его тип"""
+    if isinstance(node, ast.Constant):
+        value = node.value
+        if value is None:
+            return value, NONE
+        if isinstance(value, bool):
+            return value, BOOL
+        if isinstance(value, (int, float)):
+            return value, NUMBER
+        if isinstance(value, str):
+            return value, STRING
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.USub):
+        value, kind = _scalar(node.operand)
+        if kind == NUMBER:
+            return -value, NUMBER
+    raise RuleExpressionError(f"expected a literal, got {type(node).__name__}")
+
+
+def _literal(node: ast.AST) -> tuple[Any, str]:
+    """Скаляр или плоский кортеж (список) скаляров"""
+    if isinstance(node, (ast.Tuple, ast.List)):
+        return tuple(_scalar(item)[0] for item in node.elts), TUPLE
+    return _scalar(node)
+
+
+def _selector(name: str, keywords: list[ast.keyword]) -> Compiled:
+    element_type = SELECTORS[name]
+    filters = []
+    for keyword in keywords:
+        if keyword.arg is None:
+            raise RuleExpressionError(f"{name}(): **kwargs are not supported")
+        value, kind = _literal(keyword.value)
+        if kind == TUPLE and not value:
+            raise RuleExpressionError(f"{name}(): empty list of values for {keyword.arg}")
+        filters.append((keyword.arg, value if kind == TUPLE else (value,)))
+    if not filters:
+        return lambda ctx: ctx.rows(element_type)
+
+    def select(ctx: PlanContext) -> Selection:
+        mask = ctx.mask("type", (element_type,)) if element_type else np.ones(len(ctx.elements), dtype=bool)
+        for key, values in filters:
+            mask &= ctx.mask(key, values)
+        return Selection(np.flatnonzero(mask).tolist())
+
+    return select
+
+
+def _sum_of(values_attr: str) -> Callable[[PlanContext, Selection], float]:
+    def aggregate(ctx: PlanContext, rows: Selection) -> float:
+        values = getattr(ctx, values_attr)
+        return sum(values.get(row, 0.0) for row in rows)
+
+    return aggregate
+
+
+def _overlaps(ctx: PlanContext, rows: Selection, targets: Selection) -> Selection:
+    if not rows or not targets:
+        return Selection()
+    index, margin = ctx.index, ctx.overlap_margin
+    boxes = index.grid.boxes
+    target_rows = np.asarray(targets, dtype=np.int64)
+    target_boxes = boxes[target_rows]
+    result = []
+    for row in rows:
+        box = boxes[row]
+        # Габариты должны пересекаться глубже margin: касание по общей стене — не наложение
+        candidates = target_rows[
+            (np.minimum(box[2], target_boxes[:, 2]) - np.maximum(box[0], target_boxes[:, 0]) > margin)
+            & (np.minimum(box[3], target_boxes[:, 3]) - np.maximum(box[1], target_boxes[:, 1]) > margin)
+            & (target_rows != row)
+        ]
+        if any(index.polygons_overlap(row, other, margin) for other in candidates.tolist()):
+            result.append(row)
+    return Selection(result)
+
+
+def _within(ctx: PlanContext, rows: Selection, zones: Selection) -> Selection:
+    if not rows or not zones:
+        return Selection()
+    row_array = np.asarray(rows, dtype=np.int64)
+    points = ctx.anchors[row_array]
+    inside = np.zeros(len(row_array), dtype=bool)
+    for zone in zones:
+        inside |= ctx.index.points_in_polygon(zone, points)
+    return Selection(row_array[inside].tolist())
+
+
+_AGGREGATES: dict[str, Callable[[PlanContext, Selection], float]] = {
+    "count": lambda ctx, rows: len(rows),
+    "area": _sum_of("areas"),
+    "length": _sum_of("lengths"),
+}
+_SPATIAL: dict[str, Callable[[PlanContext, Selection, Selection], Selection]] = {
+    "overlaps": _overlaps,
+    "within": _within,
+}
+
+
+def _compile(node: ast.AST) -> tuple[Compiled, str]:
+    if isinstance(node, ast.Name):
+        if node.id not in SELECTORS:
+            raise RuleExpressionError(f"unknown name: {node.id}")
+        return _selector(node.id, []), SET
+
+    if isinstance(node, ast.Call):
+        if not isinstance(node.func, ast.Name):
+            raise RuleExpressionError("only named functions can be called")
+        name = node.func.id
+        if name in SELECTORS:
+            if node.args:
+                raise RuleExpressionError(f"{name}(): filters must be keyword arguments")
+            return _selector(name, node.keywords), SET
+        if name in _AGGREGATES or name in _SPATIAL:
+            arity = 1 if name in _AGGREGATES else 2
+            if node.keywords or len(node.args) != arity:
+                raise RuleExpressionError(f"{name}() takes {arity} element set argument(s)")
+            args = [_compile(arg) for arg in node.args]
+            if any(kind != SET for _fn, kind in args):
+                raise RuleExpressionError(f"{name}() arguments must be element sets")
+            if name in _AGGREGATES:
+                aggregate, (fn,) = _AGGREGATES[name], [fn for fn, _kind in args]
+                return (lambda ctx: aggregate(ctx, fn(ctx))), NUMBER
+            spatial, (fa, fb) = _SPATIAL[name], [fn for fn, _kind in args]
+            return (lambda ctx: spatial(ctx, fa(ctx), fb(ctx))), SET
+        raise RuleExpressionError(f"unknown function: {name}")
+
+    if isinstance(node, ast.BoolOp):
+        parts = [fn for fn, _kind in (_compile(value) for value in node.values)]
+        if isinstance(node.op, ast.And):
+            def evaluate_and(ctx: PlanContext) -> Any:
+                value = True
+                for part in parts:
+                    value = part(ctx)
+                    if not value:
+                        return value
+                return value
+
+            return evaluate_and, BOOL
+
+        def evaluate_or(ctx: PlanContext) -> Any:
+            value = False
+            for part in parts:
+                value = part(ctx)
+                if value:
+                    return value
+            return value
+
+        return evaluate_or, BOOL
+
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.Not):
+        fn, _kind = _compile(node.operand)
+        return (lambda ctx: not fn(ctx)), BOOL
+
+    if isinstance(node, ast.Compare):
+        operands = [_compile(item) for item in (node.left, *node.comparators)]
+        ops = []
+        for op, (_left, left_kind), (_right, right_kind) in zip(node.ops, operands, operands[1:]):
+            _check_comparison(op, left_kind, right_kind)
+            ops.append(_COMPARISONS[type(op)])
+        fns = [fn for fn, _kind in operands]
+
+        def evaluate_compare(ctx: PlanContext) -> bool:
+            left = fns[0](ctx)
+            for compare, right_fn in zip(ops, fns[1:]):
+                right = right_fn(ctx)
+                if left is None or right is None or not compare(left, right):
+                    return False
+                left = right
+            return True
+
+        return evaluate_compare, BOOL
+
+    value, kind = _literal(node)
+    return (lambda ctx: value), kind
+
+
+def _check_comparison(op: ast.cmpop, left: str, right: str) -> None:
+    """Сравнение допустимо для типов операндов (иначе упадет при проверке на плане)"""
+    if type(op) not in _COMPARISONS:
+        raise RuleExpressionError(f"unsupported comparison: {type(op).__name__}")
+    if SET in (left, right):
+        raise RuleExpressionError("element sets can not be compared, use count() or area()")
+    if isinstance(op, _MEMBERSHIP):
+        if right != TUPLE or left == TUPLE:
+            raise RuleExpressionError("'in' needs a value on the left and a tuple of literals on the right")
+        return
+    if TUPLE in (left, right):
+        raise RuleExpressionError("tuples can only be used with 'in'")
+    if isinstance(op, _ORDERINGS):
+        if left != NUMBER or right != NUMBER:
+            raise RuleExpressionError(f"{type(op).__name__} compares numbers only, got {left} and {right}")
+        return
+    # None сравнивается с чем угодно: при проверке сравнение с None ложно
+    if left != right and NONE not in (left, right):
+        raise RuleExpressionError(f"can not compare {left} with {right}")
+
+
+def compile_condition(text: str | None) -> Condition:
+    """Разобрать условие; RuleExpressionError — текст не является выражением языка"""
+    source = (text or "").strip()
+    if not source:
+        raise RuleExpressionError("empty condition")
+    if len(source) > MAX_EXPRESSION_LENGTH:
+        raise RuleExpressionError(f"condition is longer than {MAX_EXPRESSION_LENGTH} characters")
+    try:
+        tree = ast.parse(source, mode="eval")
+    except SyntaxError as exc:
+        raise RuleExpressionError(f"not an expression: {exc.msg}") from exc
+    fn, kind = _compile(tree.body)
+    if kind not in (SET, BOOL):
+        raise RuleExpressionError("condition must be an element set or a boolean expression")
+    return Condition(source, fn)
+
+
+_LANGUAGE_NAMES = {*SELECTORS, *_AGGREGATES, *_SPATIAL}
+
+
+def uses_language(text: str | None) -> bool:
+    """Текст — выражение Python, ссылающееся на наборы или функции языка условий
+    (такое условие должно разбираться, а не уходить описанием в LLM)"""
+    try:
+        tree = ast.parse((text or "").strip(), mode="eval")
+    except (SyntaxError, ValueError):
+        return False
+    return any(isinstance(node, ast.Name) and node.id in _LANGUAGE_NAMES for node in ast.walk(tree))
@@ -0,0 +1,92 @@
+"""Версии тарифа калькулятора стоимости.
+
+Тариф после создания не меняется: новая редакция правил — новая версия,
+заказ хранит номер версии, по которой рассчитана его цена. Скомпилированные
+правила кэшируются по номеру версии.
+"""
+from __future__ import annotations
+
+import threading
+import uuid
+
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session
+
+from app.models.pricing import PricingTariff
+from app.schemas.pricing import TariffCreate
+from app.services.pricing_rules import DEFAULT_RULES, Evaluator, compile_rules
+
+# Номер изменения набора тарифов в этом процессе (создание, активация)
+_tariffs_version = 0
+_compiled: dict[int, Evaluator] = {}
+_compiled_lock = threading.Lock()
+
+
+def tariffs_version() -> int:
+    return _tariffs_version
+
+
+def _bump_tariffs_version() -> None:
+    global _tariffs_version
+    _tariffs_version += 1
+
+
+def compiled(tariff: PricingTariff) -> Evaluator:
+    """Функция расчета для версии тарифа (компилируется один раз)"""
+    evaluate = _compiled.get(tariff.version)
+    if evaluate is None:
+        evaluate = compile_rules(tariff.rules)
+        with _compiled_lock:
+            _compiled[tariff.version] = evaluate
+    return evaluate
+
+
+def list_tariffs(db: Session) -> list[PricingTariff]:
+    return list(db.scalars(select(PricingTariff).order_by(PricingTariff.version.desc())))
+
+
+def get_tariff(db: Session, version: int) -> PricingTariff | None:
+    return db.get(PricingTariff, version)
+
+
+def get_active_tariff(db: Session) -> PricingTariff | None:
+    return db.scalars(
+        select(PricingTariff).where(PricingTariff.is_active.is_(True)).order_by(PricingTariff.version.desc()).limit(1)
+    ).first()
+
+
+def _activate(db: Session, tariff: PricingTariff) -> None:
+    db.execute(update(PricingTariff).where(PricingTariff.version != tariff.version).values(is_active=False))
+    tariff.is_active = True
+
+
+def create_tariff(db: Session, data: TariffCreate, created_by_id: uuid.UUID | None = None) -> PricingTariff:
+    """Создать новую версию тарифа; правила проверяются компиляцией (PricingRulesError)"""
+    evaluate = compile_rules(data.rules)
+    tariff = PricingTariff(rules=data.rules, comment=data.comment, created_by_id=created_by_id, is_active=False)
+    db.add(tariff)
+    db.flush()
+    if data.activate:
+        _activate(db, tariff)
+    db.commit()
+    db.refresh(tariff)
+    with _compiled_lock:
+        _compiled[tariff.version] = evaluate
+    _bump_tariffs_version()
+    return tariff
+
+
+def activate_tariff(db: Session, tariff: PricingTariff) -> PricingTariff:
+    _activate(db, tariff)
+    db.commit()
+    db.refresh(tariff)
+    _bump_tariffs_version()
+    return tariff
+
+
+def ensure_default_tariff(db: Session) -> PricingTariff:
+    """Первая версия тарифа — формула, которая раньше была записана в коде"""
+    tariff = get_active_tariff(db)
+    if tariff is None:
+        tariff = create_tariff(db, TariffCreate(rules=DEFAULT_RULES, comment="Базовый тариф", activate=True))
+    return tariff
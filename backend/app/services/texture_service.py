@@ -8,6 +8,18 @@ from sqlalchemy.orm import Session
 from app.core.config import settings
 from app.models.texture import Texture
 
+# Номер версии списка текстур в этом процессе (для кэша ответов API)
+_version = 0
+
+
+def textures_version() -> int:
+    return _version
+
+
+def _bump_version() -> None:
+    global _version
+    _version += 1
+
 
 def list_textures(db: Session) -> list[Texture]:
     return db.scalars(select(Texture)).all()
@@ -54,5 +66,6 @@ def create_texture(
     )
     db.add(texture)
     db.commit()
+    _bump_version()
     db.refresh(texture)
     return texture
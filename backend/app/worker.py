@@ -0,0 +1,79 @@
+"""Воркер фоновых задач.
+
+Запуск из каталога backend: ``python -m app.worker``
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import logging
+import os
+import socket
+
+from app.core.config import settings
+from app.db.base import Base
+from app.db.session import SessionLocal, engine
+from app.services import job_handlers  # noqa: F401  регистрирует обработчики
+from app.services import job_service
+
+logger = logging.getLogger("app.worker")
+
+
+async def _run_claimed(db, job) -> None:
+    try:
+        job = await job_service.run_job(db, job)
+        logger.info("Job %s (%s) -> %s", job.id, job.kind, job.status.value)
+    except Exception:
+        logger.exception("Job %s (%s): could not record the result", job.id, job.kind)
+    finally:
+        db.close()
+
+
+async def run_worker(kinds: list[str] | None = None, once: bool = False, concurrency: int | None = None) -> None:
+    """Забирать задачи из очереди и выполнять до concurrency штук одновременно"""
+    worker_id = f"{socket.gethostname()}:{os.getpid()}"
+    concurrency = max(concurrency or settings.worker_concurrency, 1)
+    logger.info(
+        "Worker %s started (kinds: %s, concurrency: %s)",
+        worker_id, ", ".join(kinds) if kinds else "all", concurrency,
+    )
+    running: set[asyncio.Task] = set()
+    while True:
+        job = None
+        if len(running) < concurrency:
+            # У каждой выполняемой задачи своя сессия, ее закрывает _run_claimed
+            db = SessionLocal()
+            try:
+                job_service.requeue_stale_jobs(db)
+                job = job_service.claim_next(db, worker_id, kinds)
+            finally:
+                if job is None:
+                    db.close()
+            if job is not None:
+                task = asyncio.create_task(_run_claimed(db, job))
+                running.add(task)
+                task.add_done_callback(running.discard)
+                continue
+        if once and job is None and not running:
+            return
+        if running:
+            # Ждем освобождения места или следующего опроса очереди
+            await asyncio.wait(running, timeout=settings.job_poll_interval_seconds, return_when=asyncio.FIRST_COMPLETED)
+        else:
+            await asyncio.sleep(settings.job_poll_interval_seconds)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Воркер фоновых задач")
+    parser.add_argument("--kind", action="append", dest="kinds", help="Обрабатывать только задачи этого типа")
+    parser.add_argument("--once", action="store_true", help="Выйти, когда очередь опустеет")
+    parser.add_argument("--concurrency", type=int, help="Сколько задач выполнять одновременно")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    Base.metadata.create_all(bind=engine)
+    asyncio.run(run_worker(kinds=args.kinds, once=args.once, concurrency=args.concurrency))
+
+
+if __name__ == "__main__":
+    main()
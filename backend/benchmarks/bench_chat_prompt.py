@@ -0,0 +1,96 @@
+"""Бенчмарк сборки промпта чата: вся история через list_chat_messages против
+последних сообщений (LIMIT) с бюджетом токенов.
+
+Чат во временной SQLite-базе; каждое седьмое сообщение длинное (вставленный
+документ). Размер промпта — оценка chat_prompt.estimate_tokens.
+
+Запуск из каталога backend: ``python -m benchmarks.bench_chat_prompt [--messages N]``
+"""
+from __future__ import annotations
+
+import argparse
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+
+import app.db.base  # noqa: F401  регистрация всех моделей
+from app.core.config import settings
+from app.db.base_class import Base
+from app.models.chat import ChatThread
+from app.models.order import OrderChatMessage
+from app.services import chat_service
+from app.services.chat_prompt import build_prompt, estimate_tokens
+
+
+def _timed(fn, repeat: int = 5) -> float:
+    """Лучшее время вызова, мс"""
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best * 1000
+
+
+def _setup(path: Path, count: int):
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)
+    chat_id = uuid.uuid4()
+    started = datetime.utcnow() - timedelta(days=30)
+    long_text = "Согласно проекту перепланировки несущая стена не затрагивается. " * 400
+    messages = [
+        {
+            "id": uuid.uuid4(), "chat_id": chat_id, "sender_type": "CLIENT" if i % 2 == 0 else "AI",
+            "message_text": long_text if i % 7 == 0 else f"Сообщение {i}: можно ли перенести дверь в кухню?",
+            "created_at": started + timedelta(seconds=i),
+        }
+        for i in range(count)
+    ]
+    with session() as db:
+        db.add(ChatThread(id=chat_id, client_id=uuid.uuid4(), title="bench"))
+        db.commit()
+        db.execute(insert(OrderChatMessage), messages)
+        db.commit()
+    return session, chat_id
+
+
+def _full_history(db, chat) -> str:
+    # Прежний способ: вся история, из нее последние chat_max_history без ограничения размера
+    history = chat_service.list_chat_messages(db, chat)[-settings.chat_max_history:]
+    return "\n".join(
+        f"{'Клиент' if msg.sender_type == 'CLIENT' else 'Ассистент'}: {msg.message_text}" for msg in history
+    )
+
+
+def _bounded(db, chat) -> str:
+    messages = chat_service.recent_messages(db, chat, settings.chat_max_history + settings.chat_summary_batch + 1)
+    return build_prompt(
+        sections=[], summary=chat.history_summary,
+        history=[chat_service._history_message(msg) for msg in messages],
+        message="Что дальше?", instruction="Сформулируй ответ ассистента.",
+        budget=settings.chat_prompt_max_tokens, message_max_tokens=settings.chat_message_max_tokens,
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Бенчмарк промпта чата")
+    parser.add_argument("--messages", type=int, default=20000)
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as tmp:
+        session, chat_id = _setup(Path(tmp) / "bench.db", args.messages)
+        with session() as db:
+            chat = db.get(ChatThread, chat_id)
+            for label, build in (("full history", _full_history), ("LIMIT + budget", _bounded)):
+                prompt = build(db, chat)
+                ms = _timed(lambda: (build(db, chat), db.expire_all()))
+                print(f"{label:<16}{ms:>9.1f} ms{estimate_tokens(prompt):>9} tokens")
+
+
+if __name__ == "__main__":
+    main()
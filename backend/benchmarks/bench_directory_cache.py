@@ -0,0 +1,62 @@
+"""Бенчмарк справочников: прежний обработчик (БД + Pydantic) против кэша готовых ответов.
+
+Оба варианта обслуживаются одним приложением через TestClient, поэтому в
+цифры входят маршрутизация и middleware; база — та, что в настройках.
+
+Запуск из каталога backend: ``python -m benchmarks.bench_directory_cache [--requests N]``
+"""
+from __future__ import annotations
+
+import argparse
+import time
+
+from fastapi import APIRouter, Depends
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+
+from app.api.deps import get_db_session
+from app.main import app
+from app.schemas.directory import DistrictRead
+from app.services import directory_service
+
+legacy = APIRouter()
+
+
+@legacy.get("/bench/legacy/districts", response_model=list[DistrictRead])
+def legacy_districts(db: Session = Depends(get_db_session)):
+    """Обработчик до кэша: запрос в БД и проверка моделей на каждый вызов"""
+    return [DistrictRead.model_validate(d) for d in directory_service.list_districts(db)]
+
+
+def _rate(client: TestClient, url: str, count: int, headers: dict | None = None) -> float:
+    client.get(url, headers=headers)
+    started = time.perf_counter()
+    for _ in range(count):
+        response = client.get(url, headers=headers)
+    assert response.status_code in (200, 304)
+    return count / (time.perf_counter() - started)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Бенчмарк кэша справочников")
+    parser.add_argument("--requests", type=int, default=2_000)
+    args = parser.parse_args()
+
+    app.include_router(legacy)
+    client = TestClient(app)
+    url = "/api/v1/districts"
+    assert client.get("/bench/legacy/districts").json() == client.get(url).json()
+    etag = client.get(url).headers["etag"]
+
+    rows = [
+        ("db + pydantic", _rate(client, "/bench/legacy/districts", args.requests)),
+        ("cached bytes", _rate(client, url, args.requests)),
+        ("cached, 304", _rate(client, url, args.requests, {"If-None-Match": etag})),
+    ]
+    print(f"{'handler':<16}{'req/s':>10}")
+    for name, rate in rows:
+        print(f"{name:<16}{rate:>10,.0f}")
+
+
+if __name__ == "__main__":
+    main()
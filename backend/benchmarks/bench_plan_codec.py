@@ -0,0 +1,69 @@
+"""Бенчмарк форматов передачи плана: JSON, MessagePack, колоночная раскладка, сжатие.
+
+Запуск из каталога backend: ``python -m benchmarks.bench_plan_codec [--elements N]``
+"""
+from __future__ import annotations
+
+import argparse
+import gzip
+import json
+import time
+
+import msgpack
+import numpy as np
+
+from app.schemas.plan import Plan
+from app.services import plan_codec
+from benchmarks.bench_plan_diff import make_plan
+
+
+def _timed(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, (time.perf_counter() - started) * 1000)
+    return best
+
+
+def _parse_columnar_msgpack(body: bytes) -> None:
+    data = msgpack.unpackb(body)
+    # Клиенту (3D-вьюеру) нужен массив координат, а не список списков
+    np.frombuffer(data["walls"]["points"], dtype="<f4").reshape(-1, 4)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Бенчмарк форматов передачи плана")
+    parser.add_argument("--elements", type=int, default=20_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    # Как в ответах API: все поля схемы, включая None
+    plan = Plan.model_validate(make_plan(args.elements)).model_dump(mode="json", by_alias=True)
+    columnar = plan_codec.to_columnar(plan)
+    bodies = {
+        "json": json.dumps(plan, separators=(",", ":")).encode(),
+        "msgpack": msgpack.packb(plan, use_bin_type=True),
+        "json+columnar": json.dumps(plan_codec.to_columnar(plan, binary=False), separators=(",", ":")).encode(),
+        "msgpack+columnar": msgpack.packb(columnar, use_bin_type=True),
+    }
+    parsers = {
+        "json": json.loads,
+        "msgpack": msgpack.unpackb,
+        "json+columnar": json.loads,
+        "msgpack+columnar": _parse_columnar_msgpack,
+    }
+
+    baseline = len(bodies["json"])
+    print(f"elements: {args.elements}")
+    print(f"{'format':<18}{'bytes':>12}{'ratio':>8}{'gzip':>12}{'parse ms':>10}")
+    for name, body in bodies.items():
+        compressed = len(gzip.compress(body, compresslevel=6))
+        parse_ms = _timed(lambda: parsers[name](body), args.repeat)
+        print(f"{name:<18}{len(body):>12}{baseline / len(body):>8.2f}{compressed:>12}{parse_ms:>10.1f}")
+    encode_ms = _timed(lambda: msgpack.packb(plan_codec.to_columnar(plan), use_bin_type=True), args.repeat)
+    print(f"columnar encode + pack ms: {encode_ms:.1f}")
+
+
+if __name__ == "__main__":
+    main()
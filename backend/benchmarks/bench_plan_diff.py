@@ -0,0 +1,91 @@
+"""Бенчмарк diff планов на больших планах.
+
+Запуск из каталога backend: ``python -m benchmarks.bench_plan_diff [--elements N]``
+"""
+from __future__ import annotations
+
+import argparse
+import copy
+import statistics
+import time
+import uuid
+from types import SimpleNamespace
+
+import numpy as np
+
+from app.services import plan_diff
+
+
+def make_plan(elements: int, seed: int = 0) -> dict:
+    rng = np.random.default_rng(seed)
+    items = []
+    for i in range(elements):
+        x, y = (float(v) for v in rng.uniform(0, 50_000, 2))
+        if i % 3 == 2:
+            w, h = (float(v) for v in rng.uniform(100, 600, 2))
+            items.append({
+                "id": f"zone_{i}", "type": "zone", "role": "EXISTING", "zoneType": "room",
+                "geometry": {"kind": "polygon", "points": [x, y, x + w, y, x + w, y + h, x, y + h]},
+            })
+        else:
+            dx, dy = (float(v) for v in rng.uniform(-500, 500, 2))
+            openings = [{"id": f"door_{i}", "type": "door", "from_m": 0.5, "to_m": 1.4, "bottom_m": 0.0, "top_m": 2.0}] if i % 5 == 0 else None
+            items.append({
+                "id": f"wall_{i}", "type": "wall", "role": "EXISTING", "loadBearing": i % 4 == 0, "thickness": 15,
+                "geometry": {"kind": "segment", "points": [x, y, x + dx, y + dy], "openings": openings},
+            })
+    return {"meta": {"width": 50_000, "height": 50_000, "unit": "px", "scale": {"px_per_meter": 100}}, "elements": items, "objects3d": []}
+
+
+def mutate(plan: dict, seed: int = 1) -> dict:
+    """~5% перемещений, 1% удалений и добавлений, 2% элементов с новыми id"""
+    rng = np.random.default_rng(seed)
+    result = copy.deepcopy(plan)
+    elements = result["elements"]
+    n = len(elements)
+    for i in rng.choice(n, n // 20, replace=False):
+        pts = elements[i]["geometry"]["points"]
+        pts[0] += 40.0
+    for i in rng.choice(n, n // 50, replace=False):
+        elements[i]["id"] = f"renamed_{i}"
+    keep = np.ones(n, dtype=bool)
+    keep[rng.choice(n, n // 100, replace=False)] = False
+    result["elements"] = [e for e, k in zip(elements, keep) if k]
+    result["elements"] += copy.deepcopy(make_plan(n // 100, seed=seed + 10)["elements"])
+    for e in result["elements"][-(n // 100):]:
+        e["id"] = f"new_{e['id']}"
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Бенчмарк diff планов")
+    parser.add_argument("--elements", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    original = make_plan(args.elements)
+    modified = mutate(original)
+
+    timings = []
+    for _ in range(args.repeat):
+        started = time.perf_counter()
+        result = plan_diff.diff_plans(original, modified)
+        timings.append((time.perf_counter() - started) * 1000)
+
+    a = SimpleNamespace(id=uuid.uuid4(), plan=original)
+    b = SimpleNamespace(id=uuid.uuid4(), plan=modified)
+    plan_diff.diff_versions(a, b)
+    started = time.perf_counter()
+    plan_diff.diff_versions(a, b)
+    cached_ms = (time.perf_counter() - started) * 1000
+
+    rematched = sum(1 for e in result["elements"] if "originalId" in e)
+    print(f"elements:          {len(original['elements'])}")
+    print(f"diff mean/max ms:  {statistics.mean(timings):.1f} / {max(timings):.1f}")
+    print(f"cached lookup ms:  {cached_ms:.1f}")
+    print(f"added/deleted:     {len(result['added'])} / {len(result['deleted'])}")
+    print(f"modified:          {len(result['modified'])} (matched without id: {rematched})")
+
+
+if __name__ == "__main__":
+    main()
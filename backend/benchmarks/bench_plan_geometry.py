@@ -0,0 +1,87 @@
+"""Бенчмарк векторизованной геометрии плана против поэлементного Python.
+
+Запуск из каталога backend: ``python -m benchmarks.bench_plan_geometry [--elements N]``
+"""
+from __future__ import annotations
+
+import argparse
+import math
+import time
+
+from app.services import plan_description, plan_geometry, plan_similarity_service
+from app.services.plan_transform import split_wall_segments
+from benchmarks.bench_plan_diff import make_plan
+
+
+def _timed(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, (time.perf_counter() - started) * 1000)
+    return best
+
+
+def _python_metrics(plan: dict) -> tuple[float, float, tuple[float, float, float, float]]:
+    """Эталон: длины стен, площади зон и габариты циклом по элементам"""
+    total_length = total_area = 0.0
+    min_x = min_y = math.inf
+    max_x = max_y = -math.inf
+    for elem in plan["elements"]:
+        geometry = elem.get("geometry") or {}
+        points = geometry.get("points") or []
+        if geometry.get("kind") == "segment" and len(points) == 4:
+            total_length += math.hypot(points[2] - points[0], points[3] - points[1])
+        elif geometry.get("kind") == "polygon" and len(points) >= 6:
+            xs, ys = points[0::2], points[1::2]
+            total_area += abs(sum(xs[i] * ys[i - len(xs) + 1] - xs[i - len(xs) + 1] * ys[i] for i in range(len(xs)))) / 2
+        xs, ys = points[0::2], points[1::2]
+        if xs:
+            min_x, max_x = min(min_x, *xs), max(max_x, *xs)
+            min_y, max_y = min(min_y, *ys), max(max_y, *ys)
+    return total_length, total_area, (min_x, min_y, max_x, max_y)
+
+
+def _numpy_metrics(plan: dict) -> tuple[float, float, tuple[float, float, float, float] | None]:
+    arrays = plan_geometry.load(plan)
+    return (
+        float(plan_geometry.wall_lengths(arrays).sum()),
+        float(plan_geometry.polygon_areas(arrays).sum()),
+        plan_geometry.plan_bbox(arrays),
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Бенчмарк геометрии плана")
+    parser.add_argument("--elements", type=int, default=50_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    plan = make_plan(args.elements)
+    reference, vectorized = _python_metrics(plan), _numpy_metrics(plan)
+    assert math.isclose(reference[0], vectorized[0], rel_tol=1e-9)
+    assert math.isclose(reference[1], vectorized[1], rel_tol=1e-9)
+
+    arrays = plan_geometry.load(plan)
+    rows = [
+        ("python metrics", lambda: _python_metrics(plan)),
+        ("load", lambda: plan_geometry.load(plan)),
+        ("load + metrics", lambda: _numpy_metrics(plan)),
+        ("kernels only", lambda: (
+            plan_geometry.wall_lengths(arrays), plan_geometry.polygon_areas(arrays), plan_geometry.element_bboxes(arrays),
+        )),
+        ("split_walls kernel", lambda: plan_geometry.split_walls(arrays)),
+        ("split_wall_segments", lambda: split_wall_segments(plan)),
+        ("summarize_plan", lambda: plan_description.summarize_plan(plan)),
+        ("plan_features", lambda: plan_similarity_service.plan_features(plan)),
+    ]
+    print(f"elements: {args.elements}, walls: {len(arrays.wall_rows)}, polygons: {len(arrays.polygon_rows)}, "
+          f"openings: {len(arrays.opening_walls)}")
+    print(f"{'step':<22}{'ms':>10}{'elements/s':>14}")
+    for name, fn in rows:
+        ms = _timed(fn, args.repeat)
+        print(f"{name:<22}{ms:>10.1f}{args.elements / ms * 1000:>14.0f}")
+
+
+if __name__ == "__main__":
+    main()
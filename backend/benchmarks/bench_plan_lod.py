@@ -0,0 +1,103 @@
+"""Бенчмарк уровней детализации плана: размер ответа и время построения.
+
+План — сетка комнат, как после распознавания: стены разбиты на короткие
+куски на одной прямой, контуры зон с лишними вершинами и шумом, подписи,
+проемы и мебель.
+
+Запуск из каталога backend: ``python -m benchmarks.bench_plan_lod [--rooms N]``
+"""
+from __future__ import annotations
+
+import argparse
+import gzip
+import json
+import time
+
+import numpy as np
+
+from app.schemas.plan import Plan
+from app.services import plan_lod
+from app.services.plan_transform import split_wall_segments
+
+
+def make_floor(rooms: int, seed: int = 0) -> dict:
+    rng = np.random.default_rng(seed)
+    side = max(int(np.ceil(np.sqrt(rooms))), 1)
+    size, pieces = 400.0, 6
+    elements, objects = [], []
+
+    def wall(x1, y1, x2, y2, openings=None):
+        # Стена разбита на куски с небольшим шумом в стыках
+        xs, ys = np.linspace(x1, x2, pieces + 1), np.linspace(y1, y2, pieces + 1)
+        step_m = float(np.hypot(x2 - x1, y2 - y1)) / pieces / 100
+        for k in range(pieces):
+            elements.append({
+                "id": f"wall_{len(elements)}", "type": "wall", "role": "EXISTING", "loadBearing": False, "thickness": 12,
+                "geometry": {
+                    "kind": "segment",
+                    "points": [float(xs[k]), float(ys[k]), float(xs[k + 1]), float(ys[k + 1])],
+                    "openings": openings if k == pieces // 2 and openings and step_m > 1.2 else None,
+                },
+            })
+
+    door = [{"id": "door", "type": "door", "from_m": 0.1, "to_m": 0.9, "bottom_m": 0.0, "top_m": 2.0}]
+    for r in range(rooms):
+        x0, y0 = (r % side) * size, (r // side) * size
+        wall(x0, y0, x0 + size, y0, door)
+        wall(x0, y0, x0, y0 + size)
+        t = np.linspace(0, 1, 25, endpoint=False)
+        outline = np.concatenate([
+            np.column_stack((x0 + t * size, np.full_like(t, y0))),
+            np.column_stack((np.full_like(t, x0 + size), y0 + t * size)),
+            np.column_stack((x0 + size - t * size, np.full_like(t, y0 + size))),
+            np.column_stack((np.full_like(t, x0), y0 + size - t * size)),
+        ]) + rng.normal(0, 0.3, (100, 2))
+        elements.append({
+            "id": f"zone_{r}", "type": "zone", "role": "EXISTING", "zoneType": "room",
+            "geometry": {"kind": "polygon", "points": [float(v) for v in outline.reshape(-1)]},
+        })
+        elements.append({
+            "id": f"label_{r}", "type": "label", "role": "EXISTING", "text": f"Комната {r + 1}",
+            "geometry": {"kind": "point", "x": x0 + size / 2, "y": y0 + size / 2},
+        })
+        for k, footprint in enumerate((0.3, 2.0)):
+            objects.append({
+                "id": f"obj_{r}_{k}", "type": ("chair", "bed")[k], "position": {"x": x0 / 100 + 1, "y": 0, "z": y0 / 100 + 1},
+                "size": {"x": footprint, "y": 0.8, "z": footprint},
+            })
+    for k in range(side):
+        wall(side * size, k * size, side * size, (k + 1) * size)
+        wall(k * size, side * size, (k + 1) * size, side * size)
+    return {"meta": {"width": side * size, "height": side * size, "unit": "px", "scale": {"px_per_meter": 100}}, "elements": elements, "objects3d": objects}
+
+
+def _payload(plan: dict) -> bytes:
+    """Тело ответа /plan/2d для plan: через схему, как при сериализации FastAPI"""
+    data = Plan.model_validate(plan).model_dump(mode="json", by_alias=True)
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Бенчмарк уровней детализации плана")
+    parser.add_argument("--rooms", type=int, default=30)
+    args = parser.parse_args()
+
+    plan = make_floor(args.rooms)
+    started = time.perf_counter()
+    levels = plan_lod.build_levels(plan)
+    build_ms = (time.perf_counter() - started) * 1000
+
+    print(f"rooms: {args.rooms}, all levels built in {build_ms:.1f} ms")
+    print(f"{'lod':>4}{'elements':>10}{'objects':>9}{'json KB':>10}{'gzip KB':>10}")
+    for level, data in ((0, plan), *levels.items()):
+        body = _payload(split_wall_segments(data))
+        print(f"{level:>4}{len(data['elements']):>10}{len(data['objects3d']):>9}{len(body) / 1024:>10.1f}{len(gzip.compress(body)) / 1024:>10.1f}")
+
+    plan_lod.get_level(plan, 2, "bench")
+    started = time.perf_counter()
+    plan_lod.get_level(plan, 2, "bench")
+    print(f"cached lookup: {(time.perf_counter() - started) * 1e6:.0f} us")
+
+
+if __name__ == "__main__":
+    main()
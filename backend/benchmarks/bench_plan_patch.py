@@ -0,0 +1,65 @@
+"""Бенчмарк инкрементального сохранения плана против отправки плана целиком.
+
+Сравнивается размер тела запроса и время подготовки плана на сервере для
+правки нескольких элементов большого плана.
+
+Запуск из каталога backend: ``python -m benchmarks.bench_plan_patch [--elements N] [--edits K]``
+"""
+from __future__ import annotations
+
+import argparse
+import copy
+import json
+import time
+
+from app.schemas.orders import PatchPlanRequest, SavePlanChangesRequest
+from app.services import plan_patch
+from benchmarks.bench_plan_diff import make_plan
+
+
+def _timed(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, (time.perf_counter() - started) * 1000)
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Бенчмарк PATCH /plan")
+    parser.add_argument("--elements", type=int, default=20_000)
+    parser.add_argument("--edits", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    base = make_plan(args.elements)
+    edited = copy.deepcopy(base)
+    ops = []
+    for elem in edited["elements"][: args.edits]:
+        elem["thickness"] = 30
+        ops.append({"op": "update", "id": elem["id"], "fields": {"thickness": 30}})
+
+    full_body = json.dumps({"versionType": "MODIFIED", "plan": edited}, separators=(",", ":")).encode()
+    patch_body = json.dumps(
+        {"baseRevisionId": "00000000-0000-0000-0000-000000000000", "versionType": "MODIFIED", "elements": ops},
+        separators=(",", ":"),
+    ).encode()
+
+    def full() -> dict:
+        return SavePlanChangesRequest.model_validate_json(full_body).plan.to_data()
+
+    def incremental() -> dict:
+        request = PatchPlanRequest.model_validate_json(patch_body)
+        # Сервер получает копию базового плана из истории (plan_history.materialize)
+        return plan_patch.apply(copy.deepcopy(base), request.patch, request.elements)
+
+    assert incremental() == full()
+    print(f"elements: {args.elements}, edited: {args.edits}")
+    print(f"{'mode':<14}{'body bytes':>12}{'server ms':>12}")
+    print(f"{'full plan':<14}{len(full_body):>12}{_timed(full, args.repeat):>12.1f}")
+    print(f"{'patch':<14}{len(patch_body):>12}{_timed(incremental, args.repeat):>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
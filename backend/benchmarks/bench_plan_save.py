@@ -0,0 +1,62 @@
+"""Бенчмарк проверки плана при сохранении в зависимости от числа элементов.
+
+Сравнивается прежний путь (объединение без тега + model_dump) с текущим
+(объединение по тегу type + model_dump: сохраняется всегда каноническая форма).
+В обоих случаях добавлен канонический хэш содержимого, который считается при
+записи версии.
+
+Запуск из каталога backend: ``python -m benchmarks.bench_plan_save [--sizes 1000,5000,20000,50000]``
+"""
+from __future__ import annotations
+
+import argparse
+import time
+
+from app.models.order import plan_content_hash
+from app.schemas.orders import SavePlanChangesRequest
+from app.schemas.plan import DoorElement, LabelElement, Plan, WallElement, WindowElement, ZoneElement
+from benchmarks.bench_plan_diff import make_plan
+
+
+class LegacyPlan(Plan):
+    """Схема плана до объединения по тегу: pydantic перебирает варианты для каждого элемента"""
+    elements: list[WallElement | ZoneElement | DoorElement | WindowElement | LabelElement]
+
+
+def _timed(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, (time.perf_counter() - started) * 1000)
+    return best
+
+
+def _legacy_save(body: dict) -> str:
+    plan = LegacyPlan.model_validate(body["plan"])
+    return plan_content_hash(plan.model_dump())
+
+
+def _current_save(body: dict) -> str:
+    request = SavePlanChangesRequest.model_validate(body)
+    return plan_content_hash(request.plan.to_data())
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Бенчмарк сохранения плана")
+    parser.add_argument("--sizes", default="1000,5000,20000,50000")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'elements':>10}{'legacy ms':>12}{'validate':>12}{'current ms':>12}{'validate':>12}{'speedup':>9}")
+    for size in (int(s) for s in args.sizes.split(",")):
+        body = {"versionType": "MODIFIED", "plan": make_plan(size)}
+        legacy_validate = _timed(lambda: LegacyPlan.model_validate(body["plan"]), args.repeat)
+        legacy = _timed(lambda: _legacy_save(body), args.repeat)
+        current_validate = _timed(lambda: SavePlanChangesRequest.model_validate(body), args.repeat)
+        current = _timed(lambda: _current_save(body), args.repeat)
+        print(f"{size:>10}{legacy:>12.1f}{legacy_validate:>12.1f}{current:>12.1f}{current_validate:>12.1f}{legacy / current:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
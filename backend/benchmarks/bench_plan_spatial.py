@@ -0,0 +1,74 @@
+"""Бенчмарк пространственного индекса плана против полного перебора.
+
+Запуск из каталога backend: ``python -m benchmarks.bench_plan_spatial [--elements N]``
+"""
+from __future__ import annotations
+
+import argparse
+import time
+
+import numpy as np
+
+from app.services import plan_geometry, plan_spatial
+from benchmarks.bench_plan_diff import make_plan
+
+
+def _scan(elements: list[dict], bbox: tuple[float, float, float, float]) -> list[dict]:
+    """Эталон: перебор элементов в Python, как без индекса"""
+    x1, y1, x2, y2 = bbox
+    found = []
+    for elem in elements:
+        geometry = elem.get("geometry") or {}
+        points = geometry.get("points") or []
+        xs, ys = points[0::2], points[1::2]
+        if xs and min(xs) <= x2 and max(xs) >= x1 and min(ys) <= y2 and max(ys) >= y1:
+            found.append(elem)
+    return found
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Бенчмарк пространственного индекса плана")
+    parser.add_argument("--elements", type=int, default=50_000)
+    parser.add_argument("--queries", type=int, default=1_000)
+    args = parser.parse_args()
+
+    plan = make_plan(args.elements)
+    started = time.perf_counter()
+    index = plan_spatial.PlanSpatialIndex(plan)
+    build_ms = (time.perf_counter() - started) * 1000
+
+    rng = np.random.default_rng(1)
+    corners = rng.uniform(0, 50_000, (args.queries, 2))
+    boxes = np.column_stack((corners, corners + rng.uniform(100, 2_000, (args.queries, 2))))
+
+    started = time.perf_counter()
+    indexed = [index.query(tuple(box)) for box in boxes]
+    index_us = (time.perf_counter() - started) / args.queries * 1e6
+
+    scan_count = min(args.queries, 50)
+    started = time.perf_counter()
+    scanned = [_scan(plan["elements"], tuple(box)) for box in boxes[:scan_count]]
+    scan_us = (time.perf_counter() - started) / scan_count * 1e6
+    assert all([e["id"] for e in a] == [e["id"] for e in b] for a, b in zip(indexed, scanned))
+
+    bboxes = plan_geometry.element_bboxes(index.arrays)
+    started = time.perf_counter()
+    for box in boxes:
+        np.nonzero(
+            (bboxes[:, 0] <= box[2]) & (bboxes[:, 2] >= box[0]) & (bboxes[:, 1] <= box[3]) & (bboxes[:, 3] >= box[1])
+        )
+    numpy_scan_us = (time.perf_counter() - started) / args.queries * 1e6
+
+    started = time.perf_counter()
+    qi, _rows = index.grid.query_boxes(boxes)
+    batch_us = (time.perf_counter() - started) / args.queries * 1e6
+
+    print(f"elements: {args.elements}, cell: {index.grid.cell:.0f} px, build ms: {build_ms:.1f}")
+    print(f"mean hits per query: {len(qi) / args.queries:.1f}")
+    print(f"{'method':<22}{'us/query':>12}")
+    for name, value in (("python scan", scan_us), ("numpy scan", numpy_scan_us), ("index", index_us), ("index, batch", batch_us)):
+        print(f"{name:<22}{value:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
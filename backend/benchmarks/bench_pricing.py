@@ -0,0 +1,92 @@
+"""Бенчмарк расчета стоимости: формула в коде против скомпилированного тарифа.
+
+Прежняя формула calculate_price повторена здесь как эталон; тариф версии 1
+(pricing_rules.DEFAULT_RULES) должен давать те же суммы не медленнее.
+
+Запуск из каталога backend: ``python -m benchmarks.bench_pricing [--inputs N]``
+"""
+from __future__ import annotations
+
+import argparse
+import time
+
+import numpy as np
+
+from app.services.price_calculator import PricingSnapshot, price_with
+from app.services.pricing_rules import DEFAULT_RULES, compile_rules
+
+
+def legacy_formula(calc: dict) -> tuple[float, float, float]:
+    """Часть calculate_price до появления тарифов: составляющие и множитель"""
+    area = float(calc.get("area") or 0)
+    area_cost = area * 500.0
+    works = calc.get("works") or {}
+    works_cost = 0.0
+    if works.get("walls"):
+        works_cost += 3000
+    if works.get("wet_zone"):
+        works_cost += 7000
+    if works.get("doorways"):
+        works_cost += 5000
+    features = calc.get("features") or {}
+    coef_features = 1.0
+    if features.get("basement"):
+        coef_features *= 1.2
+    if features.get("join_apartments"):
+        coef_features *= 1.5
+    if calc.get("urgent"):
+        coef_features *= 1.3
+    return 0.0, area_cost + works_cost, coef_features
+
+
+def make_inputs(count: int, seed: int = 0) -> list[dict]:
+    rng = np.random.default_rng(seed)
+    flags = rng.random((count, 6)) < 0.5
+    areas = rng.uniform(20, 200, count).round(1)
+    return [
+        {
+            "area": float(area),
+            "works": {"walls": bool(f[0]), "wet_zone": bool(f[1]), "doorways": bool(f[2])},
+            "features": {"basement": bool(f[3]), "join_apartments": bool(f[4])},
+            "urgent": bool(f[5]),
+        }
+        for area, f in zip(areas, flags)
+    ]
+
+
+def _timed(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Бенчмарк тарифа калькулятора")
+    parser.add_argument("--inputs", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    inputs = make_inputs(args.inputs)
+    started = time.perf_counter()
+    evaluate = compile_rules(DEFAULT_RULES)
+    compile_us = (time.perf_counter() - started) * 1e6
+    assert all(evaluate(calc) == legacy_formula(calc) for calc in inputs)
+
+    snapshot = PricingSnapshot((0, 0), evaluate, 1, {"central": 1.2}, {"brick": 1.1})
+    rows = (
+        ("legacy formula", lambda: [legacy_formula(calc) for calc in inputs]),
+        ("compiled tariff", lambda: [evaluate(calc) for calc in inputs]),
+        ("price_with", lambda: [price_with(snapshot, "central", "brick", calc) for calc in inputs]),
+    )
+    print(f"inputs: {args.inputs}, compile: {compile_us:.0f} us")
+    print(f"{'path':<18}{'ns/input':>10}{'inputs/s':>14}")
+    for name, fn in rows:
+        seconds = _timed(fn, args.repeat)
+        print(f"{name:<18}{seconds / args.inputs * 1e9:>10.0f}{args.inputs / seconds:>14,.0f}")
+
+
+if __name__ == "__main__":
+    main()
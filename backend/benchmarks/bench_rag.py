@@ -0,0 +1,86 @@
+"""Бенчмарк поиска по индексу RAG: списки IVF против полного просмотра матрицы.
+
+Векторы синтетические: кластеры вокруг случайных «тем» с шумом, как у
+эмбеддингов фрагментов похожих документов. Индекс пишется теми же функциями,
+что и при сборке (rag_index.write_layout), и открывается через memmap.
+Полнота — доля точных top-k, найденных поиском по спискам.
+
+Запуск из каталога backend: ``python -m benchmarks.bench_rag [--chunks N]``
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from app.services import rag_index
+from app.services.rag_index import RagIndex
+
+DIM = 384
+
+
+def make_vectors(path: Path, count: int, topics: int, seed: int = 0) -> np.memmap:
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(topics, DIM)).astype(np.float32)
+    raw = np.lib.format.open_memmap(path, mode="w+", dtype=np.float32, shape=(count, DIM))
+    for start in range(0, count, 65536):
+        rows = min(65536, count - start)
+        block = centers[rng.integers(0, topics, rows)] + rng.normal(scale=0.9, size=(rows, DIM)).astype(np.float32)
+        raw[start:start + rows] = block / np.linalg.norm(block, axis=1, keepdims=True)
+    raw.flush()
+    return raw
+
+
+def _write_index(path: Path, raw: np.ndarray) -> RagIndex:
+    started = time.perf_counter()
+    lists = rag_index.write_layout(path, raw)
+    print(f"layout: {lists} lists in {time.perf_counter() - started:.1f} s")
+    np.save(path / "chunk_offsets.npy", np.zeros(len(raw), dtype=np.int64))
+    np.save(path / "chunk_hashes.npy", np.zeros(len(raw), dtype="S16"))
+    (path / "chunks.jsonl").write_bytes(b"")
+    (path / "meta.json").write_text(json.dumps({"model": "bench", "dim": DIM, "chunks": len(raw), "lists": lists}))
+    return RagIndex(path)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Бенчмарк поиска по индексу RAG")
+    parser.add_argument("--chunks", type=int, default=1_000_000)
+    parser.add_argument("--topics", type=int, default=5_000)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("-k", type=int, default=10)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp)
+        raw = make_vectors(path / "raw.npy", args.chunks, args.topics)
+        index = _write_index(path, raw)
+        rng = np.random.default_rng(1)
+        queries = np.asarray(raw[rng.integers(0, args.chunks, args.queries)]) + rng.normal(scale=0.02, size=(args.queries, DIM))
+        queries = (queries / np.linalg.norm(queries, axis=1, keepdims=True)).astype(np.float32)
+
+        started = time.perf_counter()
+        exact = []
+        for query in queries:
+            scores = np.asarray(raw) @ query
+            exact.append(set(np.argpartition(-scores, args.k)[:args.k].tolist()))
+        exact_ms = (time.perf_counter() - started) / args.queries * 1000
+
+        print(f"chunks: {args.chunks}, dim: {DIM}, k: {args.k}")
+        print(f"{'mode':<14}{'ms/query':>10}{'recall':>9}")
+        print(f"{'full scan':<14}{exact_ms:>10.1f}{1.0:>9.3f}")
+        for nprobe in (4, 12, 32):
+            index.search(queries[0], args.k, nprobe)
+            started = time.perf_counter()
+            found = [index.search(query, args.k, nprobe) for query in queries]
+            ms = (time.perf_counter() - started) / args.queries * 1000
+            recall = np.mean([len(truth & {chunk for chunk, _score in hits}) / args.k for truth, hits in zip(exact, found)])
+            print(f"{f'nprobe {nprobe}':<14}{ms:>10.2f}{recall:>9.3f}")
+        index.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""Бенчмарк обновления индекса RAG: полная сборка, пересборка из кэша
+эмбеддингов, обновление после правки 1% документов и уплотнение.
+
+Эмбеддинги — hashing (без внешних моделей), поэтому доля времени на модель
+здесь меньше, чем с sentence-transformers: с настоящей моделью выигрыш кэша и
+обновления больше. Пул процессов ускоряет эмбеддинг примерно по числу ядер.
+
+Запуск из каталога backend: ``python -m benchmarks.bench_rag_update [--docs N] [--workers N]``
+"""
+from __future__ import annotations
+
+import argparse
+import random
+import tempfile
+import time
+from pathlib import Path
+
+from app.core.config import settings
+from app.services import rag_index
+from app.services.rag_cache import EmbeddingCache
+from app.services.rag_embeddings import HashingEmbedder, resolve_workers
+from app.services.rag_index import Document
+
+
+def make_documents(count: int, rng: random.Random) -> list[Document]:
+    words = [f"термин{i}" for i in range(20000)]
+    return [
+        Document(f"doc{i:05}.txt", "\n\n".join(" ".join(rng.choices(words, k=80)) + "." for _ in range(12)))
+        for i in range(count)
+    ]
+
+
+def _timed(label: str, func) -> object:
+    started = time.perf_counter()
+    result = func()
+    print(f"{label:<34}{time.perf_counter() - started:>8.2f} s")
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Бенчмарк обновления индекса RAG")
+    parser.add_argument("--docs", type=int, default=2000)
+    parser.add_argument("--workers", type=int, default=0)
+    args = parser.parse_args()
+    # IVF и на небольшом корпусе бенчмарка, как на боевом
+    settings.rag_ivf_min_chunks = min(settings.rag_ivf_min_chunks, 10000)
+
+    rng = random.Random(0)
+    documents = make_documents(args.docs, rng)
+    embedder = HashingEmbedder()
+    workers = resolve_workers(args.workers)
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        cache = EmbeddingCache(root / "cache", embedder.name, embedder.dim)
+        _timed("build, 1 process, no cache", lambda: rag_index.build_index(documents, embedder, root / "a", workers=1))
+        _timed(f"build, {workers} process(es), no cache",
+               lambda: rag_index.build_index(documents, embedder, root / "b", cache=cache, workers=workers))
+        path = _timed("rebuild from cache", lambda: rag_index.build_index(documents, embedder, root / "b", cache=cache))
+        meta = rag_index.read_meta(path)
+        print(f"chunks: {meta['chunks']}, lists: {meta['lists']}, embedded on rebuild: {meta['embeddedChunks']}")
+
+        for i in rng.sample(range(len(documents)), max(len(documents) // 100, 1)):
+            documents[i] = Document(documents[i].name, make_documents(1, rng)[0].text)
+        path = _timed("update, 1% documents changed", lambda: rag_index.update_index(documents, embedder, root / "b", cache=cache))
+        meta = rag_index.read_meta(path)
+        print(f"delta: {meta['deltaChunks']}, deleted: {meta['deletedChunks']}, embedded: {meta['embeddedChunks']}")
+        _timed("compact", lambda: rag_index.compact_index(root / "b"))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""Бенчмарк распознавания планов на синтетическом корпусе.
+
+Запуск из каталога backend: ``python -m benchmarks.bench_recognition [--count N] [--pool]``
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from benchmarks.plan_corpus import build_corpus
+from app.services.plan_image_recognition import recognize_array
+
+
+def _counts(plan: dict) -> tuple[int, int, int]:
+    walls = [e for e in plan["elements"] if e["type"] == "wall"]
+    rooms = sum(1 for e in plan["elements"] if e["type"] == "zone")
+    openings = [o for w in walls for o in (w["geometry"].get("openings") or [])]
+    doors = sum(1 for o in openings if o["type"] == "door")
+    windows = sum(1 for o in openings if o["type"] == "window")
+    return rooms, doors, windows
+
+
+def run_inline(corpus) -> None:
+    timings: list[float] = []
+    room_hits = 0
+    door_ratio: list[float] = []
+    window_ratio: list[float] = []
+    scale_error: list[float] = []
+    for sample in corpus:
+        started = time.perf_counter()
+        result = recognize_array(sample.image)
+        timings.append((time.perf_counter() - started) * 1000)
+        rooms, doors, windows = _counts(result.plan)
+        room_hits += rooms == sample.rooms
+        door_ratio.append(doors / sample.doors if sample.doors else 1.0)
+        window_ratio.append(windows / sample.windows if sample.windows else 1.0)
+        found = result.plan["meta"]["scale"]["px_per_meter"]
+        scale_error.append(abs(found - sample.px_per_meter) / sample.px_per_meter)
+
+    print(f"samples:          {len(corpus)}")
+    print(f"time mean/p95 ms: {statistics.mean(timings):.1f} / {np.percentile(timings, 95):.1f}")
+    print(f"rooms exact:      {room_hits}/{len(corpus)}")
+    print(f"doors found:      {statistics.mean(door_ratio):.0%}")
+    print(f"windows found:    {statistics.mean(window_ratio):.0%}")
+    print(f"scale error mean: {statistics.mean(scale_error):.1%}")
+
+
+async def _recognize_all(service, paths: list[Path]) -> float:
+    await service.recognize_image(paths[0])  # прогрев процессов
+    started = time.perf_counter()
+    # Все изображения сразу, как несколько задач воркера: пул делит их между процессами
+    await asyncio.gather(*(service.recognize_image(path) for path in paths))
+    return time.perf_counter() - started
+
+
+def run_pool(corpus) -> None:
+    """Сквозной прогон через пул процессов, как в воркере"""
+    from PIL import Image
+
+    from app.services import plan_recognition_service
+
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = []
+        for idx, sample in enumerate(corpus):
+            path = Path(tmp) / f"plan_{idx}.png"
+            Image.fromarray(sample.image).save(path)
+            paths.append(path)
+        elapsed = asyncio.run(_recognize_all(plan_recognition_service, paths))
+    print(f"pool throughput:  {len(paths) / elapsed:.1f} images/s")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Бенчмарк распознавания планов")
+    parser.add_argument("--count", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--pool", action="store_true", help="Также замерить путь через пул процессов")
+    args = parser.parse_args()
+
+    corpus = build_corpus(args.count, args.seed)
+    run_inline(corpus)
+    if args.pool:
+        run_pool(corpus)
+
+
+if __name__ == "__main__":
+    main()
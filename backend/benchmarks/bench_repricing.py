@@ -0,0 +1,76 @@
+"""Бенчмарк массового пересчета цен: по одному заказу против порций с executemany.
+
+Заказы создаются во временной SQLite-базе. «По одному» повторяет прежний путь
+(загрузка ORM-объекта, calculate_order_price, commit на каждый заказ).
+
+Запуск из каталога backend: ``python -m benchmarks.bench_repricing [--orders N]``
+"""
+from __future__ import annotations
+
+import argparse
+import tempfile
+import time
+import uuid
+from pathlib import Path
+
+from sqlalchemy import create_engine, insert, select, update
+from sqlalchemy.orm import sessionmaker
+
+import app.db.base  # noqa: F401  регистрация всех моделей
+from app.db.base_class import Base
+from app.models.directory import District
+from app.models.order import Order, OrderStatus
+from app.services import repricing_service
+from app.services.price_calculator import calculate_order_price
+from benchmarks.bench_pricing import make_inputs
+
+
+def _setup(path: Path, count: int):
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)
+    with session() as db:
+        db.add_all([District(code="a", name="A", price_coef=1.0), District(code="b", name="B", price_coef=1.0)])
+        db.execute(insert(Order), [
+            {
+                "id": uuid.uuid4(), "client_id": uuid.uuid4(), "title": f"order {i}", "status": OrderStatus.SUBMITTED,
+                "district_code": "ab"[i % 2], "calculator_input": calc, "estimated_price": 0.0, "service_code": "default",
+            }
+            for i, calc in enumerate(make_inputs(count))
+        ])
+        db.commit()
+    return session
+
+
+def _one_by_one(db) -> None:
+    for order_id in db.scalars(select(Order.id).where(Order.status.not_in(repricing_service.CLOSED_STATUSES))).all():
+        order = db.get(Order, order_id)
+        order.estimated_price, order.tariff_version = calculate_order_price(db, order, order.calculator_input or {})
+        db.commit()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Бенчмарк массового пересчета цен")
+    parser.add_argument("--orders", type=int, default=5_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        session = _setup(Path(tmp) / "bench.db", args.orders)
+        print(f"orders: {args.orders}")
+        print(f"{'mode':<16}{'seconds':>10}{'orders/s':>12}")
+        for name, coef, run in (
+            ("one by one", 1.3, _one_by_one),
+            ("dry run", 1.6, lambda db: repricing_service.reprice_orders(db, dry_run=True)),
+            ("chunked bulk", 1.6, lambda db: repricing_service.reprice_orders(db)),
+        ):
+            with session() as db:
+                db.execute(update(District).values(price_coef=coef))
+                db.commit()
+                started = time.perf_counter()
+                run(db)
+                seconds = time.perf_counter() - started
+            print(f"{name:<16}{seconds:>10.2f}{args.orders / seconds:>12,.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""Бенчмарк локальной проверки правил AI по плану.
+
+План — сетка комнат из bench_plan_lod; часть стен помечена несущими и к сносу,
+одна новая мокрая зона заходит на жилые комнаты. Меряется время разбора
+условий и проверки всех правил (один PlanContext на анализ, как в
+ai_analysis_service).
+
+Запуск из каталога backend: ``python -m benchmarks.bench_rule_expressions [--rooms N]``
+"""
+from __future__ import annotations
+
+import argparse
+import time
+
+import app.db.base  # noqa: F401  # регистрация моделей для plan_spatial
+from app.services.plan_spatial import PlanSpatialIndex
+from app.services.rule_expressions import PlanContext, compile_condition
+from benchmarks.bench_plan_lod import make_floor
+
+RULES = (
+    'walls(role="TO_DELETE", loadBearing=True)',
+    'overlaps(zones(zoneType=("kitchen", "bathroom"), role="NEW"), zones(zoneType=("room", "living_room", "bedroom")))',
+    'count(walls(role="TO_DELETE")) > 10',
+    'area(zones(zoneType="bathroom")) > 12',
+    'within(labels, zones(zoneType="bathroom"))',
+    'length(walls(loadBearing=True)) > 20 and not doors(role="NEW")',
+)
+
+
+def _timed(fn, repeat: int = 5, number: int = 20) -> float:
+    """Лучшее среднее время вызова, мкс"""
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for _ in range(number):
+            fn()
+        best = min(best, (time.perf_counter() - started) / number)
+    return best * 1e6
+
+
+def make_plan(rooms: int) -> dict:
+    plan = make_floor(rooms)
+    walls = [elem for elem in plan["elements"] if elem["type"] == "wall"]
+    for elem in walls[::7]:
+        elem["loadBearing"] = True
+    for elem in walls[::23]:
+        elem["role"] = "TO_DELETE"
+    plan["elements"].append({
+        "id": "wet_new", "type": "zone", "role": "NEW", "zoneType": "bathroom",
+        "geometry": {"kind": "polygon", "points": [300.0, 300.0, 500.0, 300.0, 500.0, 500.0, 300.0, 500.0]},
+    })
+    return plan
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Бенчмарк локальной проверки правил AI")
+    parser.add_argument("--rooms", type=int, default=30)
+    args = parser.parse_args()
+
+    plan = make_plan(args.rooms)
+    print(f"rooms: {args.rooms}, elements: {len(plan['elements'])}")
+    print(f"compile all rules: {_timed(lambda: [compile_condition(rule) for rule in RULES]):.0f} us")
+
+    index = PlanSpatialIndex(plan)
+    conditions = [compile_condition(rule) for rule in RULES]
+    for rule, condition in zip(RULES, conditions):
+        triggered, ids = condition.matches(PlanContext(index))
+        # Новый контекст на замер: площади и опорные точки считаются заново, как в первом правиле анализа
+        cost = _timed(lambda: condition.matches(PlanContext(index)))
+        print(f"{cost:8.0f} us  {'hit ' if triggered else 'miss'} {len(ids):>3}  {rule}")
+
+    def evaluate_all() -> None:
+        context = PlanContext(index)
+        for condition in conditions:
+            condition.matches(context)
+
+    print(f"all rules, one context: {_timed(evaluate_all):.0f} us")
+
+
+if __name__ == "__main__":
+    main()
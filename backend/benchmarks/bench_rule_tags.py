@@ -0,0 +1,96 @@
+"""Бенчмарк отбора правил AI по тегам: JSON-колонка против таблицы ai_rule_tags.
+
+Правила создаются во временной SQLite-базе, у каждого три тега из общего
+словаря. «JSON» повторяет прежний фильтр AIRule.tags.contains([tag]) и подсчет
+тегов в Python по всем правилам.
+
+Запуск из каталога backend: ``python -m benchmarks.bench_rule_tags [--rules N]``
+"""
+from __future__ import annotations
+
+import argparse
+import random
+import tempfile
+import time
+import uuid
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+
+from sqlalchemy import create_engine, insert, or_, select
+from sqlalchemy.orm import sessionmaker
+
+import app.db.base  # noqa: F401  регистрация всех моделей
+from app.db.base_class import Base
+from app.models.ai_rule import AIRule, AIRuleTag, RiskType
+from app.services import ai_rule_service
+
+
+def _timed(fn, repeat: int = 5) -> float:
+    """Лучшее время вызова, мс"""
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best * 1000
+
+
+def _setup(path: Path, count: int, vocabulary: int):
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)
+    rng = random.Random(0)
+    tags = [f"tag{i}" for i in range(vocabulary)]
+    rules, links = [], []
+    now = datetime.utcnow()
+    for i in range(count):
+        rule_id = uuid.uuid4()
+        rule_tags = rng.sample(tags, 3)
+        rules.append({
+            "id": rule_id, "name": f"rule {i}", "trigger_condition": "x", "risk_type": RiskType.TECHNICAL,
+            "description": "d", "severity": 1, "is_enabled": True, "priority": i % 10, "tags": rule_tags,
+            "created_at": now, "updated_at": now,
+        })
+        links.extend({"rule_id": rule_id, "tag": tag} for tag in rule_tags)
+    with session() as db:
+        db.execute(insert(AIRule), rules)
+        db.execute(insert(AIRuleTag), links)
+        db.commit()
+    return session
+
+
+def _json_filter(db, tags: list[str]) -> list:
+    return db.scalars(select(AIRule.id).where(or_(*(AIRule.tags.contains([tag]) for tag in tags)))).all()
+
+
+def _table_filter(db, tags: list[str]) -> list:
+    return db.scalars(select(AIRule.id).where(AIRule.id.in_(select(AIRuleTag.rule_id).where(AIRuleTag.tag.in_(tags))))).all()
+
+
+def _json_facets(db) -> Counter:
+    return Counter(tag for tags in db.scalars(select(AIRule.tags)) for tag in tags or ())
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Бенчмарк отбора правил AI по тегам")
+    parser.add_argument("--rules", type=int, default=20_000)
+    parser.add_argument("--vocabulary", type=int, default=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        session = _setup(Path(tmp) / "bench.db", args.rules, args.vocabulary)
+        tags = ["tag7"]
+        with session() as db:
+            found_json, found_table = len(_json_filter(db, tags)), len(_table_filter(db, tags))
+            print(f"rules: {args.rules}, tags: {args.vocabulary}, matched by JSON / table: {found_json} / {found_table}")
+            print(f"{'query':<24}{'JSON ms':>10}{'table ms':>10}")
+            for name, legacy, current in (
+                ("filter by tag (ids)", lambda: _json_filter(db, tags), lambda: _table_filter(db, tags)),
+                ("tag facets", lambda: _json_facets(db), lambda: ai_rule_service.tag_facets(db)),
+            ):
+                print(f"{name:<24}{_timed(legacy):>10.1f}{_timed(current):>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
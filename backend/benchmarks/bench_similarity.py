@@ -0,0 +1,51 @@
+"""Бенчмарк поиска похожих планов.
+
+Запуск из каталога backend: ``python -m benchmarks.bench_similarity [--size N]``
+"""
+from __future__ import annotations
+
+import argparse
+import statistics
+import time
+
+import numpy as np
+
+from benchmarks.plan_corpus import build_corpus
+from app.services.plan_image_recognition import recognize_array
+from app.services.plan_similarity_service import FEATURE_SIZE, PlanSimilarityIndex, plan_features
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Бенчмарк поиска похожих планов")
+    parser.add_argument("--size", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    args = parser.parse_args()
+
+    # Реальные векторы распознанных планов плюс синтетические для объема
+    seeds = [plan_features(recognize_array(sample.image).plan) for sample in build_corpus(8)]
+    rng = np.random.default_rng(0)
+    base = np.stack(seeds)
+    noise = rng.normal(0, 0.05, size=(args.size, FEATURE_SIZE)).astype(np.float32)
+    vectors = np.abs(base[rng.integers(0, len(base), args.size)] + noise)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+
+    index = PlanSimilarityIndex()
+    started = time.perf_counter()
+    for i, vector in enumerate(vectors):
+        index.add(f"order:{i}", vector, group=str(i // 3))
+    build_s = time.perf_counter() - started
+
+    timings = []
+    for query in vectors[rng.integers(0, args.size, args.queries)]:
+        started = time.perf_counter()
+        index.search(query, k=args.k, exclude=index.keys("0"))
+        timings.append((time.perf_counter() - started) * 1000)
+
+    print(f"plans:            {len(index)}")
+    print(f"build s:          {build_s:.2f}")
+    print(f"query mean/p95 ms: {statistics.mean(timings):.2f} / {np.percentile(timings, 95):.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""Синтетический корпус планов для бенчмарков распознавания.
+
+Планировка строится рекурсивным делением прямоугольника на комнаты,
+затем рисуется в массив: стены — залитые полосы, двери — разрывы,
+окна — разрывы с тонкими линиями, плюс немного шума.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+
+import numpy as np
+
+
+@dataclass
+class SyntheticPlan:
+    image: np.ndarray
+    px_per_meter: float
+    rooms: int
+    walls: int
+    doors: int
+    windows: int
+    rects: list[tuple[int, int, int, int]] = field(default_factory=list)
+
+
+def _split(rect, rng, min_side, depth, out, step=1):
+    x0, y0, x1, y1 = rect
+    w, h = x1 - x0, y1 - y0
+    can_v = w >= 2 * min_side
+    can_h = h >= 2 * min_side
+    if depth <= 0 or not (can_v or can_h) or (depth < 3 and rng.random() < 0.2):
+        out.append(rect)
+        return
+    vertical = can_v and (not can_h or w >= h)
+    if vertical:
+        cut = x0 + min_side + step * int(rng.integers(0, (w - 2 * min_side) // step + 1))
+        _split((x0, y0, cut, y1), rng, min_side, depth - 1, out, step)
+        _split((cut, y0, x1, y1), rng, min_side, depth - 1, out, step)
+    else:
+        cut = y0 + min_side + step * int(rng.integers(0, (h - 2 * min_side) // step + 1))
+        _split((x0, y0, x1, cut), rng, min_side, depth - 1, out, step)
+        _split((x0, cut, x1, y1), rng, min_side, depth - 1, out, step)
+
+
+def render_plan(seed: int, size: tuple[int, int] = (1000, 800), px_per_meter: float = 50.0, noise: float = 0.002) -> SyntheticPlan:
+    rng = np.random.default_rng(seed)
+    width, height = size
+    margin = int(0.08 * min(width, height))
+    outer_t = max(int(px_per_meter * 0.25), 4)
+    inner_t = max(int(px_per_meter * 0.12), 3)
+    rects: list[tuple[int, int, int, int]] = []
+    # Разрезы кратны 0.5 м, чтобы смежные комнаты делили общую стену
+    step = int(px_per_meter * 0.5)
+    _split((margin, margin, width - margin, height - margin), rng, step * 5, 3, rects, step)
+
+    img = np.full((height, width), 255, dtype=np.uint8)
+    segments: dict[tuple, bool] = {}
+    for x0, y0, x1, y1 in rects:
+        for orient, c, a, b in (("h", y0, x0, x1), ("h", y1, x0, x1), ("v", x0, y0, y1), ("v", x1, y0, y1)):
+            outer = c in (margin, width - margin) if orient == "v" else c in (margin, height - margin)
+            segments[(orient, c, a, b)] = outer
+
+    def band(orient, c, a, b, t):
+        half = t // 2
+        if orient == "h":
+            return slice(c - half, c - half + t), slice(a, b)
+        return slice(a, b), slice(c - half, c - half + t)
+
+    # Сначала все стены, затем проемы, чтобы соседние отрезки не закрашивали разрывы
+    for (orient, c, a, b), outer in segments.items():
+        t = outer_t if outer else inner_t
+        img[band(orient, c, a - t // 2, b + t // 2 + 1, t)] = 0
+
+    door_w = int(0.9 * px_per_meter)
+    window_w = int(1.2 * px_per_meter)
+    doors = windows = 0
+    for (orient, c, a, b), outer in segments.items():
+        t = outer_t if outer else inner_t
+        gap = window_w if outer else door_w
+        clearance = outer_t + int(0.4 * px_per_meter)
+        if b - a < gap + 2 * clearance + 1:
+            continue
+        start = int(rng.integers(a + clearance, b - clearance - gap))
+        img[band(orient, c, start, start + gap, t)] = 255
+        if outer:
+            windows += 1
+            offset = max(t // 4, 1)
+            img[band(orient, c - offset, start, start + gap, 1)] = 0
+            img[band(orient, c + offset, start, start + gap, 1)] = 0
+        else:
+            doors += 1
+
+    if noise:
+        flips = rng.random(img.shape) < noise
+        img[flips] = 255 - img[flips]
+    return SyntheticPlan(
+        image=img,
+        px_per_meter=px_per_meter,
+        rooms=len(rects),
+        walls=len(segments),
+        doors=doors,
+        windows=windows,
+        rects=rects,
+    )
+
+
+def build_corpus(count: int = 20, seed: int = 0) -> list[SyntheticPlan]:
+    sizes = [(800, 600), (1000, 800), (1400, 1000), (2000, 1500)]
+    return [
+        render_plan(seed + i, size=sizes[i % len(sizes)], px_per_meter=40.0 + 10 * (i % 4))
+        for i in range(count)
+    ]
@@ -1,3 +1,5 @@
+import type { Job, PlanRecognitionResult } from '../types';
+
 export type HttpMethod = 'GET' | 'POST' | 'PUT' | 'PATCH' | 'DELETE';
 
 export interface ApiOptions {
@@ -95,9 +97,39 @@ export async function apiFetch<T>(
   return payload as T;
 }
 
+export interface WaitForJobOptions {
+  intervalMs?: number;
+  timeoutMs?: number;
+}
+
+export function getJob(jobId: string, token?: string | null) {
+  return apiFetch<Job>(`/jobs/${jobId}`, {}, token);
+}
+
+const sleep = (ms: number) => new Promise((resolve) => setTimeout(resolve, ms));
+
+// Фоновые задачи (AI-анализ, ответ ассистента, распознавание плана) выполняет воркер:
+// опрашиваем GET /jobs/{id}, пока задача не завершится
+export async function waitForJob(
+  jobId: string,
+  token?: string | null,
+  { intervalMs = 1000, timeoutMs = 180000 }: WaitForJobOptions = {},
+): Promise<Job> {
+  const deadline = Date.now() + timeoutMs;
+  for (;;) {
+    const job = await getJob(jobId, token);
+    if (job.status === 'SUCCEEDED') return job;
+    if (job.status === 'FAILED') throw new Error(job.error || 'Задача завершилась с ошибкой');
+    if (Date.now() >= deadline) throw new Error('Задача не завершилась вовремя');
+    await sleep(intervalMs);
+  }
+}
+
 export async function recognizePlan(orderId: string, fileId: string, token?: string | null) {
-  return apiFetch(`/client/orders/${orderId}/plan/recognize`, {
+  const job = await apiFetch<Job>(`/client/orders/${orderId}/plan/recognize`, {
     method: 'POST',
     data: { fileId },
   }, token);
+  const done = await waitForJob(job.id, token);
+  return done.result as unknown as PlanRecognitionResult;
 }
@@ -1,6 +1,6 @@
 import { useEffect, useRef, useState } from 'react';
 import { Link, useParams } from 'react-router-dom';
-import { apiFetch } from '../../api/client';
+import { apiFetch, waitForJob } from '../../api/client';
 import { useAuth } from '../../context/AuthContext';
 import {
   badgeClass,
@@ -99,12 +99,16 @@ const ClientChatPage = () => {
         { method: 'POST', data: { message: input } },
         token,
       );
-      const newMessages = [
-        ...(data.userMessage ? [data.userMessage] : []),
-        ...(data.aiMessage ? [data.aiMessage] : []),
-      ];
-      setMessages((prev) => [...prev, ...newMessages]);
+      const { userMessage } = data;
+      if (userMessage) {
+        setMessages((prev) => [...prev, userMessage]);
+      }
       setInput('');
+      // Ответ ассистента добавит фоновая задача: ждем ее и перечитываем чат
+      if (data.aiJobId) {
+        await waitForJob(data.aiJobId, token);
+        await loadChat();
+      }
     } catch (err) {
       setError(err instanceof Error ? err.message : 'Ошибка отправки');
     } finally {
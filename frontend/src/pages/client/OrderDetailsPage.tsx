@@ -1,6 +1,6 @@
 import { useEffect, useState, type FormEvent } from 'react';
 import { Link, useParams } from 'react-router-dom';
-import { apiFetch } from '../../api/client';
+import { apiFetch, waitForJob } from '../../api/client';
 import { useAuth } from '../../context/AuthContext';
 import {
   badgeClass,
@@ -15,6 +15,7 @@ import Plan3DViewer from '../../components/Plan3DViewer';
 import type {
   AiAnalysis,
   ChatMessagePairResponse,
+  Job,
   Order,
   OrderChatMessage,
   OrderFile,
@@ -40,6 +41,7 @@ const ClientOrderDetailsPage = () => {
   const [chatMessages, setChatMessages] = useState<OrderChatMessage[]>([]);
   const [chatInput, setChatInput] = useState('');
   const [analysis, setAnalysis] = useState<AiAnalysis | null>(null);
+  const [analysisPending, setAnalysisPending] = useState(false);
   const [fileToUpload, setFileToUpload] = useState<File | null>(null);
   const [message, setMessage] = useState<string | null>(null);
   const [tab, setTab] = useState<TabKey>('info');
@@ -174,12 +176,16 @@ const ClientOrderDetailsPage = () => {
         },
         token,
       );
-      const newMessages = [
-        ...(data.userMessage ? [data.userMessage] : []),
-        ...(data.aiMessage ? [data.aiMessage] : []),
-      ];
-      setChatMessages((prev) => [...prev, ...newMessages]);
+      const { userMessage } = data;
+      if (userMessage) {
+        setChatMessages((prev) => [...prev, userMessage]);
+      }
       setChatInput('');
+      // Ответ ассистента добавит фоновая задача: ждем ее и перечитываем чат
+      if (data.aiJobId) {
+        await waitForJob(data.aiJobId, token);
+        await loadChat();
+      }
     } catch (err) {
       setMessage(err instanceof Error ? err.message : 'Ошибка отправки сообщения');
     }
@@ -187,12 +193,17 @@ const ClientOrderDetailsPage = () => {
 
   const requestAnalysis = async () => {
     if (!orderId || !token) return;
+    setAnalysisPending(true);
     try {
-      await apiFetch(`/client/orders/${orderId}/ai/analyze`, { method: 'POST' }, token);
-      await loadAnalysis();
+      const job = await apiFetch<Job>(`/client/orders/${orderId}/ai/analyze`, { method: 'POST' }, token);
       setMessage('Запрос на анализ отправлен');
+      await waitForJob(job.id, token);
+      await loadAnalysis();
+      setMessage('Анализ готов');
     } catch (err) {
       setMessage(err instanceof Error ? err.message : 'Ошибка анализа');
+    } finally {
+      setAnalysisPending(false);
     }
   };
 
@@ -409,8 +420,12 @@ const ClientOrderDetailsPage = () => {
           <div className={cardClass}>
             <div className="flex items-center justify-between">
               <h4 className={sectionTitleClass}>AI анализ</h4>
-              <button className={subtleButtonClass} onClick={() => void requestAnalysis()}>
-                Запросить анализ
+              <button
+                className={subtleButtonClass}
+                onClick={() => void requestAnalysis()}
+                disabled={analysisPending}
+              >
+                {analysisPending ? 'Анализ выполняется…' : 'Запросить анализ'}
               </button>
             </div>
             {analysis ? (
@@ -239,6 +239,33 @@ export interface OrderChatMessage {
 export interface ChatMessagePairResponse {
   userMessage?: OrderChatMessage;
   aiMessage?: OrderChatMessage;
+  aiJobId?: string | null;
+}
+
+export type JobStatus = 'QUEUED' | 'RUNNING' | 'SUCCEEDED' | 'FAILED';
+
+export interface Job {
+  id: string;
+  kind: string;
+  status: JobStatus;
+  attempts: number;
+  maxAttempts: number;
+  orderId?: string | null;
+  result?: Record<string, unknown> | null;
+  progress?: Record<string, unknown> | null;
+  error?: string | null;
+  runAfter?: string | null;
+  createdAt: string;
+  updatedAt?: string | null;
+  finishedAt?: string | null;
+}
+
+export interface PlanRecognitionResult {
+  versionId: string;
+  versionType: string;
+  confidence?: number | null;
+  processingTimeMs?: number | null;
+  errors?: string[] | null;
 }
 
 export interface AiAnalysis {